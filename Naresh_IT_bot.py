@@ -1,33 +1,94 @@
 import os
 import base64
+import logging
 import json
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import io # Added for in-memory TTS file handling
+import time
+import hashlib
+import functools
 
 import streamlit as st
 from dotenv import load_dotenv
 
 # Import necessary Google/Gemini components from LangChain
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_community.document_loaders import WebBaseLoader
-# import to use the widely adopted LangChain Text Splitters
-from langchain_text_splitters import RecursiveCharacterTextSplitter 
+from langchain_google_genai import ChatGoogleGenerativeAI
 # import to use standard structure for vector store (Corrected to standard community import)
 from langchain_community.vectorstores import FAISS 
 # Using LCEL components for modern LangChain implementation
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 import asyncio
 
-# Optional features (voice input / TTS / translation)
-# Note: Streamlit microphone input is often tricky in web deployments.
-try:
-    import speech_recognition as sr  # type: ignore
-except Exception:  # pragma: no cover
-    sr = None  # type: ignore
+# DOM-aware course page extraction + chunking (drops nav/footer/promo boilerplate)
+from course_content import COURSE_OPTIONS, COURSE_PAGES, CHUNK_MODE, CHUNK_SIZE, CHUNK_OVERLAP, load_course_chunks
+# Structured curriculum tree extracted at ingest time (answers syllabus questions without Gemini)
+from curriculum import load_curriculum, save_curriculum, format_curriculum_markdown
+# Local intent routing (canned replies / curriculum / answer cache / full RAG)
+from intent_router import (
+    CANNED_ROUTES, ROUTE_CACHE, ROUTE_CURRICULUM, ROUTE_FAQ, ROUTE_RAG,
+    AnswerCache, RouterStats, canned_response, classify_query,
+)
+# LRU caches for query embeddings and retrieval results
+from query_cache import CachedQueryEmbeddings, RetrievalCache
+# Token-budgeted per-course conversation memory for follow-up questions
+from conversation import ConversationMemory, llm_standalone_query
+# Durable, paged chat history shared across replicas (SQLite / Redis)
+from session_store import (
+    SESSION_COOKIE, SESSION_URL_RESUME, SessionStore, create_session_store, resolve_session_id,
+)
+# Two-level (process LRU + shared store) cache for answers, embeddings and index artifacts
+from shared_cache import TwoLevelCache, create_shared_cache
+# Per-query retrieval depth from intent, score gaps and a token budget
+from adaptive_retrieval import AdaptiveRetriever
+# Merges / de-duplicates retrieved chunks into the prompt context
+from context_assembly import ContextStats, assemble_context
+# The course RAG prompt + LCEL chain (shared with the offline FAQ bank build)
+from course_chain import CHAT_MODEL, course_chain
+# LLM calls under a latency deadline, with an extractive answer as fallback
+from answer_fallback import (
+    JOB_DONE as LLM_DONE, JOB_PENDING as LLM_PENDING, LLM_DEADLINE_SECONDS, LLM_MAX_RETRIES,
+    LLM_REQUEST_TIMEOUT_SECONDS, DeadlineAnswerer, extractive_answer,
+)
+# Token / cost ledger per course, session and feature (SQLite, daily rollups, budget alarm)
+from usage_ledger import (
+    FEATURE_CHAT, FEATURE_REWRITE, FEATURE_SEARCH, FEATURE_TRANSLATE, FEATURE_TTS, MeteredEmbeddings,
+    create_usage_ledger, current_usage, message_usage, usage_scope,
+)
+# Per-query retrieval traces: inspector panel (?inspect=1) and JSONL trace log
+from retrieval_trace import (
+    PART_LLM, PART_TURN, QueryTrace, TraceLog, complete_part, create_trace_log, current_trace, inspector_enabled,
+    note, stage, traced_call, tracing,
+)
+# Concurrent batched embedding for index builds
+from index_builder import FAISS_OPTIONS, INDEX_VECTORS, build_faiss_index
+# Optional PCA / truncation of stored vectors, fitted per course at build time
+from dim_reduction import reduce_index, reduction_label
+# Pre-generated, pre-translated answers to each course's predictable questions
+from faq_bank import (
+    FAQ_BANK_ENABLED, FAQ_BUILD_IN_APP, FAQ_SESSION, FAQ_TTS, RESPONSE_LANGUAGES, FaqBankBuilder, FaqBankStore,
+    index_fingerprint as bank_fingerprint,
+)
+# MinHash / LSH near-duplicate chunk elimination at ingest (within and across courses)
+from near_duplicates import DEDUP_ENABLED, DEDUP_THRESHOLD, DedupEmbeddings, create_dedup_registry, dedupe_chunks
+# Read-only mmap'd index files shared by every app process on the host
+from mmap_index import MMAP_INDEXES, open_mmap_index, write_mmap_index
+# Background warm-up of the most-selected course indexes
+from index_warmup import WARMUP_ENABLED, IndexRegistry, IndexWarmer
+# Stand-in LLM / translation / TTS services for load tests (LLM_BACKEND=standin)
+from standins import create_standin_chat_model, standin_translate, standin_tts
+# Pluggable embedding backends (remote Gemini or local CPU model)
+from embedding_backends import EMBEDDING_BACKEND, create_embeddings, embedding_identity, record_index_metadata
+
+# Server CPU and bytes sent per full run / fragment rerun (and opt-in profiling of each run)
+from rerun_metrics import begin_run, end_run, metered
+from profiling import profiled
+# Voice questions: browser audio, VAD trimming and background speech recognition
+from voice_input import (
+    JOB_DONE, JOB_PENDING, RECOGNITION_LANGUAGE, RecognitionPool, audio_digest, create_recognizer,
+)
 
+# Optional features (TTS / translation)
 try:
     from gtts import gTTS  # type: ignore
 except Exception:  # pragma: no cover
@@ -40,9 +101,16 @@ except Exception:  # pragma: no cover
 
 
 # ===== Env / Setup =====
+begin_run("full")
 load_dotenv()
+# LOG_LEVEL=INFO shows per-query routing, cache and ingest stats in the server log
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
 # Update to use GEMINI_API_KEY
 gemini_api_key = os.getenv("GOOGLE_API_KEY", "").strip()
+# "gemini" (default) or "standin": local stand-ins for Gemini, translation and TTS (see standins.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").strip().lower()
+if LLM_BACKEND == "standin":
+    gemini_api_key = gemini_api_key or "standin"  # no remote calls are made
 # Use the displayed number as the fallback for robustness
 contact_number = os.getenv("CONTACT_PHONE", "+91 8179191999").strip()
 
@@ -79,604 +147,97 @@ with col2:
     )
 
 # ===== Styles (Kept as is - they are great!) =====
-st.markdown(
-    """
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
-    
-    :root {
-      --primary: #6366f1; /* indigo-500 */
-      --primary-dark: #4f46e5; /* indigo-600 */
-      --primary-light: #a5b4fc; /* indigo-300 */
-      --secondary: #ec4899; /* pink-500 */
-      --accent: #06b6d4; /* cyan-500 */
-      --success: #10b981; /* emerald-500 */
-      --warning: #f59e0b; /* amber-500 */
-      --danger: #ef4444; /* red-500 */
-      
-      --bg-primary: #0a0a0a; /* near black */
-      --bg-secondary: #111111; /* dark gray */
-      --bg-tertiary: #1a1a1a; /* lighter dark */
-      --bg-card: #1e1e1e; /* card background */
-      --bg-glass: rgba(30, 30, 30, 0.8); /* glass effect */
-      
-      --text-primary: #ffffff;
-      --text-secondary: #a1a1aa; /* zinc-400 */
-      --text-muted: #71717a; /* zinc-500 */
-      --text-accent: #e4e4e7; /* zinc-200 */
-      
-      --border: #27272a; /* zinc-800 */
-      --border-light: #3f3f46; /* zinc-700 */
-      --shadow: 0 25px 50px -12px rgba(0, 0, 0, 0.5);
-      --shadow-lg: 0 35px 60px -12px rgba(0, 0, 0, 0.6);
-    }
+# Served once as a static asset (static/theme.css, server.enableStaticServing in
+# .streamlit/config.toml) and cached by the browser, instead of ~600 lines of inline CSS
+# re-sent on every rerun. The version query string changes whenever the file does.
+@st.cache_resource(show_spinner=False)
+def theme_version() -> str:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "theme.css"), "rb") as css:
+        return hashlib.sha1(css.read()).hexdigest()[:10]
 
-    * { box-sizing: border-box; }
-    
-    .stApp { 
-      background: linear-gradient(135deg, var(--bg-primary) 0%, #0f0f23 50%, var(--bg-primary) 100%);
-      color: var(--text-primary);
-      font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-      min-height: 100vh;
-    }
 
-    /* Animated Background */
-    .stApp::before {
-      content: '';
-      position: fixed;
-      top: 0;
-      left: 0;
-      width: 100%;
-      height: 100%;
-      background: 
-        radial-gradient(circle at 20% 80%, rgba(99, 102, 241, 0.1) 0%, transparent 50%),
-        radial-gradient(circle at 80% 20%, rgba(236, 72, 153, 0.1) 0%, transparent 50%),
-        radial-gradient(circle at 40% 40%, rgba(6, 182, 212, 0.1) 0%, transparent 50%);
-      z-index: -1;
-      animation: float 20s ease-in-out infinite;
-    }
+st.markdown(f"<style>@import url('app/static/theme.css?v={theme_version()}');</style>", unsafe_allow_html=True)
 
-    @keyframes float {
-      0%, 100% { transform: translateY(0px) rotate(0deg); }
-      50% { transform: translateY(-20px) rotate(180deg); }
-    }
 
+# ===== Helpers =====
+LANGUAGE_MAP = {
+    "English": "en",
+    "Hindi": "hi",
+    "Telugu": "te",
+    "Tamil": "ta",
+    "Kannada": "kn",
+    "Malayalam": "ml",
+    "Bengali": "bn",
+    "Gujarati": "gu",
+    "Marathi": "mr",
+    "Punjabi": "pa",
+    "Urdu": "ur",
+}
 
-    /* Premium Cards */
-    .card { 
-      background: var(--bg-card); 
-      border: 1px solid var(--border); 
-      border-radius: 20px; 
-      padding: 24px; 
-      box-shadow: var(--shadow);
-      backdrop-filter: blur(10px);
-      transition: all 0.3s ease;
-    }
-    
-    .card:hover {
-      transform: translateY(-2px);
-      box-shadow: var(--shadow-lg);
-      border-color: var(--border-light);
-    }
-    
-    .card-tonal { 
-      background: linear-gradient(135deg, var(--bg-card) 0%, var(--bg-tertiary) 100%);
-      border: 1px solid var(--border); 
-      border-radius: 20px; 
-      padding: 28px; 
-      box-shadow: var(--shadow);
-      backdrop-filter: blur(10px);
-    }
 
-    /* Modern Chat Interface */
-    .chat-container {
-      font-size: 1.2rem;
-      background: var(--bg-card);
-      border: 1px solid var(--border);
-      border-radius: 24px;
-      padding: 24px;
-      box-shadow: var(--shadow);
-      backdrop-filter: blur(10px);
-      position: relative;
-      overflow: hidden;
-    }
 
-    .course-container {
-      font-size: 1.2rem;
-      background: #8D8D9E;
-      border: 1px solid var(--border);
-      border-radius: 12px;
-      padding: 0;
-      box-shadow: var(--shadow);
-      backdrop-filter: blur(10px);
-      position: relative;
-      text-align: center;
-      overflow: hidden;
-    }
-    
-    .chat-container::before {
-      content: '';
-      position: absolute;
-      top: 0;
-      left: 0;
-      right: 0;
-      height: 1px;
-      background: linear-gradient(90deg, transparent, var(--primary), transparent);
-    }
 
-    .stChatMessage { 
-      border-radius: 20px; 
-      padding: 16px 20px; 
-      margin: 12px 0; 
-      max-width: 85%;
-      backdrop-filter: blur(10px);
-      transition: all 0.3s ease;
-    }
-    
-    .stChatMessage:hover {
-      transform: translateX(4px);
-    }
-    
-    .user-msg { 
-      background: linear-gradient(135deg, var(--primary) 0%, var(--primary-dark) 100%);
-      border: 1px solid rgba(99, 102, 241, 0.3);
-      color: white; 
-      margin-left: auto;
-      box-shadow: 0 8px 32px rgba(99, 102, 241, 0.2);
-    }
-    
-    .bot-msg { 
-      background: linear-gradient(135deg, var(--bg-tertiary) 0%, var(--bg-card) 100%);
-      border: 1px solid var(--border);
-      color: var(--text-primary);
-      box-shadow: 0 8px 32px rgba(0, 0, 0, 0.2);
-    }
-    
-    /* ----------------------------------------------------- */
-    /* MODIFICATION 1: Enhance Text Visibility for Black BG  */
-    /* ----------------------------------------------------- */
-    .main .block-container * {
-        color: var(--text-accent) !important; /* Ensure primary text is visible */
-    }
-    
-    .main .block-container h1, .main .block-container h2, .main .block-container h3, .main .block-container strong {
-        color: var(--text-primary) !important; /* Headings and strong text bright white */
-    }
-    
-    .stAlert div[data-testid="stMarkdownContainer"] {
-        color: var(--bg-primary) !important; /* Ensure text inside alerts is readable against alert background */
-    }
-    
-    .st-emotion-cache-1c9asg8 a, .st-emotion-cache-1c9asg8 a:hover {
-        color: var(--primary-light) !important; /* Ensure links are visible */
-    }
-    /* ----------------------------------------------------- */
-    
-    
+def create_chat_model(temperature: float, max_output_tokens: int):
+    """Gemini chat model, or the local stand-in with LLM_BACKEND=standin."""
+    if LLM_BACKEND == "standin":
+        return create_standin_chat_model()
+    return ChatGoogleGenerativeAI(
+        model=CHAT_MODEL,
+        google_api_key=gemini_api_key,
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        # A hung request must give its LLM worker back (see answer_fallback.py)
+        timeout=LLM_REQUEST_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
+    )
 
-    /* Sidebar Styling */
-    [data-testid="stSidebar"] { 
-      background: linear-gradient(180deg, var(--bg-secondary) 0%, var(--bg-primary) 100%);
-      border-right: 1px solid var(--border); 
-      color: var(--text-primary);
-    }
-    .sidebar-banner {
-      background: radial-gradient(1200px 200px at 0% -10%, rgba(99,102,241,0.25), transparent),
-                   radial-gradient(1000px 200px at 100% -20%, rgba(236,72,153,0.25), transparent),
-                   linear-gradient(135deg, rgba(30,30,30,0.9), rgba(20,20,30,0.9));
-      border: 1px solid var(--border);
-      border-radius: 16px;
-      padding: 16px;
-      margin: 0 0 16px 0;
-      box-shadow: var(--shadow);
-      position: relative;
-      overflow: hidden;
-    }
-    .sidebar-banner::after {
-      content: "";
-      position: absolute;
-      inset: 0;
-      background: linear-gradient(90deg, transparent, rgba(99,102,241,0.15), transparent);
-      height: 1px;
-      top: 0;
-    }
-    .sidebar-header {
-      display: flex;
-      align-items: center;
-      gap: 10px;
-      margin: 0 0 16px 0;
-    }
-    .sidebar-header h2 {
-      font-size: 1.4rem;
-      font-weight: 800;
-      margin: 0;
-      background: linear-gradient(135deg, var(--primary), var(--secondary), var(--accent));
-      -webkit-background-clip: text;
-      -webkit-text-fill-color: transparent;
-      background-clip: text;
-      letter-spacing: 0.3px;
-    }
-    .sidebar-icon {
-      width: 36px;
-      height: 36px;
-      border-radius: 10px;
-      display: grid;
-      place-items: center;
-      background: linear-gradient(135deg, rgba(99,102,241,0.2), rgba(6,182,212,0.15));
-      border: 1px solid var(--border);
-    }
-    .sidebar-subtext {
-      font-size: 0.9rem;
-      color: var(--text-secondary);
-      margin: -4px 0 12px 0;
-    }
-    .sidebar-card {
-      background: linear-gradient(135deg, var(--bg-card) 0%, rgba(30,30,30,0.9) 100%);
-      border: 1px solid rgba(99,102,241,0.3);
-      border-radius: 16px;
-      padding: 16px;
-      box-shadow: 0 6px 24px rgba(0,0,0,0.3);
-      backdrop-filter: blur(15px);
-      margin-bottom: 16px;
-      position: relative;
-      overflow: hidden;
-    }
-    
-    .sidebar-card::before {
-      content: '';
-      position: absolute;
-      top: 0;
-      left: 0;
-      right: 0;
-      height: 2px;
-      background: linear-gradient(90deg, transparent, var(--primary), transparent);
-    }
-    
-    .sidebar-card:hover {
-      border-color: rgba(99,102,241,0.5);
-      transform: translateY(-2px);
-      box-shadow: 0 8px 32px rgba(99,102,241,0.2);
-      background: linear-gradient(135deg, rgba(30,30,30,0.95) 0%, rgba(40,40,50,0.9) 100%);
-    }
-    
-    .sidebar-card-title {
-      font-size: 1.1rem;
-      font-weight: 700;
-      color: var(--text-primary);
-      margin: 0 0 8px 0;
-      display: flex;
-      align-items: center;
-      gap: 8px;
-    }
-    
-    .section-title { 
-      font-weight: 700; 
-      font-size: 1.125rem;
-      color: var(--text-primary); 
-      margin: 0 0 1rem 0;
-      padding-bottom: 0.5rem;
-      border-bottom: 2px solid var(--primary);
-    }
-    .section-subtitle {
-      font-weight: 700;
-      font-size: 0.95rem;
-      color: var(--text-accent);
-      margin: 0 0 10px 0;
-    }
-    .divider { height: 1px; background: var(--border); margin: 10px 0; }
-    .muted { color: var(--text-muted); font-size: 0.9rem; }
-    .badge {
-      display: inline-flex;
-      align-items: center;
-      gap: 6px;
-      padding: 4px 10px;
-      border-radius: 999px;
-      border: 1px solid var(--border);
-      background: var(--bg-tertiary);
-      font-size: 0.8rem;
-      color: var(--text-accent);
-    }
-    .status-pill { 
-      padding: 8px 16px; 
-      border-radius: 20px; 
-      font-size: 0.8rem; 
-      font-weight: 600;
-      border: 1px solid var(--border); 
-      display: inline-flex;
-      align-items: center;
-      gap: 6px;
-      box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-      transition: all 0.3s ease;
-    }
-    .status-ok { 
-      background: linear-gradient(135deg, rgba(16,185,129,0.2), rgba(16,185,129,0.1)); 
-      color: #10b981; 
-      border-color: rgba(16,185,129,0.4);
-      box-shadow: 0 2px 8px rgba(16,185,129,0.2);
-    }
-    .status-warn { 
-      background: linear-gradient(135deg, rgba(245,158,11,0.2), rgba(245,158,11,0.1)); 
-      color: #f59e0b; 
-      border-color: rgba(245,158,11,0.4);
-      box-shadow: 0 2px 8px rgba(245,158,11,0.2);
-    }
-    .status-err { 
-      background: linear-gradient(135deg, rgba(239,68,68,0.2), rgba(239,68,68,0.1)); 
-      color: #ef4444; 
-      border-color: rgba(239,68,68,0.4);
-      box-shadow: 0 2px 8px rgba(239,68,68,0.2);
-    }
-    
-    .status-pill:hover {
-      transform: translateY(-1px);
-      box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-    }
-    
 
-    /* Buttons */
-    .stButton {
-      margin: 0;
-      padding: 0;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-    }
-    
-    .stButton > button {
-      background: linear-gradient(135deg, var(--primary) 0%, var(--primary-dark) 100%);
-      color: white;
-      border: none;
-      border-radius: 12px;
-      padding: 0.75rem 1.5rem;
-      font-weight: 600;
-      transition: all 0.3s ease;
-      box-shadow: 0 4px 16px rgba(99, 102, 241, 0.3);
-      min-height: 48px;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      margin: 0;
-      width: 100%;
-    }
-    
-    .stButton > button:hover {
-      transform: translateY(-2px);
-      box-shadow: 0 8px 24px rgba(99, 102, 241, 0.4);
-    }
+# e.g. "google:text-embedding-004" or "local:bge-small-en-v1.5" (EMBEDDING_BACKEND, see embedding_backends.py)
+EMBEDDING_ID = embedding_identity()
+# Shared-tier lifetime of scraped chunks and built indexes (course pages change rarely)
+INDEX_CACHE_TTL = float(os.getenv("INDEX_CACHE_TTL", str(7 * 24 * 3600)))
 
-    /* Action columns alignment - ensure both elements are at same level */
-    .stColumns {
-      display: flex;
-      align-items: stretch;
-    }
-    
-    .stColumns > div {
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      padding: 0;
-      margin: 0;
-    }
-    
-    /* Specific alignment for action buttons */
-    .stColumns > div:first-child {
-      display: flex;
-      align-items: center;
-      justify-content: center;
-    }
-    
-    .stColumns > div:last-child {
-      display: flex;
-      align-items: center;
-      justify-content: center;
-    }
-    
-    /* Form Elements */
-    .stTextInput > div > div > input {
-      background: var(--bg-tertiary);
-      border: 1px solid var(--border);
-      border-radius: 12px;
-      color: var(--text-primary);
-      padding: 0.75rem 1rem;
-      font-size: 1rem;
-    }
-    
-    .stTextInput > div > div > input:focus {
-      border-color: var(--primary);
-      box-shadow: 0 0 0 3px rgba(99, 102, 241, 0.1);
-    }
 
-    /* Selectbox styling to match clear chat button exactly */
-    .stSelectbox {
-      margin: 0;
-      padding: 0;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-    }
-    
-    .stSelectbox > div {
-      margin: 0;
-      padding: 0;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      width: 100%;
-    }
-    
-    .stSelectbox > div > div {
-      background: linear-gradient(135deg, var(--primary) 0%, var(--primary-dark) 100%);
-      border: none;
-      border-radius: 12px;
-      color: white;
-      font-weight: 600;
-      box-shadow: 0 4px 16px rgba(99, 102, 241, 0.3);
-      transition: all 0.3s ease;
-      padding: 0.75rem 1.5rem;
-      min-height: 48px;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      margin: 0;
-      width: 100%;
-    }
-    
-    .stSelectbox > div > div:hover {
-      transform: translateY(-2px);
-      box-shadow: 0 8px 24px rgba(99, 102, 241, 0.4);
-    }
-    
-    .stSelectbox > div > div > div {
-      color: white;
-      padding: 0;
-      display: flex;
-      align-items: center;
-      height: 100%;
-    }
+@st.cache_resource(show_spinner=False)
+def get_usage_ledger():
+    """Process-wide token / cost ledger (USAGE_DB; see usage_ledger.py)."""
+    return create_usage_ledger()
 
-    /* Tabs */
-    .stTabs [data-baseweb="tab-list"] {
-      gap: 0.5rem;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-      background: var(--bg-tertiary);
-      border: 1px solid var(--border);
-      border-radius: 12px;
-      color: var(--text-secondary);
-      font-weight: 600;
-      padding: 0.75rem 1.5rem;
-    }
-    
-    .stTabs [aria-selected="true"] {
-      background: linear-gradient(135deg, var(--primary) 0%, var(--primary-dark) 100%);
-      color: white;
-      border-color: var(--primary);
-    }
 
-    /* Links */
-    a, .stMarkdown a { 
-      color: var(--primary-light);
-      text-decoration: none;
-      transition: color 0.3s ease;
-    }
-    
-    a:hover, .stMarkdown a:hover {
-      color: var(--primary);
-    }
+@st.cache_resource(show_spinner=False)
+def get_dedup_registry():
+    """Chunk signatures and vectors shared by every course on this host (DEDUP_DB; None when off)."""
+    return create_dedup_registry()
 
-    /* Scrollbar */
-    ::-webkit-scrollbar {
-      width: 8px;
-    }
-    
-    ::-webkit-scrollbar-track {
-      background: var(--bg-secondary);
-    }
-    
-    ::-webkit-scrollbar-thumb {
-      background: var(--primary);
-      border-radius: 4px;
-    }
-    
-    ::-webkit-scrollbar-thumb:hover {
-      background: var(--primary-dark);
-    }
 
-    /* Enhanced Download Buttons */
-    .stDownloadButton > button {
-      background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-      color: white;
-      border: none;
-      border-radius: 12px;
-      padding: 0.75rem 1rem;
-      font-weight: 700;
-      transition: all 0.3s ease;
-      box-shadow: 0 4px 16px rgba(16, 185, 129, 0.3);
-      min-height: 48px;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      margin: 0;
-      width: 100%;
-    }
-    
-    .stDownloadButton > button:hover {
-      transform: translateY(-2px);
-      box-shadow: 0 8px 24px rgba(16, 185, 129, 0.4);
-      background: linear-gradient(135deg, #059669 0%, #047857 100%);
-    }
-    
-    /* Enhanced Checkbox Styling */
-    .stCheckbox > div > div {
-      background: transparent;
-      border: none;
-    }
-    
-    .stCheckbox > div > div > label {
-      color: var(--text-primary) !important;
-      font-weight: 600 !important;
-      font-size: 0.95rem !important;
-      opacity: 1 !important;
-    }
-    
-    .stCheckbox > div > div > label:hover {
-      color: var(--primary-light) !important;
-    }
-    
-    /* Checkbox input styling */
-    .stCheckbox > div > div > label > input[type="checkbox"] {
-      accent-color: var(--primary);
-      transform: scale(1.2);
-      margin-right: 8px;
-    }
+def usage_context() -> tuple[str, str]:
+    """(course, session id) that usage in this script run is charged to."""
+    return st.session_state.get("active_course_name", ""), get_session_id()
 
-    /* Hide default Streamlit elements */
-    .stApp > header { display: none; }
-    #MainMenu { visibility: hidden; }
-    footer { visibility: hidden; }
-    .stDeployButton { display: none; }
-    .stStatusWidget { display: none; }
-    
-    /* Remove default container padding */
-    .main .block-container { 
-      padding-top: 0 !important; 
-      padding-bottom: 0 !important; 
-    }
-    /* Floating contact */
-    .floating-contact {
-      position: fixed;
-      right: 16px;
-      bottom: 16px;
-      background: linear-gradient(135deg, var(--primary), var(--primary-dark));
-      color: #fff;
-      border: 1px solid rgba(255,255,255,0.15);
-      border-radius: 999px;
-      padding: 10px 14px;
-      box-shadow: var(--shadow-lg);
-      z-index: 9999;
-      font-weight: 700;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
 
+def metered_llm(llm, feature: str, usage: Optional[tuple[str, str]] = None) -> RunnableLambda:
+    """The chat model as a runnable that records each call's tokens for this course / session / feature."""
+    ledger = get_usage_ledger()
+    course, session_id = usage or usage_context()  # read here: the call itself may run on a worker thread
+    model = "standin" if LLM_BACKEND == "standin" else CHAT_MODEL
 
-# ===== Helpers =====
-LANGUAGE_MAP = {
-    "English": "en",
-    "Hindi": "hi",
-    "Telugu": "te",
-    "Tamil": "ta",
-    "Kannada": "kn",
-    "Malayalam": "ml",
-    "Bengali": "bn",
-    "Gujarati": "gu",
-    "Marathi": "mr",
-    "Punjabi": "pa",
-    "Urdu": "ur",
-}
+    def _invoke(prompt):
+        with stage("llm" if feature == FEATURE_CHAT else feature):
+            message = llm.invoke(prompt)
+        prompt_text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        ledger.record_llm(feature, model, prompt_text, message, course, session_id)
+        if feature == FEATURE_CHAT and current_trace() is not None:
+            input_tokens, output_tokens, estimated = message_usage(prompt_text, message)
+            note(prompt_tokens=input_tokens, output_tokens=output_tokens, tokens_estimated=estimated)
+        return message
+
+    return RunnableLambda(_invoke)
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_cache() -> TwoLevelCache:
+    """Per-process LRU in front of the store shared by all replicas (see shared_cache.py)."""
+    return create_shared_cache()
 
 
 @st.cache_resource(show_spinner=False)
@@ -687,51 +248,388 @@ def get_embeddings():
         asyncio.set_event_loop(asyncio.new_event_loop())  
 
     """
-    Initializes and returns the Google Generative AI Embeddings model for RAG.
+    Initializes and returns the embeddings model for RAG: Google Generative AI Embeddings by
+    default, or a local CPU model loaded from disk with EMBEDDING_BACKEND=local.
     """
-    # Using GoogleGenerativeAIEmbeddings (default model is powerful and fast)
-    return GoogleGenerativeAIEmbeddings(model="text-embedding-004")
+    # Query vectors are memoized by normalized text (process-wide LRU with hit-rate stats),
+    # backed by the shared cache so replicas reuse each other's query embeddings
+    # Only requests that miss the caches reach the backend and are recorded in the usage ledger
+    return CachedQueryEmbeddings(
+        MeteredEmbeddings(create_embeddings(), get_usage_ledger(), EMBEDDING_ID.split(":", 1)[-1]),
+        max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048")),
+        shared=get_shared_cache(),
+        model_name=EMBEDDING_ID,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_retrieval_cache() -> RetrievalCache:
+    """Process-wide cache of retrieved chunks per (course index, normalized query, k)."""
+    return RetrievalCache(max_entries=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")))
+
+
+@st.cache_resource(show_spinner=False)
+def get_adaptive_retriever() -> AdaptiveRetriever:
+    """Chooses how many chunks each question retrieves (see adaptive_retrieval.py)."""
+    return AdaptiveRetriever(get_retrieval_cache())
 
 
 @st.cache_data(show_spinner=False)
-def load_and_split_from_url(url: str) -> List[Any]:
-    """Loads and splits documents from a given URL."""
-    loader = WebBaseLoader(url)
-    docs = loader.load()
-    # FIX: chunk_size=1500 and chunk_overlap=350 applied as requested
-    # CRITICAL FIX 3: Added custom separators to prioritize structural breaks (double newline)
-    # over single newlines, helping to keep list items together within chunks.
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1500, 
-        chunk_overlap=350, 
-        separators=["\n\n", "\n", " ", ""]
-    ) 
-    return splitter.split_documents(docs)
+def load_and_split_from_url(url: str) -> tuple[List[Any], Dict[str, Any]]:
+    """
+    Loads a course page, keeps only the course body sections (overview, curriculum, FAQs)
+    and splits them into chunks. Returns (chunks, stats) where stats reports the chunk-count
+    reduction versus splitting the raw page text.
+    """
+    # Splitter mode, chunk_size and chunk_overlap come from CHUNK_MODE / CHUNK_SIZE / CHUNK_OVERLAP
+    # (see course_content.py; choose them with bench_chunking.py)
+    # The curriculum tree is extracted once here and stored next to the index
+    # Only one replica scrapes a page: the others pick its result up from the shared cache
+    return ingest_course(url, get_shared_cache(), get_dedup_registry())
+
+
+def ingest_course(url: str, shared: TwoLevelCache, dedup_registry) -> tuple[List[Any], Dict[str, Any]]:
+    """load_and_split_from_url without st.cache_data, for threads that have no script run (warm-up)."""
+    # Crawled syllabus sub-pages (COURSE_CATALOG from course_crawler.py) are ingested with the page
+    subpages = COURSE_PAGES.get(url, [])
+    key = shared.make_key("chunks", url, CHUNK_MODE, CHUNK_SIZE, CHUNK_OVERLAP, DEDUP_ENABLED, DEDUP_THRESHOLD, *subpages)
+
+    def _ingest():
+        chunks, stats = load_course_chunks(url, store_curriculum=True, subpages=subpages)
+        if DEDUP_ENABLED:
+            # Repeated blocks (trainer pitch, placement, FAQs) collapse into one chunk with provenance
+            chunks, report = dedupe_chunks(chunks, url, dedup_registry)
+            stats.update(report, chunks=len(chunks))
+        return chunks, stats, load_curriculum(url)
+
+    chunks, stats, curriculum = shared.get_or_compute(key, _ingest, ttl=INDEX_CACHE_TTL, use_l1=False)
+    if curriculum and load_curriculum(url) is None:
+        save_curriculum(url, curriculum)  # replica that didn't scrape: store it next to its index too
+    return chunks, stats
 
 
 @st.cache_resource(show_spinner=False)
-def build_vectordb_for_url(url: str) -> FAISS:
+def get_index_registry() -> IndexRegistry:
+    """Process-wide map of course URL -> built FAISS index (shared by every session)."""
+    return IndexRegistry()
+
+
+def build_vectordb_for_url(url: str, on_progress=None) -> FAISS:
     """
     Builds the FAISS vector database from the content of a given URL.
-    This function leverages st.cache_resource for extremely fast subsequent loads.
+    Built indexes are kept in a process-wide registry for extremely fast subsequent loads.
+    (Not an st.cache_resource itself, so on_progress may update UI elements while building.)
+    """
+    registry = get_index_registry()
+    vectordb = registry.get(url)
+    if vectordb is not None:
+        return vectordb
+    # Built at most once per process, even if the warm-up thread asks for it at the same time
+    return registry.get_or_build(url, lambda: _load_or_build_vectordb(url, on_progress))
+
+
+def _load_or_build_vectordb(url: str, on_progress=None) -> FAISS:
+    return load_or_build_index(url, get_embeddings(), get_shared_cache(), get_dedup_registry(),
+                               on_progress, split=load_and_split_from_url)
+
+
+def load_or_build_index(url: str, embeddings, shared: TwoLevelCache, dedup_registry,
+                        on_progress=None, split=None) -> FAISS:
+    """
+    Loads (mmap file, shared cache) or builds a course index from explicitly passed
+    process-wide objects, so the warm-up thread builds it without calling st.cache_*.
+    split defaults to ingest_course (no per-process chunk cache).
+    """
+    split = split or (lambda page: ingest_course(page, shared, dedup_registry))
+    # Index embeddings are charged to the course (and the session that loaded it, if any;
+    # the warm-up thread has none)
+    course = next((name for name, course_url in COURSE_OPTIONS.items() if course_url == url), url)
+    # PROFILE / ?profile=: each index load or build gets its own profile (see profiling.py)
+    with usage_scope(course, current_usage()[1]), profiled(f"index-{url.rstrip('/').rsplit('/', 1)[-1]}"):
+        return _load_or_build_index_unprofiled(url, embeddings, shared, dedup_registry, split, on_progress)
+
+
+def faiss_cache_key(url: str, shared: TwoLevelCache) -> str:
+    """Shared-cache key of a course index: everything that changes the stored vectors."""
+    reduction = reduction_label()
+    return shared.make_key("faiss", url, CHUNK_MODE, CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_ID,
+                           INDEX_VECTORS, DEDUP_ENABLED, DEDUP_THRESHOLD, *COURSE_PAGES.get(url, []),
+                           *((reduction,) if reduction else ()))
+
+
+def index_fingerprint(url: str) -> str:
+    """Identifies the index content (same digest as `faq_bank.py build`): banks built from another one are stale."""
+    chunks, _ = load_and_split_from_url(url)
+    return bank_fingerprint(chunks, EMBEDDING_ID, reduction_label())
+
+
+def _load_or_build_index_unprofiled(url: str, embeddings, shared: TwoLevelCache, dedup_registry,
+                                    split, on_progress=None) -> FAISS:
+    reduction = reduction_label()
+    key = faiss_cache_key(url, shared)
+
+    def _build():
+        texts, _ = split(url)
+        # Chunks shared with an already indexed course reuse its vectors instead of being embedded again
+        registry = dedup_registry if DEDUP_ENABLED else None
+        reuse = DedupEmbeddings(embeddings, registry, EMBEDDING_ID) if registry is not None else None
+        # FAISS is used for fast, in-memory vector indexing (meets client requirement);
+        # chunks are embedded in concurrent batches and streamed into the index
+        vectordb = build_faiss_index(texts, embeddings, on_progress=on_progress, document_embeddings=reuse)
+        if reuse is not None:
+            logging.getLogger(__name__).info("Index for %s: %d chunk vectors reused, %d embedded",
+                                             url, reuse.reused, reuse.embedded)
+        # EMBED_REDUCTION=pca|truncate: smaller stored vectors; queries are transformed by the index
+        return reduce_index(vectordb)
+
+    # Processes on this host map the same read-only index files instead of each holding a copy
+    vectordb = open_mmap_index(url, key, embeddings) if MMAP_INDEXES else None
+    if vectordb is not None:
+        record_index_metadata(url, EMBEDDING_BACKEND, vectordb.index.d, reduction)
+        return vectordb
+
+    # The built index is shared as serialized bytes, so a single replica pays for the embeddings.
+    # FAISS bytes are a pickle: the shared cache only hands back values whose HMAC signature
+    # verifies (see shared_cache.py), so only replicas holding the secret can supply them
+    vectordb = shared.get_or_compute(
+        key,
+        _build,
+        dumps=lambda db: db.serialize_to_bytes(),
+        loads=lambda raw: FAISS.deserialize_from_bytes(
+            serialized=raw, embeddings=embeddings, allow_dangerous_deserialization=True, **FAISS_OPTIONS
+        ),
+        ttl=INDEX_CACHE_TTL,
+        use_l1=False,
+    )
+    # Record which backend/model/dimension built this index, next to the index
+    record_index_metadata(url, EMBEDDING_BACKEND, vectordb.index.d, reduction)
+    if MMAP_INDEXES:
+        try:
+            write_mmap_index(url, key, vectordb)
+            vectordb = open_mmap_index(url, key, embeddings) or vectordb  # drop the private copy
+        except Exception as err:
+            logging.getLogger(__name__).warning("Shared mmap index for %s unavailable: %s", url, err)
+    return vectordb
+
+
+@st.cache_resource(show_spinner=False)
+def get_index_warmer() -> IndexWarmer:
+    """
+    Created once per process; with WARMUP_ENABLED it loads or builds the hot course indexes
+    (WARMUP_COURSES, else the most selected) in the background (see index_warmup.py).
+    """
+    if not (WARMUP_ENABLED and gemini_api_key):
+        return IndexWarmer(get_index_registry(), COURSE_OPTIONS, _load_or_build_vectordb)
+    # Cached objects are resolved here, on the script thread; the warm-up thread only
+    # runs plain functions with them
+    build = functools.partial(load_or_build_index, embeddings=get_embeddings(), shared=get_shared_cache(),
+                              dedup_registry=get_dedup_registry())
+    return IndexWarmer(get_index_registry(), COURSE_OPTIONS, build).start()
+
+
+@st.cache_resource(show_spinner=False)
+def get_deadline_answerer() -> DeadlineAnswerer:
+    """Process-wide LLM workers: chat answers wait at most LLM_DEADLINE_SECONDS for Gemini."""
+    return DeadlineAnswerer()
+
+
+@st.cache_resource(show_spinner=False)
+def get_context_stats() -> ContextStats:
+    """Process-wide totals of prompt tokens saved by context assembly."""
+    return ContextStats()
+
+
+def build_context(docs: List[Any]) -> str:
+    """Retrieved chunks -> prompt context: page order, neighbours merged, duplicates dropped."""
+    with stage("context"):
+        context, stats = assemble_context(docs)
+    get_context_stats().record(stats)
+    note(context=stats)
+    return context
+
+
+@st.cache_resource(show_spinner=False)
+def get_trace_log() -> Optional[TraceLog]:
+    """JSONL log of completed query traces (RETRIEVAL_TRACE_FILE; None unless RETRIEVAL_TRACE=true)."""
+    return create_trace_log()
+
+
+def new_query_trace(query: str) -> Optional[QueryTrace]:
+    """A trace for this question when the inspector or the trace log is on, else None."""
+    inspect = inspector_enabled()
+    trace_log = get_trace_log()
+    if not inspect and trace_log is None:
+        return None
+    trace = QueryTrace(query, st.session_state.get("active_course_name", ""), get_session_id(),
+                       on_complete=trace_log.write if trace_log is not None else None)
+    if inspect:
+        st.session_state["last_trace"] = trace
+    return trace
+
+
+@st.cache_resource(show_spinner=False)
+def get_router_state() -> tuple[AnswerCache, RouterStats]:
+    """Process-wide answer cache and per-route stats, shared by every session."""
+    return (
+        AnswerCache(
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600))),
+            shared=get_shared_cache(),
+        ),
+        RouterStats(),
+    )
+
+
+def get_conversation_memory(course_name: str) -> ConversationMemory:
+    """Returns the conversation memory for a course chat in this session (created on first use)."""
+    memories = st.session_state.setdefault("memories", {})
+    if course_name not in memories:
+        memories[course_name] = ConversationMemory(
+            token_budget=int(os.getenv("MEMORY_TOKEN_BUDGET", "600")),
+            recent_turns=int(os.getenv("MEMORY_RECENT_TURNS", "2")),
+        )
+    return memories[course_name]
+
+
+# ===== Voice Input =====
+@st.cache_resource(show_spinner=False)
+def get_recognition_pool() -> Optional[RecognitionPool]:
+    """Process-wide speech recognition workers (RECOGNIZER_BACKEND); None if unavailable."""
+    try:
+        return RecognitionPool(create_recognizer())
+    except Exception as err:
+        logging.getLogger(__name__).warning("Voice input disabled: %s", err)
+        return None
+
+
+def submit_voice_clip(pool: RecognitionPool) -> bool:
+    """Sends a newly recorded/uploaded clip to the recognition workers (never waits for them)."""
+    recorder = getattr(st, "audio_input", None)
+    clip = recorder("🎤 Record your question", key="voice_recording") if recorder else None
+    upload = st.file_uploader("…or upload a WAV recording", type=["wav"], key="voice_upload")
+    source = clip or upload
+    if source is None:
+        return False
+    data = source.getvalue()
+    digest = audio_digest(data)
+    # Widgets keep returning the same clip on every rerun: submit each recording once
+    if st.session_state.get("voice_digest") != digest:
+        st.session_state["voice_digest"] = digest
+        st.session_state["voice_job"] = pool.submit(data, RECOGNITION_LANGUAGE)
+        return True
+    return False
+
+
+def poll_voice_job(pool: RecognitionPool) -> None:
+    """Checks the transcription job; once it is done, hands the transcript to the chat as a question."""
+    state, text = pool.result(st.session_state["voice_job"])
+    if state == JOB_PENDING:
+        st.caption("🎙️ Transcribing your question...")
+        return
+    st.session_state["voice_job"] = None
+    if state == JOB_DONE and text:
+        st.session_state["pending_query"] = text
+    elif state == JOB_DONE:
+        st.session_state["voice_notice"] = "🔇 No speech detected in the recording. Please try again."
+    else:
+        st.session_state["voice_notice"] = f"❌ Microphone error: {text}"
+    st.rerun()
+
+
+# ===== Session Persistence =====
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+# Base64 TTS audio is only kept in memory for the most recent answers
+KEEP_AUDIO_MESSAGES = int(os.getenv("KEEP_AUDIO_MESSAGES", "3"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_store() -> SessionStore:
+    """Durable chat store (SQLite by default, Redis via SESSION_BACKEND=redis)."""
+    return create_session_store()
+
+
+def get_session_id() -> str:
     """
-    texts = load_and_split_from_url(url)
-    embeddings = get_embeddings()
-    # FAISS is used for fast, in-memory vector indexing (meets client requirement)
-    return FAISS.from_documents(texts, embedding=embeddings)
+    Id of this browser session's chat history: from the SESSION_COOKIE cookie, else (opt-in,
+    SESSION_URL_RESUME) the URL's ?sid=, else random (see session_store.resolve_session_id).
+    """
+    sid = st.session_state.get("session_id")
+    if not sid:
+        cookie = st.context.cookies.get(SESSION_COOKIE) if SESSION_COOKIE else None
+        sid = resolve_session_id(cookie, st.query_params.get("sid") if SESSION_URL_RESUME else None)
+        if SESSION_URL_RESUME and not cookie:
+            st.query_params["sid"] = sid  # anyone with this link can read the chat history
+        st.session_state["session_id"] = sid
+    return sid
+
+
+def ensure_history_loaded(course_name: str) -> List[Dict[str, Any]]:
+    """Returns the in-memory history for a course, loading its latest page from the store once."""
+    all_messages = st.session_state.setdefault("all_messages", {})
+    if course_name not in all_messages:
+        try:
+            all_messages[course_name] = get_session_store().load_page(get_session_id(), course_name, 0, HISTORY_PAGE_SIZE)
+        except Exception as store_err:
+            logging.getLogger(__name__).warning("Session store load failed: %s", store_err)
+            all_messages[course_name] = []
+    return all_messages[course_name]
+
+
+def has_older_messages(course_name: str) -> bool:
+    try:
+        stored = get_session_store().count(get_session_id(), course_name)
+    except Exception:
+        return False
+    return stored > len(st.session_state.get("all_messages", {}).get(course_name, []))
+
+
+def load_older_messages(course_name: str) -> int:
+    """Prepends the previous page of a course's history. Returns the number of messages loaded."""
+    loaded = ensure_history_loaded(course_name)
+    older = get_session_store().load_page(get_session_id(), course_name, len(loaded), HISTORY_PAGE_SIZE)
+    loaded[:0] = older
+    # Message positions shifted: rebuild this course's conversation memory from scratch
+    st.session_state.get("memories", {}).pop(course_name, None)
+    return len(older)
+
+
+def load_full_history(course_name: str) -> List[Dict[str, Any]]:
+    try:
+        return get_session_store().load_all(get_session_id(), course_name)
+    except Exception:
+        return st.session_state.get("all_messages", {}).get(course_name, [])
+
+
+def record_message(message: Dict[str, Any]) -> None:
+    """Appends a message to the active chat in memory and in the durable session store."""
+    messages = st.session_state["messages"]
+    message.setdefault("ts", int(time.time()))  # lets a stored fallback answer be found and replaced
+    messages.append(message)
+    try:
+        get_session_store().append(get_session_id(), st.session_state["active_course_name"], message)
+    except Exception as store_err:
+        logging.getLogger(__name__).warning("Session store append failed: %s", store_err)
+    audio_msgs = [m for m in messages if m.get("audio_data")]
+    for old in audio_msgs[:-KEEP_AUDIO_MESSAGES or None]:
+        old.pop("audio_data", None)
 
 
 # FIX 1: Refactored to use in-memory IO to prevent file conflict issues in deployment
-def tts_to_audio_tag(text: str, lang_code: str) -> tuple[str, str]:
+def tts_to_audio_tag(text: str, lang_code: str, usage: Optional[tuple[str, str]] = None) -> tuple[str, str]:
     """Converts text to base64 encoded audio tag using gTTS (in-memory). Returns (audio_tag, base64_data)."""
-    if not gTTS:
+    if not gTTS and LLM_BACKEND != "standin":
         return "", ""
     try:
-        tts = gTTS(text, lang=lang_code)
-        
         # Use in-memory buffer instead of saving to disk
         mp3_fp = io.BytesIO()
-        tts.write_to_fp(mp3_fp)
+        if LLM_BACKEND == "standin":
+            mp3_fp.write(standin_tts(text, lang_code))
+        else:
+            tts = gTTS(text, lang=lang_code)
+            tts.write_to_fp(mp3_fp)
+        # Recorded once the request succeeded: failed calls are not billed
+        get_usage_ledger().record(FEATURE_TTS, "standin" if LLM_BACKEND == "standin" else "gtts",
+                                  *(usage or usage_context()), characters=len(text))
         mp3_fp.seek(0)
         
         b64_audio = base64.b64encode(mp3_fp.read()).decode()
@@ -747,27 +645,119 @@ def tts_to_audio_tag(text: str, lang_code: str) -> tuple[str, str]:
         return "", ""
 
 
-def maybe_translate(text: str, target_lang_code: str) -> str:
+def maybe_translate(text: str, target_lang_code: str, usage: Optional[tuple[str, str]] = None) -> str:
     """Translates the text if the target language is not English."""
-    if not GoogleTranslator or target_lang_code == "en":
+    if target_lang_code == "en":
+        return text
+    usage = usage or usage_context()
+    if LLM_BACKEND == "standin":
+        translated = standin_translate(text, target_lang_code)
+        get_usage_ledger().record(FEATURE_TRANSLATE, "standin", *usage, characters=len(text))
+        return translated
+    if not GoogleTranslator:
         return text
     try:
         # Note: GoogleTranslator auto-detects source language, but setting 'en' as default source
         # works well since the LLM response is generated in English first.
-        return GoogleTranslator(source="en", target=target_lang_code).translate(text)
+        translated = GoogleTranslator(source="en", target=target_lang_code).translate(text)
     except Exception:
         return text
+    # Recorded once the request succeeded: failed calls are not billed
+    get_usage_ledger().record(FEATURE_TRANSLATE, "google-translate", *usage, characters=len(text))
+    return translated
+
+
+# ===== RAG Chain / FAQ Bank =====
+def build_course_chain(current_course: str, llm, usage: Optional[tuple[str, str]] = None):
+    """
+    The course RAG chain (prompt + LCEL, see course_chain.py) with the metered chat model.
+    Shared by the chat and in-app FAQ bank builds (which pass their own usage context).
+    """
+    return course_chain(current_course, metered_llm(llm, FEATURE_CHAT, usage), contact_number, build_context)
+
+
+@st.cache_resource(show_spinner=False)
+def get_faq_bank() -> tuple[FaqBankStore, FaqBankBuilder]:
+    """Pre-generated FAQ answers of every course and the background job that builds them (faq_bank.py)."""
+    store = FaqBankStore()
+    return store, FaqBankBuilder(store)
+
+
+def ensure_faq_bank(url: str, course_name: str, vectordb, fingerprint: str) -> None:
+    """
+    FAQ_BUILD_IN_APP only: queues a FAQ bank build for the loaded course unless its current
+    bank matches this index. Banks are normally built offline (`python faq_bank.py build`).
+    """
+    usage = (course_name, FAQ_SESSION)  # the batch runs outside any session
+    retriever = get_adaptive_retriever()
+    qa = build_course_chain(course_name, create_chat_model(temperature=0.5, max_output_tokens=2048), usage=usage)
+
+    def _answer(question: str) -> str:
+        with usage_scope(*usage):
+            docs = retriever.search(vectordb, url, question)
+        return qa.invoke({"question": question, "docs": docs, "history": ""})
+
+    def _speak(text: str, lang_code: str) -> bytes:
+        audio_data = tts_to_audio_tag(text, lang_code, usage)[1]
+        return base64.b64decode(audio_data) if audio_data else b""
+
+    _, builder = get_faq_bank()
+    version = builder.ensure(
+        url, course_name, fingerprint,
+        model="standin" if LLM_BACKEND == "standin" else CHAT_MODEL,
+        languages=RESPONSE_LANGUAGES,
+        answer=_answer,
+        translate=lambda text, lang_code: maybe_translate(text, lang_code, usage),
+        speak=_speak if FAQ_TTS else None,
+    )
+    if version:
+        logging.getLogger(__name__).info("Building FAQ bank %s for %s in the background", version, course_name)
 
 
 # ===== Enhanced Sidebar =====
-with st.sidebar:
+# Sidebar settings are read from st.session_state by the chat / search panels at the time
+# they run: each panel is a fragment and reruns on its own.
+DEFAULT_LANGUAGE = next(iter(LANGUAGE_MAP))
+
+
+def response_settings() -> tuple[str, bool]:
+    """(response language code, TTS enabled) as currently set in the sidebar."""
+    language = st.session_state.get("response_language", DEFAULT_LANGUAGE)
+    return LANGUAGE_MAP.get(language, "en"), bool(st.session_state.get("enable_tts", False))
+
+
+def build_exports(course_name: str) -> tuple[str, str, int]:
+    """(JSON, Markdown, message count) exports of a course chat, from the durable (capped) history."""
+    history_to_export = load_full_history(course_name)
+    try:
+        # Include current URL for context in export
+        history_data = history_to_export + [
+            {"role": "system", "content": f"Context URL: {st.session_state.get('active_url', 'N/A')}"}
+        ]
+        history_json_str = json.dumps(history_data, ensure_ascii=False, indent=2)
+    except Exception:
+        history_json_str = "[]"
+
+    lines = [f"# NareshIT Course Assistant Transcript ({datetime.now().strftime('%Y-%m-%d')})\n"]
+    for i, msg in enumerate(history_to_export, start=1):
+        who = "User" if msg["role"] == "user" else "Assistant"
+        content = msg.get("content", "").replace("\r", "")
+        lines.append(f"## {i}. {who}\n\n{content}\n")
+    return history_json_str, "\n".join(lines), len(history_to_export)
+
+
+@st.fragment
+@metered("sidebar")
+def sidebar_panel():
+    if get_usage_ledger().alarm_active():
+        st.warning("⚠️ Today's estimated usage cost has passed the daily budget (USAGE_DAILY_BUDGET_USD).")
+
     # Language Selection Card
     st.markdown('''
     <div class="sidebar-card">
         <div class="sidebar-card-title">🌐 Language Settings</div>
     ''', unsafe_allow_html=True)
-    target_language_name = st.selectbox("Response Language", list(LANGUAGE_MAP.keys()), index=0)
-    target_lang_code = LANGUAGE_MAP[target_language_name]
+    st.selectbox("Response Language", list(LANGUAGE_MAP.keys()), index=0, key="response_language")
     st.markdown('</div>', unsafe_allow_html=True)
 
     # I/O Options Card
@@ -775,66 +765,59 @@ with st.sidebar:
     <div class="sidebar-card">
         <div class="sidebar-card-title">🎛️ Input/Output Options</div>
     ''', unsafe_allow_html=True)
-    # Client Request 2: Enable Microphone Input (already present, ensured not disabled if sr is available)
-    enable_voice = st.checkbox("🎤 Microphone input (Client Request 2)", value=False, disabled=(sr is None))
+    # Client Request 2: Enable Microphone Input (recorded in the browser, recognized in the background)
+    enable_voice = st.checkbox("🎤 Microphone input (Client Request 2)", value=False, disabled=(get_recognition_pool() is None), key="enable_voice")
     # Client Request 1: Response should be spell out (already present, ensured not disabled if gTTS is available)
-    enable_tts = st.checkbox("🔊 Text-to-speech (Client Request 1)", value=False, disabled=(gTTS is None))
+    st.checkbox("🔊 Text-to-speech (Client Request 1)", value=False, disabled=(gTTS is None), key="enable_tts")
     st.markdown('</div>', unsafe_allow_html=True)
+    # The recorder lives in the chat tab: showing/hiding it needs a full run
+    if enable_voice != st.session_state.get("voice_panel_enabled", False):
+        st.session_state["voice_panel_enabled"] = enable_voice
+        st.rerun()
 
     # Export & Share Card
     st.markdown('''
     <div class="sidebar-card">
         <div class="sidebar-card-title">🔗 Export & Share</div>
     ''', unsafe_allow_html=True)
-    
+
     # Use the history of the currently active course for export
     active_course_key = st.session_state.get("active_course_name", "the selected course")
-    history_to_export = st.session_state.get("all_messages", {}).get(active_course_key, [])
-    has_msgs = bool(history_to_export)
+    # Exports are built on request: chat turns don't rerun the sidebar, so anything built
+    # here in advance would be stale
+    if st.button("📦 Prepare export", use_container_width=True):
+        history_json_str, transcript_md, message_count = build_exports(active_course_key)
+        if message_count:
+            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            col_e1, col_e2 = st.columns(2)
+            with col_e1:
+                st.download_button(
+                    label="⬇️ JSON",
+                    data=history_json_str.encode("utf-8"),
+                    file_name=f"chat_history_{timestamp}.json",
+                    mime="application/json",
+                    use_container_width=True,
+                )
+            with col_e2:
+                st.download_button(
+                    label="⬇️ Markdown",
+                    data=transcript_md.encode("utf-8"),
+                    file_name=f"chat_history_{timestamp}.md",
+                    mime="text/markdown",
+                    use_container_width=True,
+                )
+        else:
+            st.markdown(f'<div class="muted">No messages yet for **{active_course_key}**. Start a chat to enable export.</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
 
-    try:
-        # Include current URL for context in export
-        history_data = history_to_export + [
-            {"role": "system", "content": f"Context URL: {st.session_state.get('active_url', 'N/A')}"}
-        ]
-        history_json_str = json.dumps(history_data, ensure_ascii=False, indent=2)
-    except Exception:
-        history_json_str = "[]"
 
-    lines = [f"# NareshIT Course Assistant Transcript ({datetime.now().strftime('%Y-%m-%d')})\n"]
-    for i, msg in enumerate(history_to_export, start=1):
-        who = "User" if msg["role"] == "user" else "Assistant"
-        content = msg.get("content", "").replace("\r", "")
-        lines.append(f"## {i}. {who}\n\n{content}\n")
-    transcript_md = "\n".join(lines)
-
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    col_e1, col_e2 = st.columns(2)
-    with col_e1:
-        st.download_button(
-            label="⬇️ JSON",
-            data=history_json_str.encode("utf-8"),
-            file_name=f"chat_history_{timestamp}.json",
-            mime="application/json",
-            use_container_width=True,
-            disabled=not has_msgs,
-        )
-    with col_e2:
-        st.download_button(
-            label="⬇️ Markdown",
-            data=transcript_md.encode("utf-8"),
-            file_name=f"chat_history_{timestamp}.md",
-            mime="text/markdown",
-            use_container_width=True,
-            disabled=not has_msgs,
-        )
-    if not has_msgs:
-        st.markdown(f'<div class="muted">No messages yet for **{active_course_key}**. Start a chat to enable export.</div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+with st.sidebar:
+    sidebar_panel()
 
 # ===== Session State =====
 if "all_messages" not in st.session_state:
     # MODIFICATION 1: Use a dictionary to store messages per course
+    # (only the pages loaded so far; the full history lives in the session store)
     st.session_state["all_messages"] = {} 
 
 if "retriever_ready" not in st.session_state:
@@ -849,28 +832,20 @@ if "active_course_name" not in st.session_state:
 
 # Get or initialize the currently active message list (points to a specific list inside all_messages)
 current_course_key = st.session_state.get("active_course_name", "Select Course (Click to Load)")
-if current_course_key not in st.session_state["all_messages"]:
-    st.session_state["all_messages"][current_course_key] = []
-st.session_state["messages"] = st.session_state["all_messages"][current_course_key]
+st.session_state["messages"] = ensure_history_loaded(current_course_key)
 
 
 # ===== Actions (Course Selection and Clear Chat) =====
+# Start warming the popular course indexes before anyone picks a course
+get_index_warmer()
+
 action_adv, action_clear = st.columns([1,1])
 
 with action_adv:
+    # Course URLs are shared with the ingestion tooling in course_content.py
     course_options: Dict[str, str] = {
         "Select Course (Click to Load)":"",
-        "Full Stack Python Online Training": "https://nareshit.com/courses/full-stack-python-online-training",
-        "Full Stack Data Science & AI": "https://nareshit.com/courses/full-stack-data-science-ai-online-training",
-        "Full Stack Software Testing" : "https://nareshit.com/courses/full-stack-software-testing-online-training",
-        "UI Full Stack Web Development With React":"https://nareshit.com/courses/ui-full-stack-web-development-with-react-online-training",
-        "Full Stack Dot Net Core":"https://nareshit.com/courses/full-stack-dot-net-core-online-training",
-        "Full Stack Java":"https://nareshit.com/courses/full-stack-java-online-training",
-        "Spring Boot MicroServices":"https://nareshit.com/courses/spring-boot-microservices-online-training",
-        "Django":"https://nareshit.com/courses/django-online-training",
-        "Tableau":"https://nareshit.com/courses/tableau-online-training",
-        "Power BI":"https://nareshit.com/courses/power-bi-online-training",
-        "MySQL":"https://nareshit.com/courses/mysql-online-training"
+        **COURSE_OPTIONS,
     }
 
     def _on_course_change():
@@ -881,10 +856,8 @@ with action_adv:
         st.session_state["active_course_name"] = name
         st.session_state["active_url"] = url
         
-        # Re-link the messages list to the new course's history
-        if name not in st.session_state["all_messages"]:
-            st.session_state["all_messages"][name] = []
-        st.session_state["messages"] = st.session_state["all_messages"][name]
+        # Re-link the messages list to the new course's history (latest page loaded on demand)
+        st.session_state["messages"] = ensure_history_loaded(name)
 
         if not url or name == "Select Course (Click to Load)":
             st.session_state["retriever_ready"] = False
@@ -894,11 +867,30 @@ with action_adv:
         st.toast(f"🤖 Loading data for: **{name}**... (This may take up to 30 seconds)", icon="⏳")
 
         with st.spinner(f"🧠 Processing content for {name} with AI..."):
+            progress_bar = st.empty()
+
+            def _show_progress(done: int, total: int):
+                progress_bar.progress(done / total, text=f"Embedding course content: {done}/{total} chunks")
+
             try:
-                vectordb = build_vectordb_for_url(url)
+                vectordb = build_vectordb_for_url(url, on_progress=_show_progress)
+                progress_bar.empty()
                 st.session_state["vectordb"] = vectordb
                 st.session_state["retriever_ready"] = True
-                st.toast(f"✅ AI Assistant ready for **{name}**!", icon="🎉")
+                _, ingest_stats = load_and_split_from_url(url)
+                st.session_state["ingest_stats"] = ingest_stats
+                st.session_state["index_fingerprint"] = index_fingerprint(url)
+                # Banks are built offline (`python faq_bank.py build`); building here is opt-in
+                if FAQ_BANK_ENABLED and FAQ_BUILD_IN_APP and gemini_api_key:
+                    ensure_faq_bank(url, name, vectordb, st.session_state["index_fingerprint"])
+                # Selection counts rank courses for the next process's warm-up
+                get_index_warmer().record_selection(name)
+                st.toast(
+                    f"✅ AI Assistant ready for **{name}**! "
+                    f"({ingest_stats['chunks']} chunks, {ingest_stats['chunk_reduction_pct']}% less page boilerplate"
+                    f"{', %d near-duplicates merged' % ingest_stats['duplicates_removed'] if ingest_stats.get('duplicates_removed') else ''})",
+                    icon="🎉",
+                )
             except Exception as err:
                 st.session_state["retriever_ready"] = False
                 st.error(f"❌ Failed to process course content: {err}")
@@ -916,6 +908,11 @@ with action_clear:
     # MODIFICATION 1: Clear only the active course's chat history
     def clear_active_chat():
         st.session_state["messages"].clear()
+        try:
+            get_session_store().clear(get_session_id(), st.session_state["active_course_name"])
+        except Exception as store_err:
+            logging.getLogger(__name__).warning("Session store clear failed: %s", store_err)
+        st.session_state.get("memories", {}).pop(st.session_state["active_course_name"], None)
         st.toast(f"💬 Chat history for **{st.session_state['active_course_name']}** cleared")
         
     if st.button("🗑️ Clear Chat", use_container_width=True):
@@ -923,10 +920,213 @@ with action_clear:
 
 
 # ===== Chat Interface =====
-chat_tab, llm_tab, history_tab = st.tabs(["💬 Chat", "🤖 LLM Search", "📜 History"])
+# Each panel is a fragment: interacting with one reruns only that panel, not the whole page.
+def answer_pending_query(pending_query: str) -> None:
+    """Routes and answers one question, rendering the turn where it is called."""
+    active_course_name = st.session_state.get("active_course_name", "None")
+    active_url = st.session_state.get("active_url", "")
+    target_lang_code, enable_tts = response_settings()
 
-with chat_tab:
-    
+    # Display user query immediately
+    st.markdown(f"<div class='stChatMessage user-msg'>{pending_query}</div>", unsafe_allow_html=True)
+
+    if not st.session_state.get("retriever_ready"):
+        st.info("⏳ Please wait for the course content to finish loading and indexing.")
+    else:
+        # Route the query locally first: canned replies, the curriculum tree and the answer
+        # cache all skip FAISS + Gemini. Only what's left goes through the full RAG chain.
+        answer_cache, router_stats = get_router_state()
+        route = classify_query(pending_query)
+        route_started = time.perf_counter()
+        answer = None
+        llm_state = llm_job = None
+
+        # Follow-ups ("what about the second module?") become standalone retrieval queries
+        # using this course's bounded memory (rolling summary + last turns), not the transcript
+        memory = get_conversation_memory(active_course_name)
+        memory.update(st.session_state["messages"])
+        retrieval_query = memory.standalone_query(pending_query)
+
+        if route in CANNED_ROUTES:
+            answer = canned_response(route, active_course_name, contact_number, registration_url)
+        elif route == ROUTE_CURRICULUM:
+            curriculum = load_curriculum(active_url)
+            if curriculum and curriculum.get("modules"):
+                answer = format_curriculum_markdown(curriculum, active_course_name)
+        faq_entry = None
+        if answer is None and FAQ_BANK_ENABLED:
+            # Predictable questions come pre-answered, pre-translated (and pre-spoken) from
+            # the course's FAQ bank, as long as it was built from the loaded index
+            faq_store, _ = get_faq_bank()
+            faq_entry = faq_store.lookup(active_url, st.session_state.get("index_fingerprint", ""),
+                                         pending_query, active_course_name)
+            if faq_entry is not None:
+                route = ROUTE_FAQ
+                answer = faq_entry["answers"].get("en", "")
+        if answer is None:
+            answer = answer_cache.get(active_url, retrieval_query)
+            if answer is not None:
+                route = ROUTE_CACHE
+        if answer is None:
+            route = ROUTE_RAG
+            if not gemini_api_key:
+                st.warning("⚠️ GEMINI_API_KEY is missing. Add it to your environment to use the AI assistant.")
+                st.stop()
+
+        # Add user message to history
+        record_message({"role": "user", "content": pending_query})
+
+        if route == ROUTE_RAG:
+            # Prepare RAG chain
+            vectordb = st.session_state.get("vectordb")
+
+            # Depth is chosen per question (intent, score gap, token budget; at most
+            # RETRIEVAL_MAX_K=12, the previous fixed depth).
+            # Course scoping comes from the selected course's own index, so the query is
+            # searched as typed and repeats hit the embedding + retrieval caches.
+            adaptive_retriever = get_adaptive_retriever()
+
+            # Get the currently selected course name for context injection
+            current_course = st.session_state.get("active_course_name", "the selected course")
+
+            # 2. Use ChatGoogleGenerativeAI (Gemini)
+            # FIX: Increased max_output_tokens from 1024 to 2048 for comprehensive answers
+            llm = create_chat_model(temperature=0.5, max_output_tokens=2048)
+
+            # 3. The LCEL chain (document combining prompt + Gemini), see build_course_chain
+            qa = build_course_chain(current_course, llm)
+
+            # Gemini gets LLM_DEADLINE_SECONDS. After that (or if it fails / is marked
+            # unavailable) the student sees an extractive answer from the retrieved chunks,
+            # and the LLM answer replaces it when it arrives (see answer_fallback.py).
+            answerer = get_deadline_answerer()
+            with st.spinner("Thinking..."):
+                try:
+                    if answerer.available() and os.getenv("MEMORY_LLM_REWRITE", "").lower() in ("1", "true", "yes"):
+                        retrieval_query = llm_standalone_query(metered_llm(llm, FEATURE_REWRITE), memory, pending_query)
+                    with usage_scope(*usage_context()):  # query embeddings are charged to this session
+                        docs = adaptive_retriever.search(vectordb, active_url, retrieval_query) if vectordb else []
+                    chain_input = {"question": pending_query, "docs": docs, "history": memory.render()}
+                    llm_job = answerer.submit(traced_call(lambda: qa.invoke(chain_input)))
+                    if llm_job is None:
+                        complete_part(PART_LLM)  # not submitted: the trace must not wait for it
+                    llm_state, llm_text = answerer.wait(llm_job, LLM_DEADLINE_SECONDS)
+                except Exception as run_err:
+                    # Retrieval itself failed (e.g. the embedding API is down): nothing to fall back on
+                    logging.getLogger(__name__).warning("Retrieval failed: %s", run_err)
+                    docs, llm_job, llm_text = [], None, str(run_err)
+            if llm_state == LLM_DONE:
+                answer = llm_text
+                if answer and answer.strip():
+                    answer_cache.put(active_url, retrieval_query, answer)
+            else:
+                if llm_state != LLM_PENDING:
+                    logging.getLogger(__name__).warning("LLM answer failed: %s", llm_text)
+                answer = extractive_answer(pending_query, docs)
+                if answer and llm_state != LLM_PENDING:
+                    answer = f"_Here is what the course page says about this:_\n\n{answer}"
+
+        router_stats.record(route, time.perf_counter() - route_started)
+        note(route=route, retrieval_query=retrieval_query, llm_state=llm_state)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_time("answer", 1000 * (time.perf_counter() - route_started))
+
+        # Check for empty or faulty answer and provide a robust fallback message
+        if not answer or answer.strip() == "":
+            answer = (
+                "I am sorry, I seem to be having trouble processing that request right now, or the content did not provide an answer. "
+                "Please try rephrasing your question or contact support directly at **"
+                f"{contact_number}** for immediate assistance."
+            )
+
+        # Translate if needed (FAQ bank entries are stored in every response language)
+        final_answer = None
+        if faq_entry is not None and answer == faq_entry["answers"].get("en"):
+            final_answer = faq_entry["answers"].get(target_lang_code)
+        if final_answer is None:
+            final_answer = maybe_translate(answer, target_lang_code)
+
+        # Generate TTS audio data if enabled
+        audio_data = ""
+        if enable_tts and final_answer and faq_entry is not None:
+            bank = faq_store.current(active_url) or {}
+            audio_data = faq_store.audio(active_url, bank.get("version", ""), faq_entry, target_lang_code)
+        if enable_tts and final_answer and not audio_data:
+            audio_tag, audio_data = tts_to_audio_tag(final_answer, target_lang_code)
+
+        # Store message with audio data
+        message_data = {"role": "assistant", "content": final_answer}
+        if audio_data:
+            message_data["audio_data"] = audio_data
+        record_message(message_data)
+
+        # Render AI response
+        st.markdown(f"<div class='stChatMessage bot-msg'>{final_answer}</div>", unsafe_allow_html=True)
+
+        # Display TTS audio if generated
+        if enable_tts and final_answer and audio_data:
+            audio_tag = f"""
+            <audio controls autoplay style="width: 100%; margin-top: 8px;">
+                <source src="data:audio/mp3;base64,{audio_data}" type="audio/mp3" />
+                Your browser does not support the audio element.
+            </audio>
+            """
+            st.markdown(audio_tag, unsafe_allow_html=True)
+
+        # Friendly save reminder
+        st.toast("Don't forget to use the 'Export & Share' in the sidebar to save your chat!", icon="💾")
+
+        # Clear pending query (the turn is already rendered: no extra rerun needed)
+        st.session_state["pending_query"] = None
+        complete_part(PART_TURN)
+
+        if llm_state == LLM_PENDING:
+            # The LLM missed the deadline: keep its job so late_answer_panel can swap it in
+            st.session_state["late_answer"] = {
+                "job": llm_job, "course": active_course_name, "url": active_url, "query": retrieval_query,
+                "message": message_data, "lang": target_lang_code, "tts": enable_tts,
+            }
+            st.rerun()  # full run: mounts the late-answer poller under the chat
+
+
+def retrieval_inspector(trace: Optional[QueryTrace]) -> None:
+    """Debug panel for the last question: route, caches, candidate chunks with scores, timings."""
+    with st.expander("🔎 Retrieval inspector", expanded=True):
+        if trace is None:
+            st.caption("Ask a question to see how it was retrieved and answered.")
+            return
+        record = trace.as_dict()
+        chunks = record.get("chunks", [])
+        selected = sum(c["selected"] for c in chunks)
+        st.markdown(
+            f"**{record['query']}**  \n"
+            f"route `{record.get('route', '-')}` · intent `{record.get('intent', '-')}` · "
+            f"{selected}/{len(chunks)} chunks kept (max {record.get('max_k', '-')}) · "
+            f"embedding cache `{record.get('embedding_cache', '-')}` · "
+            f"retrieval cache `{record.get('retrieval_cache', '-')}` · "
+            f"prompt tokens {record.get('prompt_tokens', '-')}"
+            f"{'' if trace.completed else ' · _LLM still running_'}"
+        )
+        timings = record["timings_ms"]
+        if timings:
+            st.markdown(" · ".join(f"{name} **{ms:.0f} ms**" for name, ms in timings.items()))
+        if chunks:
+            rows = ["| # | score | kept | tokens | section | id |", "|---|---|---|---|---|---|"]
+            for c in chunks:
+                section = (c["section"] or "-").replace("|", "/")
+                rows.append(f"| {c['rank']} | {c['score']:.3f} | {'✓' if c['selected'] else ''} | "
+                            f"{c['tokens']} | {section} | `{c['id']}` |")
+            st.markdown("\n".join(rows))
+        context = record.get("context")
+        if context:
+            st.caption(f"Context: {context['passages']} passages from {context['chunks']} chunks, "
+                       f"{context['context_tokens']} tokens ({context['tokens_saved']} saved by merging)")
+
+
+@st.fragment
+@metered("chat")
+def chat_panel():
     active_course_name = st.session_state.get("active_course_name", "None")
     active_url = st.session_state.get('active_url', '')
 
@@ -950,141 +1150,8 @@ with chat_tab:
             """
             st.markdown(audio_tag, unsafe_allow_html=True)
 
-    # Process any pending query first (so answer appears above input)
-    pending_query = st.session_state.get("pending_query")
-    if pending_query:
-        # Display user query immediately
-        st.markdown(f"<div class='stChatMessage user-msg'>{pending_query}</div>", unsafe_allow_html=True)
-        
-        if not st.session_state.get("retriever_ready"):
-            st.info("⏳ Please wait for the course content to finish loading and indexing.")
-        elif not gemini_api_key:
-            st.warning("⚠️ GEMINI_API_KEY is missing. Add it to your environment to use the AI assistant.")
-            st.stop()
-        else:
-            # Prepare RAG chain
-            vectordb = st.session_state.get("vectordb")
-            
-            # FIX: Using k=12 as determined to be the optimal depth
-            retriever = vectordb.as_retriever(search_kwargs={"k": 12}) if vectordb else None
-
-            # Get the currently selected course name for context injection
-            current_course = st.session_state.get("active_course_name", "the selected course")
-            
-            # MODIFICATION: Inject the course name into the user's query
-            # This forces the retriever (vector search) to prioritize the correct course's documents.
-            processed_query = pending_query
-
-            # --- RAG Chain Implementation using LCEL ---
-            
-            # 1. Define the document combining prompt (ChatPromptTemplate is preferred for LCEL)
-            document_combine_prompt = ChatPromptTemplate.from_messages([
-                # --- PROMPT TUNING START ---
-                ("system", f"""
-                You are a highly knowledgeable and helpful **Course Assistant for NareshIT**, specializing in the **'{current_course}'** course.  
-                Your primary role is to answer student queries *strictly and accurately* using the information available in the provided course context extracted from the official course page.
-
-                ### Your Objectives:
-                1. **Precision:** Respond only with information that clearly exists in the given context.  
-                   - Do not guess or hallucinate details.  
-                   - Match the user’s question as closely as possible using the course content.  
-                2. **Clarity & Tone:** Respond in a clear, concise, and friendly professional tone suitable for students.  
-                   - Avoid overly technical jargon unless the question explicitly requests it.  
-                   - Use natural and varied phrasing to keep responses engaging.  
-                3. **Context Awareness:** - If the answer is found in the context (from the URL), extract the *exact relevant data* and present it neatly formatted (bulleted list or short paragraph).  
-                   - If multiple sections are relevant, summarize them briefly and point out where each topic appears.  
-                4. **Formatting:** - Use bullet points, headings, or short paragraphs for readability.  
-                   - Maintain a professional and approachable tone throughout.
-                5. **Curriculum Synthesis (FINAL FIX):** If the user asks for the 'curriculum', 'syllabus', 'course content', or 'topics covered', you MUST collate **ALL** related fragments from the provided Context documents and combine them into a single, comprehensive, and well-structured list (using Markdown lists and sub-lists) for the user. **IF** you find any fragments related to the curriculum, **YOU MUST NOT USE THE FALLBACK MESSAGE**. Your primary function for this query type is to synthesize the list, even if the raw data is fragmented.
-
-                ---
-                ### Fallback Rule (Strict):
-                ONLY use the standardized fallback message if, and only if, a search across **all** provided Context yields absolutely zero relevant information to construct a meaningful answer. **DO NOT** use the fallback if you find partial information.
-                    - Fallback message: "I couldn’t find that specific detail in the course material, but you can always check the course page or call us directly at **{contact_number}** for the latest batch and prerequisite details."  
-
-                ---
-                
-                Context: {{context}}
-                """),
-                # --- PROMPT TUNING END ---
-                ("human", "{input}"),
-            ])
-
-
-            # 2. Use ChatGoogleGenerativeAI (Gemini)
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash", 
-                google_api_key=gemini_api_key, 
-                temperature=0.5, 
-                # FIX: Increased max_output_tokens from 1024 to 2048 for comprehensive answers
-                max_output_tokens=2048
-            )
-
-            # 3. Create LCEL chain using pure LangChain Expression Language
-            # This creates a chain that retrieves documents and processes them with the LLM
-            qa = (
-                {"context": retriever, "input": RunnablePassthrough()}
-                | document_combine_prompt
-                | llm
-                | StrOutputParser()
-            )
-
-            # --- End RAG Chain Implementation ---
-
-
-            # Add user message to history
-            st.session_state["messages"].append({"role": "user", "content": pending_query})
-            
-            with st.spinner("Thinking..."):
-                try:
-                    # LCEL chain expects the input directly as the question
-                    answer = qa.invoke(processed_query)
-                except Exception as run_err:
-                    # Use a general exception handler for API/network errors
-                    answer = f"There was an error answering the question: {run_err}. Please check your internet connection or API key."
-
-            # Check for empty or faulty answer and provide a robust fallback message
-            if not answer or answer.strip() == "":
-                answer = (
-                    "I am sorry, I seem to be having trouble processing that request right now, or the content did not provide an answer. "
-                    "Please try rephrasing your question or contact support directly at **"
-                    f"{contact_number}** for immediate assistance."
-                )
-
-            # Translate if needed
-            final_answer = maybe_translate(answer, target_lang_code)
-            
-            # Generate TTS audio data if enabled
-            audio_data = ""
-            if enable_tts and final_answer:
-                audio_tag, audio_data = tts_to_audio_tag(final_answer, target_lang_code)
-            
-            # Store message with audio data
-            message_data = {"role": "assistant", "content": final_answer}
-            if audio_data:
-                message_data["audio_data"] = audio_data
-            st.session_state["messages"].append(message_data)
-
-            # Render AI response
-            st.markdown(f"<div class='stChatMessage bot-msg'>{final_answer}</div>", unsafe_allow_html=True)
-
-            # Display TTS audio if generated
-            if enable_tts and final_answer and audio_data:
-                audio_tag = f"""
-                <audio controls autoplay style="width: 100%; margin-top: 8px;">
-                    <source src="data:audio/mp3;base64,{audio_data}" type="audio/mp3" />
-                    Your browser does not support the audio element.
-                </audio>
-                """
-                st.markdown(audio_tag, unsafe_allow_html=True)
-                    
-            # Friendly save reminder
-            st.toast("Don't forget to use the 'Export & Share' in the sidebar to save your chat!", icon="💾")
-            
-            # Clear pending query
-            st.session_state["pending_query"] = None
-            st.rerun() # Rerun to refresh the chat input form state
-
+    # The new turn is rendered here, above the input row, in the same run as the submit
+    turn_area = st.container()
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -1096,37 +1163,68 @@ with chat_tab:
             placeholder="e.g., What are the prerequisites for this course?",
             disabled=disabled_input
         )
-        user_query = user_query + f" for {selected_course_name}"
-        col1, col2 = st.columns([1, 4])
+        col1, _ = st.columns([1, 4])
         with col1:
             submitted = st.form_submit_button("🚀 Send", type="primary", use_container_width=True, disabled=disabled_input)
-        with col2:
-            # Voice button for microphone input (Client Request 2)
-            if enable_voice and sr is not None:
-                # Use a different key/logic for voice input to avoid conflicts
-                if st.form_submit_button("🎤 Voice", use_container_width=True, disabled=disabled_input):
-                    recognizer = sr.Recognizer()
-                    try:
-                        with st.spinner("🎙️ Listening..."):
-                            with sr.Microphone() as source:
-                                recognizer.adjust_for_ambient_noise(source, duration=1)
-                                audio = recognizer.listen(source, timeout=5)
-                            voice_text = recognizer.recognize_google(audio)
-                            
-                            # Use voice text as the pending query
-                            if voice_text:
-                                st.session_state["pending_query"] = voice_text
-                                st.rerun()
-                            
-                    except Exception as mic_err:
-                        st.error(f"❌ Microphone error: {mic_err}")
-
-    if submitted and user_query:
-        st.session_state["pending_query"] = user_query
-        st.rerun()
 
+    if submitted and user_query.strip():
+        st.session_state["pending_query"] = user_query.strip()
 
-with llm_tab:
+    # Typed questions and transcribed voice questions are answered here
+    pending_query = st.session_state.get("pending_query")
+    if pending_query:
+        with turn_area, tracing(new_query_trace(pending_query)):
+            answer_pending_query(pending_query)
+
+    if inspector_enabled():
+        retrieval_inspector(st.session_state.get("last_trace"))
+
+
+def upgrade_fallback_answer(late: Dict[str, Any], answer: str) -> None:
+    """Replaces an extractive fallback answer with the LLM answer, in memory and in the session store."""
+    message = late["message"]
+    stored = dict(message)
+    message["content"] = maybe_translate(answer, late["lang"])
+    if late["tts"]:
+        _, audio_data = tts_to_audio_tag(message["content"], late["lang"])
+        if audio_data:
+            message["audio_data"] = audio_data
+    try:
+        get_session_store().replace(get_session_id(), late["course"], stored, message)
+    except Exception as store_err:
+        logging.getLogger(__name__).warning("Session store replace failed: %s", store_err)
+
+
+def late_answer_panel(answerer: DeadlineAnswerer):
+    """Polls the LLM job of a fallback answer and swaps the LLM answer in once it arrives."""
+    late = st.session_state.get("late_answer")
+    if not late:
+        return
+    state, text = answerer.result(late["job"])
+    if state == LLM_PENDING:
+        st.caption("⏳ That was a quick answer from the course page; the full answer will replace it shortly...")
+        return
+    st.session_state["late_answer"] = None
+    if state == LLM_DONE and text and text.strip():
+        get_router_state()[0].put(late["url"], late["query"], text)
+        upgrade_fallback_answer(late, text)
+        answerer.count("late_replaced")
+    else:
+        logging.getLogger(__name__).warning("Late LLM answer failed: %s", text)
+    st.rerun()
+
+
+def voice_panel(pool: RecognitionPool):
+    """Voice input (Client Request 2): browser audio, transcribed by background workers."""
+    if submit_voice_clip(pool):
+        st.rerun()  # full run: remounts this panel with polling switched on
+    if st.session_state.get("voice_job"):
+        poll_voice_job(pool)
+
+
+@st.fragment
+@metered("llm_search")
+def llm_panel():
     st.markdown('<div class="chat-container">', unsafe_allow_html=True)
     st.markdown("### 🤖 AI General Knowledge Search")
     st.markdown("Ask me anything! I can help with general knowledge, current events, technology, science, history, and more.")
@@ -1141,16 +1239,12 @@ with llm_tab:
         llm_submitted = st.form_submit_button("🤖 Search", type="primary", use_container_width=True)
     
     if llm_submitted and llm_query:
+        target_lang_code, enable_tts = response_settings()
         if not gemini_api_key:
             st.warning("⚠️ GEMINI_API_KEY is missing. Add it to your environment to use the AI assistant.")
         else:
             # Use Gemini for general knowledge search
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                google_api_key=gemini_api_key,
-                temperature=0.7,  # Higher temperature for more creative responses
-                max_output_tokens=1024
-            )
+            llm = create_chat_model(temperature=0.7, max_output_tokens=1024)  # Higher temperature for more creative responses
             
             # General knowledge prompt
             general_prompt = (
@@ -1166,7 +1260,7 @@ with llm_tab:
             with st.spinner("🤖 AI is thinking..."):
                 try:
                     # Direct LLM call without RAG for general knowledge
-                    response = llm.invoke(general_prompt)
+                    response = metered_llm(llm, FEATURE_SEARCH).invoke(general_prompt)
                     answer = response.content if hasattr(response, 'content') else str(response)
                 except Exception as e:
                     answer = f"Sorry, I encountered an error: {e}. Please try again or contact support at {contact_number}."
@@ -1197,10 +1291,24 @@ with llm_tab:
     st.markdown('</div>', unsafe_allow_html=True)
 
 
-with history_tab:
+@st.fragment
+@metered("history")
+def history_panel():
     st.markdown('<div class="chat-container">', unsafe_allow_html=True)
     st.markdown("### 📜 Conversation History")
+    current_course_key = st.session_state.get("active_course_name", "Select Course (Click to Load)")
     st.markdown(f"**Viewing history for: {current_course_key}**")
+
+    # Chat turns only rerun the chat panel; this panel catches up when it reruns
+    col_h1, col_h2 = st.columns(2)
+    with col_h1:
+        st.button("🔄 Refresh", key="refresh_history", use_container_width=True)
+    with col_h2:
+        # Older messages stay in the session store until asked for
+        if has_older_messages(current_course_key):
+            if st.button("⬆️ Load earlier messages", key="load_older_history", use_container_width=True):
+                load_older_messages(current_course_key)
+                st.rerun(scope="fragment")
     
     # Show history from the specific active course
     if st.session_state["messages"]:
@@ -1223,6 +1331,28 @@ with history_tab:
         st.info("💬 No conversation yet for this course. Start chatting in the Chat tab!")
     st.markdown('</div>', unsafe_allow_html=True)
 
+
+chat_tab, llm_tab, history_tab = st.tabs(["💬 Chat", "🤖 LLM Search", "📜 History"])
+
+with chat_tab:
+    chat_panel()
+    # Polls every second only while a fallback answer waits for its LLM answer
+    if st.session_state.get("late_answer"):
+        st.fragment(metered("late_answer")(late_answer_panel), run_every=1.0)(get_deadline_answerer())
+    # Polls every second only while a recording is being transcribed
+    voice_pool = get_recognition_pool()
+    if st.session_state.get("voice_panel_enabled") and voice_pool is not None and st.session_state.get("retriever_ready"):
+        run_every = 1.0 if st.session_state.get("voice_job") else None
+        st.fragment(metered("voice")(voice_panel), run_every=run_every)(voice_pool)
+    if st.session_state.get("voice_notice"):
+        st.warning(st.session_state.pop("voice_notice"))
+
+with llm_tab:
+    llm_panel()
+
+with history_tab:
+    history_panel()
+
 # Floating contact number (using the dynamic contact_number variable)
 st.markdown(f'<div class="floating-contact">📞 {contact_number}</div>', unsafe_allow_html=True)
 
@@ -1249,3 +1379,4 @@ st.markdown(f'''
 </div>
 ''', unsafe_allow_html=True)
 
+end_run()
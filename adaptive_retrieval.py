@@ -0,0 +1,158 @@
+"""
+Adaptive retrieval depth.
+
+Retrieval used to fetch k=12 chunks for every question. Here the depth is picked per
+query:
+
+    intent      "what is the duration?"        factual  -> few chunks, small budget
+                "explain the projects"         default
+                "show the full syllabus"       broad    -> many chunks, large budget
+    scores      candidates (up to the intent's max_k) are cut where relevance drops
+                more than RETRIEVAL_SCORE_WINDOW below the best hit, or at the largest
+                score gap of at least RETRIEVAL_SCORE_GAP
+    budget      past the intent's min_k, chunks are added in score order until the
+                intent's token budget is used
+
+so short factual questions send a much smaller prompt to Gemini. Budgets are derived
+from CHUNK_SIZE (a full chunk is CHUNK_SIZE / 4 tokens), so at any chunk size a factual
+question can take up to 3 chunks and a default one up to 6, and the score window / gap
+decide within that range.
+
+    RETRIEVAL_MAX_K=12
+    RETRIEVAL_TOKEN_BUDGET=         broad questions (default RETRIEVAL_MAX_K full chunks);
+                                    factual questions get 1/4 of it, others 1/2
+    RETRIEVAL_SCORE_WINDOW=0.15
+    RETRIEVAL_SCORE_GAP=0.05
+"""
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple
+
+from langchain_core.documents import Document
+
+from conversation import CHARS_PER_TOKEN, estimate_tokens
+from course_content import CHUNK_SIZE
+from curriculum import is_curriculum_query
+from intent_router import DETAIL_PATTERN, normalize_query
+from retrieval_trace import current_trace, stage
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "12"))
+# Tokens of one full-size chunk
+CHUNK_TOKENS = (CHUNK_SIZE + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "") or RETRIEVAL_MAX_K * CHUNK_TOKENS)
+RETRIEVAL_SCORE_WINDOW = float(os.getenv("RETRIEVAL_SCORE_WINDOW", "0.15"))
+RETRIEVAL_SCORE_GAP = float(os.getenv("RETRIEVAL_SCORE_GAP", "0.05"))
+
+INTENT_FACTUAL = "factual"
+INTENT_DEFAULT = "default"
+INTENT_BROAD = "broad"
+
+# Questions that need many sections at once
+BROAD_PATTERN = re.compile(
+    r"\b(all|every|full|complete|entire|overall|summary|summari[sz]e|overview|compare|comparison|"
+    r"difference|differences|list|explain|describe|projects|tools|technologies)\b"
+)
+# Single facts: "how long ...", "when ...", or a question about one of these attributes.
+# A bare "what / is / which ..." is not enough ("Which databases are taught?" needs a list)
+FACTUAL_PATTERN = re.compile(
+    r"^(when|how (long|much|many)|who)\b|\b(duration|mode|modes|online|offline|"
+    r"certificate|certification|trainer|faculty|placement)\b"
+)
+# Short questions are usually single facts
+FACTUAL_MAX_WORDS = 10
+
+
+@dataclass(frozen=True)
+class RetrievalProfile:
+    intent: str
+    min_k: int
+    max_k: int
+    token_budget: int
+
+
+def retrieval_profile(query: str) -> RetrievalProfile:
+    """Picks retrieval depth and token budget from the query wording."""
+    normalized = normalize_query(query)
+    if is_curriculum_query(normalized) or BROAD_PATTERN.search(normalized):
+        return RetrievalProfile(INTENT_BROAD, min(6, RETRIEVAL_MAX_K), RETRIEVAL_MAX_K, RETRIEVAL_TOKEN_BUDGET)
+    if len(normalized.split()) <= FACTUAL_MAX_WORDS and (
+            DETAIL_PATTERN.search(normalized) or FACTUAL_PATTERN.search(normalized)):
+        return RetrievalProfile(INTENT_FACTUAL, 1, min(4, RETRIEVAL_MAX_K), RETRIEVAL_TOKEN_BUDGET // 4)
+    return RetrievalProfile(INTENT_DEFAULT, min(2, RETRIEVAL_MAX_K), min(8, RETRIEVAL_MAX_K), RETRIEVAL_TOKEN_BUDGET // 2)
+
+
+def select_by_scores(scored: List[Tuple[Document, float]], profile: RetrievalProfile) -> List[Document]:
+    """
+    scored: (chunk, relevance) pairs, best first (relevance in [0, 1]).
+    Keeps at least min_k chunks (whatever their size), cuts at the relevance window or the
+    largest score gap, then stops when the token budget is used.
+    """
+    if not scored:
+        return []
+    top = scored[0][1]
+    cut = len(scored)
+    for i in range(profile.min_k, len(scored)):
+        if scored[i][1] < top - RETRIEVAL_SCORE_WINDOW:
+            cut = i
+            break
+    gaps = [(scored[i - 1][1] - scored[i][1], i) for i in range(max(1, profile.min_k), cut)]
+    if gaps:
+        gap, at = max(gaps)
+        if gap >= RETRIEVAL_SCORE_GAP:
+            cut = at
+
+    selected: List[Document] = []
+    tokens = 0
+    for doc, _ in scored[:cut]:
+        cost = estimate_tokens(doc.page_content)
+        if len(selected) >= max(profile.min_k, 1) and tokens + cost > profile.token_budget:
+            break
+        selected.append(doc)
+        tokens += cost
+    return selected
+
+
+class AdaptiveRetriever:
+    """Scored search through the retrieval cache + per-query depth selection, with k stats."""
+
+    def __init__(self, retrieval_cache, log_every: int = 20):
+        self.retrieval_cache = retrieval_cache
+        self.log_every = log_every
+        self.counts: Dict[str, int] = {}
+        self.chunks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def search(self, vectordb, scope: str, query: str) -> List[Document]:
+        profile = retrieval_profile(query)
+        with stage("retrieval"):
+            scored = self.retrieval_cache.search_with_scores(vectordb, scope, query, k=profile.max_k)
+            docs = select_by_scores(scored, profile)
+        trace = current_trace()
+        if trace is not None:
+            trace.note(intent=profile.intent, max_k=profile.max_k, token_budget=profile.token_budget)
+            trace.set_candidates(scored, docs)
+        logger.info("retrieval intent=%s k=%d/%d", profile.intent, len(docs), profile.max_k)
+        with self._lock:
+            self.counts[profile.intent] = self.counts.get(profile.intent, 0) + 1
+            self.chunks[profile.intent] = self.chunks.get(profile.intent, 0) + len(docs)
+            total = sum(self.counts.values())
+        if self.log_every and total % self.log_every == 0:
+            logger.info("retrieval depth summary: %s", self.summary())
+        return docs
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                "queries": total,
+                "avg_k": round(sum(self.chunks.values()) / total, 2) if total else 0.0,
+                "by_intent": {
+                    intent: {"count": n, "avg_k": round(self.chunks[intent] / n, 2)}
+                    for intent, n in self.counts.items()
+                },
+            }
@@ -0,0 +1,296 @@
+"""
+Deadline-aware answers with an extractive fallback.
+
+qa.invoke used to block for as long as Gemini took and then show the student a raw
+error string if it failed. Now every LLM call runs on DeadlineAnswerer's workers:
+
+    answered within LLM_DEADLINE_SECONDS     the LLM answer is shown as before
+    deadline passed                          an extractive answer is shown (best sentences
+                                             of the retrieved chunks, query terms in bold,
+                                             under their section headings); the LLM answer
+                                             replaces it when it arrives (up to
+                                             LLM_LATE_ANSWER_SECONDS later)
+    LLM failed / unavailable                 the extractive answer stays
+
+After LLM_FAILURE_THRESHOLD consecutive failures (errors, or calls that missed the
+deadline) the LLM is treated as unavailable for LLM_COOLDOWN_SECONDS: no calls are made
+and answers are extractive straight away, so chat latency stays bounded during provider
+incidents.
+
+A running call cannot be cancelled, so at most LLM_WORKERS calls are in flight: while all
+of them are busy, new questions get the extractive answer instead of queueing behind hung
+calls. The chat model itself gives up after LLM_REQUEST_TIMEOUT_SECONDS per attempt
+(LLM_MAX_RETRIES retries), which is what eventually frees a worker held by a hung call.
+
+    LLM_DEADLINE_SECONDS=8
+    LLM_LATE_ANSWER_SECONDS=90
+    LLM_FAILURE_THRESHOLD=3
+    LLM_COOLDOWN_SECONDS=30
+    LLM_WORKERS=8
+    LLM_REQUEST_TIMEOUT_SECONDS=40
+    LLM_MAX_RETRIES=1
+    EXTRACTIVE_MAX_SENTENCES=5
+"""
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from context_assembly import document_body
+from conversation import key_terms
+
+logger = logging.getLogger(__name__)
+
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "8"))
+LLM_LATE_ANSWER_SECONDS = float(os.getenv("LLM_LATE_ANSWER_SECONDS", "90"))
+LLM_FAILURE_THRESHOLD = int(os.getenv("LLM_FAILURE_THRESHOLD", "3"))
+LLM_COOLDOWN_SECONDS = float(os.getenv("LLM_COOLDOWN_SECONDS", "30"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "8"))
+# Client-side limits of one chat-model call: (retries + 1) * timeout stays within the late-answer window
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "40"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+EXTRACTIVE_MAX_SENTENCES = int(os.getenv("EXTRACTIVE_MAX_SENTENCES", "5"))
+
+JOB_PENDING = "pending"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Sentence / list-item boundaries inside a chunk
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9#+]+")
+MIN_SENTENCE_WORDS = 3
+# Terms at least this long also match longer / shorter word forms ("prerequisite(s)")
+PREFIX_MATCH_CHARS = 5
+
+
+# ===== Extractive answers =====
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for part in _SENTENCE_SPLIT.split(text or ""):
+        part = " ".join(part.split()).lstrip("-•* ")
+        if len(part.split()) >= MIN_SENTENCE_WORDS:
+            sentences.append(part)
+    return sentences
+
+
+def _term_matches(term: str, word: str) -> bool:
+    if word == term:
+        return True
+    if len(term) >= PREFIX_MATCH_CHARS and len(word) >= PREFIX_MATCH_CHARS:
+        stem = min(len(term), len(word), PREFIX_MATCH_CHARS + 2)
+        return word[:stem] == term[:stem]
+    return False
+
+
+def matched_words(sentence: str, terms: List[str]) -> Tuple[int, set]:
+    """(number of query terms found, the sentence words that matched them)."""
+    found, words = 0, set()
+    sentence_words = set(_WORD.findall(sentence.lower()))
+    for term in terms:
+        hits = {w for w in sentence_words if _term_matches(term, w)}
+        if hits:
+            found += 1
+            words |= hits
+    return found, words
+
+
+def highlight(sentence: str, words: set) -> str:
+    if not words:
+        return sentence
+    pattern = re.compile(r"\b(" + "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True)) + r")\b",
+                         re.IGNORECASE)
+    return pattern.sub(lambda m: f"**{m.group(0)}**", sentence)
+
+
+def extractive_answer(query: str, docs: List[Document], max_sentences: int = EXTRACTIVE_MAX_SENTENCES) -> str:
+    """
+    Markdown answer built only from the retrieved chunks: the sentences covering most of
+    the query terms (ties go to better-ranked chunks), query terms in bold, grouped under
+    their section headings in page order. "" if nothing was retrieved.
+    """
+    terms = [t.lower() for t in key_terms(query, 12)]
+    candidates = []  # (terms found, -rank, -position, rank, position, heading, sentence, words)
+    for rank, doc in enumerate(docs):
+        heading = doc.metadata.get("heading_path") or doc.metadata.get("heading", "")
+        for position, sentence in enumerate(split_sentences(document_body(doc))):
+            found, words = matched_words(sentence, terms)
+            candidates.append((found, -rank, -position, rank, position, heading, sentence, words))
+    if not candidates:
+        return ""
+
+    best = sorted((c for c in candidates if c[0] > 0), reverse=True)[:max_sentences]
+    if not best:
+        # Nothing matched literally: the top chunk is still the closest by embedding
+        best = [c for c in candidates if c[3] == 0][:max_sentences] or candidates[:max_sentences]
+
+    blocks: List[str] = []
+    current_heading = None
+    for _, _, _, rank, position, heading, sentence, words in sorted(best, key=lambda c: (c[3], c[4])):
+        if heading != current_heading:
+            current_heading = heading
+            blocks.append(f"\n**{heading}**" if heading else "")
+        blocks.append(f"- {highlight(sentence, words)}")
+    return "\n".join(b for b in blocks if b).strip()
+
+
+# ===== Deadline-bounded LLM calls =====
+class DeadlineAnswerer:
+    """
+    Runs LLM calls on a thread pool. submit() returns a job id immediately (None while the
+    LLM is marked unavailable or every worker is busy); wait() blocks up to a deadline and
+    result() never blocks. Both return (state, text_or_error).
+    """
+
+    def __init__(self, max_workers: int = LLM_WORKERS, failure_threshold: int = LLM_FAILURE_THRESHOLD,
+                 cooldown_seconds: float = LLM_COOLDOWN_SECONDS, late_seconds: float = LLM_LATE_ANSWER_SECONDS,
+                 log_every: int = 20):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.late_seconds = late_seconds
+        self.log_every = log_every
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="llm")
+        # One slot per worker: calls never queue behind running (possibly hung) ones
+        self._slots = threading.BoundedSemaphore(max(1, max_workers))
+        self._jobs: Dict[str, Tuple[float, Future]] = {}
+        # Calls still running, and those already counted as failed because they missed the deadline
+        self._running: set = set()
+        self._timed_out: set = set()
+        self._failures = 0
+        self._unavailable_until = 0.0
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        with self._lock:
+            return time.time() >= self._unavailable_until
+
+    def submit(self, call: Callable[[], str]) -> Optional[str]:
+        if not self.available():
+            self.count("skipped")
+            return None
+        if not self._slots.acquire(blocking=False):
+            self.count("saturated")
+            return None
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._running.add(job_id)
+
+        def _run() -> str:
+            # Bookkeeping runs before the result is published, so wait() callers see it done
+            failed = True
+            try:
+                text = call()
+                failed = False
+                return text
+            finally:
+                self._finished(job_id, failed)
+
+        try:
+            future = self._pool.submit(_run)
+        except Exception:
+            with self._lock:
+                self._running.discard(job_id)
+            self._slots.release()
+            raise
+        with self._lock:
+            self._expire()
+            self._jobs[job_id] = (time.time(), future)
+        return job_id
+
+    def wait(self, job_id: Optional[str], timeout: float = LLM_DEADLINE_SECONDS) -> Tuple[str, str]:
+        """Waits for the job up to timeout seconds; JOB_PENDING means the deadline passed."""
+        if job_id is None:
+            return JOB_FAILED, "LLM unavailable or busy"
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return JOB_FAILED, "LLM job expired"
+        try:
+            entry[1].result(timeout=max(timeout, 0.0))
+        except FutureTimeout:
+            self.count("deadline_missed")
+            # A timeout is a failure for the circuit breaker, whenever the call finishes
+            with self._lock:
+                timed_out = job_id in self._running
+                if timed_out:
+                    self._timed_out.add(job_id)
+            if timed_out:
+                self._record_failure()
+            return JOB_PENDING, ""
+        except Exception:
+            pass  # reported by result()
+        state, text = self.result(job_id)
+        self.count("in_time" if state == JOB_DONE else "failed")
+        return state, text
+
+    def result(self, job_id: str) -> Tuple[str, str]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return JOB_FAILED, "LLM job expired"
+        submitted, future = entry
+        if not future.done():
+            if time.time() - submitted > self.late_seconds:
+                # Stop waiting; the call itself keeps its worker until the client-side timeout
+                with self._lock:
+                    self._jobs.pop(job_id, None)
+                return JOB_FAILED, "LLM answer took too long"
+            return JOB_PENDING, ""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        err = future.exception()
+        if err is not None:
+            return JOB_FAILED, str(err)
+        return JOB_DONE, future.result()
+
+    def _finished(self, job_id: str, failed: bool) -> None:
+        self._slots.release()
+        with self._lock:
+            self._running.discard(job_id)
+            if job_id in self._timed_out:
+                self._timed_out.discard(job_id)  # already counted when it missed the deadline
+                return
+            if not failed:
+                self._failures = 0
+                return
+        self._record_failure()
+
+    def _record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._unavailable_until = time.time() + self.cooldown_seconds
+                self._failures = 0
+                opened = True
+            else:
+                opened = False
+        if opened:
+            logger.warning("LLM failed %d times in a row; answering extractively for %.0fs",
+                           self.failure_threshold, self.cooldown_seconds)
+
+    def count(self, outcome: str) -> None:
+        """
+        Outcomes: in_time, deadline_missed, failed, skipped (unavailable), saturated (all
+        workers busy), late_replaced.
+        """
+        with self._lock:
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+            total = sum(self._counts.values())
+        if self.log_every and total % self.log_every == 0:
+            logger.info("LLM deadline summary: %s", self.summary())
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counts, unavailable=time.time() < self._unavailable_until)
+
+    def _expire(self) -> None:
+        # Jobs nobody polled (the session went away) are dropped after the late-answer window
+        cutoff = time.time() - self.late_seconds
+        for job_id in [j for j, (submitted, _) in self._jobs.items() if submitted < cutoff]:
+            self._jobs.pop(job_id)
@@ -0,0 +1,152 @@
+"""
+Chunking strategy benchmark.
+
+Sweeps splitter mode, chunk size and chunk overlap over every course page and reports,
+per configuration: chunk count (= embedding calls at ingest), index size, context
+characters sent per query and retrieval recall@k on a labeled question set.
+
+    python bench_chunking.py
+    python bench_chunking.py --modes recursive,section --sizes 600,1000,1500 --overlaps 0,150,350 --k 4,12
+    python bench_chunking.py --courses Django,"Power BI" --out bench_results.json
+
+Pick the winning configuration and set CHUNK_MODE / CHUNK_SIZE / CHUNK_OVERLAP in the env.
+"""
+import argparse
+import json
+import os
+import time
+from itertools import product
+from typing import List, Dict, Any
+
+from dotenv import load_dotenv
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from course_content import COURSE_OPTIONS, fetch_course_soup, load_course_chunks
+from embedding_backends import EMBEDDING_BACKEND, create_embeddings
+
+QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench", "chunking_questions.json")
+
+
+class MemoEmbeddings(Embeddings):
+    """Wraps an embeddings model so identical texts are only embedded once across the sweep."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.cache: Dict[str, List[float]] = {}
+        self.remote_calls = 0
+
+    def _embed(self, texts: List[str], fn) -> List[List[float]]:
+        missing = [t for t in dict.fromkeys(texts) if t not in self.cache]
+        if missing:
+            self.remote_calls += len(missing)
+            for text, vec in zip(missing, fn(missing)):
+                self.cache[text] = vec
+        return [self.cache[t] for t in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, self.inner.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], lambda ts: [self.inner.embed_query(ts[0])])[0]
+
+
+def load_questions(path: str, course: str) -> List[Dict[str, Any]]:
+    """Questions for a course: the shared '*' set plus any course-specific ones."""
+    with open(path, encoding="utf-8") as f:
+        labeled = json.load(f)
+    return labeled.get("*", []) + labeled.get(course, [])
+
+
+def is_hit(docs, expected: List[str]) -> bool:
+    """A question is answered if any retrieved chunk contains any expected phrase."""
+    wanted = [e.lower() for e in expected]
+    return any(w in d.page_content.lower() for d in docs for w in wanted)
+
+
+def evaluate(chunks, questions, embeddings: MemoEmbeddings, ks: List[int]) -> Dict[str, Any]:
+    texts = [c.page_content for c in chunks]
+    vectors = embeddings.embed_documents(texts)
+    dim = len(vectors[0]) if vectors else 0
+    vectordb = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=[c.metadata for c in chunks])
+
+    result: Dict[str, Any] = {
+        "chunks": len(chunks),
+        "embedding_calls": len(chunks),
+        "index_bytes": len(chunks) * dim * 4 + sum(len(t.encode("utf-8")) for t in texts),
+    }
+    max_k = max(ks)
+    hits = {k: 0 for k in ks}
+    context_chars = {k: 0 for k in ks}
+    search_s = 0.0
+    for q in questions:
+        t0 = time.perf_counter()
+        docs = vectordb.similarity_search(q["question"], k=max_k)
+        search_s += time.perf_counter() - t0
+        for k in ks:
+            hits[k] += is_hit(docs[:k], q["expected"])
+            context_chars[k] += sum(len(d.page_content) for d in docs[:k])
+    n = max(len(questions), 1)
+    for k in ks:
+        result[f"recall@{k}"] = round(hits[k] / n, 3)
+        result[f"context_chars@{k}"] = context_chars[k] // n
+    result["search_ms"] = round(1000 * search_s / n, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", default="", help="Comma-separated course names (default: all)")
+    parser.add_argument("--modes", default="recursive,section")
+    parser.add_argument("--sizes", default="500,800,1000,1500")
+    parser.add_argument("--overlaps", default="0,100,200,350")
+    parser.add_argument("--k", default="2,4,8,12")
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, help="Embedding backend (google or local)")
+    parser.add_argument("--out", default="", help="Write all results as JSON to this path")
+    args = parser.parse_args()
+
+    load_dotenv()
+    embeddings = MemoEmbeddings(create_embeddings(args.backend))
+    courses = [c.strip() for c in args.courses.split(",") if c.strip()] or list(COURSE_OPTIONS)
+    modes = args.modes.split(",")
+    sizes = [int(x) for x in args.sizes.split(",")]
+    overlaps = [int(x) for x in args.overlaps.split(",")]
+    ks = [int(x) for x in args.k.split(",")]
+
+    rows: List[Dict[str, Any]] = []
+    for course in courses:
+        url = COURSE_OPTIONS[course]
+        questions = load_questions(args.questions, course)
+        soup = fetch_course_soup(url)  # fetched once, copied for every configuration
+        for mode, size, overlap in product(modes, sizes, overlaps):
+            if overlap >= size:
+                continue
+            chunks, _ = load_course_chunks(url, soup=soup, mode=mode, chunk_size=size, chunk_overlap=overlap)
+            row = {"course": course, "mode": mode, "chunk_size": size, "chunk_overlap": overlap}
+            row.update(evaluate(chunks, questions, embeddings, ks))
+            rows.append(row)
+            print(json.dumps(row))
+
+    # Aggregate across courses so one configuration can be chosen for the whole catalogue
+    print(f"\n{'mode':10} {'size':>5} {'ovl':>4} {'chunks':>7} {'index KB':>9} "
+          + " ".join(f"{'R@' + str(k):>6}" for k in ks) + f" {'ctx@' + str(ks[-1]):>8}")
+    summary = {}
+    for row in rows:
+        key = (row["mode"], row["chunk_size"], row["chunk_overlap"])
+        summary.setdefault(key, []).append(row)
+    for (mode, size, overlap), group in sorted(summary.items()):
+        n = len(group)
+        recalls = " ".join(f"{sum(r[f'recall@{k}'] for r in group) / n:>6.2f}" for k in ks)
+        print(f"{mode:10} {size:>5} {overlap:>4} {sum(r['chunks'] for r in group):>7} "
+              f"{sum(r['index_bytes'] for r in group) / 1024:>9.1f} {recalls} "
+              f"{sum(r[f'context_chars@{ks[-1]}'] for r in group) // n:>8}")
+    print(f"\nEmbedding calls made: {embeddings.remote_calls}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Dimensionality-reduction benchmark: full-dimension flat index vs PCA / truncated vectors.
+
+Every course page is chunked and embedded once with the chosen backend. For each
+reduction (method x dimension) the same vectors are indexed the way the app would
+(dim_reduction.reduced_index), and it reports index memory, search latency (p50/p95),
+recall@k on the labeled questions in bench/chunking_questions.json, and how many of the
+full-dimension top-k neighbours the reduced index still returns (overlap@k).
+
+    python bench_dimensions.py --methods pca,truncate --dims 64,128,256 --k 4,12
+    python bench_dimensions.py --backend local --dims 128,256 --out bench/dimensions.json
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+import faiss
+import numpy as np
+from dotenv import load_dotenv
+
+from bench_chunking import QUESTIONS_PATH, MemoEmbeddings, is_hit, load_questions
+from bench_embeddings import percentile
+from course_content import COURSE_OPTIONS, COURSE_PAGES, fetch_course_soup, load_course_chunks
+from dim_reduction import REDUCTION_NONE, index_bytes, reduced_index, stored_dimension
+from embedding_backends import EMBEDDING_BACKEND, create_embeddings, embedding_identity
+
+
+def full_index(vectors: np.ndarray) -> faiss.Index:
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+def bench_reduction(method: str, dim: int, corpora: Dict[str, Tuple[list, np.ndarray, np.ndarray, list]],
+                    ks: List[int], repeats: int) -> Dict[str, Any]:
+    memory, dims, search_ms = 0, [], []
+    hits = {k: 0 for k in ks}
+    overlap = {k: 0.0 for k in ks}
+    total_questions = 0
+    top = max(ks)
+    for chunks, vectors, queries, questions in corpora.values():
+        baseline = full_index(vectors)
+        index = baseline if method == REDUCTION_NONE else (reduced_index(vectors, method, dim) or baseline)
+        memory += index_bytes(index)
+        dims.append(stored_dimension(index))
+        _, expected_ids = baseline.search(queries, top)
+        for i, question in enumerate(questions):
+            query = queries[i:i + 1]
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                _, ids = index.search(query, top)
+                search_ms.append(1000 * (time.perf_counter() - t0))
+            found = [int(j) for j in ids[0] if j >= 0]
+            for k in ks:
+                hits[k] += is_hit([chunks[j] for j in found[:k]], question["expected"])
+                reference = {int(j) for j in expected_ids[i][:k] if j >= 0}
+                overlap[k] += len(reference & set(found[:k])) / max(len(reference), 1)
+            total_questions += 1
+
+    result = {
+        "reduction": method if method == REDUCTION_NONE else f"{method}-{dim}",
+        "stored_dim": max(dims) if dims else 0,
+        "memory_kb": round(memory / 1024, 1),
+        "search_p50_ms": round(percentile(search_ms, 50), 4),
+        "search_p95_ms": round(percentile(search_ms, 95), 4),
+    }
+    for k in ks:
+        result[f"recall@{k}"] = round(hits[k] / max(total_questions, 1), 3)
+        result[f"overlap@{k}"] = round(overlap[k] / max(total_questions, 1), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND)
+    parser.add_argument("--courses", default="", help="Comma-separated course names (default: all)")
+    parser.add_argument("--methods", default="pca,truncate")
+    parser.add_argument("--dims", default="64,128,256")
+    parser.add_argument("--k", default="4,12")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed searches per question")
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--out", default="")
+    args = parser.parse_args()
+
+    load_dotenv()
+    ks = [int(x) for x in args.k.split(",")]
+    courses = [c.strip() for c in args.courses.split(",") if c.strip()] or list(COURSE_OPTIONS)
+
+    # Chunks and queries are embedded once; every reduction indexes the same vectors
+    embeddings = MemoEmbeddings(create_embeddings(args.backend))
+    corpora = {}
+    for course in courses:
+        url = COURSE_OPTIONS[course]
+        chunks, _ = load_course_chunks(url, soup=fetch_course_soup(url), subpages=COURSE_PAGES.get(url))
+        questions = load_questions(args.questions, course)
+        if not chunks or not questions:
+            continue
+        vectors = np.asarray(embeddings.embed_documents([c.page_content for c in chunks]), dtype=np.float32)
+        queries = np.asarray([embeddings.embed_query(q["question"]) for q in questions], dtype=np.float32)
+        corpora[course] = (chunks, vectors, queries, questions)
+    print(f"{embedding_identity(args.backend)}: {sum(len(c[0]) for c in corpora.values())} chunks, "
+          f"{sum(len(c[3]) for c in corpora.values())} questions, {embeddings.remote_calls} texts embedded")
+
+    rows = []
+    dims = [int(x) for x in args.dims.split(",")]
+    sweep = [(REDUCTION_NONE, 0)] + [(m.strip(), d) for m in args.methods.split(",") if m.strip() != REDUCTION_NONE
+                                     for d in dims]
+    for method, dim in sweep:
+        rows.append(bench_reduction(method, dim, corpora, ks, args.repeats))
+        print(json.dumps(rows[-1]))
+
+    if rows:
+        cols = list(rows[0].keys())
+        print("\n" + " ".join(f"{c:>14}" for c in cols))
+        for row in rows:
+            print(" ".join(f"{str(row[c]):>14}" for c in cols))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
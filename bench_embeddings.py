@@ -0,0 +1,108 @@
+"""
+Embedding backend benchmark: remote Gemini embeddings vs the local CPU model.
+
+For every backend and course page it builds the index once, then reports index build
+time, query-embedding latency (p50/p95, uncached), FAISS search latency and recall@k on
+the labeled questions in bench/chunking_questions.json.
+
+    python bench_embeddings.py --backends google,local --k 4,12
+    LOCAL_EMBEDDING_MODEL_PATH=/models/bge-small-en-v1.5 python bench_embeddings.py --backends local
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import List, Dict, Any
+
+from dotenv import load_dotenv
+from langchain_community.vectorstores import FAISS
+
+from bench_chunking import QUESTIONS_PATH, is_hit, load_questions
+from course_content import COURSE_OPTIONS, fetch_course_soup, load_course_chunks
+from embedding_backends import create_embeddings, embedding_identity
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench_backend(backend: str, course_chunks: Dict[str, list], questions: Dict[str, list],
+                  ks: List[int], repeats: int) -> Dict[str, Any]:
+    embeddings = create_embeddings(backend)
+    build_s, query_ms, search_ms = 0.0, [], []
+    hits = {k: 0 for k in ks}
+    total_questions = 0
+    dimension = 0
+    for course, chunks in course_chunks.items():
+        t0 = time.perf_counter()
+        vectordb = FAISS.from_documents(chunks, embedding=embeddings)
+        build_s += time.perf_counter() - t0
+        dimension = vectordb.index.d
+        for q in questions[course]:
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                vector = embeddings.embed_query(q["question"])
+                query_ms.append(1000 * (time.perf_counter() - t0))
+            t0 = time.perf_counter()
+            docs = vectordb.similarity_search_by_vector(vector, k=max(ks))
+            search_ms.append(1000 * (time.perf_counter() - t0))
+            for k in ks:
+                hits[k] += is_hit(docs[:k], q["expected"])
+            total_questions += 1
+
+    result = {
+        "backend": embedding_identity(backend),
+        "dimension": dimension,
+        "build_s": round(build_s, 2),
+        "query_p50_ms": round(percentile(query_ms, 50), 2),
+        "query_p95_ms": round(percentile(query_ms, 95), 2),
+        "search_p50_ms": round(percentile(search_ms, 50), 3),
+        "query_mean_ms": round(statistics.mean(query_ms), 2) if query_ms else 0.0,
+    }
+    for k in ks:
+        result[f"recall@{k}"] = round(hits[k] / max(total_questions, 1), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="google,local")
+    parser.add_argument("--courses", default="", help="Comma-separated course names (default: all)")
+    parser.add_argument("--k", default="4,12")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed embed_query calls per question")
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--out", default="")
+    args = parser.parse_args()
+
+    load_dotenv()
+    ks = [int(x) for x in args.k.split(",")]
+    courses = [c.strip() for c in args.courses.split(",") if c.strip()] or list(COURSE_OPTIONS)
+
+    # Same chunks for every backend, so only the embedding model differs
+    course_chunks = {c: load_course_chunks(COURSE_OPTIONS[c], soup=fetch_course_soup(COURSE_OPTIONS[c]))[0] for c in courses}
+    questions = {c: load_questions(args.questions, c) for c in courses}
+
+    rows = []
+    for backend in args.backends.split(","):
+        try:
+            rows.append(bench_backend(backend.strip(), course_chunks, questions, ks, args.repeats))
+        except Exception as err:
+            print(f"{backend}: skipped ({err})")
+            continue
+        print(json.dumps(rows[-1]))
+
+    if rows:
+        cols = list(rows[0].keys())
+        print("\n" + " ".join(f"{c:>14}" for c in cols))
+        for row in rows:
+            print(" ".join(f"{str(row[c]):>14}" for c in cols))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Rerun cost benchmark: server CPU and bytes sent per interaction, measured on the wire.
+
+Starts the app under a real `streamlit run` server (stand-in LLM / embeddings, course
+pages served locally, the websocket client of load_test.py) and drives one session the
+way the browser does: open the page, select a course, ask questions. For each step it
+reports the script runs it caused (full or fragment), the bytes of the ForwardMsgs
+(elements, deltas) the server sent and the server process's CPU time. Nothing inside
+the app is patched, so any version of Naresh_IT_bot.py can be measured, e.g. a worktree
+of an older commit:
+
+    python bench_reruns.py
+    python bench_reruns.py --questions 20 --out bench/reruns.json
+    git worktree add /tmp/before <commit> && python bench_reruns.py --app /tmp/before/Naresh_IT_bot.py
+
+The session caches no messages (a browser that reuses cached elements receives less),
+so the numbers compare versions rather than predict production traffic.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+from typing import Any, Dict, List
+
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from load_test import (
+    APP_PATH, COURSE_SELECT_KEY, QUESTION_LABEL, QUESTIONS, SEND_LABEL, BrowserSession, connect, free_port,
+    serve_course_pages, standin_env, start_server,
+)
+
+
+# ===== Session =====
+def step_summary(steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "n": len(steps),
+        "runs": steps[0]["runs"],
+        "mean_kb": round(statistics.mean(s["kb"] for s in steps), 2),
+        "mean_cpu_ms": round(statistics.mean(s["cpu_ms"] for s in steps), 1),
+        "mean_wall_ms": round(statistics.mean(s["wall_ms"] for s in steps), 1),
+    }
+
+
+async def run_session(port: int, server_pid: int, course: str, questions: List[str],
+                      timeout: float) -> Dict[str, Any]:
+    async with connect(port) as ws:
+        session = BrowserSession(ws, server_pid, timeout)
+        results: Dict[str, List[Dict[str, Any]]] = {"open": [await session.interact()]}
+
+        select_id, select_fragment = session.widget(COURSE_SELECT_KEY)
+        session.values[select_id] = WidgetState(id=select_id, string_value=course)
+        results["select_course"] = [await session.interact(select_fragment)]
+
+        results["question"] = []
+        for question in questions:
+            input_id, _ = session.widget(QUESTION_LABEL)
+            send_id, send_fragment = session.widget(SEND_LABEL)
+            session.values[input_id] = WidgetState(id=input_id, string_value=question)
+            results["question"].append(await session.interact(send_fragment, (send_id,)))
+            session.values.pop(input_id)  # clear_on_submit
+    return {step: dict(step_summary(steps), samples=steps) for step, steps in results.items()}
+
+
+# ===== CLI =====
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=APP_PATH, help="Naresh_IT_bot.py to measure (its directory is the cwd)")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for one interaction")
+    parser.add_argument("--out", default="")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="naresh-reruns-")
+    pages, catalog = serve_course_pages(workdir, 1)
+    catalog_path = os.path.join(workdir, "catalog.json")
+    with open(catalog_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f)
+    questions = [QUESTIONS[i % len(QUESTIONS)] + f" ({i})" for i in range(args.questions)]
+    port = free_port()
+    log_path = os.path.join(workdir, "streamlit.log")
+    server = start_server(args.app, port, standin_env(workdir, catalog_path), log_path)
+    try:
+        result = asyncio.run(run_session(port, server.pid, next(iter(catalog)), questions, args.timeout))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        pages.shutdown()
+
+    print(f"{args.app} (server log: {log_path})")
+    print(f"{'step':>14} {'n':>4} {'runs':>36} {'KB sent':>8} {'CPU ms':>8} {'wall ms':>8}")
+    for step, summary in result.items():
+        print(f"{step:>14} {summary['n']:>4} {'+'.join(summary['runs']):>36} {summary['mean_kb']:>8} "
+              f"{summary['mean_cpu_ms']:>8} {summary['mean_wall_ms']:>8}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"app": args.app, "steps": result}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Context assembly: turns retrieved chunks into the {context} block of the RAG prompt.
+
+Retrieval returns up to k chunks in score order. Neighbouring chunks of one section
+repeat up to CHUNK_OVERLAP characters at every boundary, and the same FAQ or promo
+paragraph can appear in several sections. assemble_context:
+
+    1. orders chunks by their position on the page (section_index, start_index)
+    2. merges overlapping / touching chunks of the same section into one passage,
+       keeping the overlapping text once
+    3. drops passages contained in, or near-duplicates of, another passage
+    4. renders each passage once under its heading path
+
+and reports the prompt tokens saved. ContextStats keeps running totals.
+"""
+import logging
+import re
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from conversation import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Chunks whose start is at most this many characters after the previous chunk's end are
+# adjacent (the splitter strips the whitespace between them)
+MERGE_GAP_CHARS = 2
+# Without positions, a suffix/prefix overlap this long means two chunks are neighbours
+MIN_TEXT_OVERLAP_CHARS = 40
+# Word-shingle Jaccard similarity above which a passage is a near-duplicate
+NEAR_DUPLICATE_SIMILARITY = 0.8
+SHINGLE_WORDS = 5
+
+_WORD = re.compile(r"\w+")
+
+
+class Passage:
+    """A run of merged chunks from one section."""
+
+    def __init__(self, doc: Document, rank: int):
+        self.source = doc.metadata.get("source", "")
+        self.section_index = doc.metadata.get("section_index")
+        self.heading = doc.metadata.get("heading_path") or doc.metadata.get("heading", "")
+        self.body = document_body(doc)
+        start = doc.metadata.get("start_index")
+        self.start: Optional[int] = start if isinstance(start, int) and start >= 0 else None
+        self.end: Optional[int] = self.start + len(self.body) if self.start is not None else None
+        self.rank = rank
+        self.chunks = 1
+
+    def sort_key(self) -> Tuple:
+        section = self.section_index if isinstance(self.section_index, int) else float("inf")
+        return (self.source, section, self.start if self.start is not None else 0, self.rank)
+
+    def same_section(self, other: "Passage") -> bool:
+        return (self.source, self.section_index, self.heading) == (other.source, other.section_index, other.heading)
+
+    def absorb(self, other: "Passage") -> bool:
+        """Merges a following chunk of the same section into this passage if they overlap or touch."""
+        if not self.same_section(other):
+            return False
+        if self.end is not None and other.start is not None:
+            if other.start > self.end + MERGE_GAP_CHARS:
+                return False
+            cut = self.end - other.start
+            if cut >= len(other.body):
+                pass  # fully inside this passage
+            elif cut > 0:
+                self.body += other.body[cut:]
+            else:
+                self.body += "\n" + other.body
+            self.end = max(self.end, other.end)
+        else:
+            cut = overlap_length(self.body, other.body)
+            if cut < MIN_TEXT_OVERLAP_CHARS:
+                return False
+            self.body += other.body[cut:]
+            self.end = None
+        self.rank = min(self.rank, other.rank)
+        self.chunks += other.chunks
+        return True
+
+
+def document_body(doc: Document) -> str:
+    """
+    Chunk text without the heading lines added by section-mode splitting: one per section
+    packed into the chunk (heading_paths), or the single heading_path / heading prefix.
+    """
+    metadata = doc.metadata
+    header = metadata.get("heading_path") or metadata.get("heading", "")
+    headings = {h for h in (header, *metadata.get("heading_paths", ())) if h}
+    if not headings:
+        return doc.page_content
+    lines = [line for line in doc.page_content.split("\n") if line.strip() not in headings]
+    return "\n".join(lines).strip("\n")
+
+
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right."""
+    for size in range(min(len(left), len(right)), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def shingles(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def drop_duplicates(passages: List[Passage]) -> Tuple[List[Passage], int]:
+    """Removes passages contained in, or near-duplicates of, a better-ranked passage."""
+    kept: List[Tuple[Passage, str, set]] = []
+    removed = 0
+    for passage in sorted(passages, key=lambda p: (-len(p.body), p.rank)):  # longest first
+        text = _squash(passage.body)
+        grams = shingles(passage.body)
+        duplicate = False
+        for _, other_text, other_grams in kept:
+            if text in other_text:
+                duplicate = True
+            else:
+                union = len(grams | other_grams)
+                duplicate = bool(union) and len(grams & other_grams) / union >= NEAR_DUPLICATE_SIMILARITY
+            if duplicate:
+                break
+        if duplicate:
+            removed += 1
+        else:
+            kept.append((passage, text, grams))
+    return [p for p, _, _ in kept], removed
+
+
+def assemble_context(docs: List[Document]) -> Tuple[str, Dict[str, Any]]:
+    """Returns (context text, stats) for the retrieved chunks."""
+    passages = sorted((Passage(doc, rank) for rank, doc in enumerate(docs)), key=Passage.sort_key)
+    merged: List[Passage] = []
+    for passage in passages:
+        if not (merged and merged[-1].absorb(passage)):
+            merged.append(passage)
+    unique, duplicates = drop_duplicates(merged)
+    unique.sort(key=Passage.sort_key)
+
+    blocks = []
+    for passage in unique:
+        body = passage.body.strip()
+        blocks.append(f"[{passage.heading}]\n{body}" if passage.heading else body)
+    context = "\n\n".join(blocks)
+
+    raw_tokens = estimate_tokens("\n\n".join(d.page_content for d in docs))
+    context_tokens = estimate_tokens(context)
+    stats = {
+        "chunks": len(docs),
+        "passages": len(unique),
+        "merged_chunks": len(docs) - len(merged),
+        "duplicates_removed": duplicates,
+        "raw_tokens": raw_tokens,
+        "context_tokens": context_tokens,
+        "tokens_saved": max(raw_tokens - context_tokens, 0),
+    }
+    logger.info("context assembly: %s", stats)
+    return context, stats
+
+
+class ContextStats:
+    """Running totals of prompt tokens saved by context assembly."""
+
+    def __init__(self, log_every: int = 20):
+        self.log_every = log_every
+        self.queries = 0
+        self.raw_tokens = 0
+        self.context_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, stats: Dict[str, Any]) -> None:
+        with self._lock:
+            self.queries += 1
+            self.raw_tokens += stats["raw_tokens"]
+            self.context_tokens += stats["context_tokens"]
+            queries = self.queries
+        if self.log_every and queries % self.log_every == 0:
+            logger.info("context summary: %s", self.summary())
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = max(self.raw_tokens - self.context_tokens, 0)
+            return {
+                "queries": self.queries,
+                "tokens_saved": saved,
+                "avg_tokens_saved": round(saved / self.queries, 1) if self.queries else 0.0,
+                "saved_pct": round(100.0 * saved / self.raw_tokens, 1) if self.raw_tokens else 0.0,
+            }
@@ -0,0 +1,208 @@
+"""
+Token-budgeted conversational memory for follow-up questions.
+
+Each course chat keeps a ConversationMemory: the last few turns verbatim plus a rolling
+summary of everything older, updated incrementally (only newly evicted turns are folded
+in) and always trimmed to a fixed token budget. Follow-up questions ("what about the
+second module?") are rewritten into standalone retrieval queries locally; an optional
+LLM rewrite only ever sees the bounded memory, never the whole transcript.
+"""
+import re
+from typing import List, Dict, Any, Optional
+
+# Rough token estimate (~4 characters per token for English text)
+CHARS_PER_TOKEN = 4
+
+STOPWORDS = set("""
+a an the and or but if then so of to in on at for with about from by is are was were be been
+it its this that these those they them their there here what which who whom whose when where why
+how can could should would will shall do does did i me my we our you your he she his her
+please tell show give list explain more also any some all each other same than too very just
+course courses want know need like okay ok yes no covered included include available part
+""".split())
+
+# Signals that a question leans on earlier turns
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(and|also|what about|how about|then|so|same|ok(ay)?|but)\b|"
+    r"\b(it|its|they|them|the (first|second|third|next|last|previous|above) "
+    r"(one|module|topic|part|section)|the same|mentioned|above)\b",
+    re.IGNORECASE,
+)
+DEMONSTRATIVES = {"this", "that", "these", "those"}
+# Words around a demonstrative that is used as a pronoun ("is that included?", "about this"):
+# auxiliaries, prepositions, conjunctions and predicates. Any other next word is taken as a
+# noun ("this course", "that module"), and "that" after such a word starts a relative
+# clause ("a course that covers Docker"); neither refers back.
+PRONOUN_CONTEXT = set("""
+is are was were be been am do does did has have had will would can could should shall may might must
+and or but so then also too again for in on at of about with to from by into than as if when how why
+what which who where all one ones same mean means include includes included cover covers covered
+available offered taught required mandatory necessary needed possible free online offline enough worth
+cost costs take takes need needs require requires help helps work works
+""".split())
+
+
+def refers_back(query: str) -> bool:
+    """True when the query has a demonstrative used as a pronoun ("What about that?", "Does this include ...")."""
+    words = re.findall(r"[a-z]+|[^\sa-z]", (query or "").lower())
+    for i, word in enumerate(words):
+        if word not in DEMONSTRATIVES:
+            continue
+        before = words[i - 1] if i else ""
+        after = words[i + 1] if i + 1 < len(words) else ""
+        if word == "that" and before.isalpha() and before not in PRONOUN_CONTEXT:
+            continue
+        if not after.isalpha() or after in PRONOUN_CONTEXT:
+            return True
+    return False
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def key_terms(text: str, limit: int = 8) -> List[str]:
+    """Content words of a message in order of appearance (no duplicates)."""
+    terms: List[str] = []
+    for word in re.findall(r"[A-Za-z0-9#+.]+", text or ""):
+        word = word.strip(".")
+        lowered = word.lower()
+        if len(lowered) > 2 and lowered not in STOPWORDS and word not in terms:
+            terms.append(word)
+        if len(terms) >= limit:
+            break
+    return terms
+
+
+def first_sentence(text: str, max_chars: int = 160) -> str:
+    plain = re.sub(r"[#*_`>\[\]]", "", text or "")
+    plain = " ".join(plain.split())
+    sentence = re.split(r"(?<=[.!?])\s", plain, maxsplit=1)[0]
+    return sentence[:max_chars]
+
+
+class ConversationMemory:
+    """Rolling summary + last turns of one course chat, held within token_budget."""
+
+    def __init__(self, token_budget: int = 600, recent_turns: int = 2):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_points: List[str] = []
+        self.folded = 0  # number of messages already folded into the summary
+        self.recent: List[Dict[str, Any]] = []
+
+    # ----- updating -----
+    def update(self, messages: List[Dict[str, Any]]) -> None:
+        """Incrementally folds messages that fell out of the recent window into the summary."""
+        if len(messages) < self.folded:
+            # History was cleared or replaced: start over
+            self.summary_points, self.folded = [], 0
+        keep = self.recent_turns * 2
+        cutoff = max(len(messages) - keep, self.folded)
+        for msg in messages[self.folded:cutoff]:
+            point = self._summarize(msg)
+            if point:
+                self.summary_points.append(point)
+        self.folded = cutoff
+        self.recent = [m for m in messages[cutoff:] if m.get("role") in ("user", "assistant")]
+        self._trim()
+
+    @staticmethod
+    def _summarize(msg: Dict[str, Any]) -> str:
+        if msg.get("role") == "user":
+            return f"Student asked about {' '.join(key_terms(msg.get('content', ''), 6))}".strip()
+        if msg.get("role") == "assistant":
+            sentence = first_sentence(msg.get("content", ""))
+            return f"Assistant: {sentence}" if sentence else ""
+        return ""
+
+    def _trim(self) -> None:
+        """
+        Holds summary + recent turns within the budget: recent turns get all of it (3/4 with
+        a summary), the longest clipped first, and the oldest summary points are dropped
+        until the summary fits the rest.
+        """
+        self._clip_recent(self.token_budget * 3 // 4 if self.summary_points else self.token_budget)
+        recent_tokens = sum(estimate_tokens(m.get("content", "")) for m in self.recent)
+        while self.summary_points and estimate_tokens(self.summary) > self.token_budget - recent_tokens:
+            self.summary_points.pop(0)
+
+    def _clip_recent(self, budget: int) -> None:
+        """Clips recent turns (copies, not the session's messages) to an even share of budget each, shortest first."""
+        remaining, left = budget, len(self.recent)
+        for i in sorted(range(len(self.recent)), key=lambda i: len(self.recent[i].get("content", ""))):
+            share = remaining // left
+            content = self.recent[i].get("content", "")
+            if estimate_tokens(content) > share:
+                content = content[:max(share * CHARS_PER_TOKEN - 1, 0)] + "…" if share else ""
+                self.recent[i] = dict(self.recent[i], content=content)
+            remaining -= estimate_tokens(content)
+            left -= 1
+
+    # ----- reading -----
+    @property
+    def summary(self) -> str:
+        return "\n".join(f"- {p}" for p in self.summary_points)
+
+    def render(self, max_turn_chars: int = 600) -> str:
+        """Compact conversation context for the prompt (summary + truncated recent turns)."""
+        parts = []
+        if self.summary_points:
+            parts.append(f"Earlier in this conversation:\n{self.summary}")
+        for m in self.recent:
+            who = "Student" if m["role"] == "user" else "Assistant"
+            content = " ".join(m.get("content", "").split())
+            if len(content) > max_turn_chars:
+                content = content[:max_turn_chars] + "…"
+            parts.append(f"{who}: {content}")
+        return "\n".join(parts) if parts else "(new conversation)"
+
+    def last_user_question(self) -> Optional[str]:
+        for m in reversed(self.recent):
+            if m.get("role") == "user":
+                return m.get("content", "")
+        return None
+
+    # ----- follow-up handling -----
+    def is_follow_up(self, query: str) -> bool:
+        """
+        Only questions with a reference marker ("it", "the second module", "what about ...")
+        lean on earlier turns. Short questions such as "What is the duration?" are complete
+        on their own: rewriting them would pull the previous topic into retrieval and into
+        the answer / retrieval cache keys.
+        """
+        if self.last_user_question() is None and not self.summary_points:
+            return False
+        return bool(FOLLOW_UP_PATTERN.search(query)) or refers_back(query)
+
+    def standalone_query(self, query: str) -> str:
+        """
+        Rewrites a follow-up into a standalone retrieval query by carrying over the key terms
+        of the previous question. Self-contained questions are returned unchanged.
+        """
+        if not self.is_follow_up(query):
+            return query
+        previous = self.last_user_question()
+        if previous is None and self.summary_points:
+            previous = self.summary_points[-1]
+        carried = [t for t in key_terms(previous or "") if t.lower() not in query.lower()]
+        return f"{query} ({' '.join(carried)})" if carried else query
+
+
+REWRITE_PROMPT = (
+    "Rewrite the student's latest question as a standalone search query about the course, "
+    "using the conversation only to resolve references. Reply with the query only.\n\n"
+    "{history}\n\nLatest question: {question}\nStandalone query:"
+)
+
+
+def llm_standalone_query(llm, memory: ConversationMemory, query: str) -> str:
+    """Optional LLM rewrite: sends only the bounded memory, falls back to the local rewrite."""
+    if not memory.is_follow_up(query):
+        return query
+    try:
+        response = llm.invoke(REWRITE_PROMPT.format(history=memory.render(), question=query))
+        rewritten = (response.content if hasattr(response, "content") else str(response)).strip()
+        return rewritten.splitlines()[0] if rewritten else memory.standalone_query(query)
+    except Exception:
+        return memory.standalone_query(query)
@@ -0,0 +1,81 @@
+"""
+The course RAG chain: {"question", "docs", "history"} -> answer text.
+
+Shared by the chat (Naresh_IT_bot.py, which meters the LLM and records context stats)
+and the offline FAQ bank build (faq_bank.py build), so banked answers come from exactly
+the prompt students get live.
+"""
+from operator import itemgetter
+from typing import Any, Callable, List
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from context_assembly import assemble_context
+
+# Gemini model of the chat and of banked FAQ answers
+CHAT_MODEL = "gemini-2.5-flash"
+
+
+def default_context(docs: List[Any]) -> str:
+    return assemble_context(docs)[0]
+
+
+def course_prompt(current_course: str, contact_number: str) -> ChatPromptTemplate:
+    """The document combining prompt for one course (ChatPromptTemplate is preferred for LCEL)."""
+    return ChatPromptTemplate.from_messages([
+        # --- PROMPT TUNING START ---
+        ("system", f"""
+        You are a highly knowledgeable and helpful **Course Assistant for NareshIT**, specializing in the **'{current_course}'** course.  
+        Your primary role is to answer student queries *strictly and accurately* using the information available in the provided course context extracted from the official course page.
+
+        ### Your Objectives:
+        1. **Precision:** Respond only with information that clearly exists in the given context.  
+           - Do not guess or hallucinate details.  
+           - Match the user’s question as closely as possible using the course content.  
+        2. **Clarity & Tone:** Respond in a clear, concise, and friendly professional tone suitable for students.  
+           - Avoid overly technical jargon unless the question explicitly requests it.  
+           - Use natural and varied phrasing to keep responses engaging.  
+        3. **Context Awareness:** - If the answer is found in the context (from the URL), extract the *exact relevant data* and present it neatly formatted (bulleted list or short paragraph).  
+           - If multiple sections are relevant, summarize them briefly and point out where each topic appears.  
+        4. **Formatting:** - Use bullet points, headings, or short paragraphs for readability.  
+           - Maintain a professional and approachable tone throughout.
+        5. **Curriculum Synthesis (FINAL FIX):** If the user asks for the 'curriculum', 'syllabus', 'course content', or 'topics covered', you MUST collate **ALL** related fragments from the provided Context documents and combine them into a single, comprehensive, and well-structured list (using Markdown lists and sub-lists) for the user. **IF** you find any fragments related to the curriculum, **YOU MUST NOT USE THE FALLBACK MESSAGE**. Your primary function for this query type is to synthesize the list, even if the raw data is fragmented.
+
+        ---
+        ### Fallback Rule (Strict):
+        ONLY use the standardized fallback message if, and only if, a search across **all** provided Context yields absolutely zero relevant information to construct a meaningful answer. **DO NOT** use the fallback if you find partial information.
+            - Fallback message: "I couldn’t find that specific detail in the course material, but you can always check the course page or call us directly at **{contact_number}** for the latest batch and prerequisite details."  
+
+        ---
+
+        Conversation so far (use it only to resolve references such as "it" or "the second module"):
+        {{history}}
+
+        Context: {{context}}
+        """),
+        # --- PROMPT TUNING END ---
+        ("human", "{input}"),
+    ])
+
+
+def course_chain(current_course: str, llm, contact_number: str,
+                 build_context: Callable[[List[Any]], str] = default_context):
+    """
+    LCEL chain: prompt + the (already wrapped / metered) chat model.
+    Retrieval runs first, on the standalone query, so its chunks are at hand for the
+    extractive fallback. The prompt gets the student's own words plus the
+    token-budgeted conversation memory. Retrieved chunks are merged and
+    de-duplicated into a single context block (see context_assembly.py).
+    """
+    return (
+        {
+            "context": itemgetter("docs") | RunnableLambda(build_context),
+            "input": itemgetter("question"),
+            "history": itemgetter("history"),
+        }
+        | course_prompt(current_course, contact_number)
+        | llm
+        | StrOutputParser()
+    )
@@ -0,0 +1,372 @@
+"""
+Course page ingestion for the NareshIT Course Assistant.
+
+Fetches a course page, strips site chrome (navigation, menus, footers,
+promos for other courses) and returns the course body as one Document per
+heading section, so only real course content is embedded and retrieved.
+
+Run directly to print the chunk-count reduction for every course:
+
+    python course_content.py
+"""
+import copy
+import json
+import logging
+import os
+import re
+from typing import List, Dict, Any, Optional
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+from langchain_core.documents import Document
+from langchain_community.document_loaders import WebBaseLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from curriculum import extract_curriculum, save_curriculum
+
+logger = logging.getLogger(__name__)
+
+
+# ===== Course Catalogue =====
+COURSE_OPTIONS: Dict[str, str] = {
+    "Full Stack Python Online Training": "https://nareshit.com/courses/full-stack-python-online-training",
+    "Full Stack Data Science & AI": "https://nareshit.com/courses/full-stack-data-science-ai-online-training",
+    "Full Stack Software Testing": "https://nareshit.com/courses/full-stack-software-testing-online-training",
+    "UI Full Stack Web Development With React": "https://nareshit.com/courses/ui-full-stack-web-development-with-react-online-training",
+    "Full Stack Dot Net Core": "https://nareshit.com/courses/full-stack-dot-net-core-online-training",
+    "Full Stack Java": "https://nareshit.com/courses/full-stack-java-online-training",
+    "Spring Boot MicroServices": "https://nareshit.com/courses/spring-boot-microservices-online-training",
+    "Django": "https://nareshit.com/courses/django-online-training",
+    "Tableau": "https://nareshit.com/courses/tableau-online-training",
+    "Power BI": "https://nareshit.com/courses/power-bi-online-training",
+    "MySQL": "https://nareshit.com/courses/mysql-online-training",
+}
+
+# Syllabus / curriculum sub-pages ingested together with a course page: course url -> urls
+COURSE_PAGES: Dict[str, List[str]] = {}
+
+# COURSE_CATALOG=path/to/catalog.json replaces the built-in catalogue, e.g. with the output
+# of course_crawler.py or locally served pages for load tests. Entries are either
+# "Course name": "url" or "Course name": {"url": "...", "pages": ["sub-page url", ...]}
+COURSE_CATALOG = os.getenv("COURSE_CATALOG", "").strip()
+if COURSE_CATALOG:
+    with open(COURSE_CATALOG, encoding="utf-8") as _f:
+        _catalog = json.load(_f)
+    COURSE_OPTIONS = {}
+    for _name, _entry in _catalog.items():
+        if isinstance(_entry, dict):
+            COURSE_OPTIONS[str(_name)] = str(_entry["url"])
+            COURSE_PAGES[str(_entry["url"])] = [str(u) for u in _entry.get("pages") or []]
+        else:
+            COURSE_OPTIONS[str(_name)] = str(_entry)
+
+# Chunking parameters used for every course index. Defaults keep the original
+# 1500/350 recursive split; pick better values with bench_chunking.py and set them via env.
+CHUNK_MODES = ("recursive", "section")
+CHUNK_MODE = os.getenv("CHUNK_MODE", "recursive").strip()
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1500"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "350"))
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+# ===== Boilerplate Removal =====
+# Elements that never carry course content
+CHROME_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "form",
+               "nav", "aside", "select", "input"]
+# <header> / <footer> are page chrome only outside the content: inside <main>, <article>
+# or <section> they hold section titles and notes
+PAGE_CHROME_TAGS = ["header", "footer"]
+CONTENT_TAGS = ["main", "article", "section"]
+
+# class / id tokens the site uses for menus, banners and other-course promos. A token is
+# chrome when it *starts* with one of these words (optionally after site-/main-/page-/top-),
+# so "site-header" and "footer-links" go but Bootstrap's "accordion-header" / "card-header"
+# (FAQ questions, course cards' titles) stay
+CHROME_PATTERN = re.compile(
+    r"^(site|main|page|top|global)?[-_]?(nav|navbar|navigation|menu|mega-?menu|header|footer|breadcrumbs?|"
+    r"sidebar|cookie|popup|modal|newsletter|social|share|subscribe|banner|offcanvas|"
+    r"related|recommended|popular|trending|other-courses?|course-card|"
+    r"testimonials?|enquiry|enquire|whatsapp|chat-?widget)([-_].*)?$",
+    re.IGNORECASE,
+)
+
+HEADING_TAGS = ["h1", "h2", "h3", "h4"]
+BLOCK_TAGS = ["p", "li", "td", "th", "dt", "dd", "pre", "blockquote", "summary"]
+
+# Heading keywords used to tag each section with a coarse type
+SECTION_TYPES = [
+    ("curriculum", ("curriculum", "syllabus", "course content", "modules", "topics", "module")),
+    ("faq", ("faq", "frequently asked", "questions")),
+    ("overview", ("overview", "about", "introduction", "highlights", "why", "objectives")),
+    ("prerequisites", ("prerequisite", "eligibility", "who can", "who should")),
+    ("schedule", ("batch", "schedule", "duration", "timing", "mode")),
+]
+
+# Blocks whose text is mostly links (menus, tag clouds) are dropped
+MAX_LINK_DENSITY = 0.5
+MIN_BLOCK_CHARS = 3
+MIN_REPEAT_CHARS = 40
+
+
+def _is_chrome(el: Tag) -> bool:
+    """True if the element's class or id marks it as site chrome."""
+    attrs = el.attrs or {}
+    if attrs.get("role") in ("navigation", "banner", "contentinfo", "dialog"):
+        return True
+    names = list(attrs.get("class") or []) + (attrs.get("id") or "").split()
+    return any(CHROME_PATTERN.match(name) for name in names)
+
+
+def _link_density(el: Tag) -> float:
+    text_len = len(el.get_text(" ", strip=True))
+    if not text_len:
+        return 0.0
+    link_len = sum(len(a.get_text(" ", strip=True)) for a in el.find_all("a"))
+    return link_len / text_len
+
+
+def _own_text(el: Tag) -> str:
+    """Text of a block excluding nested blocks/headings, which are emitted on their own."""
+    parts = []
+    for child in el.children:
+        if isinstance(child, NavigableString):
+            parts.append(str(child))
+        elif isinstance(child, Tag) and child.name not in BLOCK_TAGS + HEADING_TAGS:
+            if child.find(BLOCK_TAGS + HEADING_TAGS):
+                parts.append(_own_text(child))
+            else:
+                parts.append(child.get_text(" "))
+    return " ".join(" ".join(parts).split())
+
+
+def strip_site_chrome(soup: BeautifulSoup) -> Tag:
+    """Removes site chrome in place and returns the element holding the course body."""
+    for el in soup.find_all(CHROME_TAGS):
+        el.decompose()
+    for el in soup.find_all(PAGE_CHROME_TAGS):
+        if not el.decomposed and el.find_parent(CONTENT_TAGS) is None:
+            el.decompose()
+    # Collect first, then decompose, so we never touch already-removed children
+    for el in [el for el in soup.find_all(True) if _is_chrome(el)]:
+        if not el.decomposed:
+            el.decompose()
+
+    root = soup.find("main") or soup.find("article") or soup.body or soup
+    return root
+
+
+def section_type_for(heading: str) -> str:
+    """Maps a section heading to overview / curriculum / faq / ... (or 'other')."""
+    lowered = heading.lower()
+    for section_type, keywords in SECTION_TYPES:
+        if any(k in lowered for k in keywords):
+            return section_type
+    return "other"
+
+
+def extract_course_sections(soup: BeautifulSoup, url: str) -> List[Document]:
+    """
+    Extracts the course body from a parsed page as one Document per heading section.
+    Each Document carries the heading trail and section type as metadata.
+    """
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    root = strip_site_chrome(soup)
+
+    sections: List[Document] = []
+    trail: List[tuple[int, str]] = []  # current (level, heading) path, h1 > h2 > ...
+    lines: List[str] = []
+    seen_blocks = set()
+
+    def flush():
+        text = "\n".join(lines).strip()
+        if text:
+            headings = [h for _, h in trail]
+            heading = headings[-1] if headings else title
+            sections.append(Document(
+                page_content=text,
+                metadata={
+                    "source": url,
+                    "title": title,
+                    "heading": heading,
+                    "heading_path": " > ".join(headings),
+                    "section_type": section_type_for(" ".join(headings[-2:]) or heading),
+                    "section_index": len(sections),
+                },
+            ))
+        lines.clear()
+
+    for el in root.find_all(HEADING_TAGS + BLOCK_TAGS):
+        if el.name in HEADING_TAGS:
+            heading = el.get_text(" ", strip=True)
+            if not heading:
+                continue
+            flush()
+            level = int(el.name[1])
+            while trail and trail[-1][0] >= level:
+                trail.pop()
+            trail.append((level, heading))
+            continue
+
+        # Nested blocks (e.g. a sub-list inside a module <li>) are emitted separately
+        text = _own_text(el)
+        if len(text) < MIN_BLOCK_CHARS or _link_density(el) > MAX_LINK_DENSITY:
+            continue
+        # The same paragraph repeated on a page (sticky CTAs, duplicated promos) is kept
+        # once; short list labels like "Introduction" legitimately repeat across modules
+        if len(text) >= MIN_REPEAT_CHARS:
+            if text in seen_blocks:
+                continue
+            seen_blocks.add(text)
+        if el.name == "li":
+            # Keep list nesting so module > topic structure survives extraction
+            depth = len(el.find_parents("li"))
+            text = "  " * depth + f"- {text}"
+        lines.append(text)
+
+    flush()
+    return sections
+
+
+# ===== Splitting =====
+def get_splitter(chunk_size: int = None, chunk_overlap: int = None) -> RecursiveCharacterTextSplitter:
+    # start_index (offset of the chunk inside its section) lets context assembly merge neighbours
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size or CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap,
+        separators=SEPARATORS,
+        add_start_index=True,
+    )
+
+
+def split_by_section(sections: List[Document], chunk_size: int = None, chunk_overlap: int = None) -> List[Document]:
+    """
+    Heading-aligned splitting: chunk boundaries follow section boundaries.
+    Consecutive small sections under the same parent heading are packed together up to
+    chunk_size; sections larger than chunk_size are split recursively inside the section.
+    Each chunk is prefixed with its heading path so it stays self-describing.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    chunk_overlap = CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+    chunks: List[Document] = []
+    pending: List[Document] = []
+
+    def parent(doc: Document) -> str:
+        return doc.metadata.get("heading_path", "").rsplit(" > ", 1)[0]
+
+    def emit():
+        if not pending:
+            return
+        first = pending[0]
+        body = "\n\n".join(
+            f"{d.metadata.get('heading_path') or d.metadata.get('heading', '')}\n{d.page_content}".strip()
+            for d in pending
+        )
+        metadata = dict(first.metadata)
+        if len(pending) > 1:
+            metadata["heading"] = parent(first) or first.metadata.get("heading", "")
+            # Every packed section's heading line, so context assembly can strip them all
+            metadata["heading_paths"] = [d.metadata.get("heading_path") or d.metadata.get("heading", "")
+                                         for d in pending]
+        metadata["start_index"] = 0
+        chunks.append(Document(page_content=body, metadata=metadata))
+        pending.clear()
+
+    for section in sections:
+        header = section.metadata.get("heading_path") or section.metadata.get("heading", "")
+        size = len(header) + 1 + len(section.page_content)
+        if size > chunk_size:
+            emit()
+            # The heading line is prefixed to every piece, so the pieces get what is left of chunk_size
+            body_size = max(chunk_size - len(header) - 1, 1)
+            splitter = get_splitter(body_size, min(chunk_overlap, body_size // 2))
+            offset = 0
+            for piece in splitter.split_text(section.page_content):
+                start = section.page_content.find(piece, offset)
+                offset = max(start, offset) + 1
+                metadata = {**section.metadata, "start_index": start}
+                chunks.append(Document(page_content=f"{header}\n{piece}".strip(), metadata=metadata))
+            continue
+        packed = sum(len(d.page_content) + len(d.metadata.get("heading_path", "")) + 3 for d in pending)
+        if pending and (parent(pending[0]) != parent(section) or packed + size > chunk_size):
+            emit()
+        pending.append(section)
+    emit()
+    return chunks
+
+
+def split_sections(sections: List[Document], mode: str = None,
+                   chunk_size: int = None, chunk_overlap: int = None) -> List[Document]:
+    """Splits extracted sections with the given splitter mode ('recursive' or 'section')."""
+    mode = mode or CHUNK_MODE
+    if mode == "section":
+        return split_by_section(sections, chunk_size, chunk_overlap)
+    if mode == "recursive":
+        return get_splitter(chunk_size, chunk_overlap).split_documents(sections)
+    raise ValueError(f"Unknown chunk mode: {mode!r} (expected one of {CHUNK_MODES})")
+
+
+def fetch_course_soup(url: str) -> BeautifulSoup:
+    """Fetches and parses a course page using the same loader (headers, SSL) as before."""
+    return WebBaseLoader(url).scrape()
+
+
+def load_course_chunks(url: str, soup: Optional[BeautifulSoup] = None, mode: str = None,
+                       chunk_size: int = None, chunk_overlap: int = None, course: str = "",
+                       store_curriculum: bool = False,
+                       subpages: Optional[List[str]] = None) -> tuple[List[Document], Dict[str, Any]]:
+    """
+    Loads a course page, extracts its body sections and splits them into chunks.
+    Returns (chunks, stats) where stats compares against splitting the raw page text.
+    A pre-fetched soup can be passed in; it is copied, never modified.
+    Sections of the given sub-pages (e.g. COURSE_PAGES[url]) are added after the page's own;
+    a sub-page that fails to load is logged and skipped.
+    With store_curriculum=True the curriculum tree is extracted once and saved next to the index.
+    """
+    soup = copy.copy(soup) if soup is not None else fetch_course_soup(url)
+    pages = [(url, soup)]
+    for subpage in subpages or []:
+        try:
+            pages.append((subpage, fetch_course_soup(subpage)))
+        except Exception as err:
+            logger.warning("Skipping sub-page %s of %s: %s", subpage, url, err)
+
+    # Baseline: what the raw WebBaseLoader text would have produced
+    raw_text = "\n".join(page_soup.get_text() for _, page_soup in pages)
+    raw_chunks = get_splitter(chunk_size, chunk_overlap).split_documents(
+        [Document(page_content=raw_text, metadata={"source": url})]
+    )
+
+    sections = [section for page_url, page_soup in pages for section in extract_course_sections(page_soup, page_url)]
+    chunks = split_sections(sections, mode, chunk_size, chunk_overlap)
+
+    stats = {
+        "url": url,
+        "mode": mode or CHUNK_MODE,
+        "pages": len(pages),
+        "sections": len(sections),
+        "raw_chars": len(raw_text),
+        "body_chars": sum(len(s.page_content) for s in sections),
+        "raw_chunks": len(raw_chunks),
+        "chunks": len(chunks),
+        "chunk_chars": sum(len(c.page_content) for c in chunks),
+    }
+    if store_curriculum:
+        curriculum = extract_curriculum(sections, url, course)
+        save_curriculum(url, curriculum)
+        stats["curriculum_modules"] = len(curriculum["modules"])
+    stats["chunk_reduction_pct"] = (
+        round(100.0 * (1 - stats["chunks"] / stats["raw_chunks"]), 1) if stats["raw_chunks"] else 0.0
+    )
+    logger.info("Ingested %s: %d -> %d chunks (%.1f%% fewer)",
+                url, stats["raw_chunks"], stats["chunks"], stats["chunk_reduction_pct"])
+    return chunks, stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    print(f"{'Course':45} {'raw':>6} {'body':>6} {'saved':>7}")
+    for name, course_url in COURSE_OPTIONS.items():
+        try:
+            _, s = load_course_chunks(course_url)
+            print(f"{name:45} {s['raw_chunks']:>6} {s['chunks']:>6} {s['chunk_reduction_pct']:>6}%")
+        except Exception as err:
+            print(f"{name:45} failed: {err}")
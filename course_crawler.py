@@ -0,0 +1,444 @@
+"""
+Course catalogue crawler.
+
+The course list used to be a hand-maintained dict with one page per course. This
+crawler discovers course pages from the site's sitemap(s) and catalogue page, plus the
+syllabus / curriculum sub-pages each course page links to, and writes a catalogue JSON
+that the app ingests through COURSE_CATALOG:
+
+    {"Django": {"url": "https://.../courses/django-online-training",
+                "pages": ["https://.../courses/django-online-training/syllabus"]}, ...}
+
+Politeness and scale:
+    robots.txt      honoured per host (Disallow rules, Crawl-delay, Sitemap lines)
+    rate limits     one request at a time per host, at least CRAWL_HOST_DELAY seconds
+                    apart (or the robots Crawl-delay if longer); CRAWL_CONCURRENCY
+                    requests in flight across hosts
+    retries         429 / 5xx / network errors back off exponentially (Retry-After honoured)
+    de-duplication  URLs are normalized (scheme/host case, default ports, fragments,
+                    tracking parameters, trailing slashes) before they are queued
+    resumable       frontier, visited pages and their ETag / Last-Modified are saved to
+                    CRAWL_STATE every few pages; an interrupted crawl continues where it
+                    stopped, and --refresh re-crawls with conditional requests (304s reuse
+                    the stored result)
+
+    python course_crawler.py --start https://nareshit.com/courses --out course_catalog.json
+    COURSE_CATALOG=course_catalog.json streamlit run Naresh_IT_bot.py
+
+    python course_crawler.py --mirror ./site_mirror      # crawl a local mirror directory
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import urllib.robotparser
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+from xml.etree import ElementTree
+
+from bs4 import BeautifulSoup
+
+from index_store import INDEX_DIR
+
+logger = logging.getLogger(__name__)
+
+CRAWL_USER_AGENT = os.getenv("CRAWL_USER_AGENT", "NareshITCourseAssistantBot/1.0")
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+CRAWL_HOST_DELAY = float(os.getenv("CRAWL_HOST_DELAY", "1.0"))
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "500"))
+CRAWL_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT", "15"))
+CRAWL_MAX_RETRIES = int(os.getenv("CRAWL_MAX_RETRIES", "3"))
+CRAWL_STATE = os.getenv("CRAWL_STATE", os.path.join(INDEX_DIR, "crawl_state.json"))
+
+# Which paths are course pages, catalogue listings and syllabus sub-pages
+COURSE_PATH_PATTERN = re.compile(os.getenv("CRAWL_COURSE_PATTERN", r"^/courses/[^/]+$"))
+CATALOGUE_PATH_PATTERN = re.compile(os.getenv("CRAWL_CATALOGUE_PATTERN", r"^/(courses|all-courses|catalog(ue)?)$"))
+SUBPAGE_PATTERN = re.compile(r"(syllabus|curriculum|course-content|modules?|topics|brochure)", re.IGNORECASE)
+# Site suffixes stripped from page titles when naming a course
+TITLE_SUFFIX = re.compile(r"\s*[|\-–]\s*(naresh\s*i\s*technologies|nareshit|naresh it).*$", re.IGNORECASE)
+TRACKING_PARAMS = re.compile(r"^(utm_.*|gclid|fbclid|ref|source)$", re.IGNORECASE)
+
+KIND_SITEMAP = "sitemap"
+KIND_CATALOGUE = "catalogue"
+KIND_COURSE = "course"
+KIND_SUBPAGE = "subpage"
+
+SAVE_EVERY = 20
+RETRY_BASE_SECONDS = 1.0
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """Canonical form used for de-duplication; None for non-HTTP links."""
+    if base:
+        url = urljoin(base, url)
+    parts = urlparse(url.strip())
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if parts.port and not ((parts.scheme == "http" and parts.port == 80) or (parts.scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)))
+    return urlunparse((parts.scheme.lower(), host, path, "", query, ""))
+
+
+def host_of(url: str) -> str:
+    parts = urlparse(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def classify_url(url: str) -> Optional[str]:
+    path = urlparse(url).path
+    if COURSE_PATH_PATTERN.match(path):
+        return KIND_COURSE
+    if CATALOGUE_PATH_PATTERN.match(path):
+        return KIND_CATALOGUE
+    if path.endswith(".xml") and "sitemap" in path.lower():
+        return KIND_SITEMAP
+    return None
+
+
+def course_name(soup: BeautifulSoup, url: str) -> str:
+    heading = soup.find("h1")
+    name = heading.get_text(" ", strip=True) if heading else ""
+    if not name and soup.title:
+        name = TITLE_SUFFIX.sub("", soup.title.get_text(" ", strip=True))
+    if not name:
+        name = urlparse(url).path.rstrip("/").rsplit("/", 1)[-1].replace("-", " ").title()
+    return " ".join(name.split())
+
+
+# ===== Politeness =====
+class HostPolicy:
+    """robots.txt rules and the request pacing for one host."""
+
+    def __init__(self, host: str, robots: urllib.robotparser.RobotFileParser, delay: float):
+        self.host = host
+        self.robots = robots
+        robots_delay = robots.crawl_delay(CRAWL_USER_AGENT) if robots else None
+        self.delay = max(delay, float(robots_delay or 0))
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def allowed(self, url: str) -> bool:
+        return self.robots is None or self.robots.can_fetch(CRAWL_USER_AGENT, url)
+
+    def sitemaps(self) -> List[str]:
+        return list(self.robots.site_maps() or []) if self.robots else []
+
+    def __enter__(self):
+        # Held for the whole request: one request at a time per host, spaced by delay
+        self._lock.acquire()
+        pause = self._next - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        return self
+
+    def __exit__(self, *exc):
+        self._next = time.monotonic() + self.delay
+        self._lock.release()
+
+
+# ===== Resumable state =====
+class CrawlState:
+    """Frontier, visited pages (with validators and results) and the seen set, saved as JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.frontier: List[Tuple[str, str, str]] = []  # (url, kind, parent course url)
+        self.seen: set = set()
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.frontier = [tuple(item) for item in data.get("frontier", [])]
+        self.pages = data.get("pages", {})
+        self.seen = set(data.get("seen", [])) | set(self.pages)
+        logger.info("Resuming crawl: %d pages done, %d queued", len(self.pages), len(self.frontier))
+
+    def save(self, in_flight: List[Tuple[str, str, str]] = ()) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        data = {"frontier": list(in_flight) + self.frontier, "seen": sorted(self.seen), "pages": self.pages}
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".crawl_state.")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def enqueue(self, url: Optional[str], kind: str, parent: str = "") -> None:
+        if url and url not in self.seen:
+            self.seen.add(url)
+            self.frontier.append((url, kind, parent))
+
+    def reset_for_refresh(self) -> None:
+        """Re-crawl everything, keeping validators so unchanged pages come back as 304."""
+        self.frontier = []
+        self.seen = set()
+        for page in self.pages.values():
+            page["stale"] = True
+
+
+# ===== Crawler =====
+class CourseCrawler:
+    def __init__(self, start_urls: List[str], state_path: str = CRAWL_STATE, concurrency: int = CRAWL_CONCURRENCY,
+                 host_delay: float = CRAWL_HOST_DELAY, max_pages: int = CRAWL_MAX_PAGES, refresh: bool = False):
+        self.start_urls = [u for u in (normalize_url(s) for s in start_urls) if u]
+        self.start_hosts = {host_of(u) for u in self.start_urls}
+        self.state = CrawlState(state_path)
+        self.concurrency = max(1, concurrency)
+        self.host_delay = host_delay
+        self.max_pages = max_pages
+        self.hosts: Dict[str, HostPolicy] = {}
+        self._hosts_lock = threading.Lock()
+        self.fetched = 0
+        if refresh:
+            self.state.reset_for_refresh()
+
+    # ----- HTTP -----
+    def _request(self, url: str, headers: Dict[str, str]) -> Tuple[int, bytes, Dict[str, str]]:
+        request = urllib.request.Request(url, headers={"User-Agent": CRAWL_USER_AGENT, **headers})
+        try:
+            with urllib.request.urlopen(request, timeout=CRAWL_TIMEOUT) as response:
+                return response.status, response.read(), {k.lower(): v for k, v in response.headers.items()}
+        except urllib.error.HTTPError as err:
+            return err.code, b"", {k.lower(): v for k, v in (err.headers or {}).items()}
+
+    def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> Tuple[int, bytes, Dict[str, str]]:
+        """Polite GET with retries. Returns (status, body, lower-cased headers); status 0 = network failure."""
+        policy = self.policy(host_of(url))
+        headers = {}
+        if validators and validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators and validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        status, body, response_headers = 0, b"", {}
+        for attempt in range(CRAWL_MAX_RETRIES + 1):
+            with policy:
+                try:
+                    status, body, response_headers = self._request(url, headers)
+                except (urllib.error.URLError, OSError) as err:
+                    status, body, response_headers = 0, b"", {"error": str(err)}
+            if status not in (0, 429) and status < 500:
+                break
+            if attempt < CRAWL_MAX_RETRIES:
+                time.sleep(self._retry_delay(response_headers, attempt))
+        return status, body, response_headers
+
+    @staticmethod
+    def _retry_delay(headers: Dict[str, str], attempt: int) -> float:
+        retry_after = headers.get("retry-after", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+        if retry_after:
+            try:
+                return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+        return RETRY_BASE_SECONDS * (2 ** attempt)
+
+    def policy(self, host: str) -> HostPolicy:
+        with self._hosts_lock:
+            policy = self.hosts.get(host)
+            if policy is not None:
+                return policy
+            robots = urllib.robotparser.RobotFileParser(host + "/robots.txt")
+            try:
+                status, body, _ = self._request(host + "/robots.txt", {})
+                if status == 200:
+                    robots.parse(body.decode("utf-8", errors="replace").splitlines())
+                elif status in (401, 403):
+                    robots.disallow_all = True
+                else:
+                    robots = None  # no robots.txt: everything allowed
+            except (urllib.error.URLError, OSError):
+                robots = None
+            policy = self.hosts[host] = HostPolicy(host, robots, self.host_delay)
+            return policy
+
+    # ----- Crawl -----
+    def seed(self) -> None:
+        # State left by a crawl of another site is ignored, not resumed
+        self.state.frontier = [task for task in self.state.frontier if host_of(task[0]) in self.start_hosts]
+        if self.state.frontier:
+            return  # resuming
+        for start in self.start_urls:
+            policy = self.policy(host_of(start))
+            for sitemap in policy.sitemaps() or [host_of(start) + "/sitemap.xml"]:
+                self.state.enqueue(normalize_url(sitemap, start), KIND_SITEMAP)
+            self.state.enqueue(start, classify_url(start) or KIND_CATALOGUE)
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        self.seed()
+        in_flight: Dict[Future, Tuple[str, str, str]] = {}
+        recorded = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="crawl") as pool:
+            try:
+                while self.state.frontier or in_flight:
+                    while self.state.frontier and len(in_flight) < self.concurrency and self.fetched < self.max_pages:
+                        task = self.state.frontier.pop(0)
+                        in_flight[pool.submit(self._visit, *task)] = task
+                        self.fetched += 1
+                    if not in_flight:
+                        break  # page budget used up; the rest stays queued for the next run
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, kind, parent = in_flight.pop(future)
+                        self._record(url, kind, parent, future.result())
+                        recorded += 1
+                        if recorded % SAVE_EVERY == 0:
+                            self.state.save(list(in_flight.values()))
+            finally:
+                self.state.save(list(in_flight.values()))
+        return self.catalogue()
+
+    def _visit(self, url: str, kind: str, parent: str) -> Dict[str, Any]:
+        """Runs on a worker: fetches and parses one page. Never touches shared state."""
+        previous = self.state.pages.get(url, {})
+        if not self.policy(host_of(url)).allowed(url):
+            return {"kind": kind, "status": "disallowed"}
+        status, body, headers = self.fetch(url, previous if previous.get("stale") else None)
+        if status == 304 and previous:
+            return dict(previous, stale=False)
+        if status != 200:
+            return {"kind": kind, "status": status or headers.get("error", "failed")}
+        result: Dict[str, Any] = {
+            "kind": kind, "status": 200, "parent": parent,
+            "etag": headers.get("etag", ""), "last_modified": headers.get("last-modified", ""),
+        }
+        if kind == KIND_SITEMAP:
+            result["links"] = self._sitemap_links(body, url)
+        else:
+            soup = BeautifulSoup(body, "html.parser")
+            result["links"] = sorted({u for u in (normalize_url(a["href"], url) for a in soup.find_all("a", href=True)) if u})
+            if kind == KIND_COURSE:
+                result["name"] = course_name(soup, url)
+        return result
+
+    @staticmethod
+    def _sitemap_links(body: bytes, sitemap_url: str) -> List[str]:
+        """<loc> entries of a urlset or sitemap index (relative entries resolved against the sitemap)."""
+        try:
+            root = ElementTree.fromstring(body)
+        except ElementTree.ParseError:
+            return []
+        locs = (el.text or "" for el in root.iter() if el.tag.endswith("loc"))
+        return [u for u in (normalize_url(loc, sitemap_url) for loc in locs) if u]
+
+    def _record(self, url: str, kind: str, parent: str, result: Dict[str, Any]) -> None:
+        """Main thread: stores the page result and queues the links it leads to."""
+        self.state.pages[url] = result
+        if result.get("status") != 200:
+            logger.info("Skipped %s (%s)", url, result.get("status"))
+            return
+        own_host = host_of(url)
+        for link in result.get("links", []):
+            if host_of(link) != own_host:
+                continue
+            link_kind = classify_url(link)
+            if kind in (KIND_SITEMAP, KIND_CATALOGUE) and link_kind in (KIND_COURSE, KIND_CATALOGUE, KIND_SITEMAP):
+                self.state.enqueue(link, link_kind)
+            elif kind == KIND_COURSE and link_kind is None and self._is_subpage(url, link):
+                self.state.enqueue(link, KIND_SUBPAGE, url)
+        logger.info("Crawled %s %s (%d links)", kind, url, len(result.get("links", [])))
+
+    @staticmethod
+    def _is_subpage(course_url: str, link: str) -> bool:
+        course_path = urlparse(course_url).path
+        link_path = urlparse(link).path
+        return link_path.startswith(course_path + "/") or bool(
+            SUBPAGE_PATTERN.search(link_path) and course_path.rsplit("/", 1)[-1] in link_path)
+
+    def catalogue(self) -> Dict[str, Dict[str, Any]]:
+        """{course name: {"url": course page, "pages": [syllabus sub-pages]}} from the crawled pages."""
+        courses: Dict[str, Dict[str, Any]] = {}
+        subpages: Dict[str, List[str]] = {}
+        pages = {url: page for url, page in self.state.pages.items() if host_of(url) in self.start_hosts}
+        for url, page in pages.items():
+            if page.get("status") == 200 and page.get("kind") == KIND_SUBPAGE:
+                subpages.setdefault(page.get("parent", ""), []).append(url)
+        for url, page in sorted(pages.items()):
+            if page.get("status") != 200 or page.get("kind") != KIND_COURSE:
+                continue
+            name = page.get("name") or url
+            if name in courses:
+                name = f"{name} ({urlparse(url).path.rsplit('/', 1)[-1]})"
+            courses[name] = {"url": url, "pages": sorted(subpages.get(url, []))}
+        return courses
+
+
+# ===== Local mirror =====
+def serve_directory(directory: str, port: int = 0):
+    """Serves a local site mirror on localhost (a free port by default). Returns (server, base url)."""
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def send_head(self):
+            # /courses/django -> courses/django.html (mirrors keep extensionless URLs)
+            path = self.translate_path(self.path).rstrip("/")
+            if os.path.isfile(path + ".html"):
+                self.path = self.path.split("?", 1)[0].rstrip("/") + ".html"
+            return super().send_head()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", action="append", default=[], help="catalogue or course URL (repeatable)")
+    parser.add_argument("--mirror", help="serve this local mirror directory and crawl it")
+    parser.add_argument("--port", type=int, default=0,
+                        help="port for --mirror (keep it fixed to resume a mirror crawl)")
+    parser.add_argument("--out", default="course_catalog.json")
+    parser.add_argument("--state", default=CRAWL_STATE)
+    parser.add_argument("--refresh", action="store_true", help="re-crawl with conditional requests")
+    parser.add_argument("--max-pages", type=int, default=CRAWL_MAX_PAGES)
+    parser.add_argument("--concurrency", type=int, default=CRAWL_CONCURRENCY)
+    parser.add_argument("--delay", type=float, default=CRAWL_HOST_DELAY, help="seconds between requests per host")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+
+    starts = list(args.start)
+    if args.mirror:
+        server, base = serve_directory(args.mirror, args.port)
+        starts = starts or [base + "/courses"]
+    if not starts:
+        parser.error("--start or --mirror is required")
+
+    crawler = CourseCrawler(starts, state_path=args.state, concurrency=args.concurrency,
+                            host_delay=args.delay, max_pages=args.max_pages, refresh=args.refresh)
+    started = time.perf_counter()
+    catalogue = crawler.run()
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(catalogue, f, ensure_ascii=False, indent=2)
+    pages = sum(len(c["pages"]) for c in catalogue.values())
+    print(f"{len(catalogue)} courses, {pages} sub-pages, {crawler.fetched} requests "
+          f"in {time.perf_counter() - started:.1f}s -> {args.out}")
+    if crawler.state.frontier:
+        print(f"{len(crawler.state.frontier)} URLs still queued (--max-pages); run again to resume")
+
+
+if __name__ == "__main__":
+    main()
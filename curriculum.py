@@ -0,0 +1,204 @@
+"""
+Structured curriculum data for each course.
+
+At ingest time the curriculum sections of a course page are turned into a tree
+(modules -> topics, plus the course duration) and stored next to the course index
+as curriculum.json. Curriculum questions are then answered from this tree without
+asking Gemini to rebuild the syllabus from retrieved fragments.
+
+The data is also served as a small read-only JSON API:
+
+    python curriculum.py serve --port 8502
+    GET /courses                       -> [{"name", "url", "has_curriculum"}]
+    GET /curriculum?course=Django      -> curriculum tree (or 404)
+"""
+import json
+import re
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from langchain_core.documents import Document
+
+from index_store import read_json_artifact, write_json_artifact
+
+CURRICULUM_FILE = "curriculum.json"
+
+# Queries that ask for the full syllabus rather than one detail
+CURRICULUM_QUERY_PATTERN = re.compile(
+    r"\b(curriculum|syllabus|course content|course contents|topics covered|what topics|"
+    r"which topics|modules|course outline|what will i learn|what is covered)\b",
+    re.IGNORECASE,
+)
+
+DURATION_PATTERN = re.compile(
+    r"(?:duration|course length|course period)\s*[:\-–]?\s*"
+    r"(\d+(?:\s*(?:-|to|–)\s*\d+)?\s*\+?\s*(?:days|weeks|months|hours|hrs))",
+    re.IGNORECASE,
+)
+
+# Paragraph lines longer than this are prose, not topic names
+MAX_TOPIC_CHARS = 160
+
+# Paragraph lines that still title a module: "Module 3: ORM", "Week 2 - Views", "Advanced Topics:"
+MODULE_HEADING_PATTERN = re.compile(
+    r"^(?:(?:module|unit|chapter|week|day|part|phase|level|lesson)\s*[-–:.]?\s*\d+\b.*|[^.!?]{1,80}:)$",
+    re.IGNORECASE,
+)
+
+
+def _parse_lines(text: str) -> List[tuple[int, str, bool]]:
+    """Returns (depth, text, is_list_item) for every non-empty line of a section."""
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        stripped = line.lstrip(" ")
+        depth = (len(line) - len(stripped)) // 2
+        if stripped.startswith("- "):
+            items.append((depth, stripped[2:].strip(), True))
+        else:
+            items.append((depth, stripped.strip(), False))
+    return items
+
+
+def _is_module_heading(text: str) -> bool:
+    return len(text) <= MAX_TOPIC_CHARS and bool(MODULE_HEADING_PATTERN.match(text))
+
+
+def extract_curriculum(sections: List[Document], url: str, course: str = "") -> Dict[str, Any]:
+    """
+    Builds the curriculum tree from extracted course sections.
+    Nested lists become module -> topics; otherwise each curriculum section heading is a
+    module and its list items are the topics. Modules are list items or heading-like lines
+    ("Module 3: ORM"), never the prose around the list.
+    """
+    modules: List[Dict[str, Any]] = []
+    for section in sections:
+        if section.metadata.get("section_type") != "curriculum":
+            continue
+        items = _parse_lines(section.page_content)
+        heading = section.metadata.get("heading", "") or "Curriculum"
+
+        if any(depth > 0 for depth, _, _ in items):
+            for depth, text, is_list in items:
+                if depth == 0:
+                    if not is_list and not _is_module_heading(text):
+                        continue
+                    modules.append({"title": text, "topics": []})
+                elif modules:
+                    modules[-1]["topics"].append(text)
+            continue
+
+        # Sections without any list carry their topics as short paragraphs
+        has_list = any(is_list for _, _, is_list in items)
+        topics = [text for _, text, is_list in items
+                  if is_list or (not has_list and len(text) <= MAX_TOPIC_CHARS)]
+        if topics:
+            modules.append({"title": heading, "topics": topics})
+
+    duration = None
+    for section in sections:
+        match = DURATION_PATTERN.search(f"{section.metadata.get('heading', '')}: {section.page_content}")
+        if match:
+            duration = " ".join(match.group(1).split())
+            break
+
+    return {
+        "course": course or (sections[0].metadata.get("title", "") if sections else ""),
+        "url": url,
+        "duration": duration,
+        "modules": modules,
+        "topic_count": sum(len(m["topics"]) for m in modules),
+        "extracted_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def save_curriculum(url: str, curriculum: Dict[str, Any]) -> str:
+    return write_json_artifact(url, CURRICULUM_FILE, curriculum)
+
+
+def load_curriculum(url: str) -> Optional[Dict[str, Any]]:
+    """Returns the stored curriculum tree for a course, or None if it was never extracted."""
+    return read_json_artifact(url, CURRICULUM_FILE)
+
+
+def is_curriculum_query(query: str) -> bool:
+    return bool(CURRICULUM_QUERY_PATTERN.search(query or ""))
+
+
+def format_curriculum_markdown(curriculum: Dict[str, Any], course_name: str = "") -> str:
+    """Renders a curriculum tree as the Markdown list the assistant would otherwise generate."""
+    name = course_name or curriculum.get("course") or "this course"
+    lines = [f"### 📚 Curriculum — {name}", ""]
+    if curriculum.get("duration"):
+        lines += [f"**Duration:** {curriculum['duration']}", ""]
+    for i, module in enumerate(curriculum.get("modules", []), start=1):
+        lines.append(f"**{i}. {module['title']}**")
+        lines += [f"- {topic}" for topic in module.get("topics", [])]
+        lines.append("")
+    return "\n".join(lines).strip()
+
+
+# ===== JSON API =====
+def serve(host: str = "127.0.0.1", port: int = 8502) -> None:
+    """Serves stored curriculum data over HTTP (read-only, no scraping or LLM calls)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlparse, parse_qs
+
+    from course_content import COURSE_OPTIONS
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: Any) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "public, max-age=300")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path == "/courses":
+                self._send(200, [
+                    {"name": name, "url": url, "has_curriculum": load_curriculum(url) is not None}
+                    for name, url in COURSE_OPTIONS.items()
+                ])
+            elif parsed.path == "/curriculum":
+                name = parse_qs(parsed.query).get("course", [""])[0]
+                url = COURSE_OPTIONS.get(name)
+                data = load_curriculum(url) if url else None
+                if data is None:
+                    self._send(404, {"error": f"No curriculum stored for course {name!r}"})
+                else:
+                    self._send(200, data)
+            else:
+                self._send(404, {"error": "Use /courses or /curriculum?course=<name>"})
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Serving curriculum API on http://{host}:{port}")
+    ThreadingHTTPServer((host, port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract or serve structured curriculum data.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("extract", help="Scrape every course page and store its curriculum tree")
+    serve_parser = sub.add_parser("serve", help="Serve stored curriculum data as JSON")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port)
+    else:
+        from course_content import COURSE_OPTIONS, COURSE_PAGES, load_course_chunks
+
+        for course_name, course_url in COURSE_OPTIONS.items():
+            _, stats = load_course_chunks(course_url, course=course_name, store_curriculum=True,
+                                          subpages=COURSE_PAGES.get(course_url))
+            print(f"{course_name:45} {stats['curriculum_modules']:>3} modules")
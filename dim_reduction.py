@@ -0,0 +1,158 @@
+"""
+Optional embedding dimensionality reduction for course indexes.
+
+Every chunk vector is stored at the model's full dimension (768 for text-embedding-004).
+With EMBED_REDUCTION set, each course index is rebuilt right after its build as a FAISS
+IndexPreTransform: a transform fitted on that course's vectors followed by a flat index
+over the reduced vectors. Queries keep using full-dimension embeddings; the index applies
+the same transform to them, and the transform is serialized with the index (shared cache,
+mmap files), so nothing else has to know about it.
+
+    EMBED_REDUCTION=none        full dimension (default)
+    EMBED_REDUCTION=pca         PCA fitted per course. A course with n chunks needs at most
+                                n - 1 components: for L2 search that keeps the ranking exact,
+                                so smaller corpora are reduced further than EMBED_REDUCED_DIM.
+                                The projection matrix is stored too, so courses too small to
+                                save memory (about n < 400 at 768 -> 256) keep full dimension
+    EMBED_REDUCTION=truncate    first EMBED_REDUCED_DIM components, re-normalized: for
+                                Matryoshka-style models (text-embedding-004, bge-m3, ...)
+                                whose leading dimensions carry most of the signal
+    EMBED_REDUCED_DIM=256
+
+Compare memory, search latency and recall@k against full dimension with bench_dimensions.py.
+"""
+import logging
+import os
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REDUCTION_NONE = "none"
+REDUCTION_PCA = "pca"
+REDUCTION_TRUNCATE = "truncate"
+REDUCTIONS = (REDUCTION_NONE, REDUCTION_PCA, REDUCTION_TRUNCATE)
+
+EMBED_REDUCTION = os.getenv("EMBED_REDUCTION", REDUCTION_NONE).strip().lower()
+EMBED_REDUCED_DIM = int(os.getenv("EMBED_REDUCED_DIM", "256"))
+
+
+def reduction_label(method: str = EMBED_REDUCTION, dim: int = EMBED_REDUCED_DIM) -> str:
+    """'pca-256' / 'truncate-256'; '' without reduction (used in cache keys and index metadata)."""
+    if method not in REDUCTIONS:
+        raise ValueError(f"Unknown EMBED_REDUCTION: {method!r} (expected one of {REDUCTIONS})")
+    return "" if method == REDUCTION_NONE else f"{method}-{dim}"
+
+
+def output_dimension(method: str, dim: int, d_in: int, count: int) -> int:
+    if method == REDUCTION_PCA:
+        return max(1, min(dim, d_in, count - 1))
+    return max(1, min(dim, d_in))
+
+
+def reduced_index(vectors: np.ndarray, method: str, dim: int,
+                  metric: int = faiss.METRIC_L2) -> Optional[faiss.Index]:
+    """
+    Fits the reduction on the vectors and returns an IndexPreTransform holding them;
+    None when the method is 'none' or would not make the index smaller.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, d_in = vectors.shape
+    if method == REDUCTION_NONE or not count:
+        return None
+    if method == REDUCTION_PCA and metric != faiss.METRIC_L2:
+        # PCA centres the vectors, which shifts inner products by a per-chunk term
+        logger.warning("PCA reduction needs the L2 metric; keeping full dimension")
+        return None
+    d_out = output_dimension(method, dim, d_in, count)
+    # PCA also stores its d_out x d_in projection: it only pays off on larger corpora
+    extra = d_out * (d_in + 1) if method == REDUCTION_PCA else 0
+    if d_out >= d_in or count * d_out + extra >= count * d_in:
+        return None
+    index = faiss.IndexPreTransform(faiss.IndexFlat(d_out, metric))
+    if method == REDUCTION_PCA:
+        index.prepend_transform(faiss.PCAMatrix(d_in, d_out))
+    elif method == REDUCTION_TRUNCATE:
+        index.prepend_transform(faiss.NormalizationTransform(d_out, 2.0))
+        index.prepend_transform(faiss.RemapDimensionsTransform(d_in, d_out, False))
+    else:
+        raise ValueError(f"Unknown EMBED_REDUCTION: {method!r} (expected one of {REDUCTIONS})")
+    index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def reduce_index(vectordb, method: str = EMBED_REDUCTION, dim: int = EMBED_REDUCED_DIM):
+    """Replaces a built FAISS store's flat index with its reduced version (in place). Returns the store."""
+    index = vectordb.index
+    if method == REDUCTION_NONE or isinstance(index, faiss.IndexPreTransform) or not index.ntotal:
+        return vectordb
+    reduced = reduced_index(index.reconstruct_n(0, index.ntotal), method, dim, index.metric_type)
+    if reduced is None:
+        return vectordb
+    vectordb.index = reduced
+    logger.info("Reduced index (%s): %d -> %d dimensions, %d -> %d KB of vectors", method, index.d,
+                stored_dimension(reduced), index.ntotal * index.d * 4 // 1024,
+                index.ntotal * stored_dimension(reduced) * 4 // 1024)
+    return vectordb
+
+
+def stored_dimension(index) -> int:
+    """Dimension of the vectors the index actually holds."""
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index).d
+    return index.d
+
+
+def index_bytes(index) -> int:
+    """Stored vectors plus transform parameters, in bytes."""
+    total = index.ntotal * stored_dimension(index) * 4
+    if isinstance(index, faiss.IndexPreTransform):
+        for i in range(index.chain.size()):
+            transform = faiss.downcast_VectorTransform(index.chain.at(i))
+            if isinstance(transform, faiss.LinearTransform):
+                total += (transform.A.size() + transform.b.size()) * 4
+    return total
+
+
+def linear_map(index) -> Optional[Tuple[np.ndarray, np.ndarray, bool, faiss.Index]]:
+    """
+    (A, b, normalize, inner flat index) such that the index stores normalize(A x + b) for
+    each input x; None for a plain index. Used to write reduced indexes in the mmap format.
+    """
+    if not isinstance(index, faiss.IndexPreTransform):
+        return None
+    A: Optional[np.ndarray] = None
+    b: Optional[np.ndarray] = None
+    normalize = False
+    for i in range(index.chain.size()):
+        transform = faiss.downcast_VectorTransform(index.chain.at(i))
+        if normalize:
+            raise ValueError("Only a final normalization step is supported")
+        if isinstance(transform, faiss.NormalizationTransform):
+            normalize = True
+            continue
+        if isinstance(transform, faiss.LinearTransform):
+            step_A = faiss.vector_to_array(transform.A).reshape(transform.d_out, transform.d_in)
+            step_b = faiss.vector_to_array(transform.b) if transform.have_bias else np.zeros(transform.d_out, np.float32)
+        elif isinstance(transform, faiss.RemapDimensionsTransform):
+            step_A = np.zeros((transform.d_out, transform.d_in), dtype=np.float32)
+            for row, column in enumerate(faiss.vector_to_array(transform.map)):
+                if column >= 0:
+                    step_A[row, column] = 1.0
+            step_b = np.zeros(transform.d_out, np.float32)
+        else:
+            raise ValueError(f"Unsupported transform {type(transform).__name__}")
+        A, b = (step_A, step_b) if A is None else (step_A @ A, step_A @ b + step_b)
+    return A.astype(np.float32), b.astype(np.float32), normalize, faiss.downcast_index(index.index)
+
+
+def apply_linear_map(vectors: np.ndarray, A: np.ndarray, b: np.ndarray, normalize: bool) -> np.ndarray:
+    reduced = np.asarray(vectors, dtype=np.float32) @ A.T + b
+    if normalize:
+        norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+        reduced = reduced / np.where(norms > 0, norms, 1.0)
+    return reduced.astype(np.float32)
+
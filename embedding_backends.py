@@ -0,0 +1,123 @@
+"""
+Embedding backends.
+
+    EMBEDDING_BACKEND=google  (default) GoogleGenerativeAIEmbeddings, remote, text-embedding-004
+    EMBEDDING_BACKEND=local   sentence-transformers model loaded from disk, CPU only:
+                              LOCAL_EMBEDDING_MODEL_PATH=/models/bge-small-en-v1.5
+                              LOCAL_EMBEDDING_BATCH_SIZE=32
+                              LOCAL_EMBEDDING_THREADS=<cpu count>
+    EMBEDDING_BACKEND=standin hashed vectors with simulated latency, for load tests (standins.py)
+
+The local backend never touches the network (files are loaded with local_files_only),
+so query embedding costs a few milliseconds of CPU instead of a round trip and ingestion
+doesn't depend on API quota. Each course index records which backend, model and
+dimension built it (embedding.json next to the index), so vectors from different
+models are never mixed.
+"""
+import logging
+import os
+import threading
+from typing import List, Dict, Any
+
+from langchain_core.embeddings import Embeddings
+
+from index_store import read_json_artifact, write_json_artifact
+
+try:
+    from sentence_transformers import SentenceTransformer  # type: ignore
+except Exception:  # pragma: no cover
+    SentenceTransformer = None  # type: ignore
+
+try:
+    import torch  # type: ignore
+except Exception:  # pragma: no cover
+    torch = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "google").strip().lower()
+GOOGLE_EMBEDDING_MODEL = os.getenv("GOOGLE_EMBEDDING_MODEL", "text-embedding-004")
+LOCAL_EMBEDDING_MODEL_PATH = os.getenv("LOCAL_EMBEDDING_MODEL_PATH", "")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+
+EMBEDDING_META_FILE = "embedding.json"
+
+
+class LocalEmbeddings(Embeddings):
+    """CPU sentence-transformers model loaded from a local directory, with batched inference."""
+
+    def __init__(self, model_path: str = LOCAL_EMBEDDING_MODEL_PATH,
+                 batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE, threads: int = LOCAL_EMBEDDING_THREADS):
+        if SentenceTransformer is None:
+            raise RuntimeError("EMBEDDING_BACKEND=local requires the 'sentence-transformers' package")
+        if not model_path or not os.path.isdir(model_path):
+            raise RuntimeError(f"LOCAL_EMBEDDING_MODEL_PATH must point to a model directory (got {model_path!r})")
+        if torch is not None:
+            torch.set_num_threads(threads)  # intra-op parallelism for each batch
+        self.model_path = model_path
+        self.model = os.path.basename(os.path.normpath(model_path))
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model_path, device="cpu", local_files_only=True)
+        # One batch at a time: torch already uses all configured threads per batch
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            vectors = self._model.encode(
+                texts,
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+
+def embedding_identity(backend: str = EMBEDDING_BACKEND) -> str:
+    """'<backend>:<model>' without loading the model (used in cache keys and index metadata)."""
+    if backend == "local":
+        return f"local:{os.path.basename(os.path.normpath(LOCAL_EMBEDDING_MODEL_PATH)) or 'unset'}"
+    if backend == "standin":
+        from standins import StandInEmbeddings
+
+        return f"standin:{StandInEmbeddings.model}"
+    return f"{backend}:{GOOGLE_EMBEDDING_MODEL}"
+
+
+def create_embeddings(backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    if backend == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model=GOOGLE_EMBEDDING_MODEL)
+    if backend == "local":
+        return LocalEmbeddings()
+    if backend == "standin":
+        from standins import StandInEmbeddings
+
+        return StandInEmbeddings()
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend!r} (expected 'google', 'local' or 'standin')")
+
+
+def index_metadata(backend: str, dimension: int, reduction: str = "") -> Dict[str, Any]:
+    meta = {"backend": backend, "embedding": embedding_identity(backend), "dimension": dimension}
+    if reduction:
+        meta["reduction"] = reduction  # stored vectors are reduced (dim_reduction.py)
+    return meta
+
+
+def record_index_metadata(url: str, backend: str, dimension: int, reduction: str = "") -> Dict[str, Any]:
+    """Stores which backend/model/dimension (and reduction) built a course index; warns if it changed."""
+    meta = index_metadata(backend, dimension, reduction)
+    previous = read_json_artifact(url, EMBEDDING_META_FILE)
+    if previous and previous != meta:
+        logger.warning("Index for %s was built with %s, now %s", url, previous, meta)
+    if previous != meta:
+        write_json_artifact(url, EMBEDDING_META_FILE, meta)
+    return meta
@@ -0,0 +1,486 @@
+"""
+Pre-generated FAQ answer bank.
+
+Questions every course gets asked (prerequisites, duration, training modes, fees,
+certification, syllabus) used to go through retrieval + Gemini (+ translation + TTS) for
+every student. An offline batch job (`python faq_bank.py build`, e.g. nightly from cron)
+runs each course's question set through the same RAG chain as the chat (course_chain.py,
+FAQ_CONCURRENCY questions at a time). Each answer is pre-translated into every response
+language and, with FAQ_TTS=true, pre-rendered to speech. The app only reads banks: a
+chat question that matches a bank entry is answered straight from it.
+
+Banks are versioned: the version is a digest of the course index fingerprint (chunk
+texts + embedding model + reduction), the question set, the chat model and the
+languages. A bank is only served while its fingerprint matches the loaded index, so a
+re-scraped or re-chunked course falls back to live answers until the next build instead
+of being served stale. The build skips courses whose current bank is up to date (unless
+--force). Files live next to the index:
+
+    index_store/<course>/faq_bank.json              {"version": ...} of the current bank
+    index_store/<course>/faq-<version>.json         entries: question, answers per language
+    index_store/<course>/faq-<version>-audio/       <id>.<lang>.mp3 (FAQ_TTS=true)
+
+    FAQ_BANK=true              serve pre-built banks
+    FAQ_BUILD_IN_APP=false     also queue a background build in the app when a loaded
+                               course has no matching bank (costs ~6 Gemini calls and a
+                               translation per language and question, in the serving process)
+    FAQ_QUESTIONS=path.json    {"*": [{"id", "question", "match"}], "Course name": [...]}
+                               ("*" replaces the built-in set, course entries are added)
+    FAQ_CONCURRENCY=3
+    FAQ_TTS=false
+    FAQ_MAX_EXTRA_TERMS=1      words a student's question may add to a bank question
+
+    python faq_bank.py build                         every course
+    python faq_bank.py build --course Django --force
+    python faq_bank.py status
+    python faq_bank.py show --course Django --lang hi
+"""
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.runnables import RunnableLambda
+
+from conversation import key_terms
+from index_store import index_dir_for, read_json_artifact, write_json_artifact
+
+logger = logging.getLogger(__name__)
+
+FAQ_BANK_ENABLED = os.getenv("FAQ_BANK", "true").lower() in ("1", "true", "yes")
+FAQ_BUILD_IN_APP = os.getenv("FAQ_BUILD_IN_APP", "false").lower() in ("1", "true", "yes")
+FAQ_QUESTIONS = os.getenv("FAQ_QUESTIONS", "").strip()
+FAQ_CONCURRENCY = int(os.getenv("FAQ_CONCURRENCY", "3"))
+FAQ_TTS = os.getenv("FAQ_TTS", "false").lower() in ("1", "true", "yes")
+FAQ_MAX_EXTRA_TERMS = int(os.getenv("FAQ_MAX_EXTRA_TERMS", "1"))
+FAQ_KEEP_VERSIONS = 2
+# Another process's build lock older than this is considered abandoned
+FAQ_LOCK_SECONDS = 30 * 60
+
+FORMAT_VERSION = 1
+POINTER_FILE = "faq_bank.json"
+LOCK_FILE = ".faq_build.lock"
+
+DEFAULT_FAQ_QUESTIONS: List[Dict[str, str]] = [
+    {"id": "prerequisites", "question": "What are the prerequisites for this course?",
+     "match": r"\b(pre-?requisites?|eligib\w*|requirements?|who can (join|learn|take))\b"},
+    {"id": "duration", "question": "What is the duration of this course?",
+     "match": r"\b(duration|how long|how many (days|weeks|months|hours)|course length)\b"},
+    {"id": "modes", "question": "Which training modes are available for this course (online, classroom)?",
+     "match": r"\b(modes?|online|offline|classroom|in-person|virtual)\b"},
+    {"id": "fees", "question": "What is the fee for this course?",
+     "match": r"\b(fees?|price|cost|charges?)\b"},
+    {"id": "certification", "question": "Will I get a certificate after completing this course?",
+     "match": r"\b(certificat\w*|certified)\b"},
+    {"id": "syllabus", "question": "What topics does the syllabus of this course cover?",
+     "match": r"\b(syllabus|topics|course content)\b"},
+]
+# Response languages of the app (LANGUAGE_MAP in Naresh_IT_bot.py)
+RESPONSE_LANGUAGES = ["en", "hi", "te", "ta", "kn", "ml", "bn", "gu", "mr", "pa", "ur"]
+# Usage-ledger session id of bank builds
+FAQ_SESSION = "faq-bank"
+
+# Words that say nothing about which FAQ is meant
+GENERIC_TERMS = {"course", "training", "program", "programme", "class", "classes", "naresh", "nareshit",
+                 "please", "tell", "know", "want", "details", "detail", "about", "available", "get", "there"}
+
+
+def load_questions(course: str, path: str = FAQ_QUESTIONS) -> List[Dict[str, str]]:
+    """The course's question set: the built-in (or FAQ_QUESTIONS "*") set plus its own entries."""
+    if not path:
+        return list(DEFAULT_FAQ_QUESTIONS)
+    with open(path, encoding="utf-8") as f:
+        configured = json.load(f)
+    return list(configured.get("*", DEFAULT_FAQ_QUESTIONS)) + list(configured.get(course, []))
+
+
+def index_fingerprint(chunks: List[Any], embedding_id: str, reduction: str = "") -> str:
+    """Identifies an index's content: a bank built from other chunks / vectors is stale."""
+    digest = hashlib.sha1(f"{embedding_id}\0{reduction}".encode("utf-8"))
+    for chunk in chunks:
+        digest.update(b"\0" + chunk.page_content.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def bank_version(fingerprint: str, questions: List[Dict[str, str]], model: str, languages: List[str],
+                 tts: bool) -> str:
+    payload = json.dumps([FORMAT_VERSION, fingerprint, questions, model, sorted(languages), tts], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+# ===== Matching =====
+def _vocabulary(text: str) -> set:
+    return {t.lower() for t in key_terms(text, 64)}
+
+
+def match_entry(query: str, entries: List[Dict[str, Any]], course: str = "",
+                max_extra_terms: int = FAQ_MAX_EXTRA_TERMS) -> Optional[Dict[str, Any]]:
+    """
+    The bank entry a question asks for, or None. Exactly one entry's pattern must match,
+    and the question may add at most max_extra_terms words beyond that entry's own
+    question and the course name ("fees for the weekend batch" is not the fees FAQ).
+    """
+    lowered = (query or "").lower()
+    hits = [e for e in entries if e.get("match") and re.search(e["match"], lowered)]
+    if len(hits) != 1:
+        return None
+    entry = hits[0]
+    known = _vocabulary(entry["question"]) | _vocabulary(course) | GENERIC_TERMS
+    pattern_words = set(re.findall(r"[a-z]{3,}", entry["match"]))
+    extra = [t for t in _vocabulary(query) if t not in known and not any(t.startswith(w) for w in pattern_words)]
+    return entry if len(extra) <= max_extra_terms else None
+
+
+# ===== Storage =====
+class FaqBankStore:
+    """Reads and writes the versioned banks of every course (cached per course and version)."""
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def current(self, url: str) -> Optional[Dict[str, Any]]:
+        pointer = read_json_artifact(url, POINTER_FILE) or {}
+        version = pointer.get("version")
+        if not version:
+            return None
+        with self._lock:
+            cached = self._cache.get(url)
+            if cached and cached[0] == version:
+                return cached[1]
+        bank = read_json_artifact(url, f"faq-{version}.json")
+        if bank is None:
+            return None
+        with self._lock:
+            self._cache[url] = (version, bank)
+        return bank
+
+    def lookup(self, url: str, fingerprint: str, query: str, course: str = "") -> Optional[Dict[str, Any]]:
+        """The matching entry of the course's bank, if that bank was built from this index."""
+        bank = self.current(url)
+        if not bank or bank.get("fingerprint") != fingerprint:
+            return None
+        return match_entry(query, bank.get("entries", []), course)
+
+    @staticmethod
+    def audio(url: str, version: str, entry: Dict[str, Any], lang: str) -> str:
+        """Pre-rendered speech of an entry as base64 ('' if there is none)."""
+        name = entry.get("audio", {}).get(lang)
+        if not name:
+            return ""
+        try:
+            with open(os.path.join(index_dir_for(url), f"faq-{version}-audio", name), "rb") as f:
+                return base64.b64encode(f.read()).decode()
+        except OSError:
+            return ""
+
+    def save(self, url: str, bank: Dict[str, Any], audio: Dict[str, bytes]) -> None:
+        version = bank["version"]
+        if audio:
+            directory = os.path.join(index_dir_for(url, create=True), f"faq-{version}-audio")
+            os.makedirs(directory, exist_ok=True)
+            for name, data in audio.items():
+                with open(os.path.join(directory, name), "wb") as f:
+                    f.write(data)
+        write_json_artifact(url, f"faq-{version}.json", bank)
+        write_json_artifact(url, POINTER_FILE, {"version": version, "built_at": bank["built_at"]})
+        self.prune(url, keep=version)
+
+    @staticmethod
+    def prune(url: str, keep: str, versions: int = FAQ_KEEP_VERSIONS) -> None:
+        """Deletes all but the newest `versions` banks (always keeping `keep`)."""
+        directory = index_dir_for(url)
+        banks = sorted((f for f in os.listdir(directory) if re.fullmatch(r"faq-[0-9a-f]+\.json", f)),
+                       key=lambda f: os.path.getmtime(os.path.join(directory, f)), reverse=True)
+        for name in banks[versions:]:
+            version = name[len("faq-"):-len(".json")]
+            if version == keep:
+                continue
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+            shutil.rmtree(os.path.join(directory, f"faq-{version}-audio"), ignore_errors=True)
+
+
+# ===== Batch builds =====
+class FaqBankBuilder:
+    """
+    Builds banks, FAQ_CONCURRENCY questions in parallel. build_locked() builds in the
+    calling thread (the offline job); ensure() queues a build on a background worker, one
+    course at a time (FAQ_BUILD_IN_APP). A file lock keeps two processes on the host from
+    building the same course.
+    """
+
+    def __init__(self, store: FaqBankStore, concurrency: int = FAQ_CONCURRENCY):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self._courses = ThreadPoolExecutor(max_workers=1, thread_name_prefix="faq-bank")
+        self._building: set = set()
+        self._lock = threading.Lock()
+
+    def ensure(self, url: str, course: str, fingerprint: str, model: str, languages: List[str],
+               answer: Callable[[str], str], translate: Callable[[str, str], str],
+               speak: Optional[Callable[[str, str], bytes]] = None) -> Optional[str]:
+        """Queues a build unless the current bank matches. Returns the version being built, or None."""
+        questions = load_questions(course)
+        version = bank_version(fingerprint, questions, model, languages, speak is not None)
+        current = self.store.current(url)
+        if current and current.get("version") == version:
+            return None
+        with self._lock:
+            if url in self._building:
+                return None
+            self._building.add(url)
+        self._courses.submit(self._build_in_background, url, course, fingerprint, version, questions, languages,
+                             answer, translate, speak)
+        return version
+
+    def _build_in_background(self, url: str, *args) -> None:
+        try:
+            self.build_locked(url, *args)
+        except Exception as err:  # a failed batch must not take the worker down
+            logger.warning("FAQ bank build for %s failed: %s", url, err)
+        finally:
+            with self._lock:
+                self._building.discard(url)
+
+    def build_locked(self, url: str, *args) -> Optional[Dict[str, Any]]:
+        """build() under the course's lock file; None if another process is building it."""
+        lock = os.path.join(index_dir_for(url, create=True), LOCK_FILE)
+        try:
+            if os.path.exists(lock) and time.time() - os.path.getmtime(lock) > FAQ_LOCK_SECONDS:
+                os.remove(lock)
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
+            logger.info("FAQ bank for %s is being built by another process", url)
+            return None
+        try:
+            os.close(fd)
+            return self.build(url, *args)
+        finally:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+
+    def build(self, url: str, course: str, fingerprint: str, version: str, questions: List[Dict[str, str]],
+              languages: List[str], answer: Callable[[str], str], translate: Callable[[str, str], str],
+              speak: Optional[Callable[[str, str], bytes]] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        audio: Dict[str, bytes] = {}
+
+        def _entry(question: Dict[str, str]) -> Optional[Dict[str, Any]]:
+            try:
+                english = answer(question["question"])
+            except Exception as err:
+                logger.warning("FAQ %s/%s not answered: %s", course, question["id"], err)
+                return None
+            if not english or not english.strip():
+                return None
+            answers = {lang: english if lang == "en" else translate(english, lang) for lang in languages}
+            entry = dict(question, answers=answers, audio={})
+            if speak is not None:
+                for lang, text in answers.items():
+                    try:
+                        data = speak(text, lang)
+                    except Exception as err:
+                        logger.info("FAQ %s/%s: no %s speech (%s)", course, question["id"], lang, err)
+                        continue
+                    if data:
+                        name = f"{question['id']}.{lang}.mp3"
+                        audio[name] = data
+                        entry["audio"][lang] = name
+            return entry
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="faq-question") as pool:
+            entries = [e for e in pool.map(_entry, questions) if e is not None]
+        if not entries:
+            raise RuntimeError("no question could be answered")
+        bank = {
+            "format": FORMAT_VERSION,
+            "version": version,
+            "fingerprint": fingerprint,
+            "course": course,
+            "url": url,
+            "built_at": time.time(),
+            "languages": languages,
+            "entries": entries,
+        }
+        self.store.save(url, bank, audio)
+        logger.info("Built FAQ bank %s for %s: %d/%d questions, %d languages, %d audio files in %.1fs",
+                    version, course, len(entries), len(questions), len(languages), len(audio),
+                    time.perf_counter() - started)
+        return bank
+
+    def building(self) -> List[str]:
+        with self._lock:
+            return sorted(self._building)
+
+
+# ===== Offline build =====
+def build_course_banks(courses: Dict[str, str], force: bool = False, tts: bool = FAQ_TTS) -> Dict[str, str]:
+    """
+    Builds the bank of every course in {name: url} whose current bank doesn't match its
+    index, the way the app would answer: same chunks, index, retrieval and prompt. Runs in
+    the calling process (a cron job, not the app). Returns {name: version or reason}.
+    """
+    # Imported here: status / show need none of the RAG stack (or an API key)
+    from adaptive_retrieval import AdaptiveRetriever
+    from answer_fallback import LLM_MAX_RETRIES, LLM_REQUEST_TIMEOUT_SECONDS
+    from course_chain import CHAT_MODEL, course_chain
+    from course_content import COURSE_PAGES, load_course_chunks
+    from dim_reduction import reduce_index, reduction_label
+    from embedding_backends import create_embeddings, embedding_identity
+    from index_builder import build_faiss_index
+    from near_duplicates import DEDUP_ENABLED, DedupEmbeddings, create_dedup_registry, dedupe_chunks
+    from query_cache import RetrievalCache
+    from usage_ledger import (FEATURE_CHAT, FEATURE_TRANSLATE, FEATURE_TTS, MeteredEmbeddings,
+                              create_usage_ledger, usage_scope)
+
+    standin = os.getenv("LLM_BACKEND", "gemini").strip().lower() == "standin"
+    model = "standin" if standin else CHAT_MODEL
+    contact_number = os.getenv("CONTACT_PHONE", "+91 8179191999").strip()
+    embedding_id = embedding_identity()
+    ledger = create_usage_ledger()
+    registry = create_dedup_registry() if DEDUP_ENABLED else None
+    embeddings = MeteredEmbeddings(create_embeddings(), ledger, embedding_id.split(":", 1)[-1])
+    retriever = AdaptiveRetriever(RetrievalCache())
+    store = FaqBankStore()
+    builder = FaqBankBuilder(store)
+    if standin:
+        from standins import create_standin_chat_model, standin_translate, standin_tts
+
+        chat_model = create_standin_chat_model()
+        translate_text, speak_text = standin_translate, standin_tts
+    else:
+        import io
+
+        from deep_translator import GoogleTranslator
+        from gtts import gTTS
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        chat_model = ChatGoogleGenerativeAI(model=CHAT_MODEL, temperature=0.5, max_output_tokens=2048,
+                                            timeout=LLM_REQUEST_TIMEOUT_SECONDS, max_retries=LLM_MAX_RETRIES)
+
+        def translate_text(text: str, lang: str) -> str:
+            return GoogleTranslator(source="en", target=lang).translate(text)
+
+        def speak_text(text: str, lang: str) -> bytes:
+            mp3_fp = io.BytesIO()
+            gTTS(text, lang=lang).write_to_fp(mp3_fp)
+            return mp3_fp.getvalue()
+
+    results: Dict[str, str] = {}
+    for name, url in courses.items():
+        chunks, _ = load_course_chunks(url, subpages=COURSE_PAGES.get(url, []))
+        if DEDUP_ENABLED:
+            chunks, _ = dedupe_chunks(chunks, url, registry)
+        fingerprint = index_fingerprint(chunks, embedding_id, reduction_label())
+        questions = load_questions(name)
+        version = bank_version(fingerprint, questions, model, RESPONSE_LANGUAGES, tts)
+        current = store.current(url)
+        if current and current.get("version") == version and not force:
+            results[name] = f"{version} (up to date)"
+            continue
+        # Chunks already embedded for the app's index (dedup registry) reuse their vectors
+        reuse = DedupEmbeddings(embeddings, registry, embedding_id) if registry is not None else None
+        with usage_scope(name, FAQ_SESSION):
+            vectordb = reduce_index(build_faiss_index(chunks, embeddings, document_embeddings=reuse))
+
+        def _metered_llm(prompt, course=name):
+            message = chat_model.invoke(prompt)
+            prompt_text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+            ledger.record_llm(FEATURE_CHAT, model, prompt_text, message, course, FAQ_SESSION)
+            return message
+
+        qa = course_chain(name, RunnableLambda(_metered_llm), contact_number)
+
+        def _answer(question: str, course=name, url=url, vectordb=vectordb, qa=qa) -> str:
+            with usage_scope(course, FAQ_SESSION):
+                docs = retriever.search(vectordb, url, question)
+            return qa.invoke({"question": question, "docs": docs, "history": ""})
+
+        def _translate(text: str, lang: str, course=name) -> str:
+            translated = translate_text(text, lang)
+            ledger.record(FEATURE_TRANSLATE, "standin" if standin else "google-translate", course, FAQ_SESSION,
+                          characters=len(text))
+            return translated
+
+        def _speak(text: str, lang: str, course=name) -> bytes:
+            data = speak_text(text, lang)
+            ledger.record(FEATURE_TTS, "standin" if standin else "gtts", course, FAQ_SESSION, characters=len(text))
+            return data
+
+        try:
+            bank = builder.build_locked(url, name, fingerprint, version, questions, RESPONSE_LANGUAGES,
+                                        _answer, _translate, _speak if tts else None)
+        except Exception as err:
+            logger.warning("FAQ bank build for %s failed: %s", name, err)
+            results[name] = f"failed: {err}"
+            continue
+        results[name] = version if bank is not None else "being built by another process"
+    ledger.flush()
+    return results
+
+
+# ===== CLI =====
+def main() -> None:
+    load_dotenv()
+    from course_content import COURSE_OPTIONS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build the banks whose index or question set changed")
+    build.add_argument("--course", action="append", help="course name (repeatable; default: every course)")
+    build.add_argument("--force", action="store_true", help="rebuild even if the current bank matches")
+    build.add_argument("--tts", action="store_true", default=FAQ_TTS, help="also pre-render speech (FAQ_TTS)")
+    sub.add_parser("status", help="current bank of every course")
+    show = sub.add_parser("show", help="print a course's bank")
+    show.add_argument("--course", required=True)
+    show.add_argument("--lang", default="en")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        unknown = [name for name in args.course or [] if name not in COURSE_OPTIONS]
+        if unknown:
+            raise SystemExit(f"Unknown course(s): {', '.join(unknown)}")
+        courses = {name: COURSE_OPTIONS[name] for name in args.course} if args.course else dict(COURSE_OPTIONS)
+        for name, result in build_course_banks(courses, force=args.force, tts=args.tts).items():
+            print(f"{name:45} {result}")
+        return
+
+    store = FaqBankStore()
+    if args.command == "status":
+        print(f"{'Course':45} {'version':>12} {'entries':>7} {'langs':>5}  built")
+        for name, url in COURSE_OPTIONS.items():
+            bank = store.current(url)
+            if not bank:
+                print(f"{name:45} {'-':>12}")
+                continue
+            built = time.strftime("%Y-%m-%d %H:%M", time.localtime(bank["built_at"]))
+            print(f"{name:45} {bank['version']:>12} {len(bank['entries']):>7} {len(bank['languages']):>5}  {built}")
+        return
+
+    url = COURSE_OPTIONS.get(args.course)
+    bank = store.current(url) if url else None
+    if not bank:
+        raise SystemExit(f"No FAQ bank for {args.course!r}")
+    for entry in bank["entries"]:
+        print(f"## {entry['question']}  [{entry['id']}]\n")
+        print(entry["answers"].get(args.lang) or entry["answers"].get("en", ""))
+        print()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    main()
@@ -0,0 +1,107 @@
+"""
+Concurrent, batched FAISS index builds.
+
+FAISS.from_documents embeds every chunk through one sequential path, so build time grows
+with chunk count x round-trip latency. build_faiss_index instead splits the chunks into
+batches, embeds up to EMBED_CONCURRENCY batches at once (with retry and exponential
+backoff), and adds each batch's vectors to the index as soon as it completes, reporting
+progress as it goes.
+
+Vectors are stored L2-normalized (FAISS_OPTIONS), so the index's squared L2 distance d
+between a query and a chunk is 2 - 2 cos and relevance scores are the cosine similarity
+1 - d / 2, floored at 0: always in [0, 1], whichever embedding backend or EMBED_REDUCTION
+produced the vectors. Every store of a course index (built, deserialized from the shared
+cache, opened from mmap files) must be created with FAISS_OPTIONS.
+
+    EMBED_BATCH_SIZE=32     chunks per embedding request
+    EMBED_CONCURRENCY=4     embedding requests in flight
+    EMBED_MAX_RETRIES=3
+"""
+import contextvars
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Callable, Optional
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+RETRY_BASE_SECONDS = 1.0
+
+
+def cosine_relevance(distance: float) -> float:
+    """Relevance in [0, 1] from the squared L2 distance between unit vectors."""
+    return min(1.0, max(0.0, 1.0 - distance / 2.0))
+
+
+# Part of the index cache key: changing these changes the stored vectors or their scores
+FAISS_OPTIONS = {"normalize_L2": True, "relevance_score_fn": cosine_relevance}
+INDEX_VECTORS = "unit-l2"
+
+
+def embed_with_retry(embeddings: Embeddings, texts: List[str], max_retries: int = EMBED_MAX_RETRIES) -> List[List[float]]:
+    """embed_documents with exponential backoff + jitter (quota errors and timeouts are transient)."""
+    for attempt in range(max_retries + 1):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as err:
+            if attempt == max_retries:
+                raise
+            delay = RETRY_BASE_SECONDS * (2 ** attempt) * (1 + random.random())
+            logger.warning("Embedding batch of %d failed (%s); retry %d/%d in %.1fs",
+                           len(texts), err, attempt + 1, max_retries, delay)
+            time.sleep(delay)
+    raise RuntimeError("unreachable")
+
+
+def build_faiss_index(docs: List[Document], embeddings: Embeddings,
+                      batch_size: int = EMBED_BATCH_SIZE, max_workers: int = EMBED_CONCURRENCY,
+                      on_progress: Optional[Callable[[int, int], None]] = None,
+                      document_embeddings: Optional[Embeddings] = None) -> FAISS:
+    """
+    Builds a FAISS index from documents, embedding batches concurrently.
+    on_progress(done_chunks, total_chunks) is called from the calling thread after each batch.
+    Chunks are embedded with document_embeddings if given (e.g. near_duplicates.DedupEmbeddings,
+    which reuses stored vectors); the index keeps `embeddings` for queries.
+    """
+    if not docs:
+        raise ValueError("No content to index")
+    batches = [docs[i:i + batch_size] for i in range(0, len(docs), batch_size)]
+    total = len(docs)
+    done = 0
+    vectordb: Optional[FAISS] = None
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches))), thread_name_prefix="embed") as pool:
+        # Each batch runs in a copy of the caller's context (usage_ledger.usage_scope, traces)
+        futures = {
+            pool.submit(contextvars.copy_context().run, embed_with_retry, document_embeddings or embeddings,
+                        [d.page_content for d in batch]): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            vectors = future.result()
+            text_embeddings = list(zip([d.page_content for d in batch], vectors))
+            metadatas = [d.metadata for d in batch]
+            # Vectors are streamed into the index as batches complete (order doesn't matter for search)
+            if vectordb is None:
+                vectordb = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, **FAISS_OPTIONS)
+            else:
+                vectordb.add_embeddings(text_embeddings, metadatas=metadatas)
+            done += len(batch)
+            if on_progress:
+                on_progress(done, total)
+
+    elapsed = time.perf_counter() - started
+    logger.info("Indexed %d chunks in %d batches in %.2fs (%.1f chunks/s, %d workers)",
+                total, len(batches), elapsed, total / elapsed if elapsed else 0.0, max_workers)
+    return vectordb
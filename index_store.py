@@ -0,0 +1,49 @@
+"""
+On-disk location of per-course index artifacts.
+
+Every course gets a directory under INDEX_DIR (default: ./index_store) named after
+its URL slug. Artifacts built at ingest time (curriculum tree, ...) live there,
+next to each other, so any process can reuse them without re-scraping the site.
+"""
+import json
+import os
+import re
+import tempfile
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+INDEX_DIR = os.getenv("INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_store"))
+
+
+def course_slug(url: str) -> str:
+    """Stable directory name for a course URL (last path segment, filesystem-safe)."""
+    path = urlparse(url).path.rstrip("/")
+    slug = path.rsplit("/", 1)[-1] or urlparse(url).netloc
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", slug).strip("-").lower() or "course"
+
+
+def index_dir_for(url: str, create: bool = False) -> str:
+    path = os.path.join(INDEX_DIR, course_slug(url))
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_json_artifact(url: str, name: str, data: Any) -> str:
+    """Atomically writes a JSON artifact for a course (readers never see a partial file)."""
+    directory = index_dir_for(url, create=True)
+    path = os.path.join(directory, name)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def read_json_artifact(url: str, name: str) -> Optional[Any]:
+    path = os.path.join(index_dir_for(url), name)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,234 @@
+"""
+Predictive index warm-up.
+
+Nothing used to be built until a student picked a course, so the first student on a
+fresh process always waited for the scrape + embedding of their course. With
+WARMUP_ENABLED, IndexWarmer loads (from the shared cache) or builds the hot course
+indexes in a background thread on process start:
+
+    - the courses named in WARMUP_COURSES (comma-separated), or, when none are
+      configured, the WARMUP_TOP_N most selected courses
+    - one at a time, while the indexes already held in memory stay under WARMUP_MEMORY_MB
+
+With WARMUP_PREFETCH the thread then prefetches the remaining courses, most selected
+first, only while the CPU is idle (1-minute load average per core below
+WARMUP_IDLE_LOAD) and within the same memory budget. Without it, other courses are built
+when a student selects them. Selection counts are persisted in
+INDEX_DIR/selection_counts.json, so the ranking survives restarts. With no counts yet,
+catalogue order is used.
+
+The build function runs on the warm-up thread, which has no script run: it must not call
+st.cache_* (the app passes plain loader functions bound to its cached objects).
+
+    WARMUP_ENABLED=false
+    WARMUP_COURSES=Python Online Training,Django Online Training
+    WARMUP_TOP_N=3
+    WARMUP_MEMORY_MB=512
+    WARMUP_PREFETCH=false
+    WARMUP_IDLE_LOAD=0.5
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from dim_reduction import index_bytes
+from index_store import INDEX_DIR
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+WARMUP_COURSES = [c.strip() for c in os.getenv("WARMUP_COURSES", "").split(",") if c.strip()]
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "3"))
+WARMUP_MEMORY_MB = float(os.getenv("WARMUP_MEMORY_MB", "512"))
+WARMUP_PREFETCH = os.getenv("WARMUP_PREFETCH", "false").strip().lower() in ("1", "true", "yes")
+WARMUP_IDLE_LOAD = float(os.getenv("WARMUP_IDLE_LOAD", "0.5"))
+# How long prefetching backs off when the CPU is busy
+WARMUP_IDLE_POLL_SECONDS = 10.0
+
+SELECTION_COUNTS_FILE = "selection_counts.json"
+
+
+def estimate_index_bytes(vectordb) -> int:
+    """Approximate private resident size of a FAISS vector store: float32 vectors (as stored) + chunk text."""
+    index = vectordb.index
+    if hasattr(index, "private_bytes"):
+        # Memory-mapped index (mmap_index.py): its pages are shared, not held by this process
+        return index.private_bytes() + vectordb.docstore.private_bytes()
+    vector_bytes = index_bytes(index)
+    docs = getattr(vectordb.docstore, "_dict", {})
+    text_bytes = sum(len(doc.page_content.encode("utf-8")) for doc in docs.values())
+    return vector_bytes + text_bytes
+
+
+def cpu_is_idle(threshold: float = WARMUP_IDLE_LOAD) -> bool:
+    """True when the 1-minute load average per core is below threshold (always True where unsupported)."""
+    try:
+        load, _, _ = os.getloadavg()
+    except (AttributeError, OSError):
+        return True
+    return load / (os.cpu_count() or 1) < threshold
+
+
+class SelectionStats:
+    """Persisted per-course selection counts (course name -> count)."""
+
+    def __init__(self, path: str = os.path.join(INDEX_DIR, SELECTION_COUNTS_FILE)):
+        self.path = path
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = self._read()
+
+    def _read(self) -> Dict[str, int]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return {str(k): int(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def record(self, course: str) -> None:
+        with self._lock:
+            # Merge with the file first: other replicas may share INDEX_DIR
+            counts = self._read()
+            counts[course] = max(counts.get(course, 0), self.counts.get(course, 0)) + 1
+            self.counts = counts
+            directory = os.path.dirname(self.path)
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{SELECTION_COUNTS_FILE}.")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(counts, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.path)
+            except OSError as err:
+                logger.warning("Could not persist selection counts: %s", err)
+
+    def ranked(self, courses: List[str]) -> List[str]:
+        """Courses by descending selection count; ties keep catalogue order."""
+        order = {course: i for i, course in enumerate(courses)}
+        return sorted(courses, key=lambda c: (-self.counts.get(c, 0), order[c]))
+
+
+class IndexRegistry:
+    """
+    Process-wide map of course URL -> built vector store. get_or_build makes sure a
+    course is only built once even when a student and the warm-up thread ask for it
+    at the same time.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, Any] = {}
+        self._sizes: Dict[str, int] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[Any]:
+        return self._indexes.get(url)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._indexes
+
+    def get_or_build(self, url: str, build: Callable[[], Any]) -> Any:
+        if url in self._indexes:
+            return self._indexes[url]
+        with self._lock:
+            url_lock = self._locks.setdefault(url, threading.Lock())
+        with url_lock:
+            if url not in self._indexes:
+                vectordb = build()
+                self._sizes[url] = estimate_index_bytes(vectordb)
+                self._indexes[url] = vectordb
+        return self._indexes[url]
+
+    def memory_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def average_bytes(self) -> int:
+        sizes = list(self._sizes.values())
+        return sum(sizes) // len(sizes) if sizes else 0
+
+
+class IndexWarmer:
+    """Background thread that warms the hot course indexes (configured, else most selected), then optionally prefetches the rest."""
+
+    def __init__(self, registry: IndexRegistry, courses: Dict[str, str],
+                 build: Callable[[str], Any], stats: Optional[SelectionStats] = None,
+                 hot_courses: Optional[List[str]] = None, top_n: int = WARMUP_TOP_N,
+                 memory_budget_mb: float = WARMUP_MEMORY_MB, prefetch: bool = WARMUP_PREFETCH,
+                 idle_load: float = WARMUP_IDLE_LOAD):
+        self.registry = registry
+        self.courses = {name: url for name, url in courses.items() if url}
+        self.build = build
+        self.stats = stats or SelectionStats()
+        self.hot_courses = WARMUP_COURSES if hot_courses is None else hot_courses
+        self.top_n = top_n
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.prefetch = prefetch
+        self.idle_load = idle_load
+        self.warmed: List[str] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record_selection(self, course: str) -> None:
+        if course in self.courses:
+            self.stats.record(course)
+
+    def start(self) -> "IndexWarmer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="index-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _warm(self, name: str) -> None:
+        url = self.courses[name]
+        if url in self.registry:
+            return
+        started = time.perf_counter()
+        try:
+            self.registry.get_or_build(url, lambda: self.build(url))
+        except Exception as err:
+            logger.warning("Warm-up of %s failed: %s", name, err)
+            return
+        self.warmed.append(name)
+        logger.info("Warmed %s in %.1fs (indexes in memory: %.1f MB)", name,
+                    time.perf_counter() - started, self.registry.memory_bytes() / 1024 / 1024)
+
+    def hot(self) -> List[str]:
+        """Courses to warm: the configured ones that are in the catalogue, else the top_n most selected."""
+        if self.hot_courses:
+            unknown = [name for name in self.hot_courses if name not in self.courses]
+            if unknown:
+                logger.warning("WARMUP_COURSES not in the catalogue: %s", unknown)
+            return [name for name in self.hot_courses if name in self.courses]
+        return self.stats.ranked(list(self.courses))[:self.top_n]
+
+    def _over_budget(self) -> bool:
+        # Stop before the next index (estimated at the average size so far) would exceed the budget
+        if self.registry.memory_bytes() + self.registry.average_bytes() > self.memory_budget_bytes:
+            logger.info("Warm-up stopped at the %.0f MB memory budget", self.memory_budget_bytes / 1024 / 1024)
+            return True
+        return False
+
+    def _run(self) -> None:
+        hot = self.hot()
+        for name in hot:
+            if self._stop.is_set() or self._over_budget():
+                return
+            self._warm(name)
+        logger.info("Index warm-up finished: %s", self.warmed)
+        if not self.prefetch:
+            return
+
+        for name in self.stats.ranked(list(self.courses)):
+            if name in hot:
+                continue
+            while not self._stop.is_set() and not cpu_is_idle(self.idle_load):
+                self._stop.wait(WARMUP_IDLE_POLL_SECONDS)
+            if self._stop.is_set() or self._over_budget():
+                return
+            self._warm(name)
+        logger.info("Index prefetch finished: %s", self.warmed)
@@ -0,0 +1,193 @@
+"""
+In-process query-intent router for the chat tab.
+
+A cheap keyword classifier (CPU only, no network) decides how each question is
+answered, from cheapest to most expensive:
+
+    greeting / thanks / contact / registration  -> canned response
+    curriculum                                  -> structured curriculum tree
+    (prerequisites, fees, duration, ...)        -> pre-generated FAQ bank (faq_bank.py)
+    (anything already answered)                 -> answer cache
+    everything else                             -> full RAG (FAISS + Gemini)
+
+RouterStats keeps per-route counts and latencies and logs the time saved compared
+with the observed average RAG latency.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from curriculum import is_curriculum_query
+
+logger = logging.getLogger(__name__)
+
+ROUTE_GREETING = "greeting"
+ROUTE_THANKS = "thanks"
+ROUTE_CONTACT = "contact"
+ROUTE_REGISTRATION = "registration"
+ROUTE_CURRICULUM = "curriculum"
+ROUTE_FAQ = "faq"
+ROUTE_CACHE = "cache"
+ROUTE_RAG = "rag"
+
+CANNED_ROUTES = (ROUTE_GREETING, ROUTE_THANKS, ROUTE_CONTACT, ROUTE_REGISTRATION)
+
+# Whole-message small talk only: "hi, what is the duration?" must still go to RAG
+GREETING_PATTERN = re.compile(
+    r"^(hi+|hello+|hey+|hai|hii+|namaste|good (morning|afternoon|evening)|greetings|yo)"
+    r"( there| team| sir| madam)?$"
+)
+THANKS_PATTERN = re.compile(
+    r"^(thanks?( you)?( so much| a lot)?|thank u|thx|ty|ok(ay)?( thanks?)?|great|cool|bye|goodbye|see you)$"
+)
+CONTACT_PATTERN = re.compile(
+    r"\b(contact (number|no|details|info)|phone( number| no)?|mobile( number| no)?|whatsapp|"
+    r"call (you|us|someone|the institute)|how (can|do) i (contact|reach|call)|customer care|helpline)\b"
+)
+# Bare "register" only where it means enrolling ("how do i register", "register for ..."),
+# not "register a model in the admin"
+REGISTRATION_PATTERN = re.compile(
+    r"\b(register(?=$| for| me| myself| now| online| here)|registration|enrol+|enrol+ment|sign ?up|admission|"
+    r"join (the|this) course|how (can|do) i join|book (a|my) seat)\b"
+)
+# Detail questions that mention registration/contact words but need course content
+DETAIL_PATTERN = re.compile(r"\b(fee|fees|price|cost|discount|batch|timing|schedule|date|duration|prerequisite)s?\b")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercases, strips punctuation and collapses whitespace (used as cache key)."""
+    text = re.sub(r"[^\w\s#+.]", " ", (text or "").lower())
+    text = re.sub(r"(?<!\w)\.|\.(?!\w)", " ", text)
+    return " ".join(text.split())
+
+
+def classify_query(query: str) -> str:
+    """Returns the route for a query; anything not clearly cheap goes to RAG."""
+    normalized = normalize_query(query)
+    if not normalized:
+        return ROUTE_RAG
+    if GREETING_PATTERN.match(normalized):
+        return ROUTE_GREETING
+    if THANKS_PATTERN.match(normalized):
+        return ROUTE_THANKS
+    if not DETAIL_PATTERN.search(normalized):
+        if CONTACT_PATTERN.search(normalized):
+            return ROUTE_CONTACT
+        if REGISTRATION_PATTERN.search(normalized):
+            return ROUTE_REGISTRATION
+    # The curriculum tree has modules, topics and the duration, not fees or batches
+    if is_curriculum_query(normalized) and set(DETAIL_PATTERN.findall(normalized)) <= {"duration"}:
+        return ROUTE_CURRICULUM
+    return ROUTE_RAG
+
+
+def canned_response(route: str, course_name: str, contact_number: str, registration_url: str) -> str:
+    course = course_name or "our courses"
+    if route == ROUTE_GREETING:
+        return (f"Hello! 👋 I'm the NareshIT Course Assistant for **{course}**. "
+                "Ask me about the syllabus, duration, prerequisites or anything else about the course.")
+    if route == ROUTE_THANKS:
+        return (f"You're welcome! 😊 If you have more questions about **{course}**, just ask. "
+                f"You can also reach us at **{contact_number}**.")
+    if route == ROUTE_CONTACT:
+        return (f"📞 You can reach the NareshIT team at **{contact_number}** for batch details, "
+                f"fees and counselling about **{course}**.")
+    if route == ROUTE_REGISTRATION:
+        return (f"📋 You can register for **{course}** using our registration form: "
+                f"[Register here]({registration_url}). For help with enrolment, call **{contact_number}**.")
+    raise ValueError(f"No canned response for route {route!r}")
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU of generated (English) answers keyed by course URL + normalized query.
+    With a shared cache attached, answers are also read from / written to the shared store.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 24 * 3600, shared=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._data: "OrderedDict[tuple[str, str], tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, course_url: str, query: str) -> Optional[str]:
+        key = (course_url, normalize_query(query))
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                stored_at, answer = entry
+                if time.time() - stored_at <= self.ttl_seconds:
+                    self._data.move_to_end(key)
+                    return answer
+                del self._data[key]
+        if self.shared is None:
+            return None
+        answer = self.shared.get(self.shared.make_key("answer", *key), use_l1=False)
+        if answer is not None:
+            self._remember(key, answer)
+        return answer
+
+    def put(self, course_url: str, query: str, answer: str) -> None:
+        key = (course_url, normalize_query(query))
+        self._remember(key, answer)
+        if self.shared is not None:
+            self.shared.put(self.shared.make_key("answer", *key), answer, ttl=self.ttl_seconds, use_l1=False)
+
+    def _remember(self, key: tuple[str, str], answer: str) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), answer)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self, course_url: Optional[str] = None) -> None:
+        with self._lock:
+            if course_url is None:
+                self._data.clear()
+            else:
+                for key in [k for k in self._data if k[0] == course_url]:
+                    del self._data[key]
+
+
+class RouterStats:
+    """Per-route counts and latencies; savings are measured against the average RAG latency."""
+
+    def __init__(self, log_every: int = 20):
+        self.log_every = log_every
+        self.counts: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float) -> None:
+        with self._lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+            self.seconds[route] = self.seconds.get(route, 0.0) + seconds
+            total = sum(self.counts.values())
+        logger.info("route=%s latency_ms=%.1f", route, seconds * 1000)
+        if self.log_every and total % self.log_every == 0:
+            logger.info("router summary: %s", self.summary())
+
+    def summary(self) -> Dict[str, object]:
+        with self._lock:
+            counts = dict(self.counts)
+            seconds = dict(self.seconds)
+        rag_avg = seconds.get(ROUTE_RAG, 0.0) / counts[ROUTE_RAG] if counts.get(ROUTE_RAG) else None
+        routes = {}
+        saved = 0.0
+        for route, count in counts.items():
+            avg = seconds[route] / count
+            routes[route] = {"count": count, "avg_ms": round(avg * 1000, 1)}
+            if route != ROUTE_RAG and rag_avg is not None:
+                saved += max(rag_avg - avg, 0.0) * count
+        total = sum(counts.values())
+        return {
+            "total": total,
+            "skipped_rag_pct": round(100.0 * (total - counts.get(ROUTE_RAG, 0)) / total, 1) if total else 0.0,
+            "rag_avg_ms": round(rag_avg * 1000, 1) if rag_avg is not None else None,
+            "estimated_saved_s": round(saved, 2),
+            "routes": routes,
+        }
@@ -0,0 +1,486 @@
+"""
+Concurrent-user load test for Naresh_IT_bot.py.
+
+Starts the app under a real `streamlit run` server and drives N simulated students at
+once, each over its own websocket the way a browser does (all from one asyncio loop).
+Each session opens the app, selects a course, asks questions, switches the response
+language and turns on text-to-speech (skipped when the server renders that checkbox
+disabled, i.e. gTTS is not installed). Remote services are replaced by the stand-ins in
+standins.py (LLM_BACKEND=standin, EMBEDDING_BACKEND=standin) and course pages are served
+locally (COURSE_CATALOG), so the numbers measure the app, not the network. Every index,
+cache and database the server writes lives in a temporary directory.
+
+For every concurrency level it reports throughput, latency percentiles per step (to the
+last script run an interaction caused), server CPU per script run, server RSS growth per
+connected session, and errors (including exceptions the page showed), then the
+saturation point: the first level where throughput stops growing (less than --min-gain)
+or query p95 exceeds --slo-ms. A session waits QUIET_SECONDS after each step for
+follow-on reruns, which doubles as think time. Bytes sent per interaction are reported by
+bench_reruns.py, which uses the same client.
+
+    python load_test.py
+    python load_test.py --levels 1,2,4,8,16,32 --queries 4 --slo-ms 4000 --out load_results.json
+    STANDIN_LLM_LATENCY_MS=3000 python load_test.py --levels 4,16
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import urllib.request
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ClientState_pb2 import ClientState
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState, WidgetStates
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Naresh_IT_bot.py")
+
+QUESTIONS = [
+    "What are the prerequisites for this course?",
+    "hi",
+    "What projects will I build?",
+    "Show me the syllabus",
+    "How long is the course and is there placement support?",
+    "Does it cover deployment?",
+]
+LANGUAGES = ["Hindi", "Telugu", "Tamil"]
+
+# Widget labels / keys in Naresh_IT_bot.py
+COURSE_SELECT_KEY = "selected_course_name"
+LANGUAGE_LABEL = "Response Language"
+TTS_LABEL = "🔊 Text-to-speech (Client Request 1)"
+QUESTION_LABEL = "💭 Ask about the course content"
+SEND_LABEL = "🚀 Send"
+
+FINISHED = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+WIDGET_TYPES = ("selectbox", "text_input", "button", "checkbox")
+# After the last run of an interaction, the session must stay quiet this long (st.rerun chains)
+QUIET_SECONDS = 0.5
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+# ===== Local course pages =====
+def course_page(name: str, index: int) -> str:
+    """A course page with the same shape as the real ones: site chrome around heading sections."""
+    modules = "".join(
+        f"<li>Module {m}: {name} topic {m}<ul>"
+        + "".join(f"<li>Lesson {m}.{t}: hands-on {name} exercise {t}</li>" for t in range(1, 6))
+        + "</ul></li>"
+        for m in range(1, 9)
+    )
+    faqs = "".join(
+        f"<h3>Question {q} about {name}?</h3><p>Answer {q}: batch {index} covers this with live sessions, "
+        f"recorded videos and weekly assignments reviewed by the trainer.</p>"
+        for q in range(1, 7)
+    )
+    return f"""<html><head><title>{name} Online Training</title></head><body>
+<nav><a href="/">Home</a> <a href="/courses">All Courses</a> <a href="/contact">Contact</a></nav>
+<main>
+<h1>{name} Online Training</h1>
+<h2>Course Overview</h2>
+<p>{name} is a job-oriented program. Duration: {45 + index} days, weekday and weekend batches.</p>
+<p>Placement support, mock interviews and resume preparation are included for every student.</p>
+<h2>Prerequisites</h2><p>Basic computer knowledge. No prior {name} experience is required.</p>
+<h2>Course Curriculum</h2><ul>{modules}</ul>
+<h2>Projects</h2><p>Two real-time projects, including deployment to the cloud with CI/CD.</p>
+<h2>FAQs</h2>{faqs}
+</main>
+<footer><p>Copyright NareshIT. All rights reserved.</p><a href="/privacy">Privacy</a></footer>
+</body></html>"""
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_course_pages(directory: str, courses: int) -> Tuple[ThreadingHTTPServer, Dict[str, str]]:
+    """Writes course pages + a catalogue JSON and serves them on a free localhost port."""
+    names = [f"Load Test Course {i + 1}" for i in range(courses)]
+    for i, name in enumerate(names):
+        with open(os.path.join(directory, f"course-{i + 1}.html"), "w", encoding="utf-8") as f:
+            f.write(course_page(name, i))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), lambda *a: _QuietHandler(*a, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    return server, {name: f"http://127.0.0.1:{port}/course-{i + 1}.html" for i, name in enumerate(names)}
+
+
+# ===== Server =====
+def standin_env(workdir: str, catalog_path: str) -> Dict[str, str]:
+    """Environment for an app server that only talks to the stand-ins and keeps its state in workdir."""
+    return dict(os.environ, **{
+        "COURSE_CATALOG": catalog_path,
+        "LLM_BACKEND": "standin",
+        "EMBEDDING_BACKEND": "standin",
+        "RECOGNIZER_BACKEND": "fake",
+        "STANDIN_LLM_LATENCY_MS": os.getenv("STANDIN_LLM_LATENCY_MS", "200"),
+        "INDEX_DIR": os.path.join(workdir, "index_store"),
+        "SHARED_CACHE_DIR": os.path.join(workdir, "shared_cache"),
+        "SESSION_DB": os.path.join(workdir, "sessions.db"),
+        "USAGE_DB": os.path.join(workdir, "usage.db"),
+        "PROFILE_DIR": os.path.join(workdir, "profiles"),
+        "RETRIEVAL_TRACE_FILE": os.path.join(workdir, "retrieval_trace.jsonl"),
+        "WARMUP_ENABLED": "false",
+    })
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app: str, port: int, env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    command = [sys.executable, "-m", "streamlit", "run", os.path.basename(app), f"--server.port={port}",
+               "--server.headless=true", "--server.enableXsrfProtection=false",
+               "--server.fileWatcherType=none", "--browser.gatherUsageStats=false"]
+    log = open(log_path, "w", encoding="utf-8")
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(app)), env=env,
+                              stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"streamlit exited with {server.returncode}; see {log_path}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"streamlit did not become healthy; see {log_path}")
+
+
+def connect(port: int):
+    return websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                              origin=f"http://127.0.0.1:{port}", max_size=None)
+
+
+# ===== Measurements =====
+def process_cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process (Linux /proc)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def process_rss_bytes(pid: int) -> int:
+    """Current resident set size of a process (Linux /proc)."""
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+# ===== Browser session =====
+class BrowserSession:
+    """One websocket session: sends reruns with widget states, meters what comes back."""
+
+    def __init__(self, ws, server_pid: int, timeout: float):
+        self.ws = ws
+        self.server_pid = server_pid
+        self.timeout = timeout
+        self.widgets: Dict[str, Tuple[str, str]] = {}  # label or key -> (widget id, fragment id)
+        self.disabled: Set[str] = set()  # ids of widgets last rendered disabled
+        self.values: Dict[str, WidgetState] = {}  # widget id -> state the browser keeps sending
+        self.exceptions: List[str] = []  # uncaught script exceptions the page showed
+
+    def widget(self, name: str) -> Tuple[str, str]:
+        if name not in self.widgets:
+            raise LookupError(f"Widget {name!r} not rendered (have {list(self.widgets)})")
+        return self.widgets[name]
+
+    def is_disabled(self, name: str) -> bool:
+        return self.widget(name)[0] in self.disabled
+
+    async def interact(self, fragment_id: str = "", triggers: Tuple[str, ...] = ()) -> Dict[str, Any]:
+        """One rerun request. wall_ms runs to the last script run it caused, not to the quiet period."""
+        states = list(self.values.values()) + [WidgetState(id=t, trigger_value=True) for t in triggers]
+        message = BackMsg(rerun_script=ClientState(
+            widget_states=WidgetStates(widgets=states), fragment_id=fragment_id))
+        cpu_before = process_cpu_seconds(self.server_pid)
+        started = time.perf_counter()
+        await self.ws.send(message.SerializeToString())
+        sent, runs, finished_at = await self._receive()
+        return {
+            "runs": runs,
+            "kb": round(sent / 1024, 2),
+            "cpu_ms": round(1000 * (process_cpu_seconds(self.server_pid) - cpu_before), 1),
+            "wall_ms": round(1000 * (finished_at - started), 1),
+        }
+
+    async def _receive(self) -> Tuple[int, List[str], float]:
+        sent, runs, finished_at = 0, [], 0.0
+        while True:
+            try:
+                frame = await asyncio.wait_for(self.ws.recv(), QUIET_SECONDS if finished_at else self.timeout)
+            except asyncio.TimeoutError:
+                if finished_at:
+                    return sent, runs, finished_at
+                raise
+            sent += len(frame)
+            msg = ForwardMsg()
+            msg.ParseFromString(frame)
+            kind = msg.WhichOneof("type")
+            if kind == "delta":
+                self._observe(msg.delta)
+            elif kind == "script_finished":
+                runs.append(ForwardMsg.ScriptFinishedStatus.Name(msg.script_finished))
+                if msg.script_finished in FINISHED:
+                    finished_at = time.perf_counter()
+
+    def _observe(self, delta) -> None:
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element_type = delta.new_element.WhichOneof("type")
+        if element_type == "exception":
+            exception = delta.new_element.exception
+            self.exceptions.append(f"{exception.type}: {exception.message}")
+            return
+        if element_type not in WIDGET_TYPES:
+            return
+        element = getattr(delta.new_element, element_type)
+        entry = (element.id, delta.fragment_id)
+        self.widgets[element.label] = entry
+        # Keyed widgets are also found by key (their id ends with it)
+        if "-" in element.id:
+            self.widgets.setdefault(element.id.rsplit("-", 1)[-1], entry)
+        if element.disabled:
+            self.disabled.add(element.id)
+        else:
+            self.disabled.discard(element.id)
+
+
+# ===== Simulated student =====
+class SessionRun:
+    """One simulated student on its own websocket. steps holds (step name, seconds) per interaction."""
+
+    def __init__(self, session_no: int, course: str, questions: List[str], language: Optional[str],
+                 tts: bool, timeout: float):
+        self.session_no = session_no
+        self.course = course
+        self.questions = questions
+        self.language = language
+        self.tts = tts
+        self.timeout = timeout
+        self.steps: List[Tuple[str, float]] = []
+        self.script_runs = 0
+        self.skipped: List[str] = []
+        self.errors: List[str] = []
+        self.done = asyncio.Event()
+
+    async def _timed(self, session: BrowserSession, step: str, fragment_id: str = "",
+                     triggers: Tuple[str, ...] = ()) -> None:
+        shown = len(session.exceptions)
+        result = await session.interact(fragment_id, triggers)
+        self.steps.append((step, result["wall_ms"] / 1000))
+        self.script_runs += len(result["runs"])
+        self.errors.extend(f"{step}: {message}" for message in session.exceptions[shown:])
+
+    def _set(self, session: BrowserSession, name: str, **value) -> str:
+        widget_id, fragment_id = session.widget(name)
+        session.values[widget_id] = WidgetState(id=widget_id, **value)
+        return fragment_id
+
+    async def _steps(self, session: BrowserSession) -> None:
+        await self._timed(session, "open")
+        await self._timed(session, "select_course", self._set(session, COURSE_SELECT_KEY, string_value=self.course))
+        for i, question in enumerate(self.questions):
+            if self.language and i == 1:
+                fragment_id = self._set(session, LANGUAGE_LABEL, string_value=self.language)
+                await self._timed(session, "switch_language", fragment_id)
+            if self.tts and i == 2:
+                if session.is_disabled(TTS_LABEL):
+                    self.skipped.append("enable_tts")  # gTTS not installed on the server
+                else:
+                    await self._timed(session, "enable_tts", self._set(session, TTS_LABEL, bool_value=True))
+            input_id, _ = session.widget(QUESTION_LABEL)
+            send_id, send_fragment = session.widget(SEND_LABEL)
+            session.values[input_id] = WidgetState(id=input_id, string_value=question)
+            await self._timed(session, "query", send_fragment, (send_id,))
+            session.values.pop(input_id)  # clear_on_submit
+
+    def _failed(self, err: Exception) -> None:
+        self.errors.append(f"{type(err).__name__}: {err}")
+        if os.getenv("LOAD_TEST_TRACEBACKS"):
+            traceback.print_exc()
+
+    async def run(self, port: int, server_pid: int, release: asyncio.Event) -> "SessionRun":
+        """Runs the steps, then keeps the connection (and its server session) open until release."""
+        try:
+            async with connect(port) as ws:
+                try:
+                    await self._steps(BrowserSession(ws, server_pid, self.timeout))
+                except Exception as err:
+                    self._failed(err)
+                self.done.set()
+                await release.wait()
+        except Exception as err:
+            self._failed(err)
+        finally:
+            self.done.set()
+        return self
+
+
+async def run_level(port: int, server_pid: int, sessions: int, courses: List[str], args) -> Dict[str, Any]:
+    questions_per_session = args.queries
+    runs = []
+    for n in range(sessions):
+        questions = [QUESTIONS[(n + i) % len(QUESTIONS)] for i in range(questions_per_session)]
+        if not args.repeat_queries:
+            # Distinct wording per session, so the answer / retrieval caches don't hide the RAG cost
+            questions = [q if q == "hi" else f"{q} (student {n})" for q in questions]
+        language = LANGUAGES[n % len(LANGUAGES)] if args.switch_language else None
+        runs.append(SessionRun(n, courses[n % len(courses)], questions, language, args.tts, args.timeout))
+
+    release = asyncio.Event()
+    rss_before = process_rss_bytes(server_pid)
+    cpu_before = process_cpu_seconds(server_pid)
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(r.run(port, server_pid, release)) for r in runs]
+    await asyncio.gather(*(r.done.wait() for r in runs))
+    wall = time.perf_counter() - started
+    cpu = process_cpu_seconds(server_pid) - cpu_before
+    rss_after = process_rss_bytes(server_pid)  # every session is still connected
+    release.set()
+    await asyncio.gather(*tasks)
+
+    by_step: Dict[str, List[float]] = {}
+    for r in runs:
+        for step, seconds in r.steps:
+            by_step.setdefault(step, []).append(seconds)
+    queries = by_step.get("query", [])
+    script_runs = sum(r.script_runs for r in runs)
+    errors = [e for r in runs for e in r.errors]
+    skipped: Dict[str, int] = {}
+    for r in runs:
+        for step in r.skipped:
+            skipped[step] = skipped.get(step, 0) + 1
+    return {
+        "sessions": sessions,
+        "wall_s": round(wall, 2),
+        "script_runs": script_runs,
+        "queries": len(queries),
+        "queries_per_s": round(len(queries) / wall, 2) if wall else 0.0,
+        "runs_per_s": round(script_runs / wall, 2) if wall else 0.0,
+        "query_p50_ms": round(1000 * percentile(queries, 50), 1),
+        "query_p95_ms": round(1000 * percentile(queries, 95), 1),
+        "query_p99_ms": round(1000 * percentile(queries, 99), 1),
+        "steps": {
+            step: {"n": len(v), "mean_ms": round(1000 * statistics.mean(v), 1),
+                   "p95_ms": round(1000 * percentile(v, 95), 1)}
+            for step, v in by_step.items()
+        },
+        "skipped": skipped,
+        "server_cpu_ms_per_run": round(1000 * cpu / script_runs, 1) if script_runs else 0.0,
+        "rss_mb": round(rss_after / 2**20, 1),
+        "rss_per_session_kb": round(max(rss_after - rss_before, 0) / sessions / 1024, 1),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+    }
+
+
+def saturation_point(levels: List[Dict[str, Any]], min_gain: float, slo_ms: float) -> Optional[Dict[str, Any]]:
+    """First level where throughput gains less than min_gain over the previous level or p95 breaks the SLO."""
+    previous = None
+    for level in levels:
+        if level["query_p95_ms"] > slo_ms:
+            return {"sessions": level["sessions"], "reason": f"query p95 {level['query_p95_ms']} ms > {slo_ms:.0f} ms"}
+        if previous and level["queries_per_s"] < previous["queries_per_s"] * (1 + min_gain):
+            return {"sessions": level["sessions"],
+                    "reason": f"throughput {level['queries_per_s']}/s vs {previous['queries_per_s']}/s "
+                              f"at {previous['sessions']} sessions"}
+        previous = level
+    return None
+
+
+async def measure(port: int, server_pid: int, courses: List[str], args) -> List[Dict[str, Any]]:
+    if not args.cold:
+        # One session per course first: index builds are a one-off, not steady-state load
+        for course in courses:
+            warm = SessionRun(-1, course, [], None, False, args.timeout)
+            release = asyncio.Event()
+            release.set()
+            await warm.run(port, server_pid, release)
+            for error in warm.errors:
+                print(f"         warm-up error: {error}", file=sys.stderr)
+
+    results = []
+    print(f"{'sessions':>8} {'q/s':>7} {'runs/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'CPU/run':>8} {'KB/sess':>8} {'RSS MB':>7} {'errors':>6}")
+    for sessions in [int(x) for x in args.levels.split(",")]:
+        level = await run_level(port, server_pid, sessions, courses, args)
+        results.append(level)
+        print(f"{sessions:>8} {level['queries_per_s']:>7} {level['runs_per_s']:>7} {level['query_p50_ms']:>8} "
+              f"{level['query_p95_ms']:>8} {level['query_p99_ms']:>8} {level['server_cpu_ms_per_run']:>8} "
+              f"{level['rss_per_session_kb']:>8} {level['rss_mb']:>7} {level['errors']:>6}")
+        for step, count in level["skipped"].items():
+            print(f"         skipped {step} in {count} sessions (widget disabled on the server)", file=sys.stderr)
+        for sample in level["error_samples"]:
+            print(f"         error: {sample}", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=APP_PATH, help="Naresh_IT_bot.py to load (its directory is the cwd)")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Comma-separated concurrent session counts")
+    parser.add_argument("--queries", type=int, default=3, help="Questions per session")
+    parser.add_argument("--courses", type=int, default=4, help="Number of locally served course pages")
+    parser.add_argument("--no-language-switch", dest="switch_language", action="store_false")
+    parser.add_argument("--no-tts", dest="tts", action="store_false")
+    parser.add_argument("--repeat-queries", action="store_true", help="Same wording in every session (cache hits)")
+    parser.add_argument("--cold", action="store_true", help="Skip the warm-up session (first level builds indexes)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for one interaction")
+    parser.add_argument("--slo-ms", type=float, default=5000.0, help="Query p95 latency objective")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="Throughput gain needed to call a level unsaturated")
+    parser.add_argument("--out", default="", help="Write all results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="naresh-load-")
+    pages, catalog = serve_course_pages(workdir, args.courses)
+    catalog_path = os.path.join(workdir, "catalog.json")
+    with open(catalog_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f)
+    courses = list(catalog)
+    port = free_port()
+    log_path = os.path.join(workdir, "streamlit.log")
+    server = start_server(args.app, port, standin_env(workdir, catalog_path), log_path)
+    print(f"Serving {len(courses)} course pages from {workdir} (server log: {log_path})", file=sys.stderr)
+    try:
+        results = asyncio.run(measure(port, server.pid, courses, args))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        pages.shutdown()
+
+    saturated = saturation_point(results, args.min_gain, args.slo_ms)
+    if saturated:
+        print(f"\nSaturation at {saturated['sessions']} concurrent sessions: {saturated['reason']}")
+    else:
+        print(f"\nNo saturation up to {results[-1]['sessions']} concurrent sessions")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"app": args.app, "levels": results, "saturation": saturated}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
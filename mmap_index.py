@@ -0,0 +1,252 @@
+"""
+Memory-mapped, read-only course indexes shared by every app process on a host.
+
+A FAISS store loaded the usual way is a private copy per process: the float32 vectors
+plus a pickled InMemoryDocstore of Document objects. With several Streamlit processes
+per host every course index is held once per process. Here each built index is written
+once to INDEX_DIR/<course>/mmap-<key>/:
+
+    manifest.json    count, dimension, distance, normalize_L2, format version
+    vectors.f32      n x d float32 vectors, row i = chunk i
+    norms.f32        n squared L2 norms (for L2 search without touching every row twice)
+    chunks.bin       chunk records back to back: UTF-8 JSON {"t": text, "m": metadata}
+    chunks.off       n + 1 uint64 byte offsets into chunks.bin
+    transform.f32    only for reduced indexes (dim_reduction.py): the d x d_in matrix A and
+                     bias b applied to queries (then L2-normalized if the manifest says so)
+
+and every process opens it with numpy.memmap in read-only mode, so the pages live once
+in the OS page cache and are shared. Search is an exact flat (brute-force) L2 / inner
+product scan, like the IndexFlat the builder creates, and Documents are decoded only
+for the hits. The returned object is a regular LangChain FAISS store, so retrieval code
+does not change.
+
+<key> is a digest of the shared-cache key (course, chunking and embedding settings),
+so a settings change writes a new directory instead of reusing stale vectors. Writes
+go to a temporary directory that is renamed into place: readers never see a partial
+index, and when two processes race, the first rename wins.
+
+    MMAP_INDEXES=true
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from dim_reduction import apply_linear_map, linear_map
+from index_builder import cosine_relevance
+from index_store import index_dir_for
+
+logger = logging.getLogger(__name__)
+
+MMAP_INDEXES = os.getenv("MMAP_INDEXES", "true").strip().lower() in ("1", "true", "yes")
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+NORMS_FILE = "norms.f32"
+CHUNKS_FILE = "chunks.bin"
+TRANSFORM_FILE = "transform.f32"
+OFFSETS_FILE = "chunks.off"
+
+
+def mmap_dir_for(url: str, key: str) -> str:
+    return os.path.join(index_dir_for(url), "mmap-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+
+
+class MmapFlatIndex:
+    """Exact flat index over a memory-mapped n x d float32 matrix (the subset of the faiss.Index API LangChain uses)."""
+
+    def __init__(self, vectors: np.ndarray, norms: np.ndarray, inner_product: bool = False,
+                 transform: Optional[Tuple[np.ndarray, np.ndarray, bool]] = None):
+        self.vectors = vectors
+        self.norms = norms
+        self.inner_product = inner_product
+        self.transform = transform  # (A, b, normalize) of a reduced index; queries arrive at full dimension
+        self.ntotal = vectors.shape[0]
+        self.d = transform[0].shape[1] if transform else vectors.shape[1]
+
+    def search(self, queries: np.ndarray, k: int):
+        """(distances, ids) like faiss: squared L2 ascending, or inner product descending; -1 pads."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.d)
+        if self.transform:
+            queries = apply_linear_map(queries, *self.transform)
+        k = max(int(k), 1)
+        distances = np.full((len(queries), k), np.inf if not self.inner_product else -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if not self.ntotal:
+            return distances, ids
+        for row, query in enumerate(queries):
+            dots = self.vectors @ query
+            if self.inner_product:
+                scores = dots
+            else:
+                scores = self.norms - 2.0 * dots + float(query @ query)
+            top = min(k, self.ntotal)
+            order = -scores if self.inner_product else scores
+            best = np.argpartition(order, top - 1)[:top] if top < self.ntotal else np.arange(self.ntotal)
+            best = best[np.argsort(order[best], kind="stable")]
+            distances[row, :top] = scores[best]
+            ids[row, :top] = best
+        return distances, ids
+
+    def reconstruct(self, i: int) -> np.ndarray:
+        vector = np.array(self.vectors[int(i)])
+        if self.transform:
+            A, b, _ = self.transform
+            return (A.T @ (vector - b)).astype(np.float32)  # approximate, as with faiss reverse transforms
+        return vector
+
+    def private_bytes(self) -> int:
+        return 0  # the mapped pages are shared through the page cache
+
+
+class MmapChunkStore(Docstore):
+    """Read-only docstore over chunks.bin / chunks.off; ids are chunk positions ("0", "1", ...)."""
+
+    def __init__(self, directory: str):
+        self.offsets = np.memmap(os.path.join(directory, OFFSETS_FILE), dtype=np.uint64, mode="r")
+        self.count = len(self.offsets) - 1
+        path = os.path.join(directory, CHUNKS_FILE)
+        self.data = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, np.uint8)
+
+    def document(self, i: int) -> Document:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        record = json.loads(self.data[start:end].tobytes().decode("utf-8"))
+        return Document(page_content=record["t"], metadata=record.get("m") or {})
+
+    def search(self, search: str) -> Union[str, Document]:
+        try:
+            i = int(search)
+        except ValueError:
+            return f"ID {search} not found."
+        if not 0 <= i < self.count:
+            return f"ID {search} not found."
+        return self.document(i)
+
+    def delete(self, ids) -> None:
+        raise NotImplementedError("Memory-mapped indexes are read-only")
+
+    def private_bytes(self) -> int:
+        return 0
+
+
+class PositionIds(Mapping):
+    """index_to_docstore_id without a per-chunk dict: position i -> id "i"."""
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= int(i) < self.count:
+            raise KeyError(i)
+        return str(int(i))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+# ===== Write / open =====
+def write_mmap_index(url: str, key: str, vectordb: FAISS) -> str:
+    """Writes a built FAISS store in the shared mmap format (no-op if it already exists)."""
+    target = mmap_dir_for(url, key)
+    if os.path.exists(os.path.join(target, MANIFEST_FILE)):
+        return target
+    parent = index_dir_for(url, create=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".mmap-")
+    try:
+        count = vectordb.index.ntotal
+        reduction = linear_map(vectordb.index)
+        stored = reduction[3] if reduction else vectordb.index
+        vectors = np.ascontiguousarray(stored.reconstruct_n(0, count), dtype=np.float32) if count \
+            else np.zeros((0, stored.d), dtype=np.float32)
+        vectors.tofile(os.path.join(tmp, VECTORS_FILE))
+        if reduction:
+            A, b, _, _ = reduction
+            np.concatenate([A.ravel(), b]).astype(np.float32).tofile(os.path.join(tmp, TRANSFORM_FILE))
+        np.einsum("ij,ij->i", vectors, vectors).astype(np.float32).tofile(os.path.join(tmp, NORMS_FILE))
+
+        offsets = np.zeros(count + 1, dtype=np.uint64)
+        with open(os.path.join(tmp, CHUNKS_FILE), "wb") as f:
+            position = 0
+            for i in range(count):
+                doc = vectordb.docstore.search(vectordb.index_to_docstore_id[i])
+                record = json.dumps({"t": doc.page_content, "m": doc.metadata}, ensure_ascii=False,
+                                    separators=(",", ":"), default=str).encode("utf-8")
+                f.write(record)
+                position += len(record)
+                offsets[i + 1] = position
+        offsets.tofile(os.path.join(tmp, OFFSETS_FILE))
+
+        manifest = {
+            "version": FORMAT_VERSION,
+            "count": count,
+            "dimension": int(stored.d),
+            "distance": str(getattr(vectordb.distance_strategy, "value", vectordb.distance_strategy)),
+            "normalize_L2": bool(getattr(vectordb, "_normalize_L2", False)),
+            "key": key,
+        }
+        if reduction:
+            manifest["transform"] = {"dimension_in": int(vectordb.index.d), "normalize": bool(reduction[2])}
+        with open(os.path.join(tmp, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            if not os.path.exists(os.path.join(target, MANIFEST_FILE)):
+                raise
+            # Another process finished first: use its copy
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    logger.info("Wrote shared mmap index for %s (%d chunks) to %s", url, count, target)
+    return target
+
+
+def open_mmap_index(url: str, key: str, embeddings: Embeddings) -> Optional[FAISS]:
+    """Opens the shared mmap index for (url, key); None if it has not been written yet."""
+    directory = mmap_dir_for(url, key)
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest: Dict[str, Any] = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != FORMAT_VERSION:
+        return None
+    count, dimension = int(manifest["count"]), int(manifest["dimension"])
+    if count:
+        vectors = np.memmap(os.path.join(directory, VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, dimension))
+        norms = np.memmap(os.path.join(directory, NORMS_FILE), dtype=np.float32, mode="r", shape=(count,))
+    else:
+        vectors, norms = np.zeros((0, dimension), np.float32), np.zeros(0, np.float32)
+    transform = None
+    if manifest.get("transform"):
+        d_in = int(manifest["transform"]["dimension_in"])
+        raw = np.fromfile(os.path.join(directory, TRANSFORM_FILE), dtype=np.float32)
+        transform = (raw[:dimension * d_in].reshape(dimension, d_in), raw[dimension * d_in:],
+                     bool(manifest["transform"].get("normalize")))
+    distance = DistanceStrategy(manifest.get("distance", DistanceStrategy.EUCLIDEAN_DISTANCE.value))
+    index = MmapFlatIndex(vectors, norms, inner_product=distance != DistanceStrategy.EUCLIDEAN_DISTANCE,
+                          transform=transform)
+    normalize = bool(manifest.get("normalize_L2", False))
+    return FAISS(
+        embeddings,
+        index,
+        MmapChunkStore(directory),
+        PositionIds(count),
+        relevance_score_fn=cosine_relevance if normalize and distance == DistanceStrategy.EUCLIDEAN_DISTANCE else None,
+        normalize_L2=normalize,
+        distance_strategy=distance,
+    )
@@ -0,0 +1,355 @@
+"""
+Near-duplicate chunk elimination (MinHash / LSH) at ingest.
+
+Course pages repeat the same blocks (trainer pitch, placement assistance, FAQs, contact
+details) with small variations. After splitting they become many almost identical
+vectors that crowd the top-k results. Each chunk gets a MinHash signature over its word
+shingles; LSH banding finds candidate pairs without comparing every pair, and candidates
+are kept only when their Jaccard similarity is at least DEDUP_THRESHOLD.
+
+    within a course     near-duplicates collapse into the first occurrence (page order);
+                        its metadata lists what was merged ("duplicates": source and
+                        heading of each one) and how many ("duplicate_count")
+    across courses      every course keeps its copy, because each course has its own index
+                        and its students still need the block. The chunk is marked
+                        "shared_with" the other courses, and the index build reuses the
+                        vector already computed for the matching chunk instead of
+                        embedding it again (DedupEmbeddings)
+
+Signatures, LSH bands and chunk vectors live in a small SQLite file (DEDUP_DB), so
+courses indexed later (or by another process on the host) match earlier ones.
+
+    DEDUP_ENABLED=true
+    DEDUP_THRESHOLD=0.8        Jaccard similarity of 5-word shingles
+    DEDUP_NUM_PERM=128         MinHash permutations
+    DEDUP_SHINGLE_WORDS=5
+
+    python near_duplicates.py  # per-course report: chunks, duplicates, shared, embedding calls saved
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from context_assembly import document_body
+from index_store import INDEX_DIR
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_SHINGLE_WORDS = int(os.getenv("DEDUP_SHINGLE_WORDS", "5"))
+DEDUP_DB = os.getenv("DEDUP_DB", os.path.join(INDEX_DIR, "dedup.db"))
+
+# LSH bands are tuned to catch pairs somewhat below the threshold; candidates are verified
+LSH_RECALL_MARGIN = 0.1
+MERSENNE_PRIME = (1 << 61) - 1
+SEED = 1234
+_WORD = re.compile(r"\w+")
+
+
+def chunk_digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def shingles(text: str, size: int = DEDUP_SHINGLE_WORDS) -> set:
+    """32-bit hashes of the chunk's overlapping `size`-word windows (the whole text if shorter)."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        windows = [" ".join(words)]
+    else:
+        windows = (" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return {int.from_bytes(hashlib.blake2b(w.encode("utf-8"), digest_size=4).digest(), "little") for w in windows}
+
+
+def jaccard(left: set, right: set) -> float:
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows per band) whose S-curve midpoint (1/b)^(1/r) is nearest threshold - margin."""
+    target = max(threshold - LSH_RECALL_MARGIN, 0.05)
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if abs((1 / bands) ** (1 / rows) - target) < abs((1 / best[0]) ** (1 / best[1]) - target):
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    """MinHash signatures with fixed random hash functions (a*x + b mod 2^61-1), so they are comparable across runs."""
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, threshold: float = DEDUP_THRESHOLD):
+        rng = np.random.RandomState(SEED)
+        # a, b < 2^32 and x < 2^32 keep a*x + b inside uint64
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+
+    def signature(self, hashes: set) -> np.ndarray:
+        if not hashes:
+            return np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        return ((np.outer(x, self.a) + self.b) % MERSENNE_PRIME).min(axis=0)
+
+    def band_keys(self, signature: np.ndarray) -> List[str]:
+        return [
+            f"{band}:{hashlib.sha1(signature[band * self.rows:(band + 1) * self.rows].tobytes()).hexdigest()[:16]}"
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(left: np.ndarray, right: np.ndarray) -> float:
+        """Estimated Jaccard similarity: the share of equal signature slots."""
+        return float(np.mean(left == right))
+
+
+# ===== Within a course =====
+def collapse_duplicates(chunks: List[Document], hasher: MinHasher,
+                        threshold: float = DEDUP_THRESHOLD) -> Tuple[List[Document], List[np.ndarray]]:
+    """
+    Merges near-duplicate chunks into their first occurrence. Returns the kept chunks
+    (copies, in page order) and their signatures.
+    """
+    kept: List[Document] = []
+    kept_shingles: List[set] = []
+    signatures: List[np.ndarray] = []
+    buckets: Dict[str, List[int]] = {}
+    for chunk in chunks:
+        chunk_shingles = shingles(document_body(chunk))
+        signature = hasher.signature(chunk_shingles)
+        keys = hasher.band_keys(signature)
+        candidates = sorted({i for key in keys for i in buckets.get(key, [])})
+        match = next((i for i in candidates if jaccard(chunk_shingles, kept_shingles[i]) >= threshold), None)
+        if match is not None:
+            metadata = kept[match].metadata
+            metadata["duplicate_count"] = metadata.get("duplicate_count", 0) + 1
+            metadata.setdefault("duplicates", []).append({
+                "source": chunk.metadata.get("source", ""),
+                "heading": chunk.metadata.get("heading_path") or chunk.metadata.get("heading", ""),
+            })
+            continue
+        for key in keys:
+            buckets.setdefault(key, []).append(len(kept))
+        kept.append(Document(page_content=chunk.page_content, metadata=dict(chunk.metadata)))
+        kept_shingles.append(chunk_shingles)
+        signatures.append(signature)
+    return kept, signatures
+
+
+# ===== Across courses =====
+class DedupRegistry:
+    """Chunk signatures, LSH bands and chunk vectors of every ingested course, in one SQLite file."""
+
+    def __init__(self, path: str = DEDUP_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " digest TEXT NOT NULL, course TEXT NOT NULL, canonical TEXT NOT NULL, signature BLOB NOT NULL,"
+                " PRIMARY KEY (course, digest))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_chunks_digest ON chunks (digest)")
+            db.execute("CREATE TABLE IF NOT EXISTS bands (band TEXT NOT NULL, course TEXT NOT NULL, digest TEXT NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_bands_band ON bands (band)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_bands_course ON bands (course)")
+            # Vectors are keyed by the exact chunk text, so they stay valid when a course is re-ingested
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS vectors ("
+                " digest TEXT NOT NULL, model TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (digest, model))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: safe across Streamlit's script threads
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def register(self, course: str, chunks: List[Document], signatures: List[np.ndarray], hasher: MinHasher,
+                 threshold: float = DEDUP_THRESHOLD) -> int:
+        """
+        Replaces the course's chunks and links each to a near-duplicate in another course
+        (metadata "shared_with"). Returns the number of shared chunks.
+        """
+        shared = 0
+        with self._connect() as db:
+            db.execute("DELETE FROM chunks WHERE course = ?", (course,))
+            db.execute("DELETE FROM bands WHERE course = ?", (course,))
+            for chunk, signature in zip(chunks, signatures):
+                digest = chunk_digest(chunk.page_content)
+                keys = hasher.band_keys(signature)
+                marks = ",".join("?" * len(keys))
+                rows = db.execute(
+                    f"SELECT DISTINCT c.digest, c.course, c.canonical, c.signature FROM bands b"
+                    f" JOIN chunks c ON c.course = b.course AND c.digest = b.digest"
+                    f" WHERE b.band IN ({marks}) AND b.course != ?",
+                    (*keys, course),
+                ).fetchall()
+                matches = [
+                    (other_course, canonical) for _, other_course, canonical, blob in rows
+                    if MinHasher.similarity(signature, np.frombuffer(blob, dtype=np.uint64)) >= threshold
+                ]
+                canonical = min(canonical for _, canonical in matches) if matches else digest
+                if matches:
+                    shared += 1
+                    chunk.metadata["shared_with"] = sorted({other for other, _ in matches})
+                db.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)",
+                           (digest, course, canonical, signature.astype(np.uint64).tobytes()))
+                db.executemany("INSERT INTO bands VALUES (?, ?, ?)", [(key, course, digest) for key in keys])
+        return shared
+
+    def vectors(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Stored vector of each text, or of the chunk it was matched to in another course."""
+        found: List[Optional[List[float]]] = []
+        with self._connect() as db:
+            for text in texts:
+                digest = chunk_digest(text)
+                # The text itself, or any chunk with the same canonical (whichever course was built first)
+                row = db.execute(
+                    "SELECT vector FROM vectors WHERE model = ? AND digest IN"
+                    " (SELECT ? UNION SELECT digest FROM chunks WHERE canonical IN"
+                    "  (SELECT canonical FROM chunks WHERE digest = ?))"
+                    " ORDER BY digest != ? LIMIT 1",
+                    (model, digest, digest, digest),
+                ).fetchone()
+                found.append(np.frombuffer(row[0], dtype=np.float32).tolist() if row else None)
+        return found
+
+    def store_vectors(self, texts: List[str], vectors: List[List[float]], model: str) -> None:
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO vectors VALUES (?, ?, ?)",
+                [(chunk_digest(t), model, np.asarray(v, dtype=np.float32).tobytes()) for t, v in zip(texts, vectors)],
+            )
+
+
+class DedupEmbeddings(Embeddings):
+    """
+    Index-build embeddings: chunks whose vector (or a near-duplicate's from another
+    course) is already in the registry are not embedded again; new vectors are stored.
+    """
+
+    def __init__(self, inner: Embeddings, registry: DedupRegistry, model: str):
+        self.inner = inner
+        self.registry = registry
+        self.model = model
+        self.reused = 0
+        self.embedded = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        try:
+            vectors = self.registry.vectors(texts, self.model)
+        except sqlite3.Error as err:
+            logger.warning("Dedup registry unavailable, embedding every chunk: %s", err)
+            return self.inner.embed_documents(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = self.inner.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+            try:
+                self.registry.store_vectors([texts[i] for i in missing], fresh, self.model)
+            except sqlite3.Error as err:
+                logger.warning("Storing chunk vectors failed: %s", err)
+        with self._lock:
+            self.reused += len(texts) - len(missing)
+            self.embedded += len(missing)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+
+def dedupe_chunks(chunks: List[Document], course: str, registry: Optional[DedupRegistry] = None,
+                  threshold: float = DEDUP_THRESHOLD,
+                  hasher: Optional[MinHasher] = None) -> Tuple[List[Document], Dict[str, Any]]:
+    """
+    Collapses near-duplicates within the course and, with a registry, links chunks shared
+    with other courses. Returns (kept chunks, report).
+    """
+    hasher = hasher or MinHasher(threshold=threshold)
+    kept, signatures = collapse_duplicates(chunks, hasher, threshold)
+    shared = 0
+    if registry is not None:
+        try:
+            shared = registry.register(course, kept, signatures, hasher, threshold)
+        except sqlite3.Error as err:
+            logger.warning("Cross-course de-duplication skipped for %s: %s", course, err)
+    removed = len(chunks) - len(kept)
+    report = {
+        "chunks_before_dedup": len(chunks),
+        "duplicates_removed": removed,
+        "shared_chunks": shared,
+        # Each removed chunk is one vector and one embedded text less; shared chunks reuse a vector
+        "embeddings_saved": removed + shared,
+        "dedup_reduction_pct": round(100.0 * removed / len(chunks), 1) if chunks else 0.0,
+    }
+    logger.info("De-duplicated %s: %d -> %d chunks, %d shared with other courses",
+                course, len(chunks), len(kept), shared)
+    return kept, report
+
+
+def create_dedup_registry(path: str = DEDUP_DB) -> Optional[DedupRegistry]:
+    """The host's registry, or None when de-duplication is off or the file can't be opened."""
+    if not DEDUP_ENABLED:
+        return None
+    try:
+        return DedupRegistry(path)
+    except (sqlite3.Error, OSError) as err:
+        logger.warning("Dedup registry unavailable (%s); de-duplicating within courses only", err)
+        return None
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from course_content import COURSE_OPTIONS, COURSE_PAGES, load_course_chunks
+
+    logging.basicConfig(level=logging.WARNING)
+    # A scratch registry, so the report doesn't depend on (or change) the app's
+    scratch = DedupRegistry(os.path.join(tempfile.mkdtemp(prefix="dedup_"), "dedup.db"))
+    totals = {"before": 0, "after": 0, "shared": 0}
+    print(f"{'Course':45} {'chunks':>6} {'kept':>6} {'dups':>5} {'shared':>6} {'embeds saved':>12}")
+    for name, course_url in COURSE_OPTIONS.items():
+        try:
+            course_chunks, _ = load_course_chunks(course_url, subpages=COURSE_PAGES.get(course_url))
+        except Exception as err:
+            print(f"{name:45} failed: {err}")
+            continue
+        kept_chunks, r = dedupe_chunks(course_chunks, course_url, scratch)
+        totals["before"] += len(course_chunks)
+        totals["after"] += len(kept_chunks)
+        totals["shared"] += r["shared_chunks"]
+        print(f"{name:45} {len(course_chunks):>6} {len(kept_chunks):>6} {r['duplicates_removed']:>5} "
+              f"{r['shared_chunks']:>6} {r['embeddings_saved']:>12}")
+    if totals["before"]:
+        saved = totals["before"] - totals["after"] + totals["shared"]
+        print(json.dumps({
+            "chunks": totals["before"],
+            "indexed_vectors": totals["after"],
+            "index_reduction_pct": round(100.0 * (totals["before"] - totals["after"]) / totals["before"], 1),
+            "chunks_embedded": totals["before"] - saved,
+            "embedding_reduction_pct": round(100.0 * saved / totals["before"], 1),
+            "lsh_bands_rows": list(lsh_params(DEDUP_THRESHOLD, DEDUP_NUM_PERM)),
+        }, indent=2))
@@ -0,0 +1,286 @@
+"""
+Opt-in profiling of script runs and index builds.
+
+    PROFILE=cprofile      deterministic (cProfile): exact call counts, higher overhead
+    PROFILE=sample        a sampling thread records the profiled thread's stack every
+                          PROFILE_INTERVAL_MS; low overhead, exact stacks
+    ?profile=sample       the same for one browser session (only with PROFILE_ALLOW_QUERY=true:
+                          off by default, since any visitor could switch profiling on)
+
+Every profiled script run (full or fragment-only) and every course index load/build
+writes to PROFILE_DIR:
+
+    <time>-<label>.folded   "outer;inner;leaf value" lines: flamegraph.pl, speedscope,
+                            inferno. Values are samples (sample) or microseconds (cprofile,
+                            call tree rebuilt from caller edges, so shared callees are
+                            apportioned)
+    <time>-<label>.txt      top PROFILE_TOP_N hotspots
+    <time>-<label>.prof     pstats dump (cprofile only; snakeviz, python -m pstats)
+
+Only the newest PROFILE_KEEP runs are kept.
+
+cProfile hooks the thread that enabled it, and only that thread can disable it. A cProfile
+profile stopped from another thread (a run closed when the session's next run starts) is
+finished by its own thread when that thread next starts a profile.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODE_CPROFILE = "cprofile"
+MODE_SAMPLE = "sample"
+MODES = (MODE_CPROFILE, MODE_SAMPLE)
+
+PROFILE_MODE = os.getenv("PROFILE", "").strip().lower()
+PROFILE_ALLOW_QUERY = os.getenv("PROFILE_ALLOW_QUERY", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+
+# cProfile call-tree paths below this many microseconds are dropped from .folded output
+MIN_FOLDED_US = 50
+MAX_STACK_DEPTH = 128
+
+# cProfile profiles stopped from another thread, by the id of the thread they profile
+_deferred: Dict[int, List["Profile"]] = defaultdict(list)
+_deferred_lock = threading.Lock()
+
+
+def requested_mode() -> str:
+    """PROFILE, overridden per session by ?profile=cprofile|sample|off; "" when profiling is off."""
+    mode = PROFILE_MODE
+    if PROFILE_ALLOW_QUERY:
+        try:
+            import streamlit as st
+
+            mode = (st.query_params.get("profile") or mode).strip().lower()
+        except Exception:
+            pass  # no script run context (e.g. the warm-up thread): environment only
+    return mode if mode in MODES else ""
+
+
+def frame_label(filename: str, line: int, name: str) -> str:
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _slug(label: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", label).strip("-")[:60] or "run"
+
+
+# ===== Sampling =====
+class StackSampler:
+    """Samples one thread's Python stack on a background thread; folded stacks → sample counts."""
+
+    def __init__(self, thread_id: int, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = max(interval_ms, 0.5) / 1000.0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return  # the profiled thread has finished
+            stack: List[str] = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        return self.stacks
+
+
+def sample_hotspots(stacks: Counter, top_n: int = PROFILE_TOP_N) -> str:
+    """Top-N table by self samples, with the samples each function spent on the stack (total)."""
+    total = sum(stacks.values())
+    if not total:
+        return "No samples.\n"
+    self_counts: Counter = Counter()
+    total_counts: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    lines = [f"{total} samples\n", f"{'self%':>7} {'total%':>7} {'self':>7} {'total':>7}  function"]
+    for frame, count in self_counts.most_common(top_n):
+        lines.append(f"{100 * count / total:7.1f} {100 * total_counts[frame] / total:7.1f} "
+                     f"{count:7d} {total_counts[frame]:7d}  {frame}")
+    return "\n".join(lines) + "\n"
+
+
+# ===== cProfile =====
+def folded_from_stats(stats: pstats.Stats) -> Dict[str, int]:
+    """
+    Folded stacks (microseconds) rebuilt from cProfile's caller edges. A function called
+    from several places has its time split between them in proportion to each caller's
+    share of its cumulative time.
+    """
+    raw = stats.stats  # func -> (cc, nc, tt, ct, callers{caller: (cc, nc, tt, ct)})
+    children: Dict[Tuple, Dict[Tuple, float]] = defaultdict(dict)
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            children[caller][func] = edge[3]
+    roots = [func for func, entry in raw.items() if not entry[4]]
+    folded: Dict[str, int] = Counter()
+
+    def walk(func: Tuple, path: List[str], on_path: set, share: float) -> None:
+        _, _, tt, ct, _ = raw[func]
+        if ct * share * 1e6 < MIN_FOLDED_US or len(path) > MAX_STACK_DEPTH:
+            return
+        label = ";".join(path)
+        folded[label] += int(tt * share * 1e6)
+        for child, edge_ct in children.get(func, {}).items():
+            child_ct = raw[child][3]
+            if child in on_path or not child_ct:
+                continue  # recursion is folded into the first occurrence
+            walk(child, path + [frame_label(*child)], on_path | {child}, share * min(edge_ct / child_ct, 1.0))
+
+    for root in roots:
+        walk(root, [frame_label(*root)], {root}, 1.0)
+    return {stack: us for stack, us in folded.items() if us > 0}
+
+
+def cprofile_hotspots(stats: pstats.Stats, top_n: int = PROFILE_TOP_N) -> str:
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+    out.write("\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(top_n)
+    return out.getvalue()
+
+
+# ===== Profiles =====
+class Profile:
+    """One profiled run / build. stop() writes its files (from any thread, at most once)."""
+
+    def __init__(self, label: str, mode: str):
+        self.label = label
+        self.mode = mode
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.stopped = False
+        self._lock = threading.Lock()
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        if mode == MODE_CPROFILE and sys.getprofile() is None:
+            try:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                self._profiler = profiler
+            except ValueError:
+                pass  # another profiler is active (Python 3.12+ reports it here)
+        if self._profiler is None:
+            # Sampling mode, or the thread is already under cProfile (e.g. an index build
+            # inside a profiled script run): sample this block instead
+            self._sampler = StackSampler(threading.get_ident()).start()
+
+    def stop(self) -> Optional[str]:
+        """
+        Stops profiling and writes the output files. Returns their common path prefix, or
+        None if a cProfile profile was stopped from another thread (finished later, see
+        stop_deferred()).
+        """
+        with self._lock:
+            if self.stopped:
+                return None
+            if self.ended is None:
+                self.ended = time.perf_counter()
+            if self._profiler is not None and threading.get_ident() != self.thread_id:
+                with _deferred_lock:
+                    if self not in _deferred[self.thread_id]:
+                        _deferred[self.thread_id].append(self)
+                return None
+            self.stopped = True
+        elapsed_ms = (self.ended - self.started) * 1000
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            prefix = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed_ms)}ms-{_slug(self.label)}")
+            if self._profiler is not None:
+                self._profiler.disable()
+                stats = pstats.Stats(self._profiler)
+                stats.dump_stats(prefix + ".prof")
+                folded = folded_from_stats(stats)
+                table = cprofile_hotspots(stats)
+            else:
+                folded = self._sampler.stop()
+                table = sample_hotspots(folded)
+            with open(prefix + ".folded", "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {value}\n" for stack, value in sorted(folded.items()))
+            with open(prefix + ".txt", "w", encoding="utf-8") as f:
+                f.write(f"{self.label}: {elapsed_ms:.1f} ms wall, mode={self.mode}\n\n{table}")
+            prune_profiles()
+        except Exception as err:  # profiling must never break the page
+            logger.warning("Writing profile %s failed: %s", self.label, err)
+            return None
+        logger.info("profile %s (%.1f ms) written to %s.*", self.label, elapsed_ms, prefix)
+        return prefix
+
+
+def stop_deferred() -> None:
+    """Finishes this thread's cProfile profiles that other threads stopped."""
+    with _deferred_lock:
+        pending = _deferred.pop(threading.get_ident(), [])
+        alive = {thread.ident for thread in threading.enumerate()}
+        for thread_id in [t for t in _deferred if t not in alive]:
+            # The thread is gone and its hook with it; its stats can't be collected from here
+            for profile in _deferred.pop(thread_id):
+                logger.info("profile %s dropped: its thread exited before writing it", profile.label)
+    for profile in pending:
+        profile.stop()
+
+
+def start_profile(label: str, mode: Optional[str] = None) -> Optional[Profile]:
+    stop_deferred()
+    mode = requested_mode() if mode is None else mode
+    return Profile(label, mode) if mode in MODES else None
+
+
+@contextmanager
+def profiled(label: str, mode: Optional[str] = None):
+    """Profiles the enclosed block (e.g. an index build) when profiling is on."""
+    profile = start_profile(label, mode)
+    try:
+        yield profile
+    finally:
+        if profile is not None:
+            profile.stop()
+
+
+def prune_profiles(keep: int = PROFILE_KEEP) -> None:
+    """Deletes all but the newest `keep` runs' files."""
+    runs: Dict[str, float] = {}
+    for name in os.listdir(PROFILE_DIR):
+        prefix, ext = os.path.splitext(name)
+        if ext in (".folded", ".txt", ".prof"):
+            runs[prefix] = max(runs.get(prefix, 0.0), os.path.getmtime(os.path.join(PROFILE_DIR, name)))
+    for prefix in sorted(runs, key=runs.get)[:max(len(runs) - keep, 0)]:
+        for ext in (".folded", ".txt", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, prefix + ext))
+            except OSError:
+                pass
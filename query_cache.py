@@ -0,0 +1,128 @@
+"""
+In-process caches for the query side of retrieval.
+
+CachedQueryEmbeddings wraps the embeddings model and keeps an LRU of query vectors
+keyed by the normalized query text, so repeated questions (across sessions) skip the
+embedding round trip. With a shared cache (shared_cache.py) attached, a miss is looked
+up in the shared store before calling the model, so replicas reuse each other's vectors.
+RetrievalCache keeps the retrieved chunks per course index, so an exact repeat skips
+the FAISS search as well. Both report hit rates, and note hits / misses and search
+times on the current query trace (retrieval_trace.py).
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Hashable, Callable, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from intent_router import normalize_query
+from retrieval_trace import note, stage
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Small thread-safe LRU with hit/miss counters."""
+
+    def __init__(self, max_entries: int, name: str = "cache", log_every: int = 100):
+        self.max_entries = max_entries
+        self.name = name
+        self.log_every = log_every
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                self._maybe_log()
+                return self._data[key]
+            self.misses += 1
+            self._maybe_log()
+        value = compute()  # outside the lock: remote calls must not serialize all sessions
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def _maybe_log(self) -> None:
+        if self.log_every and (self.hits + self.misses) % self.log_every == 0:
+            logger.info("%s: %s", self.name, self.stats())
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that memoizes embed_query by normalized text. Documents pass through."""
+
+    def __init__(self, inner: Embeddings, max_entries: int = 2048, shared=None, model_name: str = ""):
+        self.inner = inner
+        self.cache = LRUCache(max_entries, name="query-embedding cache")
+        self.shared = shared
+        self.model_name = model_name or getattr(inner, "model", type(inner).__name__)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        # Looked up by the normalized text, but the model embeds the student's own wording
+        key = normalize_query(text)
+        source: List[str] = []  # filled on an LRU miss: "shared" hit or "miss" (model called)
+        vector = self.cache.get_or_compute(key, lambda: self._embed_uncached(key, text, source))
+        note(embedding_cache=source[-1] if source else "hit")
+        return vector
+
+    def _embed_uncached(self, key: str, text: str, source: List[str]) -> List[float]:
+        def _embed() -> List[float]:
+            source.append("miss")
+            with stage("embed"):
+                return self.inner.embed_query(text)
+
+        source.append("shared")
+        if self.shared is None:
+            return _embed()
+        shared_key = self.shared.make_key("query-embedding", self.model_name, key)
+        return self.shared.get_or_compute(shared_key, _embed, use_l1=False)
+
+
+class RetrievalCache:
+    """LRU of similarity-search results keyed by (course index, normalized query, k[, scored])."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.cache = LRUCache(max_entries, name="retrieval cache")
+
+    def search(self, vectordb, scope: str, query: str, k: int) -> List[Document]:
+        key = (scope, normalize_query(query), k)
+        return self.cache.get_or_compute(key, lambda: vectordb.similarity_search(query, k=k))
+
+    def search_with_scores(self, vectordb, scope: str, query: str, k: int) -> List[Tuple[Document, float]]:
+        """(chunk, relevance in [0, 1]) pairs, best first (used for adaptive retrieval depth)."""
+        key = (scope, normalize_query(query), k, "scored")
+        searched: List[bool] = []
+
+        def _search() -> List[Tuple[Document, float]]:
+            searched.append(True)
+            with stage("vector_search"):  # query embedding + FAISS
+                return vectordb.similarity_search_with_relevance_scores(query, k=k)
+
+        scored = self.cache.get_or_compute(key, _search)
+        note(retrieval_cache="miss" if searched else "hit")
+        return scored
@@ -0,0 +1,142 @@
+"""
+Per-rerun cost metrics: server CPU time of every full script run and fragment rerun.
+
+    cpu_ms      CPU time of the script thread for the run (time.thread_time)
+
+The run is metered at its own boundaries: begin_run() / end_run() around the script,
+and the metered() decorator around a fragment function, so nothing inside Streamlit is
+patched. Totals per kind ("full", "fragment:chat", ...) are kept process-wide in
+RERUN_STATS and logged at INFO every LOG_EVERY runs, so full reruns can be compared
+with fragment reruns. Bytes sent per interaction are measured on the websocket by
+bench_reruns.py.
+
+A run that ends early (st.rerun / st.stop) never reaches end_run(); it is closed when
+the session's next run starts. That run is on the same script thread, so its CPU time
+includes the restart; if it is on another thread, the run is counted without a CPU time.
+
+With profiling on (PROFILE=... or ?profile=..., see profiling.py) every metered run is
+also profiled, and its profile is written when the run is closed.
+"""
+import functools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import streamlit as st
+
+from profiling import start_profile
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except Exception:  # pragma: no cover
+    get_script_run_ctx = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+LOG_EVERY = 50
+METER_KEY = "_rerun_meter"
+
+
+class RerunStats:
+    """Thread-safe totals of CPU time, per run kind."""
+
+    def __init__(self, log_every: int = LOG_EVERY):
+        self.log_every = log_every
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, cpu_s: Optional[float]) -> None:
+        """Counts one run; cpu_s is None when its CPU time could not be measured."""
+        with self._lock:
+            totals = self._totals.setdefault(kind, {"runs": 0, "timed": 0, "cpu_s": 0.0})
+            totals["runs"] += 1
+            if cpu_s is not None:
+                totals["timed"] += 1
+                totals["cpu_s"] += cpu_s
+            runs = sum(t["runs"] for t in self._totals.values())
+        logger.debug("rerun kind=%s cpu_ms=%s", kind, "-" if cpu_s is None else f"{cpu_s * 1000:.1f}")
+        if self.log_every and runs % self.log_every == 0:
+            logger.info("rerun summary: %s", self.summary())
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                kind: {
+                    "runs": int(t["runs"]),
+                    "avg_cpu_ms": round(1000 * t["cpu_s"] / t["timed"], 2) if t["timed"] else None,
+                }
+                for kind, t in self._totals.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+RERUN_STATS = RerunStats()
+
+
+class _Meter:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.thread_id = threading.get_ident()
+        self.cpu_start = time.thread_time()
+        self.closed = False
+        self.profile = start_profile(kind)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        # thread_time() is per thread: only the thread that opened the meter can read its end
+        cpu_s = None
+        if threading.get_ident() == self.thread_id:
+            cpu_s = max(time.thread_time() - self.cpu_start, 0.0)
+        RERUN_STATS.record(self.kind, cpu_s)
+        if self.profile is not None:
+            self.profile.stop()
+
+
+def _context():
+    return get_script_run_ctx() if get_script_run_ctx is not None else None
+
+
+def begin_run(kind: str = "full") -> None:
+    """Starts metering this run; closes the session's previous run if it ended early."""
+    ctx = _context()
+    if ctx is None:
+        return
+    try:
+        previous: Optional[_Meter] = st.session_state.get(METER_KEY)
+        if previous is not None:
+            previous.close()
+        st.session_state[METER_KEY] = _Meter(kind)
+    except Exception as err:  # metering must never break the page
+        logger.debug("rerun metering unavailable: %s", err)
+
+
+def end_run() -> None:
+    try:
+        meter: Optional[_Meter] = st.session_state.get(METER_KEY)
+    except Exception:
+        return
+    if meter is not None:
+        meter.close()
+
+
+def metered(name: str) -> Callable:
+    """Decorator for fragment functions: fragment-only reruns are metered as 'fragment:<name>'."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            ctx = _context()
+            if not getattr(ctx, "fragment_ids_this_run", None):
+                return fn(*args, **kwargs)  # part of a full run, metered as a whole
+            begin_run(f"fragment:{name}")
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                end_run()
+        return wrapper
+    return decorator
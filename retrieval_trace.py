@@ -0,0 +1,329 @@
+"""
+Per-query retrieval traces: an opt-in inspector panel and a JSONL trace log.
+
+Every chat question gets a QueryTrace while tracing is on. The code on its path
+annotates the current trace (a context variable: LLM worker threads see it through
+traced_call) and does nothing when there is none:
+
+    query_cache.py          embedding cache hit / shared / miss, retrieval cache hit / miss,
+                            query embedding and vector search time
+    adaptive_retrieval.py   intent, every candidate chunk with its score and whether it
+                            was kept, retrieval time
+    the app                 route, context assembly, prompt / output tokens, LLM time
+
+A trace is complete once the turn is rendered and its LLM call (if any, a late answer
+included) has returned. It is then shown by the inspector panel under the chat and
+appended to the trace log as one JSON line:
+
+    {"ts", "trace_id", "session_id", "course", "query", "route", "retrieval_query",
+     "intent", "max_k", "embedding_cache", "retrieval_cache", "llm_state",
+     "chunks": [{"rank", "id", "score", "selected", "tokens", "section", "section_type", "source"}],
+     "context": {...context_assembly stats}, "prompt_tokens", "output_tokens",
+     "timings_ms": {"embed", "vector_search", "faiss", "retrieval", "context", "llm", "answer", ...}}
+
+"faiss" is the vector search without the query embedding; "answer" is how long the
+student waited for the first answer (extractive fallbacks included).
+
+    RETRIEVAL_TRACE=false                       append traces to RETRIEVAL_TRACE_FILE
+    RETRIEVAL_TRACE_FILE=traces/retrieval.jsonl
+    RETRIEVAL_TRACE_MAX_MB=50                   then rotated to <file>.1
+    RETRIEVAL_INSPECTOR=false                   the inspector panel for every session
+    RETRIEVAL_INSPECTOR_ALLOW_QUERY=false       true honours ?inspect=1 (the panel for one
+                                                browser session; never on public deployments)
+
+    python retrieval_trace.py summary
+    python retrieval_trace.py summary --course Django --file traces/retrieval.jsonl
+"""
+import argparse
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from conversation import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_TRACE = os.getenv("RETRIEVAL_TRACE", "false").lower() in ("1", "true", "yes")
+RETRIEVAL_TRACE_FILE = os.getenv(
+    "RETRIEVAL_TRACE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces", "retrieval.jsonl"))
+RETRIEVAL_TRACE_MAX_MB = float(os.getenv("RETRIEVAL_TRACE_MAX_MB", "50"))
+RETRIEVAL_INSPECTOR = os.getenv("RETRIEVAL_INSPECTOR", "false").lower() in ("1", "true", "yes")
+RETRIEVAL_INSPECTOR_ALLOW_QUERY = os.getenv("RETRIEVAL_INSPECTOR_ALLOW_QUERY", "false").lower() in ("1", "true", "yes")
+
+PART_TURN = "turn"
+PART_LLM = "llm"
+
+_current: contextvars.ContextVar = contextvars.ContextVar("retrieval_trace", default=None)
+
+
+def inspector_enabled() -> bool:
+    """RETRIEVAL_INSPECTOR, or ?inspect=1 for one browser session (only with RETRIEVAL_INSPECTOR_ALLOW_QUERY)."""
+    if RETRIEVAL_INSPECTOR:
+        return True
+    if not RETRIEVAL_INSPECTOR_ALLOW_QUERY:
+        return False
+    try:
+        import streamlit as st
+
+        return (st.query_params.get("inspect") or "").strip().lower() in ("1", "true", "yes")
+    except Exception:
+        return False  # no script run context
+
+
+def chunk_id(doc) -> str:
+    """Stable id of a chunk (source + text), the same across index rebuilds and replicas."""
+    digest = hashlib.sha1(f"{doc.metadata.get('source', '')}\0{doc.page_content}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+# ===== Traces =====
+class QueryTrace:
+    """
+    What happened to one question. Parts (the turn, the LLM call) complete independently;
+    on_complete gets the record once all expected parts are done.
+    """
+
+    def __init__(self, query: str, course: str = "", session_id: str = "",
+                 on_complete: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.fields: Dict[str, Any] = {
+            "ts": round(time.time(), 3),
+            "trace_id": uuid.uuid4().hex[:16],
+            "session_id": session_id,
+            "course": course,
+            "query": query,
+        }
+        self.timings: Dict[str, float] = {}
+        self.completed = False
+        self._pending = {PART_TURN}
+        self._on_complete = on_complete
+        self._lock = threading.Lock()
+
+    def note(self, **fields: Any) -> None:
+        with self._lock:
+            self.fields.update(fields)
+
+    def add_time(self, name: str, ms: float) -> None:
+        """Adds to a stage's time (a stage can run more than once per question)."""
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + ms
+
+    def set_candidates(self, scored: List[Tuple[Any, float]], selected: List[Any]) -> None:
+        """Every retrieved candidate (best first) with its score, and whether it was kept."""
+        kept = {id(doc) for doc in selected}
+        chunks = [{
+            "rank": rank,
+            "id": chunk_id(doc),
+            "score": round(float(score), 4),
+            "selected": id(doc) in kept,
+            "tokens": estimate_tokens(doc.page_content),
+            "section": doc.metadata.get("heading_path") or doc.metadata.get("heading", ""),
+            "section_type": doc.metadata.get("section_type", ""),
+            "source": doc.metadata.get("source", ""),
+        } for rank, (doc, score) in enumerate(scored, 1)]
+        self.note(chunks=chunks)
+
+    def expect(self, part: str) -> None:
+        with self._lock:
+            self._pending.add(part)
+
+    def complete(self, part: str) -> None:
+        with self._lock:
+            self._pending.discard(part)
+            done = not self._pending and not self.completed
+            if done:
+                self.completed = True
+        if done and self._on_complete is not None:
+            try:
+                self._on_complete(self.as_dict())
+            except Exception as err:  # tracing must never break an answer
+                logger.warning("Trace %s not recorded: %s", self.fields["trace_id"], err)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            record = dict(self.fields)
+            timings = dict(self.timings)
+        if "vector_search" in timings:
+            timings["faiss"] = max(timings["vector_search"] - timings.get("embed", 0.0), 0.0)
+        record["timings_ms"] = {name: round(ms, 2) for name, ms in timings.items()}
+        return record
+
+
+def current_trace() -> Optional[QueryTrace]:
+    return _current.get()
+
+
+@contextmanager
+def tracing(trace: Optional[QueryTrace]) -> Iterator[Optional[QueryTrace]]:
+    """Makes the trace current for the block (None: no tracing)."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def note(**fields: Any) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.note(**fields)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times the block into the current trace's stage `name`."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_time(name, 1000 * (time.perf_counter() - started))
+
+
+def complete_part(part: str) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.complete(part)
+
+
+def traced_call(call: Callable[[], Any], part: str = PART_LLM) -> Callable[[], Any]:
+    """
+    Wraps a call for a worker thread: it runs with the caller's current trace, and the
+    trace is not complete until it returns. If the wrapper never runs (the job was not
+    submitted), call complete_part(part) instead.
+    """
+    trace = _current.get()
+    if trace is None:
+        return call
+    trace.expect(part)
+    context = contextvars.copy_context()
+
+    def _run():
+        try:
+            return context.run(call)
+        finally:
+            trace.complete(part)
+
+    return _run
+
+
+# ===== Trace log =====
+class TraceLog:
+    """Appends completed traces as JSON lines; rotates the file to <file>.1 at max_mb."""
+
+    def __init__(self, path: str = RETRIEVAL_TRACE_FILE, max_mb: float = RETRIEVAL_TRACE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            try:
+                if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as err:
+                logger.warning("Trace log write failed: %s", err)
+
+
+def create_trace_log() -> Optional[TraceLog]:
+    if not RETRIEVAL_TRACE:
+        return None
+    try:
+        return TraceLog()
+    except OSError as err:
+        logger.warning("Retrieval trace log disabled: %s", err)
+        return None
+
+
+def read_traces(path: str = RETRIEVAL_TRACE_FILE) -> List[Dict[str, Any]]:
+    """Traces of the rotated file, then the current one (unreadable lines are skipped)."""
+    records = []
+    for name in (path + ".1", path):
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+# ===== Summary =====
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Route mix, cache hit rates, retrieval depth, prompt size and p50/p95 per stage."""
+    routes = Counter(r.get("route", "") for r in records)
+    embedding = Counter(r["embedding_cache"] for r in records if r.get("embedding_cache"))
+    retrieval = Counter(r["retrieval_cache"] for r in records if r.get("retrieval_cache"))
+    stages: Dict[str, List[float]] = defaultdict(list)
+    for r in records:
+        for name, ms in r.get("timings_ms", {}).items():
+            stages[name].append(ms)
+    by_intent: Dict[str, Dict[str, float]] = {}
+    for intent in sorted({r["intent"] for r in records if r.get("intent")}):
+        rows = [r for r in records if r.get("intent") == intent]
+        kept = [sum(c["selected"] for c in r.get("chunks", [])) for r in rows]
+        scores = [c["score"] for r in rows for c in r.get("chunks", []) if c["selected"]]
+        by_intent[intent] = {
+            "queries": len(rows),
+            "avg_candidates": round(sum(len(r.get("chunks", [])) for r in rows) / len(rows), 2),
+            "avg_selected": round(sum(kept) / len(rows), 2),
+            "selected_score_p50": round(percentile(scores, 50), 4),
+        }
+    prompts = [r["prompt_tokens"] for r in records if r.get("prompt_tokens")]
+    return {
+        "traces": len(records),
+        "routes": dict(routes),
+        "embedding_cache": dict(embedding),
+        "embedding_hit_rate": round(embedding["hit"] / sum(embedding.values()), 3) if embedding else 0.0,
+        "retrieval_hit_rate": round(retrieval["hit"] / sum(retrieval.values()), 3) if retrieval else 0.0,
+        "avg_prompt_tokens": round(sum(prompts) / len(prompts), 1) if prompts else 0.0,
+        "by_intent": by_intent,
+        "timings_ms": {name: {"p50": round(percentile(v, 50), 2), "p95": round(percentile(v, 95), 2),
+                              "n": len(v)} for name, v in sorted(stages.items())},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summary", help="aggregate the trace log")
+    summary.add_argument("--file", default=RETRIEVAL_TRACE_FILE)
+    summary.add_argument("--course", default="")
+    summary.add_argument("--since-hours", type=float, default=0.0)
+    args = parser.parse_args()
+
+    records = read_traces(args.file)
+    if args.course:
+        records = [r for r in records if r.get("course") == args.course]
+    if args.since_hours:
+        cutoff = time.time() - 3600 * args.since_hours
+        records = [r for r in records if r.get("ts", 0) >= cutoff]
+    print(json.dumps(summarize(records), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Durable chat-session storage shared across app replicas.
+
+Chat history is stored per (session id, course) as compact records, outside the
+Streamlit process, so a restarted or load-balanced replica can pick the session up
+again. History is loaded lazily, one page at a time, and every chat is capped in
+length and expires after a TTL.
+
+Backends (SESSION_BACKEND):
+    sqlite  (default)  SESSION_DB=./sessions.db  - one file, WAL mode, safe for several
+                                                   processes on the same host
+    redis              SESSION_REDIS_URL=redis://localhost:6379/0 - a Redis server (uses
+                       RPUSH/LRANGE/LSET/LLEN/LTRIM/DEL/EXPIRE/SADD/SMEMBERS/SREM)
+
+Base64 TTS audio is never persisted: it is large and can be regenerated.
+
+Session ids (resolve_session_id): anyone who knows an id can read that chat history, so
+ids are random and, by default, held only by the Streamlit session. To resume history
+across reloads and replicas:
+    SESSION_COOKIE=<name>      a cookie set in front of the app (auth proxy, load balancer)
+                               identifies the browser; the id is a hash of its value
+    SESSION_URL_RESUME=true    the id is kept in the URL (?sid=): whoever has the link,
+                               e.g. from a shared screenshot or browser history, can read
+                               the chat history. Off by default.
+"""
+import hashlib
+import json
+import os
+import re
+import uuid
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover
+    redis = None  # type: ignore
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite").strip().lower()
+SESSION_DB = os.getenv("SESSION_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db"))
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+MAX_MESSAGES_PER_CHAT = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(14 * 24 * 3600)))
+SESSION_COOKIE = os.getenv("SESSION_COOKIE", "").strip()
+SESSION_URL_RESUME = os.getenv("SESSION_URL_RESUME", "false").strip().lower() in ("1", "true", "yes")
+SESSION_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+ROLE_CODES = {"user": "u", "assistant": "a", "system": "s"}
+ROLE_NAMES = {v: k for k, v in ROLE_CODES.items()}
+
+
+def to_record(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact stored form of a chat message (audio and UI-only fields dropped)."""
+    return {
+        "r": ROLE_CODES.get(message.get("role"), "s"),
+        "c": message.get("content", ""),
+        "t": int(message.get("ts") or time.time()),
+    }
+
+
+def from_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {"role": ROLE_NAMES.get(record.get("r"), "system"), "content": record.get("c", ""), "ts": record.get("t")}
+
+
+def resolve_session_id(cookie: Optional[str] = None, url_sid: Optional[str] = None) -> str:
+    """
+    Id for a new Streamlit session: a hash of the SESSION_COOKIE value if the browser sent
+    one (the raw cookie is never stored), else url_sid if it is a well-formed id (only
+    passed with SESSION_URL_RESUME), else a new random id.
+    """
+    if cookie:
+        return hashlib.sha256(f"{SESSION_COOKIE}\0{cookie}".encode("utf-8")).hexdigest()[:32]
+    if url_sid and SESSION_ID_PATTERN.fullmatch(url_sid):
+        return url_sid
+    return uuid.uuid4().hex
+
+
+class SessionStore(ABC):
+    """Interface shared by the storage backends."""
+
+    def __init__(self, max_messages: int = MAX_MESSAGES_PER_CHAT, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def append(self, session_id: str, course: str, message: Dict[str, Any]) -> None:
+        """Adds a message to the chat, dropping the oldest past max_messages."""
+
+    @abstractmethod
+    def count(self, session_id: str, course: str) -> int:
+        """Number of stored messages in the chat."""
+
+    @abstractmethod
+    def replace(self, session_id: str, course: str, old: Dict[str, Any], new: Dict[str, Any],
+                search: int = 20) -> bool:
+        """
+        Replaces the newest stored copy of `old` among the last `search` messages (e.g. a
+        fallback answer upgraded once the LLM answer arrives). False if it is not found.
+        """
+
+    @abstractmethod
+    def load_page(self, session_id: str, course: str, skip_newest: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` messages in chronological order, ending `skip_newest`
+        messages before the newest one. (skip_newest=0 -> the latest page.)
+        """
+
+    @abstractmethod
+    def clear(self, session_id: str, course: str) -> None:
+        """Deletes the chat."""
+
+    @abstractmethod
+    def courses(self, session_id: str) -> List[str]:
+        """Courses the session has stored chats for."""
+
+    def load_all(self, session_id: str, course: str) -> List[Dict[str, Any]]:
+        """Full (capped) history of one chat, e.g. for export."""
+        return self.load_page(session_id, course, 0, self.max_messages)
+
+
+class SQLiteSessionStore(SessionStore):
+
+    def __init__(self, path: str = SESSION_DB, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._appends = 0
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL, course TEXT NOT NULL,"
+                " record TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (session_id, course, id)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS chats ("
+                " session_id TEXT NOT NULL, course TEXT NOT NULL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (session_id, course))"
+            )
+        self.purge_expired()
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: safe across Streamlit's script threads
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def append(self, session_id: str, course: str, message: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO messages (session_id, course, record, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, course, json.dumps(to_record(message), ensure_ascii=False), now),
+            )
+            db.execute(
+                "INSERT INTO chats (session_id, course, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id, course) DO UPDATE SET updated_at = excluded.updated_at",
+                (session_id, course, now),
+            )
+            # Cap: keep only the newest max_messages of this chat
+            db.execute(
+                "DELETE FROM messages WHERE session_id = ? AND course = ? AND id NOT IN ("
+                " SELECT id FROM messages WHERE session_id = ? AND course = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, course, session_id, course, self.max_messages),
+            )
+        with self._lock:
+            self._appends += 1
+            purge = self._appends % 500 == 0
+        if purge:
+            self.purge_expired()
+
+    def replace(self, session_id: str, course: str, old: Dict[str, Any], new: Dict[str, Any],
+                search: int = 20) -> bool:
+        target = to_record(old)
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, record FROM messages WHERE session_id = ? AND course = ? ORDER BY id DESC LIMIT ?",
+                (session_id, course, search),
+            ).fetchall()
+            for row_id, record in rows:
+                if json.loads(record) == target:
+                    db.execute("UPDATE messages SET record = ? WHERE id = ?",
+                               (json.dumps(to_record(new), ensure_ascii=False), row_id))
+                    return True
+        return False
+
+    def count(self, session_id: str, course: str) -> int:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ? AND course = ?", (session_id, course)
+            ).fetchone()
+        return row[0]
+
+    def load_page(self, session_id: str, course: str, skip_newest: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT record FROM messages WHERE session_id = ? AND course = ? "
+                "ORDER BY id DESC LIMIT ? OFFSET ?",
+                (session_id, course, limit, skip_newest),
+            ).fetchall()
+        return [from_record(json.loads(r[0])) for r in reversed(rows)]
+
+    def clear(self, session_id: str, course: str) -> None:
+        with self._connect() as db:
+            db.execute("DELETE FROM messages WHERE session_id = ? AND course = ?", (session_id, course))
+            db.execute("DELETE FROM chats WHERE session_id = ? AND course = ?", (session_id, course))
+
+    def courses(self, session_id: str) -> List[str]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT course FROM chats WHERE session_id = ? ORDER BY updated_at DESC", (session_id,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def purge_expired(self) -> int:
+        """Deletes chats not touched within the TTL. Returns the number of chats removed."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._connect() as db:
+            expired = db.execute("SELECT session_id, course FROM chats WHERE updated_at < ?", (cutoff,)).fetchall()
+            for session_id, course in expired:
+                db.execute("DELETE FROM messages WHERE session_id = ? AND course = ?", (session_id, course))
+            db.execute("DELETE FROM chats WHERE updated_at < ?", (cutoff,))
+        return len(expired)
+
+
+class RedisSessionStore(SessionStore):
+    """Chats are Redis lists of JSON records; expiry is handled by the server via EXPIRE."""
+
+    def __init__(self, url: str = SESSION_REDIS_URL, client=None, **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            if redis is None:
+                raise RuntimeError("SESSION_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+
+    @staticmethod
+    def _chat_key(session_id: str, course: str) -> str:
+        return f"chat:{session_id}:{course}"
+
+    @staticmethod
+    def _courses_key(session_id: str) -> str:
+        return f"chat:{session_id}:_courses"
+
+    def append(self, session_id: str, course: str, message: Dict[str, Any]) -> None:
+        key = self._chat_key(session_id, course)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, json.dumps(to_record(message), ensure_ascii=False))
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.sadd(self._courses_key(session_id), course)
+        pipe.expire(self._courses_key(session_id), self.ttl_seconds)
+        pipe.execute()
+
+    def replace(self, session_id: str, course: str, old: Dict[str, Any], new: Dict[str, Any],
+                search: int = 20) -> bool:
+        key = self._chat_key(session_id, course)
+        target = to_record(old)
+        rows = self.client.lrange(key, -search, -1)
+        for offset, record in enumerate(reversed(rows), start=1):
+            if json.loads(record) == target:
+                self.client.lset(key, -offset, json.dumps(to_record(new), ensure_ascii=False))
+                return True
+        return False
+
+    def count(self, session_id: str, course: str) -> int:
+        return int(self.client.llen(self._chat_key(session_id, course)))
+
+    def load_page(self, session_id: str, course: str, skip_newest: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        end = -1 - skip_newest
+        start = end - limit + 1
+        total = self.count(session_id, course)
+        if total + end < 0:
+            return []
+        start = max(start, -total)
+        rows = self.client.lrange(self._chat_key(session_id, course), start, end)
+        return [from_record(json.loads(r)) for r in rows]
+
+    def clear(self, session_id: str, course: str) -> None:
+        self.client.delete(self._chat_key(session_id, course))
+        self.client.srem(self._courses_key(session_id), course)
+
+    def courses(self, session_id: str) -> List[str]:
+        return sorted(self.client.smembers(self._courses_key(session_id)))
+
+
+def create_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    if backend == "redis":
+        return RedisSessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend!r} (expected 'sqlite' or 'redis')")
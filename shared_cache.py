@@ -0,0 +1,442 @@
+"""
+Two-level cache shared by every app replica.
+
+    L1: per-process LRU (fast, private)
+    L2: shared store - a directory (local disk or a shared volume) or a Redis-protocol server
+
+Keys are versioned (CACHE_VERSION + namespace + hash of the key parts), so changing the
+chunking or embedding configuration never serves stale artifacts. Computation is
+stampede-protected: within a process only one thread computes a given key, and across
+replicas a lock in the shared store lets one replica compute while the others wait for
+its result instead of repeating the scrape / embedding work. The holder refreshes its
+lock while it computes, so a build longer than LOCK_TIMEOUT_SECONDS keeps it; only a
+lock whose holder died goes stale.
+
+The file store deletes an expired value when a read finds it, and every
+PRUNE_INTERVAL_SECONDS a write prunes the directory: expired values first, then the
+oldest written until it fits SHARED_CACHE_MAX_MB.
+
+Values are pickled (FAISS indexes too), and unpickling runs code, so every value in the
+shared store is signed: HMAC-SHA256 over key + payload with SHARED_CACHE_SECRET. A value
+whose signature does not verify is logged and treated as a miss, never deserialized, so
+write access to the store is not code execution on the replicas. The file backend on
+one host can use a generated secret (SHARED_CACHE_SECRET_FILE, created 0600 outside the
+cache directory); a Redis store or a volume shared between hosts needs the same
+SHARED_CACHE_SECRET on every replica, and without one the Redis tier is disabled.
+
+Configuration:
+    SHARED_CACHE_BACKEND=file|redis|none   (default: file)
+    SHARED_CACHE_DIR=./shared_cache
+    SHARED_CACHE_MAX_MB=2048               file store: oldest values are pruned past this (0 = no limit)
+    SHARED_CACHE_REDIS_URL=redis://localhost:6379/1
+    SHARED_CACHE_SECRET=                   signing key shared by all replicas
+    SHARED_CACHE_SECRET_FILE=./.shared_cache_secret
+    CACHE_VERSION=1                        bump to invalidate everything
+"""
+import hashlib
+import hmac
+import secrets
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover
+    redis = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_BACKEND = os.getenv("SHARED_CACHE_BACKEND", "file").strip().lower()
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "shared_cache"))
+SHARED_CACHE_REDIS_URL = os.getenv("SHARED_CACHE_REDIS_URL", "redis://localhost:6379/1")
+SHARED_CACHE_SECRET = os.getenv("SHARED_CACHE_SECRET", "")
+SHARED_CACHE_SECRET_FILE = os.getenv(
+    "SHARED_CACHE_SECRET_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".shared_cache_secret"))
+SHARED_CACHE_MAX_MB = float(os.getenv("SHARED_CACHE_MAX_MB", "2048"))
+CACHE_VERSION = os.getenv("CACHE_VERSION", "1")
+
+# Signed values: SIGNATURE_PREFIX + 32-byte HMAC-SHA256 + payload
+SIGNATURE_PREFIX = b"hs1:"
+
+# How long a replica waits for another replica's computation before doing it itself
+LOCK_TIMEOUT_SECONDS = 120
+LOCK_POLL_SECONDS = 0.25
+# How often a computing replica refreshes its lock
+LOCK_REFRESH_SECONDS = LOCK_TIMEOUT_SECONDS / 4
+PRUNE_INTERVAL_SECONDS = 600
+
+_MISSING = object()
+
+
+class SignatureError(ValueError):
+    """A shared-cache value that was not written by a replica holding the secret."""
+
+
+def sign(secret: bytes, key: str, payload: bytes) -> bytes:
+    digest = hmac.new(secret, key.encode("utf-8") + b"\0" + payload, hashlib.sha256).digest()
+    return SIGNATURE_PREFIX + digest + payload
+
+
+def verify(secret: bytes, key: str, raw: bytes) -> bytes:
+    """The payload of a signed value; SignatureError if it is unsigned or was tampered with."""
+    head = len(SIGNATURE_PREFIX)
+    if not raw.startswith(SIGNATURE_PREFIX) or len(raw) < head + 32:
+        raise SignatureError("unsigned value")
+    digest, payload = raw[head:head + 32], raw[head + 32:]
+    expected = hmac.new(secret, key.encode("utf-8") + b"\0" + payload, hashlib.sha256).digest()
+    if not hmac.compare_digest(digest, expected):
+        raise SignatureError("bad signature")
+    return payload
+
+
+def load_secret(path: str = SHARED_CACHE_SECRET_FILE) -> bytes:
+    """SHARED_CACHE_SECRET, else this host's generated secret (created on first use, mode 0600)."""
+    if SHARED_CACHE_SECRET:
+        return SHARED_CACHE_SECRET.encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+    secret = secrets.token_hex(32).encode("ascii")
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+    except FileExistsError:
+        return load_secret(path)  # another process created it first
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    return secret
+
+
+# ===== Shared stores =====
+class FileCacheBackend:
+    """One file per key under a directory; locks are O_EXCL lock files."""
+
+    def __init__(self, root: str = SHARED_CACHE_DIR, max_mb: float = SHARED_CACHE_MAX_MB):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._pruned_at = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key.replace("/", "__"))
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at = float(f.readline() or 0)
+                if expires_at and expires_at < time.time():
+                    # Unless a writer has just replaced it with a fresh value
+                    if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                        os.remove(path)
+                    return None
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else 0
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(f"{expires_at}\n".encode())
+            f.write(value)
+        os.replace(tmp, self._path(key))  # readers never see a partial value
+        if time.time() - self._pruned_at > PRUNE_INTERVAL_SECONDS:
+            self._pruned_at = time.time()
+            self.prune()
+
+    def prune(self) -> int:
+        """Deletes expired values, then the oldest written until the store fits max_bytes. Returns files deleted."""
+        now = time.time()
+        deleted, kept = 0, []
+        for name in os.listdir(self.root):
+            if name.startswith(".") or name.endswith(".lock"):
+                continue  # values being written, locks
+            path = os.path.join(self.root, name)
+            try:
+                stat = os.stat(path)
+                with open(path, "rb") as f:
+                    expires_at = float(f.readline() or 0)
+                if expires_at and expires_at < now:
+                    os.remove(path)
+                    deleted += 1
+                else:
+                    kept.append((stat.st_mtime, stat.st_size, path))
+            except (OSError, ValueError):
+                continue
+        total = sum(size for _, size, _ in kept)
+        for _, size, path in sorted(kept):
+            if not self.max_bytes or total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                deleted += 1
+            except OSError:
+                pass
+            total -= size
+        if deleted:
+            logger.info("Pruned %d shared cache files (%.1f MB left)", deleted, total / 1024 / 1024)
+        return deleted
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def acquire(self, key: str, timeout: float) -> bool:
+        path = self._path(key) + ".lock"
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            return True
+        except FileExistsError:
+            # A crashed holder leaves its lock behind: treat old locks as stale
+            try:
+                if time.time() - os.path.getmtime(path) > timeout:
+                    os.remove(path)
+            except OSError:
+                pass
+            return False
+
+    def refresh(self, key: str, timeout: float) -> None:
+        os.utime(self._path(key) + ".lock")
+
+    def release(self, key: str) -> None:
+        try:
+            os.remove(self._path(key) + ".lock")
+        except OSError:
+            pass
+
+
+class RedisCacheBackend:
+    """Values are plain Redis strings; locks are SET NX PX keys."""
+
+    def __init__(self, url: str = SHARED_CACHE_REDIS_URL, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("SHARED_CACHE_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.client.set(key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def acquire(self, key: str, timeout: float) -> bool:
+        return bool(self.client.set(f"{key}:lock", b"1", nx=True, px=int(timeout * 1000)))
+
+    def refresh(self, key: str, timeout: float) -> None:
+        self.client.pexpire(f"{key}:lock", int(timeout * 1000))
+
+    def release(self, key: str) -> None:
+        self.client.delete(f"{key}:lock")
+
+
+# ===== Two-level cache =====
+class TwoLevelCache:
+
+    def __init__(self, backend=None, l1_entries: int = 256, version: str = CACHE_VERSION,
+                 secret: Optional[bytes] = None):
+        if backend is not None and not secret:
+            raise ValueError("a shared cache backend needs a signing secret")
+        self.backend = backend
+        self.secret = secret
+        self.version = version
+        self.l1_entries = l1_entries
+        self._l1: "OrderedDict[str, Any]" = OrderedDict()
+        self._l1_lock = threading.Lock()
+        # key -> [lock, number of threads holding or waiting for it]
+        self._key_locks: Dict[str, List[Any]] = {}
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "waited": 0, "rejected": 0}
+
+    def make_key(self, namespace: str, *parts: Hashable) -> str:
+        digest = hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:32]
+        return f"v{self.version}/{namespace}/{digest}"
+
+    # ----- L1 -----
+    def _l1_get(self, key: str) -> Any:
+        with self._l1_lock:
+            if key in self._l1:
+                self._l1.move_to_end(key)
+                return self._l1[key]
+        return _MISSING
+
+    def _l1_put(self, key: str, value: Any) -> None:
+        with self._l1_lock:
+            self._l1[key] = value
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_entries:
+                self._l1.popitem(last=False)
+
+    # ----- L2 -----
+    def _l2_get(self, key: str, loads: Callable[[bytes], Any]) -> Any:
+        if self.backend is None:
+            return _MISSING
+        try:
+            raw = self.backend.get(key)
+            return _MISSING if raw is None else loads(verify(self.secret, key, raw))
+        except SignatureError as err:
+            self.stats["rejected"] += 1
+            logger.warning("shared cache value for %s rejected (%s); recomputing", key, err)
+            return _MISSING
+        except Exception as err:
+            logger.warning("shared cache read failed for %s: %s", key, err)
+            return _MISSING
+
+    def _l2_put(self, key: str, value: Any, dumps: Callable[[Any], bytes], ttl: Optional[float]) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(key, sign(self.secret, key, dumps(value)), ttl)
+        except Exception as err:
+            logger.warning("shared cache write failed for %s: %s", key, err)
+
+    # ----- public API -----
+    def get(self, key: str, loads: Callable[[bytes], Any] = pickle.loads, use_l1: bool = True) -> Any:
+        """Returns the cached value or None."""
+        value = self._l1_get(key) if use_l1 else _MISSING
+        if value is _MISSING:
+            value = self._l2_get(key, loads)
+            if value is not _MISSING and use_l1:
+                self._l1_put(key, value)
+        return None if value is _MISSING else value
+
+    def put(self, key: str, value: Any, dumps: Callable[[Any], bytes] = pickle.dumps,
+            ttl: Optional[float] = None, use_l1: bool = True) -> None:
+        if use_l1:
+            self._l1_put(key, value)
+        self._l2_put(key, value, dumps, ttl)
+
+    @contextmanager
+    def _single_flight(self, key: str):
+        with self._l1_lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            # Drop a per-key lock once no thread holds or waits for it, so the table doesn't
+            # grow with every distinct query (a waiter keeps it alive: no second lock is made)
+            with self._l1_lock:
+                entry[1] -= 1
+                if entry[1] == 0 and self._key_locks.get(key) is entry:
+                    del self._key_locks[key]
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       dumps: Callable[[Any], bytes] = pickle.dumps,
+                       loads: Callable[[bytes], Any] = pickle.loads,
+                       ttl: Optional[float] = None, use_l1: bool = True) -> Any:
+        """
+        L1 -> L2 -> compute. Only one thread per process and (while the lock is honoured)
+        one replica overall computes a given key; the others wait for the shared result.
+        """
+        if use_l1:
+            value = self._l1_get(key)
+            if value is not _MISSING:
+                self.stats["l1_hits"] += 1
+                return value
+
+        with self._single_flight(key):
+            if use_l1:
+                value = self._l1_get(key)
+                if value is not _MISSING:
+                    self.stats["l1_hits"] += 1
+                    return value
+            value = self._l2_get(key, loads)
+            if value is not _MISSING:
+                self.stats["l2_hits"] += 1
+                if use_l1:
+                    self._l1_put(key, value)
+                return value
+
+            holds_lock = self._acquire_shared(key)
+            try:
+                if not holds_lock:
+                    # Another replica is computing this key: wait for its result
+                    self.stats["waited"] += 1
+                    deadline = time.time() + LOCK_TIMEOUT_SECONDS
+                    while time.time() < deadline:
+                        time.sleep(LOCK_POLL_SECONDS)
+                        value = self._l2_get(key, loads)
+                        if value is not _MISSING:
+                            if use_l1:
+                                self._l1_put(key, value)
+                            return value
+                        if self._acquire_shared(key):
+                            holds_lock = True
+                            break
+                self.stats["misses"] += 1
+                with self._refreshing(key, holds_lock):
+                    value = compute()
+                self.put(key, value, dumps, ttl, use_l1)
+                return value
+            finally:
+                if holds_lock and self.backend is not None:
+                    try:
+                        self.backend.release(key)
+                    except Exception:
+                        pass
+
+    @contextmanager
+    def _refreshing(self, key: str, holds_lock: bool):
+        """Keeps the shared lock on key fresh while the body runs, so other replicas don't break it."""
+        if not holds_lock or self.backend is None:
+            yield
+            return
+        done = threading.Event()
+
+        def refresh():
+            while not done.wait(LOCK_REFRESH_SECONDS):
+                try:
+                    self.backend.refresh(key, LOCK_TIMEOUT_SECONDS)
+                except Exception as err:
+                    logger.warning("shared cache lock refresh failed for %s: %s", key, err)
+
+        threading.Thread(target=refresh, name="cache-lock-refresh", daemon=True).start()
+        try:
+            yield
+        finally:
+            done.set()
+
+    def _acquire_shared(self, key: str) -> bool:
+        if self.backend is None:
+            return True
+        try:
+            return self.backend.acquire(key, LOCK_TIMEOUT_SECONDS)
+        except Exception as err:
+            logger.warning("shared cache lock failed for %s: %s", key, err)
+            return True
+
+
+def create_shared_cache(backend: str = SHARED_CACHE_BACKEND) -> TwoLevelCache:
+    """Builds the cache from SHARED_CACHE_* settings; a broken shared store degrades to L1 only."""
+    try:
+        if backend == "redis":
+            if not SHARED_CACHE_SECRET:
+                raise RuntimeError("SHARED_CACHE_SECRET is required for a Redis store")
+            return TwoLevelCache(RedisCacheBackend(), secret=load_secret())
+        if backend == "file":
+            return TwoLevelCache(FileCacheBackend(), secret=load_secret())
+    except Exception as err:
+        logger.warning("shared cache backend %r unavailable (%s); using per-process cache only", backend, err)
+        return TwoLevelCache(None)
+    if backend == "none":
+        return TwoLevelCache(None)
+    raise ValueError(f"Unknown SHARED_CACHE_BACKEND: {backend!r} (expected 'file', 'redis' or 'none')")
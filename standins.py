@@ -0,0 +1,83 @@
+"""
+Stand-in remote services for load tests and offline runs.
+
+The app talks to four remote services: Gemini (answers), Gemini embeddings, Google
+Translate and Google TTS. The stand-ins here answer locally after a configurable
+delay that mimics the round trip, so load tests measure the app itself, not quota.
+
+    EMBEDDING_BACKEND=standin    hashed bag-of-words vectors (deterministic, no model)
+    LLM_BACKEND=standin          canned Gemini answers + stand-in translation and TTS
+    STANDIN_LLM_LATENCY_MS=1500
+    STANDIN_EMBEDDING_LATENCY_MS=80
+    STANDIN_SERVICE_LATENCY_MS=150   translation / TTS
+"""
+import hashlib
+import math
+import os
+import re
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+STANDIN_LLM_LATENCY_MS = float(os.getenv("STANDIN_LLM_LATENCY_MS", "1500"))
+STANDIN_EMBEDDING_LATENCY_MS = float(os.getenv("STANDIN_EMBEDDING_LATENCY_MS", "80"))
+STANDIN_SERVICE_LATENCY_MS = float(os.getenv("STANDIN_SERVICE_LATENCY_MS", "150"))
+STANDIN_EMBEDDING_DIM = 384
+
+STANDIN_ANSWER = (
+    "This course covers the fundamentals first and then moves on to hands-on projects. "
+    "Each module ends with assignments and a mock interview, and the trainers share notes "
+    "and recordings for every session. Please contact the NareshIT team for the next batch "
+    "dates and fee details."
+)
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _sleep_ms(ms: float) -> None:
+    if ms > 0:
+        time.sleep(ms / 1000.0)
+
+
+class StandInEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors: similar texts get similar vectors, so retrieval still behaves."""
+
+    model = f"hash-{STANDIN_EMBEDDING_DIM}"
+
+    def __init__(self, dimension: int = STANDIN_EMBEDDING_DIM, latency_ms: float = STANDIN_EMBEDDING_LATENCY_MS):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for token in _TOKEN.findall(text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimension] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        _sleep_ms(self.latency_ms)  # one round trip per batch, like the remote API
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        _sleep_ms(self.latency_ms)
+        return self._vector(text)
+
+
+def create_standin_chat_model() -> FakeListChatModel:
+    return FakeListChatModel(responses=[STANDIN_ANSWER], sleep=STANDIN_LLM_LATENCY_MS / 1000.0)
+
+
+def standin_translate(text: str, target_lang_code: str) -> str:
+    _sleep_ms(STANDIN_SERVICE_LATENCY_MS)
+    return f"[{target_lang_code}] {text}"
+
+
+def standin_tts(text: str, lang_code: str) -> bytes:
+    """Silent payload sized like a 32 kbit/s MP3 of the text read aloud (~15 chars/s)."""
+    _sleep_ms(STANDIN_SERVICE_LATENCY_MS)
+    seconds = max(1.0, len(text) / 15.0)
+    return bytes(int(seconds * 32000 / 8))
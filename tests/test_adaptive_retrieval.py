@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.documents import Document
+
+from adaptive_retrieval import (
+    CHUNK_TOKENS, INTENT_BROAD, INTENT_DEFAULT, INTENT_FACTUAL, RETRIEVAL_MAX_K, retrieval_profile, select_by_scores,
+)
+
+
+def full_chunks(scores):
+    """Chunks of the configured CHUNK_SIZE with the given relevance scores, best first."""
+    return [(Document(page_content="x" * (CHUNK_TOKENS * 4), metadata={"i": i}), s) for i, s in enumerate(scores)]
+
+
+@pytest.mark.parametrize("query, intent", [
+    ("What is the duration?", INTENT_FACTUAL),
+    ("Is it available online?", INTENT_FACTUAL),
+    ("How long is the course?", INTENT_FACTUAL),
+    ("Which databases are taught?", INTENT_DEFAULT),
+    ("What are the prerequisites?", INTENT_FACTUAL),
+    ("What is Django REST framework used for?", INTENT_DEFAULT),
+    ("Show me the full syllabus", INTENT_BROAD),
+    ("Compare the projects in both modules", INTENT_BROAD),
+])
+def test_intent(query, intent):
+    assert retrieval_profile(query).intent == intent
+
+
+def test_factual_question_keeps_several_close_full_size_chunks():
+    profile = retrieval_profile("What is the duration?")
+    docs = select_by_scores(full_chunks([0.80, 0.79, 0.78, 0.77]), profile)
+    assert len(docs) == 3  # token budget: three full chunks
+
+
+def test_default_question_is_not_capped_at_four_chunks():
+    profile = retrieval_profile("Which databases are taught?")
+    docs = select_by_scores(full_chunks([0.80, 0.79, 0.79, 0.78, 0.78, 0.77, 0.77, 0.76]), profile)
+    assert len(docs) == 6
+
+
+def test_score_gap_decides_depth():
+    profile = retrieval_profile("Which databases are taught?")
+    docs = select_by_scores(full_chunks([0.82, 0.81, 0.80, 0.70, 0.69, 0.68]), profile)
+    assert [d.metadata["i"] for d in docs] == [0, 1, 2]
+
+
+def test_score_window_drops_weak_hits():
+    profile = retrieval_profile("What is the duration?")
+    docs = select_by_scores(full_chunks([0.9, 0.72, 0.71]), profile)
+    assert len(docs) == 1
+
+
+def test_min_k_overrides_the_budget():
+    profile = retrieval_profile("Show me the full syllabus")
+    oversized = [(Document(page_content="x" * (profile.token_budget * 4)), 0.8) for _ in range(RETRIEVAL_MAX_K)]
+    assert len(select_by_scores(oversized, profile)) == profile.min_k
+
+
+def test_empty():
+    assert select_by_scores([], retrieval_profile("anything")) == []
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from answer_fallback import JOB_DONE, JOB_FAILED, JOB_PENDING, DeadlineAnswerer, extractive_answer
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()  # let hung calls finish so the worker threads exit
+
+
+def hang(release):
+    def _call():
+        release.wait(5)
+        return "late answer"
+    return _call
+
+
+def fail():
+    raise RuntimeError("provider down")
+
+
+def test_answer_in_time():
+    answerer = DeadlineAnswerer(max_workers=2)
+    assert answerer.wait(answerer.submit(lambda: "answer"), 1) == (JOB_DONE, "answer")
+
+
+def test_deadline_miss_then_late_answer(release):
+    answerer = DeadlineAnswerer(max_workers=2)
+    job = answerer.submit(hang(release))
+    assert answerer.wait(job, 0.05) == (JOB_PENDING, "")
+
+    release.set()
+    assert answerer.wait(job, 1) == (JOB_DONE, "late answer")
+
+
+def test_timeouts_open_the_circuit(release):
+    answerer = DeadlineAnswerer(max_workers=4, failure_threshold=2, cooldown_seconds=60)
+    for _ in range(2):
+        assert answerer.wait(answerer.submit(hang(release)), 0.05)[0] == JOB_PENDING
+
+    assert not answerer.available()
+    assert answerer.submit(lambda: "answer") is None
+    assert answerer.summary()["skipped"] == 1
+
+
+def test_late_success_is_not_counted_twice(release):
+    answerer = DeadlineAnswerer(max_workers=4, failure_threshold=2, cooldown_seconds=60)
+    job = answerer.submit(hang(release))
+    answerer.wait(job, 0.05)
+    release.set()
+    answerer.wait(job, 1)
+    answerer.wait(answerer.submit(fail), 1)
+
+    assert not answerer.available()  # deadline miss + error = 2 consecutive failures
+
+
+def test_success_resets_the_failure_count():
+    answerer = DeadlineAnswerer(max_workers=2, failure_threshold=2, cooldown_seconds=60)
+    answerer.wait(answerer.submit(fail), 1)
+    answerer.wait(answerer.submit(lambda: "answer"), 1)
+    assert answerer.wait(answerer.submit(fail), 1)[0] == JOB_FAILED
+
+    assert answerer.available()
+
+
+def test_hung_calls_do_not_queue_new_ones(release):
+    answerer = DeadlineAnswerer(max_workers=2, failure_threshold=100)
+    hung = [answerer.submit(hang(release)) for _ in range(2)]
+    assert all(hung)
+
+    assert answerer.submit(lambda: "answer") is None
+    assert answerer.summary()["saturated"] == 1
+
+    release.set()
+    for job in hung:
+        answerer.wait(job, 1)
+    assert answerer.wait(answerer.submit(lambda: "answer"), 1) == (JOB_DONE, "answer")
+
+
+def test_extractive_answer_uses_the_matching_sentences():
+    docs = [Document(page_content="Django Training\nThe course runs for 60 days. Batches start every month.",
+                     metadata={"heading": "Django Training", "heading_path": "Django Training"})]
+    answer = extractive_answer("How many days does the course run?", docs)
+
+    assert "60 **days**" in answer
+    assert answer.startswith("**Django Training**")
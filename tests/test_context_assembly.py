@@ -0,0 +1,44 @@
+from langchain_core.documents import Document
+
+from context_assembly import assemble_context, document_body
+from course_content import split_by_section
+
+
+def section(path, text, index):
+    return Document(page_content=text, metadata={
+        "source": "https://example.com/django", "heading": path.rsplit(" > ", 1)[-1],
+        "heading_path": path, "section_index": index})
+
+
+SECTIONS = [
+    section("Django > Overview", "Django is a Python web framework.", 0),
+    section("Django > Duration", "The course runs for 60 days.", 1),
+    section("Django > Fees", "Contact us for the fee.", 2),
+]
+
+
+def test_packed_chunk_loses_every_heading_line():
+    chunks = split_by_section(SECTIONS, chunk_size=1000, chunk_overlap=0)
+    assert len(chunks) == 1
+    assert chunks[0].page_content.count("Django > ") == 3
+
+    assert document_body(chunks[0]) == ("Django is a Python web framework.\n\n"
+                                        "The course runs for 60 days.\n\nContact us for the fee.")
+
+
+def test_single_section_chunk_loses_its_prefix():
+    doc = Document(page_content="Django > Fees\nContact us for the fee.", metadata={"heading_path": "Django > Fees"})
+    assert document_body(doc) == "Contact us for the fee."
+
+
+def test_chunk_without_heading_prefix_is_unchanged():
+    doc = Document(page_content="Contact us for the fee.\nFees vary by batch.", metadata={"heading": "Fees"})
+    assert document_body(doc) == doc.page_content
+
+
+def test_context_has_the_passage_heading_and_no_packed_heading_lines():
+    chunks = split_by_section(SECTIONS, chunk_size=1000, chunk_overlap=0)
+    context, _ = assemble_context(chunks)
+
+    assert context == ("[Django > Overview]\nDjango is a Python web framework.\n\n"
+                       "The course runs for 60 days.\n\nContact us for the fee.")
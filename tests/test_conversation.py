@@ -0,0 +1,79 @@
+import pytest
+
+from conversation import ConversationMemory, estimate_tokens
+
+
+def memory_after(question: str, answer: str = "It covers Spring Boot and microservices.") -> ConversationMemory:
+    memory = ConversationMemory()
+    memory.update([{"role": "user", "content": question}, {"role": "assistant", "content": answer}])
+    return memory
+
+
+@pytest.mark.parametrize("query", [
+    "What is the duration?",
+    "What are the fees?",
+    "Is there a certificate?",
+    "Duration?",
+    "Which databases are taught?",
+    "What is the fee for this course?",
+    "How long is that module?",
+    "Do these projects use Django?",
+    "Is there a course that covers Docker?",
+])
+def test_short_standalone_questions_are_not_rewritten(query):
+    memory = memory_after("Does Java cover Spring Boot microservices?")
+    assert not memory.is_follow_up(query)
+    assert memory.standalone_query(query) == query
+
+
+@pytest.mark.parametrize("query", [
+    "What about the second module?",
+    "Is it available online?",
+    "And the fees for that?",
+    "How long does the second module take?",
+    "What about that?",
+    "Is that included in the fee?",
+    "Does this include placement support?",
+    "Are those available online?",
+    "Tell me more about this.",
+])
+def test_follow_ups_carry_the_previous_terms(query):
+    memory = memory_after("Does Java cover Spring Boot microservices?")
+    assert memory.is_follow_up(query)
+    rewritten = memory.standalone_query(query)
+    assert rewritten.startswith(query)
+    assert "Spring" in rewritten
+
+
+def test_first_question_is_never_a_follow_up():
+    memory = ConversationMemory()
+    memory.update([])
+    assert not memory.is_follow_up("What about it?")
+    assert memory.standalone_query("What about it?") == "What about it?"
+
+
+def test_memory_stays_within_budget():
+    memory = ConversationMemory(token_budget=60, recent_turns=1)
+    messages = []
+    for i in range(20):
+        messages += [{"role": "user", "content": f"Question {i} about Django REST framework module {i}"},
+                     {"role": "assistant", "content": f"Module {i} covers serializers and viewsets in depth."}]
+    memory.update(messages)
+    assert len(memory.recent) == 2
+    assert memory.summary_points
+    assert len(memory.summary) // 4 <= 60
+
+
+def test_long_recent_turns_are_clipped_to_the_budget():
+    memory = ConversationMemory(token_budget=100, recent_turns=2)
+    messages = []
+    for i in range(4):
+        messages += [{"role": "user", "content": f"Question {i} about Spring Boot"},
+                     {"role": "assistant", "content": f"Answer {i}: " + "microservices " * 200}]
+    memory.update(messages)
+
+    tokens = sum(estimate_tokens(m["content"]) for m in memory.recent) + estimate_tokens(memory.summary)
+    assert tokens <= 100
+    assert memory.recent[0]["content"] == "Question 2 about Spring Boot"  # short turns are kept whole
+    assert memory.recent[1]["content"].endswith("…")
+    assert messages[-1]["content"].endswith("microservices ")  # the session's messages are untouched
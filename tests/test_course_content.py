@@ -0,0 +1,61 @@
+import os
+
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+
+from course_content import extract_course_sections, split_by_section
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "course_page.html")
+URL = "https://nareshit.com/courses/django-online-training"
+
+
+def sections():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return extract_course_sections(BeautifulSoup(f.read(), "html.parser"), URL)
+
+
+def test_keeps_accordion_faq_questions_and_answers():
+    docs = sections()
+    headings = [d.metadata["heading"] for d in docs]
+    assert "What are the prerequisites for Django?" in headings
+    assert "Is the course available online?" in headings
+    faq = next(d for d in docs if d.metadata["heading"] == "What are the prerequisites for Django?")
+    assert "Basic Python knowledge" in faq.page_content
+    assert faq.metadata["heading_path"].startswith("Django Online Training > Frequently Asked Questions")
+
+
+def test_drops_site_chrome_but_keeps_in_content_headers():
+    text = "\n".join(d.page_content + " " + d.metadata["heading_path"] for d in sections())
+    assert "All Courses" not in text
+    assert "Admissions open" not in text
+    assert "All rights reserved" not in text
+    assert "Flask, FastAPI" not in text
+    assert "Django Online Training" in text  # the <header> inside the content section stays
+
+
+def test_curriculum_nesting_and_section_types():
+    docs = sections()
+    curriculum = next(d for d in docs if d.metadata["heading"] == "Curriculum")
+    assert curriculum.metadata["section_type"] == "curriculum"
+    assert "- Module 1: Introduction to Django" in curriculum.page_content
+    assert "  - Project layout" in curriculum.page_content
+
+
+def test_section_chunks_carry_their_heading_path():
+    chunks = split_by_section(sections(), chunk_size=400, chunk_overlap=0)
+    assert chunks
+    assert all(c.metadata.get("source") == URL for c in chunks)
+    assert any(c.page_content.startswith("Django Online Training > Frequently Asked Questions") for c in chunks)
+
+
+def test_split_sections_fit_chunk_size_with_their_heading():
+    long_section = Document(
+        page_content="\n".join(f"- Topic {i}: building and deploying Django views" for i in range(40)),
+        metadata={"heading": "Curriculum", "heading_path": "Django Online Training > Curriculum",
+                  "section_type": "curriculum"},
+    )
+    chunks = split_by_section(sections() + [long_section], chunk_size=300, chunk_overlap=60)
+    split = [c for c in chunks if c.metadata["heading_path"] == "Django Online Training > Curriculum"]
+    assert len(split) > 1
+    assert all(len(c.page_content) <= 300 for c in chunks)
+    assert all(c.page_content.startswith("Django Online Training > Curriculum\n") for c in split)
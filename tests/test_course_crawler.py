@@ -0,0 +1,115 @@
+import json
+import os
+
+import pytest
+
+from course_crawler import CourseCrawler, classify_url, normalize_url, serve_directory
+
+NAMES = ["Demo Course 1", "Demo Course 2", "Demo Course 3"]
+SLUGS = ["demo-course-1", "demo-course-2", "demo-course-3"]
+
+
+def write_mirror(directory):
+    """A tiny site: robots.txt, a sitemap missing the last course, a catalogue, course pages with syllabus pages."""
+    os.makedirs(os.path.join(directory, "courses"), exist_ok=True)
+    files = {
+        "robots.txt": f"User-agent: *\nDisallow: /private\nDisallow: /courses/{SLUGS[-1]}/syllabus\n"
+                      "Sitemap: /sitemap.xml\n",
+        "sitemap.xml": '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                       + "".join(f"<url><loc>/courses/{s}</loc></url>" for s in SLUGS[:-1]) + "</urlset>",
+        "courses.html": "<html><body><h1>All Courses</h1>"
+                        + "".join(f'<a href="/courses/{s}?utm_source=list">{n}</a>' for s, n in zip(SLUGS, NAMES))
+                        + '<a href="/private/admin">Admin</a></body></html>',
+    }
+    for slug, name in zip(SLUGS, NAMES):
+        os.makedirs(os.path.join(directory, "courses", slug), exist_ok=True)
+        files[f"courses/{slug}.html"] = (
+            f"<html><head><title>{name} | NareshIT</title></head><body><h1>{name}</h1>"
+            f'<a href="/courses/{slug}/syllabus">Syllabus</a> <a href="/courses/{slug}/syllabus#top">Syllabus</a> '
+            f'<a href="/courses">Back</a> <a href="https://example.com/elsewhere">Partner</a></body></html>'
+        )
+        files[f"courses/{slug}/syllabus.html"] = f"<html><body><h2>{name} syllabus</h2><ul><li>Module 1</li></ul></body></html>"
+    for path, content in files.items():
+        with open(os.path.join(directory, path), "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+@pytest.fixture
+def site(tmp_path):
+    write_mirror(str(tmp_path / "site"))
+    server, base = serve_directory(str(tmp_path / "site"))
+    yield base
+    server.shutdown()
+
+
+def crawler(site, tmp_path, **kwargs):
+    return CourseCrawler([site + "/courses"], state_path=str(tmp_path / "state.json"), host_delay=0, **kwargs)
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTP://Example.COM:80/courses/django/?utm_source=x&b=2&a=1#top", "http://example.com/courses/django?a=1&b=2"),
+    ("https://example.com:443//courses//django", "https://example.com/courses/django"),
+    ("mailto:info@example.com", None),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_classify_url():
+    assert classify_url("https://example.com/courses/django") == "course"
+    assert classify_url("https://example.com/courses") == "catalogue"
+    assert classify_url("https://example.com/sitemap-courses.xml") == "sitemap"
+    assert classify_url("https://example.com/courses/django/syllabus") is None
+
+
+def test_crawl_finds_courses_and_allowed_syllabus_pages(site, tmp_path):
+    catalogue = crawler(site, tmp_path).run()
+
+    assert sorted(catalogue) == NAMES  # the last course is only linked from the catalogue
+    assert catalogue["Demo Course 1"] == {"url": f"{site}/courses/demo-course-1",
+                                          "pages": [f"{site}/courses/demo-course-1/syllabus"]}
+    assert catalogue["Demo Course 3"]["pages"] == []  # its syllabus is disallowed by robots.txt
+
+
+def test_crawl_fetches_each_page_once_and_stays_on_the_site(site, tmp_path):
+    run = crawler(site, tmp_path)
+    run.run()
+
+    pages = run.state.pages
+    assert all(url.startswith(site) for url in pages)
+    assert not any("/private" in url or "utm_source" in url for url in pages)
+    # sitemap, catalogue, 3 courses, 3 syllabus pages (one of them disallowed, not fetched)
+    assert run.fetched == 8
+    assert pages[f"{site}/courses/demo-course-3/syllabus"]["status"] == "disallowed"
+
+
+def test_interrupted_crawl_resumes_from_its_state(site, tmp_path):
+    first = crawler(site, tmp_path, max_pages=3)
+    first.run()
+    assert first.state.frontier
+
+    second = crawler(site, tmp_path)
+    assert sorted(second.run()) == NAMES
+    assert first.fetched + second.fetched == 8
+
+
+def test_refresh_reuses_unchanged_pages(site, tmp_path):
+    crawler(site, tmp_path).run()
+
+    refreshed = crawler(site, tmp_path, refresh=True)
+    statuses = []
+    fetch = refreshed.fetch
+
+    def recording_fetch(url, validators=None):
+        result = fetch(url, validators)
+        statuses.append(result[0])
+        return result
+
+    refreshed.fetch = recording_fetch
+    catalogue = refreshed.run()
+
+    assert sorted(catalogue) == NAMES
+    assert statuses and set(statuses) == {304}  # every page is unchanged (Last-Modified)
+    assert not any(page.get("stale") for page in refreshed.state.pages.values())
+    with open(tmp_path / "state.json", encoding="utf-8") as f:
+        assert not json.load(f)["frontier"]
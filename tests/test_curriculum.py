@@ -0,0 +1,48 @@
+import os
+
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+
+from course_content import extract_course_sections
+from curriculum import extract_curriculum
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "course_page.html")
+URL = "https://nareshit.com/courses/django-online-training"
+
+
+def fixture_curriculum():
+    with open(FIXTURE, encoding="utf-8") as f:
+        sections = extract_course_sections(BeautifulSoup(f.read(), "html.parser"), URL)
+    return extract_curriculum(sections, URL, "Django")
+
+
+def curriculum_section(text, heading="Curriculum"):
+    return Document(page_content=text, metadata={"heading": heading, "section_type": "curriculum"})
+
+
+def test_fixture_modules_are_the_list_items_not_the_prose_around_them():
+    curriculum = fixture_curriculum()
+    assert [m["title"] for m in curriculum["modules"]] == [
+        "Module 1: Introduction to Django", "Module 2: Models and the ORM",
+    ]
+    assert curriculum["modules"][0]["topics"] == ["Project layout", "Settings and URLs"]
+    assert curriculum["duration"] == "45 days"
+
+
+def test_heading_like_paragraphs_still_title_modules():
+    text = "Module 1: Basics\n  - Variables\nHands-on labs every week.\nAdvanced Topics:\n  - Decorators"
+    modules = extract_curriculum([curriculum_section(text)], URL)["modules"]
+    assert modules == [
+        {"title": "Module 1: Basics", "topics": ["Variables"]},
+        {"title": "Advanced Topics:", "topics": ["Decorators"]},
+    ]
+
+
+def test_flat_section_prefers_list_items_over_short_prose():
+    text = "What you will learn.\n- Variables\n- Loops"
+    modules = extract_curriculum([curriculum_section(text, "Core Python")], URL)["modules"]
+    assert modules == [{"title": "Core Python", "topics": ["Variables", "Loops"]}]
+
+    paragraphs = "Variables\nLoops"
+    modules = extract_curriculum([curriculum_section(paragraphs, "Core Python")], URL)["modules"]
+    assert modules == [{"title": "Core Python", "topics": ["Variables", "Loops"]}]
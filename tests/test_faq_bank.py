@@ -0,0 +1,79 @@
+import os
+
+import pytest
+from langchain_core.documents import Document
+
+import index_store
+from faq_bank import (
+    DEFAULT_FAQ_QUESTIONS, LOCK_FILE, FaqBankBuilder, FaqBankStore, bank_version, index_fingerprint, match_entry,
+)
+
+URL = "https://nareshit.com/courses/django-online-training"
+LANGUAGES = ["en", "hi"]
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_store, "INDEX_DIR", str(tmp_path))
+    return tmp_path
+
+
+def build(builder, fingerprint="f1", speak=None):
+    version = bank_version(fingerprint, DEFAULT_FAQ_QUESTIONS, "standin", LANGUAGES, speak is not None)
+    return builder.build_locked(URL, "Django", fingerprint, version, DEFAULT_FAQ_QUESTIONS, LANGUAGES,
+                                lambda question: f"Answer to: {question}",
+                                lambda text, lang: f"[{lang}] {text}", speak)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What is the fee?", "fees"),
+    ("How long is the course?", "duration"),
+    ("Do I get a certificate?", "certification"),
+])
+def test_match_entry_finds_the_faq(query, expected):
+    assert match_entry(query, DEFAULT_FAQ_QUESTIONS, "Django")["id"] == expected
+
+
+@pytest.mark.parametrize("query", [
+    "What is the fee for the weekend batch in Hyderabad?",  # too specific for the banked answer
+    "What is the fee and duration?",  # two FAQs at once
+    "Explain Django middleware",
+])
+def test_match_entry_leaves_other_questions_to_the_chat(query):
+    assert match_entry(query, DEFAULT_FAQ_QUESTIONS, "Django") is None
+
+
+def test_fingerprint_changes_with_chunks_embedding_and_reduction():
+    chunks = [Document(page_content="Django basics"), Document(page_content="ORM")]
+    base = index_fingerprint(chunks, "google:text-embedding-004")
+    assert base == index_fingerprint(list(chunks), "google:text-embedding-004")
+    assert base != index_fingerprint(chunks[:1], "google:text-embedding-004")
+    assert base != index_fingerprint(chunks, "local:bge-small-en-v1.5")
+    assert base != index_fingerprint(chunks, "google:text-embedding-004", "pca128")
+
+
+def test_built_bank_is_served_only_for_its_index():
+    store = FaqBankStore()
+    bank = build(FaqBankBuilder(store), speak=lambda text, lang: text.encode("utf-8"))
+
+    entry = store.lookup(URL, "f1", "What is the fee?", "Django")
+    assert entry["answers"]["hi"] == "[hi] Answer to: What is the fee for this course?"
+    assert store.audio(URL, bank["version"], entry, "hi")
+    assert store.lookup(URL, "f2", "What is the fee?", "Django") is None
+
+
+def test_rebuild_replaces_the_current_bank():
+    store = FaqBankStore()
+    builder = FaqBankBuilder(store)
+    first = build(builder, "f1")
+    second = build(builder, "f2")
+
+    assert first["version"] != second["version"]
+    assert store.current(URL)["version"] == second["version"]
+
+
+def test_build_skipped_while_another_process_holds_the_lock():
+    open(os.path.join(index_store.index_dir_for(URL, create=True), LOCK_FILE), "w").close()
+
+    assert build(FaqBankBuilder(FaqBankStore())) is None
+    assert FaqBankStore().current(URL) is None
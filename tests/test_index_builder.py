@@ -0,0 +1,91 @@
+import hashlib
+import warnings
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import index_store
+from dim_reduction import REDUCTION_PCA, REDUCTION_TRUNCATE, reduce_index
+from index_builder import FAISS_OPTIONS, build_faiss_index
+from mmap_index import open_mmap_index, write_mmap_index
+
+URL = "https://example.com/python"
+QUERIES = ["What is the course fee?", "python lesson 3", "Is there a certificate?", "placement support"]
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_store, "INDEX_DIR", str(tmp_path))
+
+
+class UnnormalizedEmbeddings(Embeddings):
+    """Random directions with random lengths (0.2 to 5), like backends that don't normalize."""
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "little")
+        rng = np.random.default_rng(seed)
+        vector = rng.normal(size=32)
+        return (vector / np.linalg.norm(vector) * rng.uniform(0.2, 5.0)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def built(embeddings, n=80):
+    docs = [Document(page_content=f"Python lesson {i}: topic {i % 7}", metadata={"section_index": i}) for i in range(n)]
+    return build_faiss_index(docs, embeddings, batch_size=16)
+
+
+def relevance_scores(vectordb):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", UserWarning)  # LangChain warns about scores outside [0, 1]
+        return [s for q in QUERIES for _, s in vectordb.similarity_search_with_relevance_scores(q, k=20)]
+
+
+def assert_unit_interval(scores):
+    assert scores
+    assert all(0.0 <= s <= 1.0 for s in scores)
+
+
+def test_built_index_scores_are_cosine_relevance_in_unit_interval():
+    embeddings = UnnormalizedEmbeddings()
+    vectordb = built(embeddings)
+    assert_unit_interval(relevance_scores(vectordb))
+
+    # Exact text scores 1, and scores follow the cosine similarity of the raw vectors
+    (doc, score), = vectordb.similarity_search_with_relevance_scores("Python lesson 5: topic 5", k=1)
+    assert doc.metadata["section_index"] == 5
+    assert score == pytest.approx(1.0, abs=1e-5)
+    query = np.array(embeddings.embed_query(QUERIES[0]))
+    for doc, score in vectordb.similarity_search_with_relevance_scores(QUERIES[0], k=5):
+        vector = np.array(embeddings.embed_query(doc.page_content))
+        cosine = query @ vector / np.linalg.norm(query) / np.linalg.norm(vector)
+        assert score == pytest.approx(max(0.0, cosine), abs=1e-4)
+
+
+def test_scores_stay_in_unit_interval_through_cache_and_mmap():
+    embeddings = UnnormalizedEmbeddings()
+    vectordb = built(embeddings)
+    restored = FAISS.deserialize_from_bytes(vectordb.serialize_to_bytes(), embeddings,
+                                            allow_dangerous_deserialization=True, **FAISS_OPTIONS)
+    assert relevance_scores(restored) == pytest.approx(relevance_scores(vectordb))
+
+    write_mmap_index(URL, "key", vectordb)
+    mapped = open_mmap_index(URL, "key", embeddings)
+    assert relevance_scores(mapped) == pytest.approx(relevance_scores(vectordb), abs=1e-4)
+
+
+@pytest.mark.parametrize("method", [REDUCTION_PCA, REDUCTION_TRUNCATE])
+def test_reduced_index_scores_stay_in_unit_interval(method):
+    embeddings = UnnormalizedEmbeddings()
+    vectordb = reduce_index(built(embeddings), method, 8)
+    assert_unit_interval(relevance_scores(vectordb))
+
+    write_mmap_index(URL, f"key-{method}", vectordb)
+    assert_unit_interval(relevance_scores(open_mmap_index(URL, f"key-{method}", embeddings)))
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from index_warmup import IndexRegistry, IndexWarmer, SelectionStats
+
+COURSES = {"Python": "https://example.com/python", "Django": "https://example.com/django",
+           "Java": "https://example.com/java", "Unlisted": ""}
+
+
+class FakeIndex:
+    def __init__(self, size):
+        self.index = self
+        self.docstore = self
+        self.size = size
+
+    def private_bytes(self):
+        return self.size
+
+
+def warm(tmp_path, size=1024, **kwargs):
+    built = []
+
+    def build(url):
+        built.append((url, threading.current_thread().name))
+        return FakeIndex(size)
+
+    stats = kwargs.pop("stats", None) or SelectionStats(str(tmp_path / "counts.json"))
+    warmer = IndexWarmer(IndexRegistry(), COURSES, build, stats=stats, **kwargs).start()
+    warmer._thread.join(5)
+    return warmer, built
+
+
+def test_configured_hot_courses_are_warmed_on_the_warmup_thread(tmp_path):
+    warmer, built = warm(tmp_path, hot_courses=["Django", "Unknown"])
+
+    assert built == [("https://example.com/django", "index-warmup")]
+    assert warmer.warmed == ["Django"]
+
+
+def test_without_configuration_only_the_most_selected_are_warmed(tmp_path):
+    stats = SelectionStats(str(tmp_path / "counts.json"))
+    for course in ["Java", "Java", "Django"]:
+        stats.record(course)
+    warmer, _ = warm(tmp_path, stats=stats, hot_courses=[], top_n=2)
+
+    assert warmer.warmed == ["Java", "Django"]
+
+
+def test_warmup_stops_at_the_memory_budget(tmp_path):
+    warmer, _ = warm(tmp_path, size=600 * 1024, hot_courses=["Python", "Django", "Java"], memory_budget_mb=1)
+
+    assert warmer.warmed == ["Python"]
+
+
+def test_selection_counts_persist(tmp_path):
+    SelectionStats(str(tmp_path / "counts.json")).record("Django")
+
+    assert SelectionStats(str(tmp_path / "counts.json")).ranked(["Python", "Django"]) == ["Django", "Python"]
+
+
+def test_prefetch_builds_the_remaining_courses_while_idle_within_the_budget(tmp_path):
+    warmer, _ = warm(tmp_path, hot_courses=["Django"], prefetch=True, idle_load=float("inf"))
+
+    assert warmer.warmed == ["Django", "Python", "Java"]
+
+    warmer, _ = warm(tmp_path, size=200 * 1024, hot_courses=["Django"], prefetch=True, idle_load=float("inf"),
+                     memory_budget_mb=1)
+    assert warmer.warmed == ["Django", "Python"]
+
+
+def test_prefetch_waits_while_the_cpu_is_busy(tmp_path):
+    warmer = IndexWarmer(IndexRegistry(), COURSES, lambda url: FakeIndex(1024),
+                         stats=SelectionStats(str(tmp_path / "counts.json")), hot_courses=["Django"],
+                         prefetch=True, idle_load=0.0).start()
+    deadline = time.time() + 5
+    while not warmer.warmed and time.time() < deadline:
+        time.sleep(0.01)
+    warmer.stop()
+    warmer._thread.join(5)
+
+    assert warmer.warmed == ["Django"]
+    assert not warmer._thread.is_alive()
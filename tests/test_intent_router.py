@@ -0,0 +1,78 @@
+import pytest
+
+from intent_router import (
+    ROUTE_CONTACT, ROUTE_CURRICULUM, ROUTE_GREETING, ROUTE_RAG, ROUTE_REGISTRATION, ROUTE_THANKS,
+    canned_response, classify_query,
+)
+
+ROUTES = [
+    # greeting: the whole message is small talk
+    ("Hi", ROUTE_GREETING),
+    ("hello there", ROUTE_GREETING),
+    ("Good morning sir!", ROUTE_GREETING),
+    ("Namaste", ROUTE_GREETING),
+    # thanks
+    ("Thanks!", ROUTE_THANKS),
+    ("ok thanks", ROUTE_THANKS),
+    ("Thank you so much", ROUTE_THANKS),
+    ("bye", ROUTE_THANKS),
+    # contact
+    ("What is your phone number?", ROUTE_CONTACT),
+    ("How can I contact the institute?", ROUTE_CONTACT),
+    ("whatsapp", ROUTE_CONTACT),
+    # registration
+    ("How do I register?", ROUTE_REGISTRATION),
+    ("admission process", ROUTE_REGISTRATION),
+    ("how can i join", ROUTE_REGISTRATION),
+    # curriculum
+    ("Show me the syllabus", ROUTE_CURRICULUM),
+    ("What topics are covered?", ROUTE_CURRICULUM),
+    ("which modules", ROUTE_CURRICULUM),
+    ("syllabus and duration", ROUTE_CURRICULUM),
+    # everything else: RAG
+    ("What projects will I build?", ROUTE_RAG),
+    ("Is there a certificate?", ROUTE_RAG),
+    ("", ROUTE_RAG),
+]
+
+NEAR_MISSES = [
+    # small talk with a real question attached
+    "hi, what is the duration?",
+    "hey can you help me choose a course",
+    "thanks, and is there placement support?",
+    "great, what are the prerequisites?",
+    # contact / registration words around a detail question
+    "phone number for fee details?",
+    "registration fee?",
+    "enrolment batch timings",
+    "what is the admission date",
+    # curriculum words around a detail the tree doesn't hold
+    "thanks for the syllabus, what about fees?",
+    "syllabus price",
+    # words that only look like a route
+    "what is the course structure",
+    "Great course?",
+    "hello world program in python",
+    "how to register a django model in admin",
+]
+
+
+@pytest.mark.parametrize("query, route", ROUTES)
+def test_routes(query, route):
+    assert classify_query(query) == route
+
+
+@pytest.mark.parametrize("query", NEAR_MISSES)
+def test_near_misses_fall_through_to_rag(query):
+    assert classify_query(query) == ROUTE_RAG
+
+
+@pytest.mark.parametrize("route", [ROUTE_GREETING, ROUTE_THANKS, ROUTE_CONTACT, ROUTE_REGISTRATION])
+def test_canned_routes_have_a_response(route):
+    text = canned_response(route, "Django", "+91 0000", "https://example.com/register")
+    assert "Django" in text
+
+
+def test_rag_has_no_canned_response():
+    with pytest.raises(ValueError):
+        canned_response(ROUTE_RAG, "Django", "+91 0000", "https://example.com/register")
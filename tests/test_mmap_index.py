@@ -0,0 +1,112 @@
+import hashlib
+import random
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import index_store
+from dim_reduction import REDUCTION_PCA, REDUCTION_TRUNCATE, reduce_index, stored_dimension
+from mmap_index import MmapFlatIndex, open_mmap_index, write_mmap_index
+
+URL = "https://example.com/django"
+WORDS = ("django python orm models views templates forms admin rest api fees duration batch online "
+         "classroom certificate placement trainer project deployment testing middleware queries").split()
+QUERIES = ["What is the course fee?", "Django ORM models and queries", "Is there a certificate?",
+           "rest api deployment project", "middleware"]
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_store, "INDEX_DIR", str(tmp_path))
+
+
+class RandomEmbeddings(Embeddings):
+    """A fixed random unit vector per text: no score ties, so result order is comparable."""
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "little")
+        vector = np.random.default_rng(seed).normal(size=64)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def embeddings():
+    return RandomEmbeddings()
+
+
+def chunks(n=120):
+    rng = random.Random(7)
+    return [Document(page_content=" ".join(rng.choice(WORDS) for _ in range(12)),
+                     metadata={"source": URL, "section_index": i, "heading_path": f"Django > Part {i % 5}"})
+            for i in range(n)]
+
+
+def build(embeddings, distance=DistanceStrategy.EUCLIDEAN_DISTANCE):
+    return FAISS.from_documents(chunks(), embeddings, distance_strategy=distance)
+
+
+def assert_same_results(built, mapped, k=8):
+    for query in QUERIES:
+        expected = built.similarity_search_with_score(query, k=k)
+        actual = mapped.similarity_search_with_score(query, k=k)
+        assert [d.metadata["section_index"] for d, _ in actual] == [d.metadata["section_index"] for d, _ in expected]
+        np.testing.assert_allclose([s for _, s in actual], [s for _, s in expected], rtol=1e-4, atol=1e-4)
+        assert [d.page_content for d, _ in actual] == [d.page_content for d, _ in expected]
+
+
+def test_mmap_index_returns_what_faiss_returns(embeddings):
+    built = build(embeddings)
+    write_mmap_index(URL, "key", built)
+    mapped = open_mmap_index(URL, "key", embeddings)
+
+    assert isinstance(mapped.index, MmapFlatIndex)
+    assert mapped.index.ntotal == built.index.ntotal
+    assert_same_results(built, mapped)
+
+
+@pytest.mark.parametrize("method", [REDUCTION_PCA, REDUCTION_TRUNCATE])
+def test_reduced_mmap_index_returns_what_faiss_returns(embeddings, method):
+    built = reduce_index(build(embeddings), method, 16)
+    assert stored_dimension(built.index) == 16
+
+    write_mmap_index(URL, f"key-{method}", built)
+    mapped = open_mmap_index(URL, f"key-{method}", embeddings)
+
+    assert mapped.index.vectors.shape == (120, 16)
+    assert_same_results(built, mapped)
+
+
+def test_reduction_is_skipped_when_it_would_not_save_memory(embeddings):
+    vectordb = FAISS.from_documents(chunks(10), embeddings)
+
+    assert stored_dimension(reduce_index(vectordb, REDUCTION_PCA, 16).index) == 64
+
+
+def test_inner_product_index(embeddings):
+    built = build(embeddings, DistanceStrategy.MAX_INNER_PRODUCT)
+    write_mmap_index(URL, "key-ip", built)
+
+    assert_same_results(built, open_mmap_index(URL, "key-ip", embeddings))
+
+
+def test_unwritten_index_is_not_opened(embeddings):
+    assert open_mmap_index(URL, "missing", embeddings) is None
+
+
+def test_second_write_keeps_the_first_copy(embeddings):
+    built = build(embeddings)
+    first = write_mmap_index(URL, "key", built)
+    other = FAISS.from_documents(chunks(10), embeddings)
+
+    assert write_mmap_index(URL, "key", other) == first
+    assert_same_results(built, open_mmap_index(URL, "key", embeddings))
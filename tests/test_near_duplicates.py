@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from near_duplicates import (
+    DedupEmbeddings, DedupRegistry, MinHasher, collapse_duplicates, dedupe_chunks, jaccard, lsh_params, shingles,
+)
+
+PITCH = ("Our trainers have more than fifteen years of industry experience and every batch gets placement "
+         "assistance, mock interviews, resume preparation and lifetime access to the recorded sessions "
+         "so that students can revise the concepts at their own pace after the course ends")
+
+
+def chunk(text, heading, source="https://example.com/django"):
+    return Document(page_content=text, metadata={"source": source, "heading_path": heading})
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [0.0, 1.0]
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return DedupRegistry(str(tmp_path / "dedup.db"))
+
+
+def test_lsh_bands_cover_the_signature():
+    bands, rows = lsh_params(0.8, 128)
+    assert bands * rows <= 128
+    assert (1 / bands) ** (1 / rows) < 0.8
+
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(num_perm=256)
+    left = shingles(PITCH)
+    right = shingles(PITCH.replace("fifteen", "twelve"))
+
+    estimate = MinHasher.similarity(hasher.signature(left), hasher.signature(right))
+    assert abs(estimate - jaccard(left, right)) < 0.1
+
+
+def test_near_duplicates_collapse_into_the_first_occurrence():
+    chunks = [
+        chunk(PITCH, "Django > Trainer"),
+        chunk("Models map Python classes to database tables through the ORM.", "Django > ORM"),
+        chunk(PITCH + " online", "Django > Placement"),
+        chunk(PITCH.replace("course ends", "course finishes"), "Django > FAQ"),
+    ]
+    kept, signatures = collapse_duplicates(chunks, MinHasher(), 0.8)
+
+    assert [c.metadata["heading_path"] for c in kept] == ["Django > Trainer", "Django > ORM"]
+    assert kept[0].metadata["duplicate_count"] == 2
+    assert [d["heading"] for d in kept[0].metadata["duplicates"]] == ["Django > Placement", "Django > FAQ"]
+    assert len(signatures) == 2
+    assert "duplicates" not in chunks[0].metadata  # inputs are not modified
+
+
+def test_heading_prefixes_do_not_keep_duplicates_apart():
+    chunks = [chunk(f"Django > Trainer\n{PITCH}", "Django > Trainer"),
+              chunk(f"Django > Placement\n{PITCH}", "Django > Placement")]
+
+    kept, _ = collapse_duplicates(chunks, MinHasher(), 0.8)
+    assert len(kept) == 1
+
+
+def test_different_chunks_are_kept():
+    chunks = [chunk(PITCH, "Django > Trainer"),
+              chunk("The Django course covers models, views, templates, forms and the admin site in sixty days.",
+                    "Django > Overview")]
+
+    assert len(collapse_duplicates(chunks, MinHasher(), 0.8)[0]) == 2
+
+
+def test_shared_chunks_reuse_the_other_course_vector(registry):
+    django, report = dedupe_chunks([chunk(PITCH, "Django > Trainer")], "django", registry)
+    inner = CountingEmbeddings()
+    DedupEmbeddings(inner, registry, "m").embed_documents([c.page_content for c in django])
+
+    java, report = dedupe_chunks([chunk(PITCH + " today", "Java > Trainer", "https://example.com/java")],
+                                 "java", registry)
+    reuse = DedupEmbeddings(inner, registry, "m")
+    vectors = reuse.embed_documents([c.page_content for c in java])
+
+    assert report["shared_chunks"] == 1
+    assert java[0].metadata["shared_with"] == ["django"]
+    assert (reuse.reused, reuse.embedded) == (1, 0)
+    assert len(inner.calls) == 1
+    np.testing.assert_allclose(vectors[0], [float(len(PITCH)), 1.0])
+
+
+def test_report_counts_removed_chunks(registry):
+    chunks = [chunk(PITCH, "A"), chunk(PITCH, "B"), chunk("Something else entirely about REST APIs.", "C")]
+    kept, report = dedupe_chunks(chunks, "django", registry)
+
+    assert len(kept) == 2
+    assert report["duplicates_removed"] == 1
+    assert report["dedup_reduction_pct"] == 33.3
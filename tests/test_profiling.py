@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+
+import pytest
+
+import profiling
+from profiling import MODE_CPROFILE, MODE_SAMPLE, Profile, start_profile, stop_deferred
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def busy():
+    return sum(i * i for i in range(20000))
+
+
+def in_thread(fn):
+    result = []
+    worker = threading.Thread(target=lambda: result.append(fn()))
+    worker.start()
+    worker.join()
+    return result[0]
+
+
+def test_query_parameter_is_ignored_by_default():
+    assert profiling.PROFILE_ALLOW_QUERY is False
+
+
+def test_cprofile_profile_writes_its_files(profile_dir):
+    profile = Profile("run", MODE_CPROFILE)
+    busy()
+    prefix = profile.stop()
+
+    assert sys.getprofile() is None
+    assert {os.path.splitext(name)[1] for name in os.listdir(profile_dir)} == {".folded", ".txt", ".prof"}
+    assert prefix.endswith("-run")
+
+
+def test_cprofile_stopped_from_another_thread_is_finished_by_its_own(profile_dir):
+    profile = Profile("early-run", MODE_CPROFILE)
+    busy()
+    try:
+        assert in_thread(profile.stop) is None
+        assert sys.getprofile() is not None  # only this thread can disable it
+        assert os.listdir(profile_dir) == []
+
+        assert start_profile("next-run", mode="") is None  # the thread's next run
+        assert sys.getprofile() is None
+        assert profile.stopped
+        assert any(name.endswith("-early-run.prof") for name in os.listdir(profile_dir))
+    finally:
+        sys.setprofile(None)
+
+
+def test_sampled_profile_can_be_stopped_from_any_thread(profile_dir):
+    profile = Profile("sampled", MODE_SAMPLE)
+    busy()
+    assert in_thread(profile.stop).endswith("-sampled")
+
+
+def test_deferred_profile_of_an_exited_thread_is_dropped():
+    profile = in_thread(lambda: Profile("gone", MODE_CPROFILE))
+    profile.stop()
+    stop_deferred()
+
+    assert profile.thread_id not in profiling._deferred
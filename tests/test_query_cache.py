@@ -0,0 +1,78 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from query_cache import CachedQueryEmbeddings, RetrievalCache
+from retrieval_trace import QueryTrace, tracing
+from shared_cache import FileCacheBackend, TwoLevelCache
+
+
+class RecordingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries = []
+
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 1.0]
+
+
+@pytest.fixture
+def shared(tmp_path):
+    return TwoLevelCache(FileCacheBackend(str(tmp_path)), secret=b"test-secret")
+
+
+def embed(embeddings, text):
+    trace = QueryTrace(text)
+    with tracing(trace):
+        vector = embeddings.embed_query(text)
+    return vector, trace.fields["embedding_cache"]
+
+
+def test_miss_embeds_the_students_wording_not_the_cache_key(shared):
+    inner = RecordingEmbeddings()
+    cached = CachedQueryEmbeddings(inner, shared=shared, model_name="test")
+
+    assert embed(cached, "What is the Django course FEE?")[1] == "miss"
+    assert inner.queries == ["What is the Django course FEE?"]
+
+
+def test_repeat_with_other_casing_is_an_lru_hit(shared):
+    inner = RecordingEmbeddings()
+    cached = CachedQueryEmbeddings(inner, shared=shared, model_name="test")
+    first, _ = embed(cached, "What is the fee?")
+
+    assert embed(cached, "what is the FEE") == (first, "hit")
+    assert len(inner.queries) == 1
+    assert cached.cache.stats()["hits"] == 1
+
+
+def test_another_replica_reuses_the_shared_vector(shared):
+    first, _ = embed(CachedQueryEmbeddings(RecordingEmbeddings(), shared=shared, model_name="test"), "Duration?")
+    inner = RecordingEmbeddings()
+    replica = CachedQueryEmbeddings(inner, shared=shared, model_name="test")
+
+    assert embed(replica, "duration") == (first, "shared")
+    assert inner.queries == []
+    # another model never shares vectors
+    other = CachedQueryEmbeddings(RecordingEmbeddings(), shared=shared, model_name="other")
+    assert embed(other, "duration")[1] == "miss"
+
+
+def test_retrieval_cache_searches_with_the_original_query():
+    searched = []
+
+    class Store:
+        def similarity_search_with_relevance_scores(self, query, k):
+            searched.append(query)
+            return [("chunk", 0.9)]
+
+    cache = RetrievalCache()
+    trace = QueryTrace("q")
+    with tracing(trace):
+        cache.search_with_scores(Store(), "django", "Is there a Certificate?", 4)
+        cache.search_with_scores(Store(), "django", "is there a certificate", 4)
+
+    assert searched == ["Is there a Certificate?"]
+    assert trace.fields["retrieval_cache"] == "hit"
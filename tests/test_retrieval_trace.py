@@ -0,0 +1,14 @@
+import retrieval_trace
+from retrieval_trace import inspector_enabled
+
+
+def test_query_parameter_is_ignored_by_default():
+    assert retrieval_trace.RETRIEVAL_INSPECTOR_ALLOW_QUERY is False
+
+
+def test_inspector_is_off_without_the_setting(monkeypatch):
+    monkeypatch.setattr(retrieval_trace, "RETRIEVAL_INSPECTOR", False)
+    assert not inspector_enabled()
+
+    monkeypatch.setattr(retrieval_trace, "RETRIEVAL_INSPECTOR", True)
+    assert inspector_enabled()
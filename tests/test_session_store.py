@@ -0,0 +1,167 @@
+import time
+
+import pytest
+
+import session_store
+from session_store import RedisSessionStore, SessionStore, SQLiteSessionStore, resolve_session_id
+
+
+def redis_range(items, start, end):
+    """Items start..end inclusive, negative indexes counting from the end (LRANGE / LTRIM semantics)."""
+    n = len(items)
+    start, end = max(start + n if start < 0 else start, 0), min(end + n if end < 0 else end, n - 1)
+    return items[start:end + 1] if start <= end else []
+
+
+class FakeRedis:
+    """The list / set / expiry commands RedisSessionStore uses, in memory (decode_responses=True)."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value)
+
+    def ltrim(self, key, start, end):
+        self.data[key] = redis_range(self.data.get(key, []), start, end)
+
+    def lrange(self, key, start, end):
+        return redis_range(self.data.get(key, []), start, end)
+
+    def lset(self, key, index, value):
+        self.data[key][index] = value
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def srem(self, key, member):
+        self.data.get(key, set()).discard(member)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    def delete(self, key):
+        self.data.pop(key, None)
+        self.ttls.pop(key, None)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "redis":
+        return RedisSessionStore(client=FakeRedis(), max_messages=50, ttl_seconds=3600)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), max_messages=50, ttl_seconds=3600)
+
+
+def fill(store, n, session_id="s1", course="Django"):
+    for i in range(n):
+        store.append(session_id, course, {"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"})
+
+
+def contents(messages):
+    return [m["content"] for m in messages]
+
+
+def test_pages_walk_back_from_the_newest_in_chronological_order(store):
+    fill(store, 25)
+
+    assert contents(store.load_page("s1", "Django", 0, 10)) == [f"m{i}" for i in range(15, 25)]
+    assert contents(store.load_page("s1", "Django", 10, 10)) == [f"m{i}" for i in range(5, 15)]
+    assert contents(store.load_page("s1", "Django", 20, 10)) == [f"m{i}" for i in range(5)]
+    assert store.load_page("s1", "Django", 25, 10) == []
+
+
+def test_chats_are_capped_to_the_newest_messages(store):
+    fill(store, 60)
+
+    assert store.count("s1", "Django") == 50
+    assert contents(store.load_all("s1", "Django"))[0] == "m10"
+
+
+def test_chats_are_kept_per_session_and_course(store):
+    fill(store, 3, course="Django")
+    fill(store, 2, course="Java")
+    fill(store, 4, session_id="s2")
+
+    assert store.count("s1", "Django") == 3
+    assert sorted(store.courses("s1")) == ["Django", "Java"]
+    store.clear("s1", "Java")
+    assert store.courses("s1") == ["Django"]
+    assert store.count("s2", "Django") == 4
+
+
+def test_replace_upgrades_the_newest_copy(store):
+    old = {"role": "assistant", "content": "fallback", "ts": 100}
+    store.append("s1", "Django", old)
+    store.append("s1", "Django", {"role": "user", "content": "thanks", "ts": 101})
+
+    assert store.replace("s1", "Django", old, {"role": "assistant", "content": "full answer", "ts": 100})
+    assert contents(store.load_all("s1", "Django")) == ["full answer", "thanks"]
+    assert not store.replace("s1", "Django", old, old)
+
+
+def test_audio_is_not_persisted(store):
+    store.append("s1", "Django", {"role": "assistant", "content": "hi", "audio": "UklGRg=="})
+
+    assert "audio" not in store.load_all("s1", "Django")[0]
+
+
+def test_expired_chats_are_purged(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60)
+    fill(store, 3)
+    with store._connect() as db:
+        db.execute("UPDATE chats SET updated_at = ?", (time.time() - 120,))
+
+    assert store.purge_expired() == 1
+    assert store.count("s1", "Django") == 0
+
+
+def test_redis_chats_expire_with_the_ttl():
+    client = FakeRedis()
+    store = RedisSessionStore(client=client, ttl_seconds=60)
+    fill(store, 2)
+
+    assert client.ttls == {"chat:s1:Django": 60, "chat:s1:_courses": 60}
+
+
+def test_backends_implement_the_whole_interface():
+    class Partial(SessionStore):
+        def append(self, session_id, course, message):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_session_ids_come_from_the_cookie_then_a_valid_url_id(monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_COOKIE", "proxy_session")
+    from_cookie = resolve_session_id("browser-1")
+
+    assert from_cookie == resolve_session_id("browser-1", url_sid="0" * 32)
+    assert from_cookie != resolve_session_id("browser-2")
+    assert "browser-1" not in from_cookie
+    assert resolve_session_id(None, url_sid="0" * 32) == "0" * 32
+    # anything else in ?sid= (or no id at all) gets a fresh random id
+    assert resolve_session_id(None, url_sid="../../etc") != resolve_session_id(None, url_sid="../../etc")
+    assert len(resolve_session_id()) == 32
@@ -0,0 +1,150 @@
+import os
+import pickle
+import threading
+import time
+
+import pytest
+
+import shared_cache
+from shared_cache import FileCacheBackend, SignatureError, TwoLevelCache, sign, verify
+
+SECRET = b"test-secret"
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return FileCacheBackend(str(tmp_path))
+
+
+def test_values_round_trip_through_the_shared_store(backend):
+    writer = TwoLevelCache(backend, secret=SECRET)
+    key = writer.make_key("chunks", "https://example.com/course")
+    writer.put(key, {"chunks": [1, 2, 3]})
+    reader = TwoLevelCache(backend, secret=SECRET)
+    assert reader.get(key) == {"chunks": [1, 2, 3]}
+
+
+class Exploit:
+    ran = False
+
+    def __reduce__(self):
+        return (setattr, (Exploit, "ran", True))
+
+
+def test_unsigned_pickle_is_never_loaded(backend):
+    cache = TwoLevelCache(backend, secret=SECRET)
+    key = cache.make_key("faiss", "https://example.com/course")
+    backend.set(key, pickle.dumps(Exploit()))
+    assert cache.get(key, use_l1=False) is None
+    assert cache.get_or_compute(key, lambda: "rebuilt", use_l1=False) == "rebuilt"
+    assert not Exploit.ran
+    assert cache.stats["rejected"] >= 1
+
+
+def test_value_signed_with_another_secret_or_key_is_rejected(backend):
+    cache = TwoLevelCache(backend, secret=SECRET)
+    key = cache.make_key("answer", "q")
+    backend.set(key, sign(b"other-secret", key, pickle.dumps("forged")))
+    assert cache.get(key, use_l1=False) is None
+    # a genuine value copied to a different key does not verify either
+    raw = sign(SECRET, "v1/answer/other", pickle.dumps("moved"))
+    with pytest.raises(SignatureError):
+        verify(SECRET, key, raw)
+
+
+def test_backend_requires_a_secret(backend):
+    with pytest.raises(ValueError):
+        TwoLevelCache(backend)
+
+
+def test_single_flight_computes_once_per_key():
+    cache = TwoLevelCache(None)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    threads = [threading.Thread(target=cache.get_or_compute, args=("k", compute)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert cache._key_locks == {}
+
+
+def test_single_flight_keeps_the_lock_while_threads_wait():
+    cache = TwoLevelCache(None)
+    started = threading.Event()
+
+    def holder():
+        with cache._single_flight("k"):
+            started.set()
+            time.sleep(0.05)
+
+    first = threading.Thread(target=holder)
+    first.start()
+    started.wait()
+    entry = cache._key_locks["k"]
+    waiter = threading.Thread(target=cache.get_or_compute, args=("k", lambda: "value"), kwargs={"use_l1": False})
+    waiter.start()
+    time.sleep(0.01)
+    # the holder finishing must not drop the lock the waiter is queued on
+    assert cache._key_locks["k"] is entry and entry[1] == 2
+    first.join()
+    waiter.join()
+    assert cache._key_locks == {}
+
+
+def test_expired_value_is_deleted_when_read(backend, tmp_path):
+    backend.set("v1/answer/old", b"stale", ttl=0.01)
+    time.sleep(0.02)
+
+    assert backend.get("v1/answer/old") is None
+    assert not (tmp_path / "v1__answer__old").exists()
+
+
+def test_prune_drops_expired_then_oldest_values_past_the_size_limit(tmp_path):
+    backend = FileCacheBackend(str(tmp_path), max_mb=2.5 / 1024)  # 2.5 KB
+    backend.set("expired", b"x" * 100, ttl=0.01)
+    for i in range(4):
+        backend.set(f"value-{i}", b"x" * 1000)
+        os.utime(tmp_path / f"value-{i}", (1000 + i, 1000 + i))
+    backend.acquire("value-0", 60)
+    time.sleep(0.02)
+
+    assert backend.prune() == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["value-0.lock", "value-2", "value-3"]
+
+
+def test_writes_prune_periodically(tmp_path, monkeypatch):
+    backend = FileCacheBackend(str(tmp_path), max_mb=1.5 / 1024)
+    backend.set("first", b"x" * 1000)
+    os.utime(tmp_path / "first", (1000, 1000))
+    backend.set("second", b"x" * 1000)  # within PRUNE_INTERVAL_SECONDS of the first write's prune
+    assert (tmp_path / "first").exists()
+
+    monkeypatch.setattr(shared_cache, "PRUNE_INTERVAL_SECONDS", 0)
+    backend.set("third", b"x" * 100)
+    assert not (tmp_path / "first").exists()
+
+
+def test_lock_is_refreshed_while_a_long_computation_holds_it(backend, monkeypatch):
+    monkeypatch.setattr(shared_cache, "LOCK_REFRESH_SECONDS", 0.05)
+    lock = backend._path("v1/faiss/key") + ".lock"
+    cache = TwoLevelCache(backend, secret=SECRET)
+    ages = []
+
+    def compute():
+        os.utime(lock, (time.time() - 100, time.time() - 100))
+        time.sleep(0.2)
+        ages.append(time.time() - os.path.getmtime(lock))
+        # another replica would treat a lock older than 1 s as stale
+        assert not backend.acquire("v1/faiss/key", 1)
+        return "index"
+
+    assert cache.get_or_compute("v1/faiss/key", compute, use_l1=False) == "index"
+    assert ages[0] < 1
+    assert not os.path.exists(lock)
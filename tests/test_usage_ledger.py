@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from index_builder import build_faiss_index
+from standins import StandInEmbeddings
+from usage_ledger import FEATURE_EMBED_INDEX, FEATURE_EMBED_QUERY, MeteredEmbeddings, UsageLedger, usage_scope
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "usage.db"), flush_seconds=60, prices={})
+    yield ledger
+    ledger.close()
+
+
+def rows(ledger, columns="feature, course, session_id"):
+    with sqlite3.connect(ledger.path) as db:
+        return db.execute(f"SELECT {columns} FROM usage ORDER BY id").fetchall()
+
+
+def test_record_is_written_by_the_writer_not_the_caller(ledger):
+    ledger.record("translate", "google-translate", "Django", "s1", characters=10)
+    assert rows(ledger) == []  # still queued: no commit in the request path
+
+    assert ledger.flush()
+    assert rows(ledger) == [("translate", "Django", "s1")]
+
+
+def test_batch_is_rolled_up_per_day_course_feature_model(ledger):
+    for _ in range(3):
+        ledger.record("translate", "google-translate", "Django", "s1", characters=10)
+    ledger.record("translate", "google-translate", "Java", "s2", characters=5)
+    ledger.flush()
+
+    rollup = {(r["course"], r["feature"]): r for r in ledger.rollup(1, ("course", "feature"))}
+    assert rollup[("Django", "translate")]["calls"] == 3
+    assert rollup[("Django", "translate")]["characters"] == 30
+    assert rollup[("Java", "translate")]["calls"] == 1
+
+
+def test_close_writes_what_is_queued(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "usage.db"), flush_seconds=60, prices={})
+    ledger.record("tts", "gtts", "Django", "s1", characters=10)
+    ledger.close()
+    assert rows(ledger) == [("tts", "Django", "s1")]
+
+
+def test_embeddings_are_charged_to_the_usage_scope(ledger):
+    embeddings = MeteredEmbeddings(StandInEmbeddings(latency_ms=0), ledger, "standin")
+    embeddings.embed_query("outside any scope")
+    with usage_scope("Django", "s1"):
+        embeddings.embed_query("what is the fee?")
+    ledger.flush()
+
+    assert rows(ledger) == [(FEATURE_EMBED_QUERY, "", ""), (FEATURE_EMBED_QUERY, "Django", "s1")]
+
+
+def test_index_build_workers_inherit_the_usage_scope(ledger):
+    embeddings = MeteredEmbeddings(StandInEmbeddings(latency_ms=0), ledger, "standin")
+    docs = [Document(page_content=f"chunk {i}") for i in range(6)]
+    with usage_scope("Django", "s1"):
+        build_faiss_index(docs, embeddings, batch_size=2, max_workers=3)
+    ledger.flush()
+
+    assert rows(ledger) == [(FEATURE_EMBED_INDEX, "Django", "s1")] * 3
+
+
+def test_scope_does_not_leak_into_other_threads(ledger):
+    embeddings = MeteredEmbeddings(StandInEmbeddings(latency_ms=0), ledger, "standin")
+    with usage_scope("Django", "s1"):
+        worker = threading.Thread(target=embeddings.embed_query, args=("fees",))
+        worker.start()
+        worker.join()
+    ledger.flush()
+
+    assert rows(ledger) == [(FEATURE_EMBED_QUERY, "", "")]
@@ -0,0 +1,128 @@
+import io
+import math
+import time
+import wave
+from array import array
+
+import pytest
+
+import voice_input
+from voice_input import (
+    JOB_DONE, JOB_FAILED, JOB_PENDING, FakeRecognizer, RecognitionPool, audio_digest, create_recognizer, read_wav,
+    trim_silence, wav_duration, write_wav,
+)
+
+
+def synth_clip(rate=16000, lead_s=0.8, speech_s=1.2, tail_s=1.0, noise=60, channels=1):
+    """Silence + a voiced (multi-tone, amplitude-modulated) burst + silence, as 16-bit WAV."""
+    samples = array("h")
+    total = int(rate * (lead_s + speech_s + tail_s))
+    speech_start, speech_end = int(rate * lead_s), int(rate * (lead_s + speech_s))
+    for i in range(total):
+        value = noise * math.sin(2 * math.pi * 50 * i / rate)
+        if speech_start <= i < speech_end:
+            t = i / rate
+            envelope = 0.6 + 0.4 * math.sin(2 * math.pi * 4 * t)
+            value += 6000 * envelope * (math.sin(2 * math.pi * 220 * t) + 0.5 * math.sin(2 * math.pi * 660 * t))
+        samples.extend([int(max(-32768, min(32767, value)))] * channels)
+    return write_wav(samples, rate) if channels == 1 else pcm_wav(samples.tobytes(), rate, channels, 2)
+
+
+def pcm_wav(frames, rate, channels, sample_width):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def clips(tmp_path_factory):
+    """WAV fixtures written to disk and read back, like uploaded files."""
+    directory = tmp_path_factory.mktemp("audio")
+    fixtures = {
+        "speech.wav": synth_clip(),
+        "silence.wav": synth_clip(speech_s=0.0),
+        "speech_8k.wav": synth_clip(rate=8000, lead_s=0.3, tail_s=2.0),
+        "speech_stereo.wav": synth_clip(channels=2),
+    }
+    data = {}
+    for name, clip in fixtures.items():
+        (directory / name).write_bytes(clip)
+        data[name] = (directory / name).read_bytes()
+    return data
+
+
+def wait(pool, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    state, text = pool.result(job_id)
+    while state == JOB_PENDING and time.time() < deadline:
+        time.sleep(0.01)
+        state, text = pool.result(job_id)
+    return state, text
+
+
+@pytest.mark.parametrize("name", ["speech.wav", "speech_8k.wav", "speech_stereo.wav"])
+def test_vad_trims_to_the_speech_with_padding(clips, name):
+    trimmed = trim_silence(clips[name])
+    padding = 2 * voice_input.VAD_PADDING_MS / 1000
+
+    assert 1.2 <= wav_duration(trimmed) <= 1.2 + padding + 0.1  # every clip has 1.2s of speech
+    assert wav_duration(trimmed) < wav_duration(clips[name])
+    assert read_wav(trimmed)[2] == 1  # mono
+
+
+def test_silent_clip_has_no_speech(clips):
+    assert trim_silence(clips["silence.wav"]) is None
+
+
+def test_only_16_bit_audio_is_accepted():
+    with pytest.raises(ValueError):
+        trim_silence(pcm_wav(bytes(800), 8000, 1, 1))
+
+
+def test_pool_transcribes_the_trimmed_clip_in_the_background(clips):
+    recognizer = FakeRecognizer(text="what is the fee", delay_seconds=0.2)
+    pool = RecognitionPool(recognizer, max_workers=2)
+
+    started = time.perf_counter()
+    job_id = pool.submit(clips["speech.wav"])
+    assert pool.result(job_id) == (JOB_PENDING, "")
+    assert time.perf_counter() - started < 0.1  # submit never waits for recognition
+
+    assert wait(pool, job_id) == (JOB_DONE, "what is the fee")
+    assert pool.result(job_id)[0] == JOB_FAILED  # a result is read once
+
+
+def test_silent_clip_never_reaches_the_recognizer(clips):
+    recognizer = FakeRecognizer()
+    pool = RecognitionPool(recognizer)
+
+    assert wait(pool, pool.submit(clips["silence.wav"])) == (JOB_DONE, "")
+    assert recognizer.calls == 0
+
+
+def test_transcripts_per_clip(clips):
+    speech = trim_silence(clips["speech.wav"])
+    recognizer = FakeRecognizer(transcripts={audio_digest(speech): "how long is the course"})
+    pool = RecognitionPool(recognizer)
+
+    assert wait(pool, pool.submit(clips["speech.wav"])) == (JOB_DONE, "how long is the course")
+    assert wait(pool, pool.submit(clips["speech_8k.wav"])) == (JOB_DONE, recognizer.text)
+
+
+def test_recognizer_errors_are_reported(clips):
+    class Broken:
+        def transcribe(self, wav_bytes, language="en-US"):
+            raise RuntimeError("service unavailable")
+
+    pool = RecognitionPool(Broken())
+    assert wait(pool, pool.submit(clips["speech.wav"])) == (JOB_FAILED, "service unavailable")
+
+
+def test_fake_backend_is_selectable():
+    assert isinstance(create_recognizer("fake"), FakeRecognizer)
+    with pytest.raises(ValueError):
+        create_recognizer("whisper")
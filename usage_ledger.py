@@ -0,0 +1,435 @@
+"""
+Token and cost ledger for every remote call the app makes.
+
+Each Gemini call (course chat, LLM search, follow-up rewrite), every embedding request
+that misses the caches (query and index builds) and every translation / TTS request is
+recorded with its token (or character) counts and an estimated cost:
+
+    feature         chat_rag | llm_search | memory_rewrite | embed_query | embed_index
+                    | translate | tts
+    course          course name ("" where a call is not tied to one course)
+    session_id      the browser session (?sid=)
+
+Calls that don't get the course / session passed in (embedding requests deep inside
+retrieval and index builds) are charged to the current usage_scope(course, session_id).
+
+record() only queues the row: a background writer appends queued rows to a local WAL-mode
+SQLite file (USAGE_DB) in one transaction per batch (every USAGE_FLUSH_SECONDS or
+USAGE_BATCH_ROWS rows, and at exit), rolling them up per day, course, feature and model
+in the same transaction. Raw rows are kept for USAGE_RETENTION_DAYS;
+the daily rollups are kept for good. Token counts come from the model's usage
+metadata when it reports them, otherwise they are estimated (~4 characters per token).
+
+Budget alarm: once today's estimated cost passes USAGE_DAILY_BUDGET_USD a warning is
+logged (once per day per process) and alarm_active() turns true; the app's sidebar then
+shows a warning.
+
+Prices (USD per 1M tokens, or per 1M characters for translate / tts) are estimates;
+override them with USAGE_PRICES='{"gemini-2.5-flash": [0.30, 2.50]}'.
+
+    python usage_ledger.py report --days 7 --by course,feature
+    python usage_ledger.py today
+"""
+import argparse
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from conversation import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+USAGE_ENABLED = os.getenv("USAGE_LEDGER", "true").lower() in ("1", "true", "yes")
+USAGE_DB = os.getenv("USAGE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "usage.db"))
+USAGE_RETENTION_DAYS = int(os.getenv("USAGE_RETENTION_DAYS", "30"))
+USAGE_DAILY_BUDGET_USD = float(os.getenv("USAGE_DAILY_BUDGET_USD", "0"))  # 0 = no alarm
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", "2"))
+USAGE_BATCH_ROWS = int(os.getenv("USAGE_BATCH_ROWS", "500"))
+# Rows waiting for the writer beyond this are dropped (with a warning) rather than block a request
+USAGE_QUEUE_SIZE = 10000
+
+FEATURE_CHAT = "chat_rag"
+FEATURE_SEARCH = "llm_search"
+FEATURE_REWRITE = "memory_rewrite"
+FEATURE_EMBED_QUERY = "embed_query"
+FEATURE_EMBED_INDEX = "embed_index"
+FEATURE_TRANSLATE = "translate"
+FEATURE_TTS = "tts"
+
+# (input, output) USD per 1M tokens; translate / tts are per 1M characters
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "text-embedding-004": (0.0, 0.0),
+    "gemini-embedding-001": (0.15, 0.0),
+    "google-translate": (20.0, 0.0),
+    "gtts": (0.0, 0.0),
+}
+ROLLUP_COLUMNS = ("day", "course", "feature", "model")
+# Today's running cost is re-read from the database this often, to include other processes
+TODAY_REFRESH_SECONDS = 60
+
+_scope: contextvars.ContextVar = contextvars.ContextVar("usage_scope", default=("", ""))
+_STOP = object()
+
+
+@contextmanager
+def usage_scope(course: str, session_id: str = "") -> Iterator[None]:
+    """Charges calls made in this block (and in worker threads it hands its context to) to course / session."""
+    token = _scope.set((course or "", session_id or ""))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_usage() -> Tuple[str, str]:
+    """(course, session id) of the innermost usage_scope, ("", "") outside of one."""
+    return _scope.get()
+
+
+def load_prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_PRICES)
+    override = os.getenv("USAGE_PRICES", "").strip()
+    if override:
+        try:
+            prices.update({model: (float(p[0]), float(p[1])) for model, p in json.loads(override).items()})
+        except (ValueError, TypeError, IndexError, AttributeError) as err:
+            logger.warning("Ignoring invalid USAGE_PRICES: %s", err)
+    return prices
+
+
+def message_usage(prompt_text: str, message: Any) -> Tuple[int, int, bool]:
+    """(input tokens, output tokens, estimated?) for one chat-model response."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("input_tokens") is not None and usage.get("output_tokens") is not None:
+        return int(usage["input_tokens"]), int(usage["output_tokens"]), False
+    content = getattr(message, "content", message)
+    return estimate_tokens(prompt_text), estimate_tokens(content if isinstance(content, str) else str(content)), True
+
+
+class UsageLedger:
+    """
+    Append-only usage rows + daily rollups in one SQLite file, with a daily budget alarm.
+    Rows are queued and written in batches by a background thread.
+    """
+
+    def __init__(self, path: str = USAGE_DB, daily_budget: float = USAGE_DAILY_BUDGET_USD,
+                 retention_days: int = USAGE_RETENTION_DAYS, prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                 flush_seconds: float = USAGE_FLUSH_SECONDS, batch_rows: int = USAGE_BATCH_ROWS):
+        self.path = path
+        self.daily_budget = daily_budget
+        self.retention_days = retention_days
+        self.prices = prices if prices is not None else load_prices()
+        self.flush_seconds = flush_seconds
+        self.batch_rows = max(1, batch_rows)
+        self._lock = threading.Lock()
+        self._today = ""
+        self._today_cost = 0.0
+        self._today_read = 0.0
+        self._alarmed_day = ""
+        self._records = 0
+        self._dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=USAGE_QUEUE_SIZE)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, day TEXT NOT NULL,"
+                " session_id TEXT NOT NULL, course TEXT NOT NULL, feature TEXT NOT NULL, model TEXT NOT NULL,"
+                " calls INTEGER NOT NULL, input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL,"
+                " characters INTEGER NOT NULL, estimated INTEGER NOT NULL, cost REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_usage_ts ON usage (ts)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS usage_daily ("
+                " day TEXT NOT NULL, course TEXT NOT NULL, feature TEXT NOT NULL, model TEXT NOT NULL,"
+                " calls INTEGER NOT NULL, input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL,"
+                " characters INTEGER NOT NULL, cost REAL NOT NULL,"
+                " PRIMARY KEY (day, course, feature, model))"
+            )
+        self.purge_expired()
+        self._writer = threading.Thread(target=self._write_loop, name="usage-ledger", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: safe across Streamlit's script threads
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def cost(self, model: str, input_units: int, output_units: int) -> float:
+        price_in, price_out = self.prices.get(model, (0.0, 0.0))
+        return (input_units * price_in + output_units * price_out) / 1_000_000
+
+    def record(self, feature: str, model: str, course: str = "", session_id: str = "", calls: int = 1,
+               input_tokens: int = 0, output_tokens: int = 0, characters: int = 0, estimated: bool = False) -> None:
+        """Queues one request for the writer. Never raises or blocks: accounting must not break the app."""
+        now = time.time()
+        day = datetime.fromtimestamp(now).strftime("%Y-%m-%d")
+        # Character-priced services (translate / tts) bill characters as input units
+        cost = self.cost(model, characters if characters and not input_tokens else input_tokens, output_tokens)
+        row = (now, day, session_id or "", course or "", feature, model, calls, input_tokens,
+               output_tokens, characters, int(estimated), cost)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+                first = self._dropped == 1
+            if first:
+                logger.warning("Usage ledger queue full (%d rows); dropping usage rows", USAGE_QUEUE_SIZE)
+            return
+        logger.debug("usage feature=%s model=%s course=%s in=%d out=%d chars=%d cost=%.6f",
+                     feature, model, course, input_tokens, output_tokens, characters, cost)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Waits until every row recorded so far is written. False on timeout."""
+        if not self._writer.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Writes the queued rows and stops the writer (at exit)."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            rows, flushed, stop = [], [], False
+            deadline = time.monotonic() + self.flush_seconds
+            # Collect a batch: until flush_seconds after its first row, batch_rows rows, flush() or close()
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    flushed.append(item)
+                    break
+                rows.append(item)
+                if len(rows) >= self.batch_rows:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if rows:
+                self._write(rows)
+            for event in flushed:
+                event.set()
+            if stop:
+                return
+
+    def _write(self, rows: List[Tuple]) -> None:
+        daily: Dict[Tuple[str, str, str, str], List[float]] = {}
+        for _, day, _, course, feature, model, calls, input_tokens, output_tokens, characters, _, cost in rows:
+            totals = daily.setdefault((day, course, feature, model), [0, 0, 0, 0, 0.0])
+            for i, value in enumerate((calls, input_tokens, output_tokens, characters, cost)):
+                totals[i] += value
+        try:
+            with self._connect() as db:
+                db.executemany(
+                    "INSERT INTO usage (ts, day, session_id, course, feature, model, calls, input_tokens,"
+                    " output_tokens, characters, estimated, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                db.executemany(
+                    "INSERT INTO usage_daily (day, course, feature, model, calls, input_tokens, output_tokens,"
+                    " characters, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (day, course, feature, model) DO UPDATE SET"
+                    " calls = calls + excluded.calls, input_tokens = input_tokens + excluded.input_tokens,"
+                    " output_tokens = output_tokens + excluded.output_tokens,"
+                    " characters = characters + excluded.characters, cost = cost + excluded.cost",
+                    [key + tuple(totals) for key, totals in daily.items()],
+                )
+        except sqlite3.Error as err:
+            logger.warning("Usage ledger write of %d rows failed: %s", len(rows), err)
+            return
+        now = time.time()
+        for day in sorted({key[0] for key in daily}):
+            self._check_budget(day, sum(t[4] for key, t in daily.items() if key[0] == day), now)
+        with self._lock:
+            before = self._records
+            self._records += len(rows)
+            purge = before // 1000 != self._records // 1000
+        if purge:
+            self.purge_expired()
+
+    def record_llm(self, feature: str, model: str, prompt_text: str, message: Any,
+                   course: str = "", session_id: str = "") -> None:
+        input_tokens, output_tokens, estimated = message_usage(prompt_text, message)
+        self.record(feature, model, course, session_id, input_tokens=input_tokens,
+                    output_tokens=output_tokens, estimated=estimated)
+
+    # ----- Budget alarm -----
+    def today_cost(self) -> float:
+        day = datetime.now().strftime("%Y-%m-%d")
+        with self._connect() as db:
+            row = db.execute("SELECT COALESCE(SUM(cost), 0) FROM usage_daily WHERE day = ?", (day,)).fetchone()
+        return float(row[0])
+
+    def _check_budget(self, day: str, cost: float, now: float) -> None:
+        if self.daily_budget <= 0:
+            return
+        with self._lock:
+            stale = day != self._today or now - self._today_read > TODAY_REFRESH_SECONDS
+        if stale:
+            try:
+                total = self.today_cost()
+            except sqlite3.Error:
+                return
+            with self._lock:
+                self._today, self._today_cost, self._today_read = day, total, now
+        else:
+            with self._lock:
+                self._today_cost += cost
+        with self._lock:
+            fire = self._today_cost >= self.daily_budget and self._alarmed_day != day
+            if fire:
+                self._alarmed_day = day
+            total = self._today_cost
+        if fire:
+            logger.warning("Usage budget alarm: estimated cost today $%.4f >= USAGE_DAILY_BUDGET_USD $%g",
+                           total, self.daily_budget)
+
+    def alarm_active(self) -> bool:
+        with self._lock:
+            return self.daily_budget > 0 and self._today == datetime.now().strftime("%Y-%m-%d") \
+                and self._today_cost >= self.daily_budget
+
+    # ----- Rollups -----
+    def rollup(self, days: int = 7, by: Tuple[str, ...] = ("course", "feature")) -> List[Dict[str, Any]]:
+        """Daily rollups of the last `days` days grouped by `by` (day / course / feature / model), costliest first."""
+        columns = [c for c in by if c in ROLLUP_COLUMNS] or ["feature"]
+        since = (datetime.now() - timedelta(days=max(days - 1, 0))).strftime("%Y-%m-%d")
+        group = ", ".join(columns)
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT {group}, SUM(calls), SUM(input_tokens), SUM(output_tokens), SUM(characters), SUM(cost)"
+                f" FROM usage_daily WHERE day >= ? GROUP BY {group} ORDER BY SUM(cost) DESC, SUM(input_tokens) DESC",
+                (since,),
+            ).fetchall()
+        keys = columns + ["calls", "input_tokens", "output_tokens", "characters", "cost"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    def purge_expired(self) -> int:
+        """Deletes raw rows older than the retention window (daily rollups are kept)."""
+        cutoff = time.time() - self.retention_days * 24 * 3600
+        try:
+            with self._connect() as db:
+                return db.execute("DELETE FROM usage WHERE ts < ?", (cutoff,)).rowcount
+        except sqlite3.Error as err:
+            logger.warning("Usage ledger purge failed: %s", err)
+            return 0
+
+
+class NullLedger:
+    """Stand-in when USAGE_LEDGER=false."""
+
+    def record(self, *args, **kwargs) -> None:
+        pass
+
+    def record_llm(self, *args, **kwargs) -> None:
+        pass
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        return True
+
+    def alarm_active(self) -> bool:
+        return False
+
+
+def create_usage_ledger():
+    if not USAGE_ENABLED:
+        return NullLedger()
+    try:
+        return UsageLedger()
+    except sqlite3.Error as err:
+        logger.warning("Usage ledger disabled: %s", err)
+        return NullLedger()
+
+
+class MeteredEmbeddings(Embeddings):
+    """
+    Records every embedding request that reaches the backend (wrap it inside the query
+    caches), charged to the current usage_scope().
+    """
+
+    def __init__(self, inner: Embeddings, ledger, model: str):
+        self.inner = inner
+        self.ledger = ledger
+        self.model = getattr(inner, "model", model)
+        self.model_name = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.inner.embed_documents(texts)
+        self.ledger.record(FEATURE_EMBED_INDEX, self.model_name, *current_usage(),
+                           input_tokens=sum(estimate_tokens(t) for t in texts), estimated=True)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.inner.embed_query(text)
+        self.ledger.record(FEATURE_EMBED_QUERY, self.model_name, *current_usage(), input_tokens=estimate_tokens(text),
+                           estimated=True)
+        return vector
+
+
+# ===== CLI =====
+def print_rollup(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        print("No usage recorded.")
+        return
+    keys = list(rows[0].keys())
+    widths = {k: max(len(k), *(len(_fmt(r[k])) for r in rows)) for k in keys}
+    print("  ".join(k.ljust(widths[k]) for k in keys))
+    for row in rows:
+        print("  ".join(_fmt(row[k]).ljust(widths[k]) for k in keys))
+    total = sum(r["cost"] for r in rows)
+    print(f"\nEstimated total: ${total:.4f}")
+
+
+def _fmt(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value if value != "" else "-")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Token / cost usage report")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="rollup of the last N days")
+    report.add_argument("--days", type=int, default=7)
+    report.add_argument("--by", default="course,feature", help="comma list of day, course, feature, model")
+    sub.add_parser("today", help="today's cost per feature against USAGE_DAILY_BUDGET_USD")
+    args = parser.parse_args()
+
+    ledger = UsageLedger()
+    if args.command == "report":
+        print_rollup(ledger.rollup(args.days, tuple(c.strip() for c in args.by.split(",") if c.strip())))
+    else:
+        print_rollup(ledger.rollup(1, ("feature", "model")))
+        if ledger.daily_budget > 0:
+            print(f"Budget: ${ledger.daily_budget:g} ({100 * ledger.today_cost() / ledger.daily_budget:.1f}% used)")
+
+
+if __name__ == "__main__":
+    main()
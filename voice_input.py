@@ -0,0 +1,213 @@
+"""
+Voice questions from browser audio.
+
+The browser records (st.audio_input) or uploads a WAV clip; nothing touches a server
+microphone. Each clip is trimmed to the spoken part by a small energy-based voice
+activity detector and handed to RecognitionPool, which transcribes it on worker
+threads, so script reruns only ever poll a job and never wait on recognition.
+
+    RECOGNIZER_BACKEND=google    speech_recognition's free Google Web Speech API (default)
+    RECOGNIZER_BACKEND=fake      offline stand-in: returns RECOGNIZER_FAKE_TEXT (for demos/tests)
+    RECOGNITION_LANGUAGE=en-US
+    RECOGNITION_WORKERS=2
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+import wave
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+try:
+    import speech_recognition as sr  # type: ignore
+except Exception:  # pragma: no cover
+    sr = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+RECOGNIZER_BACKEND = os.getenv("RECOGNIZER_BACKEND", "google").strip().lower()
+RECOGNIZER_FAKE_TEXT = os.getenv("RECOGNIZER_FAKE_TEXT", "What are the prerequisites for this course?")
+RECOGNITION_LANGUAGE = os.getenv("RECOGNITION_LANGUAGE", "en-US")
+RECOGNITION_WORKERS = int(os.getenv("RECOGNITION_WORKERS", "2"))
+
+# Voice activity detection
+VAD_FRAME_MS = 30
+VAD_PADDING_MS = 200  # kept around the detected speech so word edges aren't clipped
+VAD_MIN_RMS = 300  # absolute floor (16-bit samples) for quiet recordings
+VAD_NOISE_RATIO = 3.0  # speech = frame energy this many times above the noise floor
+
+# Finished jobs are forgotten after this long (results are read on the next rerun)
+JOB_TTL_SECONDS = 300
+
+JOB_PENDING = "pending"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+# ===== WAV helpers and voice activity detection =====
+def read_wav(data: bytes) -> Tuple[array, int, int]:
+    """Returns (mono 16-bit samples, sample_rate, channels) for a PCM WAV clip."""
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV audio is supported")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        samples = array("h", wav.readframes(wav.getnframes()))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if channels > 1:
+        # Downmix: recognizers only need one channel
+        samples = array("h", (sum(samples[i:i + channels]) // channels for i in range(0, len(samples), channels)))
+    return samples, rate, channels
+
+
+def write_wav(samples: array, rate: int) -> bytes:
+    out = array("h", samples)
+    if sys.byteorder == "big":
+        out.byteswap()
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(out.tobytes())
+    return buf.getvalue()
+
+
+def _frame_rms(samples: array, start: int, end: int) -> float:
+    frame = samples[start:end]
+    return math.sqrt(sum(s * s for s in frame) / len(frame)) if frame else 0.0
+
+
+def trim_silence(data: bytes) -> Optional[bytes]:
+    """
+    Trims leading/trailing silence from a WAV clip (mono 16-bit output).
+    Returns None when no speech is detected, so silent clips never reach the recognizer.
+    """
+    samples, rate, _ = read_wav(data)
+    frame_len = max(1, rate * VAD_FRAME_MS // 1000)
+    energies = [_frame_rms(samples, i, i + frame_len) for i in range(0, len(samples), frame_len)]
+    if not energies:
+        return None
+    # Noise floor from the quietest tenth of the frames
+    quiet = sorted(energies)[:max(1, len(energies) // 10)]
+    threshold = max(VAD_MIN_RMS, VAD_NOISE_RATIO * sum(quiet) / len(quiet))
+    voiced = [i for i, energy in enumerate(energies) if energy >= threshold]
+    if not voiced:
+        return None
+    pad = VAD_PADDING_MS // VAD_FRAME_MS
+    start = max(0, voiced[0] - pad) * frame_len
+    end = min(len(energies), voiced[-1] + 1 + pad) * frame_len
+    return write_wav(samples[start:end], rate)
+
+
+def wav_duration(data: bytes) -> float:
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        return wav.getnframes() / float(wav.getframerate())
+
+
+# ===== Recognizer backends =====
+class GoogleWebRecognizer:
+    """speech_recognition's recognize_google (network call, run on a worker thread)."""
+
+    def __init__(self):
+        if sr is None:
+            raise RuntimeError("RECOGNIZER_BACKEND=google requires the 'SpeechRecognition' package")
+        self._recognizer = sr.Recognizer()
+
+    def transcribe(self, wav_bytes: bytes, language: str = RECOGNITION_LANGUAGE) -> str:
+        with sr.AudioFile(io.BytesIO(wav_bytes)) as source:
+            audio = self._recognizer.record(source)
+        try:
+            return self._recognizer.recognize_google(audio, language=language)
+        except sr.UnknownValueError:
+            return ""
+
+
+class FakeRecognizer:
+    """Offline recognizer: returns a fixed transcript (or one per clip hash) after an optional delay."""
+
+    def __init__(self, text: str = RECOGNIZER_FAKE_TEXT, transcripts: Optional[Dict[str, str]] = None,
+                 delay_seconds: float = 0.0):
+        self.text = text
+        self.transcripts = transcripts or {}
+        self.delay_seconds = delay_seconds
+        self.calls = 0
+
+    def transcribe(self, wav_bytes: bytes, language: str = RECOGNITION_LANGUAGE) -> str:
+        self.calls += 1
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        return self.transcripts.get(audio_digest(wav_bytes), self.text)
+
+
+def create_recognizer(backend: str = RECOGNIZER_BACKEND):
+    if backend == "google":
+        return GoogleWebRecognizer()
+    if backend == "fake":
+        return FakeRecognizer()
+    raise ValueError(f"Unknown RECOGNIZER_BACKEND: {backend!r} (expected 'google' or 'fake')")
+
+
+def audio_digest(data: bytes) -> str:
+    """Identifies a clip, so a rerun that sees the same recording doesn't submit it twice."""
+    return hashlib.sha1(data).hexdigest()
+
+
+# ===== Asynchronous recognition =====
+class RecognitionPool:
+    """
+    Transcribes clips on a thread pool. submit() returns a job id immediately;
+    result() is non-blocking and returns (state, text_or_error).
+    """
+
+    def __init__(self, recognizer, max_workers: int = RECOGNITION_WORKERS):
+        self.recognizer = recognizer
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="speech")
+        self._jobs: Dict[str, Tuple[float, Future]] = {}
+        self._lock = threading.Lock()
+
+    def _recognize(self, data: bytes, language: str) -> str:
+        started = time.perf_counter()
+        speech = trim_silence(data)
+        if speech is None:
+            return ""
+        text = self.recognizer.transcribe(speech, language=language).strip()
+        logger.info("Recognized %.1fs of speech (of %.1fs recorded) in %.2fs",
+                    wav_duration(speech), wav_duration(data), time.perf_counter() - started)
+        return text
+
+    def submit(self, data: bytes, language: str = RECOGNITION_LANGUAGE) -> str:
+        job_id = uuid.uuid4().hex
+        future = self._pool.submit(self._recognize, data, language)
+        with self._lock:
+            self._expire()
+            self._jobs[job_id] = (time.time(), future)
+        return job_id
+
+    def result(self, job_id: str) -> Tuple[str, str]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return JOB_FAILED, "Recognition job expired"
+        future = entry[1]
+        if not future.done():
+            return JOB_PENDING, ""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        err = future.exception()
+        if err is not None:
+            return JOB_FAILED, str(err)
+        return JOB_DONE, future.result()
+
+    def _expire(self) -> None:
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for job_id in [j for j, (submitted, f) in self._jobs.items() if submitted < cutoff and f.done()]:
+            del self._jobs[job_id]